@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Tool-call throughput under concurrent readers and writers
+
+Runs reader threads (search_contacts, get_contact_details) and writer threads
+(create_task, create_communication) against a scratch copy of the sample database
+for a fixed time. It compares the pooled, WAL-mode connections with the previous
+behaviour of one fresh rollback-journal connection per tool call.
+
+Usage:
+    python benchmark_connections.py [--readers 4] [--writers 2] [--seconds 5]
+"""
+
+import sys
+import json
+import time
+import sqlite3
+import argparse
+import tempfile
+import threading
+from pathlib import Path
+from typing import Dict
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import server
+from database import CRMDatabase
+
+def per_call_connection(readonly: bool = False) -> sqlite3.Connection:
+    """The connection handling before pooling: a new default connection per call"""
+    conn = sqlite3.connect(server.DB_PATH)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+def read_call(i: int) -> str:
+    if i % 2:
+        return server.get_contact_details(1 + i % 3)
+    return server.search_contacts("a", limit=20)
+
+def write_call(i: int) -> str:
+    if i % 2:
+        return server.create_task(f"Benchmark task {i}", contact_id=1 + i % 3)
+    return server.create_communication("email", f"sender{i % 5}@example.com", f"Benchmark message {i}",
+                                       subject="Benchmark")
+
+def is_error(result: str) -> bool:
+    try:
+        return not json.loads(result).get("success", True)
+    except (ValueError, AttributeError):
+        return result.startswith(("Error", "Failed"))
+
+def run_workload(db_path: Path, readers: int, writers: int, seconds: float) -> Dict:
+    """
+    Call tools from reader and writer threads until the time is up
+
+    Returns:
+        Calls, errors and calls/sec for reads and writes
+    """
+    server.DB_PATH = db_path
+    counts = {"read": [0, 0], "write": [0, 0]}
+    counts_lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def worker(kind: str, call):
+        calls = errors = 0
+        while time.perf_counter() < deadline:
+            try:
+                failed = is_error(call(calls))
+            except Exception:
+                failed = True
+            calls += 1
+            errors += failed
+        with counts_lock:
+            counts[kind][0] += calls
+            counts[kind][1] += errors
+
+    threads = [threading.Thread(target=worker, args=("read", read_call)) for _ in range(readers)]
+    threads += [threading.Thread(target=worker, args=("write", write_call)) for _ in range(writers)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    return {
+        kind: {"calls": calls, "errors": errors, "calls_per_sec": round(calls / elapsed, 1)}
+        for kind, (calls, errors) in counts.items()
+    }
+
+def create_sample_database(path: Path):
+    db = CRMDatabase(str(path))
+    with db:
+        db.init_database()
+        db.create_sample_data()
+
+def compare(readers: int, writers: int, seconds: float) -> Dict:
+    """Run the same workload with per-call connections and with pooled connections"""
+    original_db_path, original_get_connection = server.DB_PATH, server.get_db_connection
+    results = {}
+    with tempfile.TemporaryDirectory() as temp_dir:
+        try:
+            per_call_db = Path(temp_dir) / "per_call.db"
+            create_sample_database(per_call_db)
+            server.get_db_connection = per_call_connection
+            results["per_call"] = run_workload(per_call_db, readers, writers, seconds)
+
+            pooled_db = Path(temp_dir) / "pooled.db"
+            create_sample_database(pooled_db)
+            server.get_db_connection = original_get_connection
+            results["pooled"] = run_workload(pooled_db, readers, writers, seconds)
+        finally:
+            server.get_db_connection = original_get_connection
+            server.get_connection_manager().close()
+            server.DB_PATH = original_db_path
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark CRM tool calls under concurrency")
+    parser.add_argument("--readers", type=int, default=4, help="Reader threads")
+    parser.add_argument("--writers", type=int, default=2, help="Writer threads")
+    parser.add_argument("--seconds", type=float, default=5.0, help="Duration of each run")
+    args = parser.parse_args()
+
+    print(f"📊 {args.readers} readers, {args.writers} writers, {args.seconds:.0f}s per run")
+    results = compare(args.readers, args.writers, args.seconds)
+    for mode, result in results.items():
+        print(f"   {mode:>8}: reads {result['read']['calls_per_sec']:>8.1f}/s ({result['read']['errors']} errors), "
+              f"writes {result['write']['calls_per_sec']:>7.1f}/s ({result['write']['errors']} errors)")
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Serialization time and response size of search results
+
+Fills a scratch database with email-like communications (long text bodies, HTML
+and JSON metadata) and formats one page of search_communications results three
+ways: the previous formatter (every column, json.dumps(indent=2)), the current
+default (truncated, compact, size limit) and the current default with a fields
+projection.
+
+Usage:
+    python benchmark_formatting.py [--rows 20] [--repeat 200]
+"""
+
+import sys
+import json
+import time
+import argparse
+import tempfile
+from pathlib import Path
+from typing import Dict
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import server
+from database import CRMDatabase
+from formatting import estimate_tokens
+
+PROJECTION = ["id", "communication_timestamp", "sender_display_name", "subject_line", "snippet"]
+
+def previous_format(results, description: str) -> str:
+    """The formatter before projection and limits: every column, indented"""
+    if not results:
+        return f"No results found. {description}"
+    formatted_results = [dict(row) for row in results]
+    return f"{description}\n\nResults ({len(results)} found):\n{json.dumps(formatted_results, indent=2, default=str)}"
+
+def create_sample_database(path: Path, rows: int):
+    db = CRMDatabase(str(path))
+    with db:
+        db.init_database()
+        db.create_sample_data()
+    body = " ".join(f"Paragraph {i} of the quarterly report with figures and commentary." for i in range(60))
+    metadata = json.dumps({"headers": {f"X-Header-{i}": "value " * 8 for i in range(30)}, "labels": ["inbox"] * 10})
+    records = [{"platform": "email", "sender_identifier": f"analyst{i % 7}@example.com",
+                "sender_name": f"Analyst {i % 7}", "subject": f"Quarterly report {i}",
+                "content": f"{body} Report number {i}."} for i in range(rows)]
+    server.DB_PATH = path
+    server.ingest_communications(records)
+    with server.get_db_connection() as conn:
+        conn.execute("""
+            UPDATE communications
+            SET message_content_html = '<html><body><p>' || message_content_text || '</p></body></html>',
+                platform_specific_data = ?, ai_extracted_entities = ?
+        """, (metadata, metadata))
+
+def measure(format_page, repeat: int) -> Dict:
+    output = format_page()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        format_page()
+    elapsed = (time.perf_counter() - start) / repeat
+    return {"ms": round(elapsed * 1000, 3), "chars": len(output), "tokens": estimate_tokens(output)}
+
+def run(rows: int, repeat: int) -> Dict:
+    """
+    Format the same page with each formatter
+
+    Returns:
+        Time per page, characters and estimated tokens per formatter
+    """
+    original_db_path = server.DB_PATH
+    with tempfile.TemporaryDirectory() as temp_dir:
+        try:
+            create_sample_database(Path(temp_dir) / "crm.db", rows)
+            conn = server.get_db_connection(readonly=True)
+            results = conn.execute("""
+                SELECT c.*, snippet(communications_fts, -1, '**', '**', '...', 16) as snippet
+                FROM communications_fts JOIN communications c ON communications_fts.rowid = c.id
+                WHERE communications_fts MATCH 'quarterly' ORDER BY c.id LIMIT ?
+            """, (rows,)).fetchall()
+            description = "Communication search results for: 'quarterly'"
+            return {
+                "previous": measure(lambda: previous_format(results, description), repeat),
+                "compact": measure(lambda: server.format_results_for_llm(results, description), repeat),
+                "projected": measure(lambda: server.format_results_for_llm(results, description, PROJECTION), repeat),
+            }
+        finally:
+            server.get_connection_manager().close()
+            server.DB_PATH = original_db_path
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark result formatting")
+    parser.add_argument("--rows", type=int, default=20, help="Rows per page")
+    parser.add_argument("--repeat", type=int, default=200, help="Timed repetitions per formatter")
+    args = parser.parse_args()
+
+    print(f"📊 One page of {args.rows} communications")
+    results = run(args.rows, args.repeat)
+    for mode, result in results.items():
+        print(f"   {mode:>9}: {result['ms']:>8.3f} ms, {result['chars']:>8,} chars, ~{result['tokens']:>7,} tokens")
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+SQLite Connection Management for the CRM Server
+
+Tool calls reuse long-lived connections instead of opening a new one per call:
+each thread gets its own read-only connection, and all writes go through a single
+writer connection guarded by a lock. The database runs in WAL mode, so readers
+never block the writer and the writer never blocks readers. Every connection is
+tuned on open (synchronous, mmap, cache, busy timeout, foreign keys) and keeps a
+cache of prepared statements.
+
+Ad hoc SQL gets separate per-thread connections opened with mode=ro, so its
+authorizer and time budget never touch the connections the tools use.
+"""
+
+import os
+import sqlite3
+import logging
+import threading
+from pathlib import Path
+from typing import Callable, List, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+# Connection tuning (environment overrides)
+MMAP_SIZE = int(os.getenv("CRM_DB_MMAP_SIZE", str(256 * 1024 * 1024)))
+CACHE_SIZE_KB = int(os.getenv("CRM_DB_CACHE_SIZE_KB", "65536"))
+BUSY_TIMEOUT_MS = int(os.getenv("CRM_DB_BUSY_TIMEOUT_MS", "5000"))
+# Prepared statements kept per connection (sqlite3 default is 128)
+STATEMENT_CACHE_SIZE = int(os.getenv("CRM_DB_STATEMENT_CACHE_SIZE", "256"))
+
+def tune_connection(conn: sqlite3.Connection, read_only: bool = False) -> sqlite3.Connection:
+    """Apply the per-connection pragmas"""
+    conn.row_factory = sqlite3.Row
+    conn.execute(f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute(f"PRAGMA mmap_size = {MMAP_SIZE}")
+    conn.execute(f"PRAGMA cache_size = -{CACHE_SIZE_KB}")
+    conn.execute("PRAGMA foreign_keys = ON")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    if read_only:
+        conn.execute("PRAGMA query_only = ON")
+    return conn
+
+class _WriterSession:
+    """Holds the writer lock for a `with` block and commits or rolls back on exit"""
+
+    def __init__(self, manager: "ConnectionManager"):
+        self.manager = manager
+
+    def __enter__(self) -> sqlite3.Connection:
+        self.manager._writer_lock.acquire()
+        try:
+            self.conn = self.manager._get_writer()
+            return self.conn.__enter__()
+        except Exception:
+            self.manager._writer_lock.release()
+            raise
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        try:
+            return self.conn.__exit__(exc_type, exc_val, exc_tb)
+        finally:
+            self.manager._writer_lock.release()
+
+class ConnectionManager:
+    """Per-thread reader connections and one shared writer connection for a database file"""
+
+    def __init__(self, db_path: Union[str, Path]):
+        self.db_path = Path(db_path)
+        self._local = threading.local()
+        self._readers: List[sqlite3.Connection] = []
+        self._readers_lock = threading.Lock()
+        self._writer: Optional[sqlite3.Connection] = None
+        self._writer_lock = threading.RLock()
+        self._trace_callback: Optional[Callable[[str], None]] = None
+
+    def _connect(self, read_only_file: bool = False) -> sqlite3.Connection:
+        # Connections are used from one thread at a time but may be closed from another
+        if read_only_file:
+            conn = sqlite3.connect(f"{self.db_path.resolve().as_uri()}?mode=ro", uri=True,
+                                   timeout=BUSY_TIMEOUT_MS / 1000, check_same_thread=False)
+        else:
+            conn = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT_MS / 1000,
+                                   cached_statements=STATEMENT_CACHE_SIZE, check_same_thread=False)
+        conn.set_trace_callback(self._trace_callback)
+        return conn
+
+    def _get_writer(self) -> sqlite3.Connection:
+        if self._writer is None:
+            conn = self._connect()
+            mode = conn.execute("PRAGMA journal_mode = WAL").fetchone()[0]
+            if mode.lower() != "wal":
+                logger.warning(f"Could not enable WAL for {self.db_path} (journal_mode={mode})")
+            self._writer = tune_connection(conn)
+        return self._writer
+
+    def reader(self) -> sqlite3.Connection:
+        """
+        Read-only connection for the calling thread
+
+        Returns:
+            Connection with query_only set; writes through it raise sqlite3.OperationalError
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # The writer switches the file to WAL before any reader attaches
+            with self._writer_lock:
+                self._get_writer()
+            conn = tune_connection(self._connect(), read_only=True)
+            self._local.conn = conn
+            with self._readers_lock:
+                self._readers.append(conn)
+        return conn
+
+    def query_reader(self) -> sqlite3.Connection:
+        """
+        Read-only connection for the calling thread's ad hoc queries
+
+        Opened with mode=ro as well as query_only, so writes fail even if
+        query_only is switched off.
+
+        Returns:
+            Connection separate from reader()
+        """
+        conn = getattr(self._local, "query_conn", None)
+        if conn is None:
+            with self._writer_lock:
+                self._get_writer()
+            conn = tune_connection(self._connect(read_only_file=True), read_only=True)
+            self._local.query_conn = conn
+            with self._readers_lock:
+                self._readers.append(conn)
+        return conn
+
+    def writer(self) -> _WriterSession:
+        """
+        Exclusive use of the writer connection for a `with` block
+
+        Returns:
+            Context manager yielding the writer connection; the transaction is
+            committed on success and rolled back on error
+        """
+        return _WriterSession(self)
+
+    def set_trace_callback(self, callback: Optional[Callable[[str], None]]):
+        """
+        Call callback with the SQL of every statement run on any connection
+
+        Applies to open connections and to connections opened later; None turns
+        tracing off.
+        """
+        self._trace_callback = callback
+        with self._readers_lock:
+            for conn in self._readers:
+                conn.set_trace_callback(callback)
+        with self._writer_lock:
+            if self._writer is not None:
+                self._writer.set_trace_callback(callback)
+
+    def close(self):
+        """Close all connections (readers of other threads included)"""
+        with self._readers_lock:
+            for conn in self._readers:
+                conn.close()
+            self._readers.clear()
+        self._local = threading.local()
+        with self._writer_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
@@ -8,10 +8,154 @@ for the CRM system designed for LLM processing.
 
 import sqlite3
 import json
+import hashlib
 from pathlib import Path
 from datetime import datetime, date
 from typing import Optional, List, Dict, Any
 import argparse
+from contextlib import contextmanager
+
+# FTS index -> (external content table, indexed columns)
+FTS_TABLES = {
+    "communications_fts": ("communications", ["message_content_text", "subject_line", "sender_display_name"]),
+    "contacts_fts": ("contacts", ["first_name", "last_name", "email", "notes"]),
+}
+FTS_TRIGGER_SUFFIXES = ("ai", "ad", "au")
+# Leaf pages written per incremental FTS merge step
+FTS_MERGE_PAGES = 256
+
+# Unique keys used as ON CONFLICT targets by communication ingestion
+INGESTION_KEY_INDEXES = {
+    "idx_communications_platform_message": """
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_communications_platform_message
+        ON communications(platform, platform_message_id) WHERE platform_message_id IS NOT NULL
+    """,
+    "idx_communications_content_hash": """
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_communications_content_hash
+        ON communications(content_hash) WHERE platform_message_id IS NULL
+    """,
+}
+
+# Indexes replaced by the live-row (WHERE deleted_at IS NULL) indexes or by UNIQUE constraints
+OBSOLETE_INDEXES = [
+    "idx_contacts_deleted",
+    "idx_companies_deleted",
+    "idx_communications_deleted",
+    "idx_tasks_deleted",
+    "idx_transactions_deleted",
+    "idx_contacts_email",
+    "idx_tasks_due_date",
+    "idx_tasks_priority",
+    "idx_transactions_date",
+    "idx_communications_date",
+    "idx_communications_source_id",
+    "idx_contact_identities_platform",
+]
+
+# Dashboard rollup metric -> (source table, bucket, condition, columns read), over live rows only.
+# {row} stands for the row: new/old in triggers, the table itself when recomputing.
+COMMUNICATION_DAY = "substr({row}.communication_timestamp, 1, 10)"
+ROLLUPS = {
+    "contacts_by_status": ("contacts", "COALESCE({row}.status, '')", "1", ["status"]),
+    "companies": ("companies", "''", "1", []),
+    "communications": ("communications", "''", "1", []),
+    "communications_by_day": ("communications", COMMUNICATION_DAY, "1", ["communication_timestamp"]),
+    "unprocessed_communications_by_day": ("communications", COMMUNICATION_DAY,
+                                          "{row}.processing_status = 'needs_processing'",
+                                          ["communication_timestamp", "processing_status"]),
+    "urgent_communications_by_day": ("communications", COMMUNICATION_DAY, "{row}.urgency_level = 'urgent'",
+                                     ["communication_timestamp", "urgency_level"]),
+    "follow_up_communications_by_day": ("communications", COMMUNICATION_DAY, "{row}.requires_follow_up = 1",
+                                        ["communication_timestamp", "requires_follow_up"]),
+    "tasks": ("tasks", "''", "1", []),
+    "open_tasks": ("tasks", "''", "{row}.completed = 0", ["completed"]),
+    "open_tasks_by_due_date": ("tasks", "{row}.due_date", "{row}.completed = 0 AND {row}.due_date IS NOT NULL",
+                               ["completed", "due_date"]),
+}
+ROLLUP_TRIGGER_SUFFIXES = ("ai", "ad", "au")
+
+def rollup_source_tables() -> List[str]:
+    """Tables with rollup triggers, in definition order"""
+    return list(dict.fromkeys(table for table, _, _, _ in ROLLUPS.values()))
+
+def dashboard_counts(conn: sqlite3.Connection) -> Dict[str, Any]:
+    """
+    Dashboard metrics read from the rollups instead of counting the tables
+    
+    Every metric is a primary key lookup. The 30-day and overdue figures sum the
+    per-day buckets in their date range, so they stay correct as days pass.
+    """
+    def total(metric: str, bucket_condition: str = "1") -> int:
+        return conn.execute(f"""
+            SELECT COALESCE(SUM(count), 0) FROM dashboard_rollups WHERE metric = ? AND {bucket_condition}
+        """, (metric,)).fetchone()[0]
+    
+    last_30_days = "bucket >= date('now', '-30 days')"
+    return {
+        "contacts": total("contacts_by_status"),
+        "active_contacts": total("contacts_by_status", "bucket = 'active'"),
+        "companies": total("companies"),
+        "communications": total("communications"),
+        "communications_30_days": {
+            "total": total("communications_by_day", last_30_days),
+            "unprocessed": total("unprocessed_communications_by_day", last_30_days),
+            "urgent": total("urgent_communications_by_day", last_30_days),
+            "needs_followup": total("follow_up_communications_by_day", last_30_days),
+        },
+        "task_summary": {
+            "total": total("tasks"),
+            "pending": total("open_tasks"),
+            "overdue": total("open_tasks_by_due_date", "bucket <= date('now')"),
+        },
+    }
+
+def optimize_fts(conn: sqlite3.Connection):
+    """Run the FTS5 'optimize' merge on every FTS index (caller commits)"""
+    for fts_table in FTS_TABLES:
+        conn.execute(f"INSERT INTO {fts_table}({fts_table}) VALUES ('optimize')")
+
+def merge_fts_step(conn: sqlite3.Connection, fts_table: str, pages: int = None) -> bool:
+    """
+    One bounded step of the FTS5 'merge' command on one index (caller commits)
+    
+    A negative page count merges segments regardless of their level, so repeated
+    steps end at the same single segment as 'optimize'.
+    
+    Returns:
+        True if the step merged anything, False once the index is fully merged
+    """
+    pages = pages or FTS_MERGE_PAGES
+    before = conn.total_changes
+    conn.execute(f"INSERT INTO {fts_table}({fts_table}, rank) VALUES ('merge', ?)", (-pages,))
+    # FTS5 counts a step that did no work as fewer than two changes
+    return conn.total_changes - before >= 2
+
+def communication_content_hash(platform: str, sender_identifier: str, timestamp: str, content: str) -> str:
+    """Dedupe key for communications without a platform message ID"""
+    payload = "\x1f".join(str(part or "") for part in (platform, sender_identifier, timestamp, content))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+@contextmanager
+def deferred_fts_sync(conn: sqlite3.Connection, fts_table: str):
+    """
+    Index the rows inserted inside the block with one statement instead of per-row triggers
+    
+    The insert trigger flushes the FTS5 buffer for every row, which dominates bulk
+    inserts. Use inside a write transaction for inserts only; updates and deletes
+    still go through their triggers.
+    """
+    table, columns = FTS_TABLES[fts_table]
+    column_list = ", ".join(columns)
+    last_id = conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}").fetchone()[0]
+    conn.execute("INSERT INTO fts_deferred_sync (table_name) VALUES (?)", (table,))
+    try:
+        yield
+    finally:
+        conn.execute("DELETE FROM fts_deferred_sync WHERE table_name = ?", (table,))
+        conn.execute(f"""
+            INSERT INTO {fts_table}(rowid, {column_list})
+            SELECT id, {column_list} FROM {table} WHERE id > ?
+        """, (last_id,))
 
 class CRMDatabase:
     def __init__(self, db_path: str = "crm.db"):
@@ -50,7 +194,9 @@ class CRMDatabase:
         self._create_communication_tables(cursor)
         self._create_data_protection_tables(cursor)
         self._create_indexes(cursor)
+        self._create_ingestion_keys(cursor)
         self._create_fts_tables(cursor)
+        self._create_rollups(cursor)
         
         self.conn.commit()
         print(f"Database initialized successfully at {self.db_path}")
@@ -299,6 +445,7 @@ class CRMDatabase:
             platform TEXT NOT NULL,
             platform_message_id TEXT,
             platform_thread_id TEXT,
+            content_hash TEXT, -- communication_content_hash(); dedupes messages without a platform ID
             
             -- Contact and Relationship Information  
             sender_contact_id INTEGER,
@@ -548,21 +695,25 @@ class CRMDatabase:
         """)
     
     def _create_indexes(self, cursor):
-        """Create performance indexes"""
+        """
+        Create performance indexes
+        
+        Tool queries filter on deleted_at IS NULL and order by a date, so the main
+        indexes are partial indexes over live rows whose trailing columns match
+        the ORDER BY; a LIMIT query then stops after reading LIMIT entries. Plain
+        indexes stay on foreign key columns (foreign key checks cannot use partial
+        indexes). Check the plans with index_advisor.py after changing a query.
+        """
         
         indexes = [
             # Core CRM indexes
             "CREATE INDEX IF NOT EXISTS idx_contacts_company ON contacts(company_id)",
-            "CREATE INDEX IF NOT EXISTS idx_contacts_email ON contacts(email)",
             "CREATE INDEX IF NOT EXISTS idx_interactions_contact ON interactions(contact_id)",
             "CREATE INDEX IF NOT EXISTS idx_interactions_date ON interactions(interaction_date)",
-            "CREATE INDEX IF NOT EXISTS idx_tasks_due_date ON tasks(due_date)",
-            "CREATE INDEX IF NOT EXISTS idx_tasks_priority ON tasks(priority, completed)",
             "CREATE INDEX IF NOT EXISTS idx_tasks_communication ON tasks(communication_id)",
             
             # Financial indexes
             "CREATE INDEX IF NOT EXISTS idx_transactions_account ON transactions(account_id)",
-            "CREATE INDEX IF NOT EXISTS idx_transactions_date ON transactions(transaction_date)",
             "CREATE INDEX IF NOT EXISTS idx_transactions_company ON transactions(company_id)",
             "CREATE INDEX IF NOT EXISTS idx_subscriptions_next_billing ON subscriptions(next_billing_date)",
             "CREATE INDEX IF NOT EXISTS idx_subscriptions_company ON subscriptions(company_id)",
@@ -570,17 +721,14 @@ class CRMDatabase:
             # Communication indexes
             "CREATE INDEX IF NOT EXISTS idx_communications_sender_contact ON communications(sender_contact_id)",
             "CREATE INDEX IF NOT EXISTS idx_communications_company ON communications(sender_company_id)",
-            "CREATE INDEX IF NOT EXISTS idx_communications_date ON communications(communication_timestamp)",
             "CREATE INDEX IF NOT EXISTS idx_communications_status ON communications(processing_status)",
             "CREATE INDEX IF NOT EXISTS idx_communications_category ON communications(content_category)",
             "CREATE INDEX IF NOT EXISTS idx_communications_platform ON communications(platform)",
-            "CREATE INDEX IF NOT EXISTS idx_communications_source_id ON communications(platform_message_id)",
             "CREATE INDEX IF NOT EXISTS idx_communications_thread ON communications(conversation_thread_global_id)",
             "CREATE INDEX IF NOT EXISTS idx_communications_action_required ON communications(requires_follow_up, follow_up_due_date)",
             
-            # Contact identities
+            # Contact identities (platform lookups use the UNIQUE (platform, platform_identifier) index)
             "CREATE INDEX IF NOT EXISTS idx_contact_identities_contact ON contact_identities(contact_id)",
-            "CREATE INDEX IF NOT EXISTS idx_contact_identities_platform ON contact_identities(platform, platform_identifier)",
             
             # Data protection indexes
             "CREATE INDEX IF NOT EXISTS idx_deletion_audit_table_record ON deletion_audit(table_name, record_id)",
@@ -589,19 +737,135 @@ class CRMDatabase:
             "CREATE INDEX IF NOT EXISTS idx_deletion_policies_table ON deletion_policies(table_name)",
             "CREATE INDEX IF NOT EXISTS idx_retention_schedules_table ON data_retention_schedules(table_name)",
             
-            # Soft delete indexes for all tables
-            "CREATE INDEX IF NOT EXISTS idx_contacts_deleted ON contacts(deleted_at)",
-            "CREATE INDEX IF NOT EXISTS idx_companies_deleted ON companies(deleted_at)",
-            "CREATE INDEX IF NOT EXISTS idx_communications_deleted ON communications(deleted_at)",
-            "CREATE INDEX IF NOT EXISTS idx_tasks_deleted ON tasks(deleted_at)",
-            "CREATE INDEX IF NOT EXISTS idx_transactions_deleted ON transactions(deleted_at)"
+            # Live-row indexes: contacts and companies (listings by name, dashboard counts)
+            "CREATE INDEX IF NOT EXISTS idx_contacts_live_company_name ON contacts(company_id, last_name, first_name) WHERE deleted_at IS NULL",
+            "CREATE INDEX IF NOT EXISTS idx_contacts_live_status ON contacts(status) WHERE deleted_at IS NULL",
+            "CREATE INDEX IF NOT EXISTS idx_companies_live_name ON companies(name) WHERE deleted_at IS NULL",
+            
+            # Live-row indexes: communication timelines, newest first
+            "CREATE INDEX IF NOT EXISTS idx_communications_live_timestamp ON communications(communication_timestamp) WHERE deleted_at IS NULL",
+            "CREATE INDEX IF NOT EXISTS idx_communications_live_sender ON communications(sender_contact_id, communication_timestamp) WHERE deleted_at IS NULL",
+            "CREATE INDEX IF NOT EXISTS idx_communications_live_recipient ON communications(recipient_contact_id, communication_timestamp) WHERE deleted_at IS NULL",
+            "CREATE INDEX IF NOT EXISTS idx_communications_live_company ON communications(sender_company_id, communication_timestamp) WHERE deleted_at IS NULL",
+            
+            # Live-row indexes: tasks in search_tasks order (due_date, priority DESC, created_at DESC)
+            "CREATE INDEX IF NOT EXISTS idx_tasks_live_due ON tasks(due_date, priority DESC, created_at DESC) WHERE deleted_at IS NULL",
+            "CREATE INDEX IF NOT EXISTS idx_tasks_live_contact_due ON tasks(contact_id, due_date, priority DESC, created_at DESC) WHERE deleted_at IS NULL",
+            "CREATE INDEX IF NOT EXISTS idx_tasks_live_contact_created ON tasks(contact_id, created_at) WHERE deleted_at IS NULL",
+            "CREATE INDEX IF NOT EXISTS idx_tasks_live_company_due ON tasks(company_id, due_date, priority DESC, created_at DESC) WHERE deleted_at IS NULL",
+            "CREATE INDEX IF NOT EXISTS idx_tasks_live_priority_due ON tasks(priority, due_date, created_at DESC) WHERE deleted_at IS NULL",
+            "CREATE INDEX IF NOT EXISTS idx_tasks_live_completed_due ON tasks(completed, due_date, priority DESC, created_at DESC) WHERE deleted_at IS NULL",
+            
+            # Live-row indexes: transactions, newest first (transaction_date DESC, created_at DESC)
+            "CREATE INDEX IF NOT EXISTS idx_transactions_live_date ON transactions(transaction_date, created_at) WHERE deleted_at IS NULL",
+            "CREATE INDEX IF NOT EXISTS idx_transactions_live_account ON transactions(account_id, transaction_date, created_at) WHERE deleted_at IS NULL",
+            "CREATE INDEX IF NOT EXISTS idx_transactions_live_company ON transactions(company_id, transaction_date, created_at) WHERE deleted_at IS NULL",
+            "CREATE INDEX IF NOT EXISTS idx_transactions_live_category ON transactions(category, transaction_date, created_at) WHERE deleted_at IS NULL",
         ]
         
         for index_sql in indexes:
             cursor.execute(index_sql)
     
+    def ensure_indexes(self) -> List[str]:
+        """
+        Bring an existing database to the current index set
+        
+        Creates missing indexes and drops the ones they replace.
+        
+        Returns:
+            Names of the indexes created or dropped
+        """
+        if not self.conn:
+            self.connect()
+        
+        cursor = self.conn.cursor()
+        before = {row[0] for row in cursor.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        self._create_indexes(cursor)
+        for index_name in OBSOLETE_INDEXES:
+            cursor.execute(f"DROP INDEX IF EXISTS {index_name}")
+        after = {row[0] for row in cursor.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        self.conn.commit()
+        return sorted(before ^ after)
+    
+    def _create_ingestion_keys(self, cursor) -> bool:
+        """
+        Add the unique keys that make communication imports idempotent
+        
+        Messages with a platform message ID are unique per platform, the others by
+        content hash. On an existing database the hash is backfilled first and
+        duplicates are soft deleted, keeping the oldest copy; their keys move to
+        deletion_context_json.
+        
+        Returns:
+            True if the keys were added
+        """
+        indexes = {row[0] for row in cursor.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        if set(INGESTION_KEY_INDEXES) <= indexes:
+            return False
+        
+        columns = {row[1] for row in cursor.execute("PRAGMA table_info(communications)")}
+        if "content_hash" not in columns:
+            cursor.execute("ALTER TABLE communications ADD COLUMN content_hash TEXT")
+        
+        self.conn.create_function("communication_content_hash", 4, communication_content_hash, deterministic=True)
+        cursor.execute("""
+            UPDATE communications
+            SET content_hash = communication_content_hash(
+                platform, sender_identifier, communication_timestamp, message_content_text)
+            WHERE content_hash IS NULL
+        """)
+        
+        duplicates = cursor.execute("""
+            SELECT id, keep_id, platform_message_id, content_hash FROM (
+                SELECT id, platform_message_id, content_hash,
+                       MIN(id) OVER (PARTITION BY platform, platform_message_id) AS keep_id
+                FROM communications WHERE platform_message_id IS NOT NULL
+                UNION ALL
+                SELECT id, platform_message_id, content_hash,
+                       MIN(id) OVER (PARTITION BY content_hash) AS keep_id
+                FROM communications WHERE platform_message_id IS NULL
+            )
+            WHERE id != keep_id
+        """).fetchall()
+        for comm_id, keep_id, platform_message_id, content_hash in duplicates:
+            reason = f"Duplicate of communication {keep_id}"
+            cursor.execute("""
+                UPDATE communications
+                SET platform_message_id = NULL, content_hash = NULL,
+                    deleted_at = COALESCE(deleted_at, CURRENT_TIMESTAMP),
+                    deleted_by = COALESCE(deleted_by, 'system'),
+                    deletion_reason = COALESCE(deletion_reason, ?),
+                    deletion_context_json = ?
+                WHERE id = ?
+            """, (reason, json.dumps({"platform_message_id": platform_message_id, "content_hash": content_hash}),
+                  comm_id))
+            cursor.execute("""
+                INSERT INTO deletion_audit (table_name, record_id, deletion_type, deleted_by, deletion_reason)
+                VALUES ('communications', ?, 'soft', 'system', ?)
+            """, (comm_id, reason))
+        if duplicates:
+            print(f"Soft deleted {len(duplicates)} duplicate communications")
+        
+        for index_sql in INGESTION_KEY_INDEXES.values():
+            cursor.execute(index_sql)
+        return True
+    
+    def ensure_ingestion_keys(self) -> bool:
+        """
+        Migrate an existing database to idempotent communication ingestion
+        
+        Returns:
+            True if the keys were added
+        """
+        if not self.conn:
+            self.connect()
+        
+        added = self._create_ingestion_keys(self.conn.cursor())
+        self.conn.commit()
+        return added
+    
     def _create_fts_tables(self, cursor):
-        """Create full-text search tables"""
+        """Create full-text search tables and the triggers that keep them in sync"""
         
         # Communications FTS
         cursor.execute("""
@@ -625,6 +889,225 @@ class CRMDatabase:
             content_rowid=id
         )
         """)
+        
+        # Tables whose insert trigger is suspended by deferred_fts_sync()
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS fts_deferred_sync (
+            table_name TEXT PRIMARY KEY
+        )
+        """)
+        
+        for fts_table, (table, columns) in FTS_TABLES.items():
+            self._create_fts_triggers(cursor, fts_table, table, columns)
+    
+    def _create_fts_triggers(self, cursor, fts_table: str, table: str, columns: List[str]):
+        """
+        Mirror inserts, updates and deletes on an external-content table into its FTS index
+        
+        Updates only fire when an indexed column changes, so status and soft-delete
+        updates do not touch the index.
+        """
+        column_list = ", ".join(columns)
+        new_values = ", ".join(f"new.{column}" for column in columns)
+        old_values = ", ".join(f"old.{column}" for column in columns)
+        
+        cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS {fts_table}_ai AFTER INSERT ON {table}
+        WHEN NOT EXISTS (SELECT 1 FROM fts_deferred_sync WHERE table_name = '{table}') BEGIN
+            INSERT INTO {fts_table}(rowid, {column_list}) VALUES (new.id, {new_values});
+        END
+        """)
+        cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS {fts_table}_ad AFTER DELETE ON {table} BEGIN
+            INSERT INTO {fts_table}({fts_table}, rowid, {column_list}) VALUES ('delete', old.id, {old_values});
+        END
+        """)
+        cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS {fts_table}_au AFTER UPDATE OF {column_list} ON {table} BEGIN
+            INSERT INTO {fts_table}({fts_table}, rowid, {column_list}) VALUES ('delete', old.id, {old_values});
+            INSERT INTO {fts_table}(rowid, {column_list}) VALUES (new.id, {new_values});
+        END
+        """)
+    
+    def ensure_fts_indexes(self) -> bool:
+        """
+        Add missing FTS tables and triggers to an existing database
+        
+        Databases created before the triggers existed have empty FTS indexes; they are
+        backfilled here once.
+        
+        Returns:
+            True if the indexes were created or rebuilt
+        """
+        if not self.conn:
+            self.connect()
+        
+        objects = {row[0] for row in self.conn.execute(
+            "SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')"
+        )}
+        expected = {f"{fts_table}_{suffix}" for fts_table in FTS_TABLES for suffix in FTS_TRIGGER_SUFFIXES}
+        if expected | {"fts_deferred_sync"} <= objects:
+            return False
+        
+        self.rebuild_fts_indexes()
+        return True
+    
+    def rebuild_fts_indexes(self):
+        """(Re)create the FTS tables and triggers and rebuild the indexes from their content tables"""
+        if not self.conn:
+            self.connect()
+        
+        cursor = self.conn.cursor()
+        for fts_table in FTS_TABLES:
+            for suffix in FTS_TRIGGER_SUFFIXES:
+                cursor.execute(f"DROP TRIGGER IF EXISTS {fts_table}_{suffix}")
+        self._create_fts_tables(cursor)
+        for fts_table in FTS_TABLES:
+            cursor.execute(f"INSERT INTO {fts_table}({fts_table}) VALUES ('rebuild')")
+        
+        self.conn.commit()
+        print(f"Full-text search indexes rebuilt for {', '.join(FTS_TABLES)}")
+    
+    def optimize_fts_indexes(self):
+        """Merge the FTS index segments into one b-tree per index"""
+        if not self.conn:
+            self.connect()
+        
+        optimize_fts(self.conn)
+        self.conn.commit()
+        print(f"Full-text search indexes optimized for {', '.join(FTS_TABLES)}")
+    
+    def _create_rollups(self, cursor):
+        """
+        Create the dashboard rollup table and the triggers that maintain it
+        
+        Each metric counts the live rows of its source table per bucket. Inserts,
+        deletes and updates of the columns a metric reads adjust the counts in the
+        same transaction as the change.
+        """
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS dashboard_rollups (
+            metric TEXT NOT NULL,
+            bucket TEXT NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (metric, bucket)
+        ) WITHOUT ROWID
+        """)
+        
+        for table in rollup_source_tables():
+            metrics = {metric: spec for metric, spec in ROLLUPS.items() if spec[0] == table}
+            columns = ["deleted_at"] + sorted({column for _, _, _, read in metrics.values() for column in read})
+            
+            def increment(row: str) -> str:
+                return "".join(f"""
+                INSERT INTO dashboard_rollups (metric, bucket, count)
+                SELECT '{metric}', {bucket.format(row=row)}, 1
+                WHERE {row}.deleted_at IS NULL AND {condition.format(row=row)}
+                ON CONFLICT (metric, bucket) DO UPDATE SET count = count + 1;"""
+                    for metric, (_, bucket, condition, _) in metrics.items())
+            
+            def decrement(row: str) -> str:
+                return "".join(f"""
+                UPDATE dashboard_rollups SET count = count - 1
+                WHERE metric = '{metric}' AND bucket = {bucket.format(row=row)}
+                  AND {row}.deleted_at IS NULL AND {condition.format(row=row)};"""
+                    for metric, (_, bucket, condition, _) in metrics.items())
+            
+            cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_rollups_ai AFTER INSERT ON {table} BEGIN{increment("new")}
+            END
+            """)
+            cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_rollups_ad AFTER DELETE ON {table} BEGIN{decrement("old")}
+            END
+            """)
+            cursor.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_rollups_au AFTER UPDATE OF {", ".join(columns)} ON {table}
+            BEGIN{decrement("old")}{increment("new")}
+            END
+            """)
+    
+    def _compute_rollups(self, cursor) -> Dict[tuple, int]:
+        """Every rollup count recomputed from the source tables, keyed by (metric, bucket)"""
+        counts = {}
+        for metric, (table, bucket, condition, _) in ROLLUPS.items():
+            for bucket_value, count in cursor.execute(f"""
+                SELECT {bucket.format(row=table)}, COUNT(*) FROM {table}
+                WHERE {table}.deleted_at IS NULL AND {condition.format(row=table)}
+                GROUP BY 1
+            """):
+                counts[(metric, bucket_value)] = count
+        return counts
+    
+    def _fill_rollups(self, cursor):
+        """Replace the stored rollups with counts recomputed from the source tables"""
+        cursor.execute("DELETE FROM dashboard_rollups")
+        cursor.executemany("INSERT INTO dashboard_rollups (metric, bucket, count) VALUES (?, ?, ?)",
+                           [(metric, bucket, count) for (metric, bucket), count in self._compute_rollups(cursor).items()])
+    
+    def ensure_rollups(self) -> bool:
+        """
+        Add the dashboard rollups to an existing database
+        
+        Returns:
+            True if the rollups were created and filled
+        """
+        if not self.conn:
+            self.connect()
+        
+        objects = {row[0] for row in self.conn.execute(
+            "SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')"
+        )}
+        expected = {f"{table}_rollups_{suffix}" for table in rollup_source_tables() for suffix in ROLLUP_TRIGGER_SUFFIXES}
+        if expected | {"dashboard_rollups"} <= objects:
+            return False
+        
+        cursor = self.conn.cursor()
+        self._create_rollups(cursor)
+        self._fill_rollups(cursor)
+        self.conn.commit()
+        return True
+    
+    def rebuild_rollups(self):
+        """(Re)create the rollup triggers and recompute every count from the source tables"""
+        if not self.conn:
+            self.connect()
+        
+        cursor = self.conn.cursor()
+        for table in rollup_source_tables():
+            for suffix in ROLLUP_TRIGGER_SUFFIXES:
+                cursor.execute(f"DROP TRIGGER IF EXISTS {table}_rollups_{suffix}")
+        self._create_rollups(cursor)
+        self._fill_rollups(cursor)
+        
+        self.conn.commit()
+        print(f"Dashboard rollups rebuilt for {', '.join(rollup_source_tables())}")
+    
+    def check_rollups(self) -> List[Dict[str, Any]]:
+        """
+        Compare the stored rollups with counts recomputed from scratch
+        
+        Returns:
+            One entry per (metric, bucket) that differs, with the stored and actual counts
+        """
+        if not self.conn:
+            self.connect()
+        
+        # One read transaction, so writes in between cannot look like drift
+        if not self.conn.in_transaction:
+            self.conn.execute("BEGIN")
+        try:
+            actual = self._compute_rollups(self.conn.cursor())
+            stored = {(metric, bucket): count for metric, bucket, count in self.conn.execute(
+                "SELECT metric, bucket, count FROM dashboard_rollups WHERE count != 0"
+            )}
+        finally:
+            self.conn.rollback()
+        
+        return [{"metric": metric, "bucket": bucket, "stored": stored.get((metric, bucket), 0),
+                 "actual": actual.get((metric, bucket), 0)}
+                for metric, bucket in sorted(set(actual) | set(stored))
+                if stored.get((metric, bucket), 0) != actual.get((metric, bucket), 0)]
     
     def create_sample_data(self):
         """Create sample data for testing"""
@@ -768,6 +1251,12 @@ def main():
     parser.add_argument("--init", action="store_true", help="Initialize database with schema")
     parser.add_argument("--sample-data", action="store_true", help="Add sample data")
     parser.add_argument("--deletion-policies", action="store_true", help="Create default deletion policies")
+    parser.add_argument("--rebuild-fts", action="store_true", help="Create FTS triggers and rebuild the search indexes")
+    parser.add_argument("--optimize-fts", action="store_true", help="Merge the search index segments")
+    parser.add_argument("--check-rollups", action="store_true",
+                        help="Recompute the dashboard rollups from scratch and report differences")
+    parser.add_argument("--rebuild-rollups", action="store_true",
+                        help="Create the rollup triggers and recompute the dashboard rollups")
     parser.add_argument("--db-path", default="crm.db", help="Database file path")
     
     args = parser.parse_args()
@@ -787,8 +1276,30 @@ def main():
     elif args.deletion_policies:
         with db:
             db.create_default_deletion_policies()
+    elif args.rebuild_fts or args.optimize_fts:
+        with db:
+            if args.rebuild_fts:
+                db.rebuild_fts_indexes()
+            if args.optimize_fts:
+                db.optimize_fts_indexes()
+    elif args.rebuild_rollups:
+        with db:
+            db.rebuild_rollups()
+    elif args.check_rollups:
+        with db:
+            differences = db.check_rollups()
+        if not differences:
+            print("Dashboard rollups match the tables")
+        else:
+            for difference in differences:
+                print(f"{difference['metric']} [{difference['bucket']}]: "
+                      f"stored {difference['stored']}, actual {difference['actual']}")
+            print(f"{len(differences)} rollup counts differ; run --rebuild-rollups to recompute them")
+            raise SystemExit(1)
     else:
-        print("Use --init to initialize database, --sample-data to add sample data, or --deletion-policies to create default policies")
+        print("Use --init to initialize database, --sample-data to add sample data, --deletion-policies to create default policies, "
+              "--rebuild-fts / --optimize-fts to maintain the search indexes, "
+              "or --check-rollups / --rebuild-rollups to verify the dashboard rollups")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
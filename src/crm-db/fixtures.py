@@ -0,0 +1,43 @@
+"""
+Shared test databases for the CRM tests
+
+sample_database() yields a fresh database in a temporary directory, and
+server_database() also points server.DB_PATH at it for the with block, closing
+the server's pooled connections and restoring the path afterwards.
+"""
+
+import tempfile
+from pathlib import Path
+from contextlib import contextmanager
+from typing import Callable, Iterator
+
+from database import CRMDatabase
+
+def create_test_database(path: Path):
+    """Schema and sample data"""
+    db = CRMDatabase(str(path))
+    with db:
+        db.init_database()
+        db.create_sample_data()
+
+@contextmanager
+def sample_database(create: Callable[[Path], None] = create_test_database) -> Iterator[Path]:
+    """Path of a database built by create in a temporary directory, removed afterwards"""
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db_path = Path(temp_dir) / "crm.db"
+        create(db_path)
+        yield db_path
+
+@contextmanager
+def server_database(create: Callable[[Path], None] = create_test_database) -> Iterator[Path]:
+    """sample_database() with the server's tools pointed at it"""
+    import server
+
+    original_db_path = server.DB_PATH
+    with sample_database(create) as db_path:
+        server.DB_PATH = db_path
+        try:
+            yield db_path
+        finally:
+            server.get_connection_manager().close()
+            server.DB_PATH = original_db_path
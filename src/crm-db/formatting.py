@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Result Formatting for LLM Responses
+
+Tool results go straight into the model's context, so they are kept small:
+
+- projection: only the requested columns are returned
+- truncation: long text values (message bodies, HTML, JSON blobs) are cut to
+  CRM_RESULT_MAX_FIELD_CHARS characters, with the number of characters cut
+- compact JSON: no indentation or spaces after separators
+- token budget: rows that do not fit CRM_RESULT_TOKEN_BUDGET (estimated at 4
+  characters per token) are left out, and the response says how many
+
+When a paged search leaves rows out, its next_cursor resumes right after the
+last row shown, so nothing is lost.
+"""
+
+import os
+import json
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+# Output limits (environment overrides)
+MAX_FIELD_CHARS = int(os.getenv("CRM_RESULT_MAX_FIELD_CHARS", "500"))
+TOKEN_BUDGET = int(os.getenv("CRM_RESULT_TOKEN_BUDGET", "8000"))
+COMPACT_JSON = os.getenv("CRM_RESULT_COMPACT", "1") != "0"
+
+CHARS_PER_TOKEN = 4
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for budgeting (no tokenizer dependency)"""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+def truncate_value(value: Any, max_chars: int) -> Any:
+    """Cut strings longer than max_chars (0 disables), noting how much was cut"""
+    if max_chars and isinstance(value, str) and len(value) > max_chars:
+        return f"{value[:max_chars]}... [{len(value) - max_chars} more chars]"
+    return value
+
+def project_row(row: Dict[str, Any], fields: Optional[Sequence[str]], max_chars: int) -> Dict[str, Any]:
+    """Requested columns of a row (all if fields is empty), truncated"""
+    keys = fields if fields else row.keys()
+    return {key: truncate_value(row[key], max_chars) for key in keys}
+
+def check_fields(rows: List[Dict[str, Any]], fields: Optional[Sequence[str]]):
+    """Raise ValueError naming the available columns if a requested field does not exist"""
+    if not fields or not rows:
+        return
+    unknown = [field for field in fields if field not in rows[0]]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}. Available fields: {', '.join(rows[0])}")
+
+def format_results(rows: List[Dict[str, Any]], description: str, fields: Optional[Sequence[str]] = None,
+                   has_more: bool = False, cursor_after: Optional[Callable[[Dict[str, Any]], str]] = None,
+                   max_field_chars: int = None, token_budget: int = None, compact: bool = None) -> str:
+    """
+    Format result rows for LLM consumption
+
+    Args:
+        rows: Result rows as dicts, in order
+        description: First line of the response
+        fields: Columns to return (default: all)
+        has_more: More rows match beyond these (a paged search with a next page)
+        cursor_after: Builds the next_cursor resuming after a row (paged searches)
+        max_field_chars: Truncate longer text values (0 disables; default MAX_FIELD_CHARS)
+        token_budget: Estimated tokens for the rows (0 disables; default TOKEN_BUDGET)
+        compact: Compact JSON instead of indented (default COMPACT_JSON)
+
+    Returns:
+        Description, the rows as a JSON array, and notes on omitted rows and the next page
+    """
+    if not rows:
+        return f"No results found. {description}"
+    check_fields(rows, fields)
+    max_field_chars = MAX_FIELD_CHARS if max_field_chars is None else max_field_chars
+    token_budget = TOKEN_BUDGET if token_budget is None else token_budget
+    compact = COMPACT_JSON if compact is None else compact
+
+    separators = (",", ":") if compact else (",", ": ")
+    indent = None if compact else 2
+
+    # Serialize row by row until the budget is spent; the first row is always kept
+    budget_chars = token_budget * CHARS_PER_TOKEN if token_budget else None
+    kept_rows, pieces = [], []
+    used = 2
+    for row in rows:
+        projected = project_row(row, fields, max_field_chars)
+        piece = json.dumps(projected, indent=indent, separators=separators, default=str)
+        used += len(piece) + 1
+        if budget_chars and used > budget_chars and kept_rows:
+            break
+        kept_rows.append(projected)
+        pieces.append(piece)
+
+    kept = len(kept_rows)
+    if compact:
+        body = f"[{','.join(pieces)}]"
+    else:
+        body = json.dumps(kept_rows, indent=indent, separators=separators, default=str)
+    omitted = len(rows) - kept
+    if omitted:
+        formatted = f"{description}\n\nResults ({kept} shown, {omitted} omitted to fit the response size limit):\n{body}"
+    else:
+        formatted = f"{description}\n\nResults ({kept} found):\n{body}"
+
+    if cursor_after and (has_more or omitted):
+        formatted += f"\n\nMore results available. next_cursor: {cursor_after(rows[kept - 1])}"
+    elif omitted:
+        formatted += "\n\nRequest fewer fields or narrow the query to see the omitted rows."
+    return formatted
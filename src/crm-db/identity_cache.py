@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Sender Identity Cache for the CRM Server
+
+Communication ingestion resolves every sender (platform, identifier) to a contact.
+The same few hundred senders repeat constantly, so resolved senders are kept in an
+in-memory LRU cache. Senders without a contact are cached too, with a short TTL, so
+unknown senders do not hit the database on every message either. Contact and
+identity writes in the server invalidate the affected entries; the TTLs bound how
+long writes made outside the server can go unnoticed.
+"""
+
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+# Cache tuning (environment overrides)
+IDENTITY_CACHE_SIZE = int(os.getenv("CRM_IDENTITY_CACHE_SIZE", "10000"))
+IDENTITY_CACHE_TTL_SECONDS = float(os.getenv("CRM_IDENTITY_CACHE_TTL_SECONDS", "600"))
+IDENTITY_CACHE_NEGATIVE_TTL_SECONDS = float(os.getenv("CRM_IDENTITY_CACHE_NEGATIVE_TTL_SECONDS", "30"))
+
+class IdentityCache:
+    """Thread-safe LRU map of (platform, identifier) -> contact_id, with negative entries"""
+
+    def __init__(self, max_size: int = IDENTITY_CACHE_SIZE, ttl: float = IDENTITY_CACHE_TTL_SECONDS,
+                 negative_ttl: float = IDENTITY_CACHE_NEGATIVE_TTL_SECONDS,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, Tuple[Optional[int], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get_many(self, keys: Iterable[Hashable]) -> Tuple[Dict[Hashable, Optional[int]], List[Hashable]]:
+        """
+        Look up senders
+
+        Returns:
+            Cached entries (contact_id, or None for a known unknown sender) and the
+            keys that must be resolved from the database
+        """
+        found = {}
+        missing = []
+        now = self._clock()
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is not None and entry[1] > now:
+                    self._entries.move_to_end(key)
+                    found[key] = entry[0]
+                    if entry[0] is None:
+                        self.negative_hits += 1
+                    else:
+                        self.hits += 1
+                else:
+                    if entry is not None:
+                        del self._entries[key]
+                    missing.append(key)
+                    self.misses += 1
+        return found, missing
+
+    def put_many(self, entries: Dict[Hashable, Optional[int]]):
+        """Cache resolved senders; None marks a sender without a contact"""
+        if self.max_size <= 0:
+            return
+        now = self._clock()
+        with self._lock:
+            for key, contact_id in entries.items():
+                ttl = self.ttl if contact_id is not None else self.negative_ttl
+                self._entries[key] = (contact_id, now + ttl)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, keys: Iterable[Hashable] = (), contact_id: Optional[int] = None):
+        """Drop the given senders and every sender resolved to contact_id"""
+        with self._lock:
+            for key in keys:
+                if self._entries.pop(key, None) is not None:
+                    self.invalidations += 1
+            if contact_id is not None:
+                stale = [key for key, (cached_id, _) in self._entries.items() if cached_id == contact_id]
+                for key in stale:
+                    del self._entries[key]
+                self.invalidations += len(stale)
+
+    def clear(self):
+        """Drop all entries (counters are kept)"""
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        """Hit-rate metrics; negative hits count as hits"""
+        with self._lock:
+            lookups = self.hits + self.negative_hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "negative_hits": self.negative_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.hits + self.negative_hits) / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
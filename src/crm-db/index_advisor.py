@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Index Advisor for the CRM Server
+
+Calls every MCP tool and resource against a scratch database with statement
+tracing on, then runs EXPLAIN QUERY PLAN on each statement they issued and flags:
+
+- full scans: `SCAN <table>` without an index, or a search on deleted_at alone
+  (it matches every live row); an error on any large table
+- index scans: `SCAN <table> USING INDEX`, the index is walked in order until
+  LIMIT rows match, which can be all of it when the other filters are selective
+- temp sorts: `USE TEMP B-TREE`, rows are sorted instead of read in index order
+
+Without ANALYZE statistics SQLite plans a query the same way whatever the table
+sizes, so the plans on a small scratch database are the plans a database with
+millions of rows gets. With --db-path the scratch database is a copy of that
+database (statistics included); the original is never written.
+
+Usage:
+    python index_advisor.py [--db-path crm.db] [--json]
+"""
+
+import re
+import sys
+import json
+import sqlite3
+import argparse
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import server
+from database import CRMDatabase
+
+# Tables that stay small enough for a full scan to be fine
+SMALL_TABLES = {"accounts", "deletion_policies", "sqlite_master", "sqlite_schema"}
+
+# Tools whose SQL is not their own
+SKIPPED_TOOLS = {"execute_sql_query": "runs caller-supplied SQL"}
+
+# One or more calls per tool and resource, covering their filter combinations
+SAMPLE_CALLS = [
+    ("create_company", {"name": "Initech", "industry": "Software"}),
+    ("update_company", {"company_id": 1, "industry": "Software", "name": "Acme Corp"}),
+    ("search_companies", {"query": "acme"}),
+    ("get_company_details", {"company_id": 1}),
+    ("get_company_contacts", {"company_id": 1}),
+    ("create_contact", {"first_name": "Ada", "last_name": "Lovelace", "email": "ada@example.com",
+                        "company_name": "Initech"}),
+    ("update_contact", {"contact_id": 1, "title": "Chair", "email": "john@acme.com",
+                        "company_name": "Global Services Inc"}),
+    ("search_contacts", {"query": "john"}),
+    ("add_contact_identity", {"contact_id": 2, "platform": "whatsapp", "platform_identifier": "+15550201"}),
+    ("create_communication", {"platform": "email", "sender_identifier": "john@acme.com",
+                              "content": "Contract draft attached", "subject": "Contract"}),
+    ("create_communication", {"platform": "whatsapp", "sender_identifier": "+15550201",
+                              "content": "Running late", "timestamp": "2024-03-01T10:00:00"}),
+    ("create_communication", {"platform": "whatsapp", "sender_identifier": "+15550201",
+                              "content": "Running late", "timestamp": "2024-03-01T10:00:00"}),
+    ("create_communications_bulk", {"records": [
+        {"platform": "email", "sender_identifier": "john@acme.com", "content": "Signed copy",
+         "platform_message_id": "<signed@acme.com>"},
+        {"platform": "email", "sender_identifier": "john@acme.com", "content": "Signed copy, final",
+         "platform_message_id": "<signed@acme.com>"},
+        {"platform": "sms", "sender_identifier": "+15550000", "content": "Who is this?"},
+    ]}),
+    ("create_communications_bulk", {"records": [
+        {"platform": "email", "sender_identifier": "john@acme.com", "content": "Signed copy, amended",
+         "platform_message_id": "<signed@acme.com>"},
+        {"platform": "sms", "sender_identifier": "+15550000", "content": "Who is this?"},
+    ]}),
+    ("create_communication_with_workflow", {"platform": "email", "sender_identifier": "ops@example.com",
+                                            "content": "Invoice overdue", "auto_trigger_workflows": False}),
+    ("search_communications", {"query": "contract"}),
+    ("search_communications", {"query": "contract", "platform": "email"}),
+    ("update_communication_fields", {"communication_id": 1, "updates": {"urgency_level": "high"}}),
+    ("get_communication_with_workflow_data", {"communication_id": 1}),
+    ("get_contact_details", {"contact_id": 1}),
+    ("get_contact_timeline", {"contact_id": 1}),
+    ("create_account", {"name": "Operating", "account_type": "checking", "bank_name": "Chase Bank"}),
+    ("search_accounts", {}),
+    ("search_accounts", {"query": "chase", "account_type": "checking", "active_only": False}),
+    ("create_transaction", {"account_id": 1, "amount": 42.5, "description": "Office supplies",
+                            "category": "office", "vendor_name": "Acme Corp"}),
+    ("create_transaction", {"account_id": 1, "amount": 1200, "description": "Consulting",
+                            "company_id": 2, "transaction_type": "income"}),
+    ("search_transactions", {}),
+    ("search_transactions", {"query": "office"}),
+    ("search_transactions", {"account_id": 1}),
+    ("search_transactions", {"company_id": 2}),
+    ("search_transactions", {"category": "office"}),
+    ("create_task", {"title": "Send proposal", "contact_id": 1, "due_date": "2024-01-15", "priority": "high"}),
+    ("create_task", {"title": "Renew contract", "company_id": 1, "due_date": "2099-01-15"}),
+    ("update_task", {"task_id": 1, "priority": "urgent", "due_date": "2024-01-20"}),
+    ("complete_task", {"task_id": 2}),
+    ("search_tasks", {}),
+    ("search_tasks", {"query": "proposal"}),
+    ("search_tasks", {"contact_id": 1}),
+    ("search_tasks", {"company_id": 1}),
+    ("search_tasks", {"priority": "urgent"}),
+    ("search_tasks", {"completed": False}),
+    ("search_tasks", {"overdue_only": True}),
+    ("search_tasks", {"next_cursor": server.TASK_KEYSET.encode(["2024-01-20", "high", "2024-01-01 00:00:00", 1])}),
+    ("search_tasks", {"contact_id": 1, "next_cursor": server.TASK_KEYSET.encode([None, "high", None, 1])}),
+    ("search_transactions", {"next_cursor": server.TRANSACTION_KEYSET.encode(["2099-01-01", None, 9])}),
+    ("search_transactions", {"account_id": 1, "next_cursor": server.TRANSACTION_KEYSET.encode(
+        ["2099-01-01", "2099-01-01 00:00:00", 9])}),
+    ("search_contacts", {"query": "john", "limit": 1,
+                         "next_cursor": server.CONTACT_RANK_KEYSET.encode([-1.5, 1])}),
+    ("search_communications", {"query": "contract", "next_cursor": server.COMMUNICATION_RANK_KEYSET.encode([-1.5, 1])}),
+    ("search_companies", {"query": "acme", "next_cursor": server.COMPANY_NAME_KEYSET.encode(["Acme", 1])}),
+    ("delete_contact", {"contact_id": 3, "reason": "index advisor"}),
+    ("get_database_schema", {}),
+    ("get_contact_resource", {"contact_id": "1"}),
+    ("get_dashboard_summary", {}),
+    ("get_upcoming_tasks", {}),
+    ("get_identity_cache_metrics", {}),
+]
+
+# FTS5 reads its shadow tables ('main'.'communications_fts_config', ...) through nested statements
+FTS_SHADOW = re.compile(r"^\s*SELECT .* FROM 'main'\.'\w+_fts_\w+'", re.IGNORECASE | re.DOTALL)
+# Statements without a query plan worth checking
+UNPLANNED = re.compile(r"^\s*(?:--|PRAGMA|BEGIN|COMMIT|ROLLBACK|SAVEPOINT|RELEASE|CREATE|DROP|ALTER|ANALYZE)",
+                       re.IGNORECASE)
+INSERT_VALUES = re.compile(r"^\s*INSERT\b(?:(?!\bSELECT\b).)*$", re.IGNORECASE | re.DOTALL)
+TABLE_ALIAS = re.compile(r"\b(?:FROM|JOIN|UPDATE|INTO)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?", re.IGNORECASE)
+SCAN = re.compile(r"^SCAN (\w+)(.*)$")
+SOFT_DELETE_ONLY = re.compile(r"^SEARCH (\w+) USING (?:COVERING )?INDEX \w+ \(deleted_at=\?\)$")
+
+def registered_names() -> Dict[str, str]:
+    """Tool and resource function names registered on the MCP server"""
+    names = {name: "tool" for name in server.mcp._tool_manager._tools}
+    for manager in (server.mcp._resource_manager._resources, server.mcp._resource_manager._templates):
+        for resource in manager.values():
+            names[resource.fn.__name__] = "resource"
+    return names
+
+def trace_calls(calls=SAMPLE_CALLS) -> List[Dict]:
+    """
+    Run the sample calls against server.DB_PATH
+
+    Returns:
+        One entry per distinct statement: the calling tool and the SQL with parameters inlined
+    """
+    statements = []
+    seen = set()
+    current = [None]
+
+    def collect(sql: str):
+        key = (current[0], sql)
+        if key in seen or UNPLANNED.match(sql) or INSERT_VALUES.match(sql) or FTS_SHADOW.match(sql):
+            return
+        seen.add(key)
+        statements.append({"tool": current[0], "sql": sql})
+
+    manager = server.get_connection_manager()
+    manager.set_trace_callback(collect)
+    try:
+        for name, kwargs in calls:
+            current[0] = name
+            getattr(server, name)(**kwargs)
+    finally:
+        manager.set_trace_callback(None)
+    return statements
+
+def table_aliases(sql: str) -> Dict[str, str]:
+    aliases = {}
+    for table, alias in TABLE_ALIAS.findall(sql):
+        aliases[table] = table
+        if alias and alias.upper() not in {"WHERE", "ON", "SET", "VALUES", "LEFT", "JOIN", "INNER", "ORDER",
+                                           "GROUP", "LIMIT", "INDEXED", "USING", "SELECT", "DEFAULT", "AS"}:
+            aliases[alias] = table
+    return aliases
+
+def check_plan(conn: sqlite3.Connection, sql: str) -> Dict:
+    """
+    EXPLAIN QUERY PLAN one statement
+
+    Returns:
+        The plan lines and findings with their severity
+    """
+    plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}")]
+    aliases = table_aliases(sql)
+    if aliases and set(aliases.values()) <= SMALL_TABLES:
+        return {"plan": plan, "findings": []}
+
+    findings = []
+    for detail in plan:
+        scan = SCAN.match(detail)
+        if scan:
+            name, rest = scan.groups()
+            if "VIRTUAL TABLE" in rest or name == "CONSTANT" or aliases.get(name, name) in SMALL_TABLES:
+                continue
+            if "USING" not in rest:
+                findings.append({"severity": "error", "issue": "full scan", "detail": detail})
+            else:
+                findings.append({"severity": "warning", "issue": "index scan", "detail": detail})
+        elif SOFT_DELETE_ONLY.match(detail):
+            findings.append({"severity": "error", "issue": "full scan", "detail": detail})
+        elif "USE TEMP B-TREE" in detail:
+            findings.append({"severity": "warning", "issue": "temp sort", "detail": detail})
+    return {"plan": plan, "findings": findings}
+
+def analyze(db_path: Optional[Path] = None) -> Dict:
+    """
+    Trace every tool and resource on a scratch database and check their query plans
+
+    Args:
+        db_path: Database to copy as the scratch database (default: fresh sample data)
+
+    Returns:
+        Per-statement plans and findings, counts, and the tools the sample calls miss
+    """
+    original_db_path = server.DB_PATH
+    with tempfile.TemporaryDirectory() as temp_dir:
+        scratch = Path(temp_dir) / "crm.db"
+        db = CRMDatabase(str(scratch))
+        with db:
+            if db_path:
+                with sqlite3.connect(db_path) as source:
+                    source.backup(db.conn)
+                db.ensure_ingestion_keys()
+                db.ensure_fts_indexes()
+                db.ensure_indexes()
+            else:
+                db.init_database()
+                db.create_sample_data()
+        server.DB_PATH = scratch
+        try:
+            statements = trace_calls()
+            conn = server.get_db_connection(readonly=True)
+            for statement in statements:
+                statement.update(check_plan(conn, statement["sql"]))
+        finally:
+            server.get_connection_manager().close()
+            server.DB_PATH = original_db_path
+
+    called = {name for name, _ in SAMPLE_CALLS}
+    findings = [finding for statement in statements for finding in statement["findings"]]
+    return {
+        "statements": statements,
+        "full_scans": sum(finding["severity"] == "error" for finding in findings),
+        "warnings": sum(finding["severity"] == "warning" for finding in findings),
+        "uncovered": sorted(set(registered_names()) - called - set(SKIPPED_TOOLS)),
+    }
+
+def print_report(report: Dict):
+    for statement in report["statements"]:
+        if not statement["findings"]:
+            continue
+        sql = " ".join(statement["sql"].split())
+        print(f"\n{statement['tool']}: {sql[:160]}{'...' if len(sql) > 160 else ''}")
+        for finding in statement["findings"]:
+            icon = "❌" if finding["severity"] == "error" else "⚠️ "
+            print(f"  {icon} {finding['issue']}: {finding['detail']}")
+
+    print(f"\n📊 {len(report['statements'])} statements checked: "
+          f"{report['full_scans']} full scans, {report['warnings']} warnings")
+    if report["uncovered"]:
+        print(f"⚠️  No sample calls for: {', '.join(report['uncovered'])}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the query plans of every CRM tool")
+    parser.add_argument("--db-path", type=Path, help="Database to copy (default: fresh sample data)")
+    parser.add_argument("--json", action="store_true", help="Print the full report as JSON")
+    args = parser.parse_args()
+
+    report = analyze(args.db_path)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+    sys.exit(1 if report["full_scans"] else 0)
+
+if __name__ == "__main__":
+    main()
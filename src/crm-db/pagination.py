@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Keyset Pagination for the CRM Search Tools
+
+Search tools return at most `limit` rows and, when more rows match, an opaque
+`next_cursor` token. The token holds the sort key of the last row returned; the
+next page selects the rows that sort after it (WHERE sort key > last key)
+instead of skipping rows with OFFSET. A page costs the same however deep the
+walk goes, and rows inserted or deleted between pages do not shift later pages.
+
+Every ORDER BY ends with the row id so the sort key is unique.
+"""
+
+import json
+import base64
+from typing import Any, List, Optional, Sequence, Tuple
+
+class Keyset:
+    """An ORDER BY that can be resumed from a cursor"""
+
+    def __init__(self, name: str, columns: Sequence[Tuple[str, str, str, bool]]):
+        """
+        Args:
+            name: Identifies the ordering; cursors from another ordering are rejected
+            columns: (SQL expression, result column, "ASC" or "DESC", nullable) per sort
+                column, ending with a unique column
+        """
+        self.name = name
+        self.columns = list(columns)
+
+    def order_by(self) -> str:
+        """ORDER BY clause body"""
+        return ", ".join(f"{expr} {direction}" for expr, _, direction, _ in self.columns)
+
+    def encode(self, values: Sequence[Any]) -> str:
+        """Cursor for the rows after the given sort key"""
+        payload = json.dumps({"o": self.name, "k": list(values)}, separators=(",", ":"), default=str)
+        return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+    def decode(self, cursor: str) -> List[Any]:
+        """Sort key stored in a cursor; raises ValueError for foreign or damaged cursors"""
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+            values = payload["k"]
+            name = payload["o"]
+        except (ValueError, TypeError, KeyError, UnicodeEncodeError):
+            raise ValueError("Invalid cursor")
+        if name != self.name or not isinstance(values, list) or len(values) != len(self.columns):
+            raise ValueError("Cursor does not belong to this search; start again without next_cursor")
+        return values
+
+    def condition(self, cursor: Optional[str]) -> Tuple[str, List[Any]]:
+        """
+        WHERE condition selecting the rows after the cursor
+
+        SQLite sorts NULLs first: before every value ascending, after every value
+        descending. The first column also gets a plain range bound so the planner
+        can start the index range at the cursor.
+
+        Returns:
+            SQL condition ("1" without a cursor) and its parameters
+        """
+        if not cursor:
+            return "1", []
+        values = self.decode(cursor)
+
+        alternatives = []
+        params: List[Any] = []
+        for i, ((expr, _, direction, nullable), value) in enumerate(zip(self.columns, values)):
+            if direction == "DESC" and value is None:
+                continue  # nothing sorts after NULL descending
+            terms = []
+            for (prev_expr, _, _, _), prev_value in zip(self.columns[:i], values[:i]):
+                if prev_value is None:
+                    terms.append(f"{prev_expr} IS NULL")
+                else:
+                    terms.append(f"{prev_expr} = ?")
+                    params.append(prev_value)
+            if direction == "ASC" and value is None:
+                terms.append(f"{expr} IS NOT NULL")
+            elif direction == "ASC":
+                terms.append(f"{expr} > ?")
+                params.append(value)
+            else:
+                terms.append(f"({expr} < ? OR {expr} IS NULL)" if nullable else f"{expr} < ?")
+                params.append(value)
+            alternatives.append(" AND ".join(terms))
+        if not alternatives:
+            return "0", []
+
+        expr, _, direction, nullable = self.columns[0]
+        first = values[0]
+        bound: List[str] = []
+        bound_params: List[Any] = []
+        if direction == "ASC" and first is not None:
+            bound, bound_params = [f"{expr} >= ?"], [first]
+        elif direction == "DESC" and first is None:
+            bound = [f"{expr} IS NULL"]
+        elif direction == "DESC":
+            bound = [f"({expr} <= ? OR {expr} IS NULL)" if nullable else f"{expr} <= ?"]
+            bound_params = [first]
+
+        after = " OR ".join(f"({alternative})" for alternative in alternatives)
+        return " AND ".join(bound + [f"({after})"]), bound_params + params
+
+    def cursor_after(self, row: Any) -> str:
+        """Cursor for the rows after a result row"""
+        return self.encode([row[column] for _, column, _, _ in self.columns])
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Read-Only Query Engine for Ad Hoc SQL
+
+Runs caller-supplied SQL (the execute_sql_query tool) under several independent
+limits:
+
+- the connection is opened with mode=ro and query_only, so SQLite refuses writes
+- the statement must start with SELECT, WITH or VALUES, and an authorizer denies
+  everything but reads for the duration of the query (no writes, ATTACH or
+  PRAGMA, including writes hidden behind WITH)
+- a progress handler interrupts the query once CRM_QUERY_TIMEOUT_MS has passed
+- rows are fetched in batches and fetching stops at CRM_QUERY_MAX_ROWS, so a
+  huge result is never materialized
+
+explain_query() shows how SQLite would run a query without running it.
+"""
+
+import os
+import re
+import time
+import sqlite3
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+# Limits (environment overrides)
+QUERY_TIMEOUT_MS = int(os.getenv("CRM_QUERY_TIMEOUT_MS", "2000"))
+QUERY_MAX_ROWS = int(os.getenv("CRM_QUERY_MAX_ROWS", "1000"))
+
+# SQLite virtual machine instructions between deadline checks
+PROGRESS_INTERVAL = 1000
+FETCH_BATCH = 100
+
+READ_STATEMENTS = ("SELECT", "WITH", "VALUES")
+READ_ACTIONS = {sqlite3.SQLITE_SELECT, sqlite3.SQLITE_READ, sqlite3.SQLITE_FUNCTION, sqlite3.SQLITE_RECURSIVE}
+# FTS5 checks data_version on every query of its tables
+READ_PRAGMAS = {"data_version"}
+# Virtual table constructors (FTS5) declare their schema as an update of sqlite_master;
+# real writes are still refused by the read-only connection
+SCHEMA_DECLARATION = (sqlite3.SQLITE_UPDATE, "sqlite_master")
+
+LEADING_COMMENTS = re.compile(r"^(?:\s+|--[^\n]*(?:\n|$)|/\*.*?\*/)*", re.DOTALL)
+
+def check_statement(sql: str) -> str:
+    """Raise ValueError unless the statement starts with a read keyword; returns it stripped"""
+    statement = LEADING_COMMENTS.sub("", sql).strip()
+    keyword = statement.split(None, 1)[0].upper() if statement else ""
+    if keyword not in READ_STATEMENTS:
+        raise ValueError(f"Only {', '.join(READ_STATEMENTS)} statements are allowed")
+    return statement
+
+def authorize_read(action: int, arg1: Optional[str], arg2: Optional[str], db_name: Optional[str],
+                   source: Optional[str]) -> int:
+    """sqlite3 authorizer that allows reads and denies everything else"""
+    if action in READ_ACTIONS or (action, arg1) == SCHEMA_DECLARATION:
+        return sqlite3.SQLITE_OK
+    if action == sqlite3.SQLITE_PRAGMA and arg1 in READ_PRAGMAS and arg2 is None:
+        return sqlite3.SQLITE_OK
+    return sqlite3.SQLITE_DENY
+
+@contextmanager
+def read_only_limits(conn: sqlite3.Connection, timeout_ms: int):
+    """
+    Apply the authorizer and the time budget to conn for a `with` block
+
+    Errors raised by SQLite inside the block become ValueError (statement not
+    allowed) or TimeoutError (budget spent).
+    """
+    deadline = time.monotonic() + timeout_ms / 1000
+    conn.set_authorizer(authorize_read)
+    conn.set_progress_handler(lambda: time.monotonic() > deadline, PROGRESS_INTERVAL)
+    try:
+        yield
+    except sqlite3.DatabaseError as e:
+        if str(e) == "interrupted":
+            raise TimeoutError(f"Query stopped after the {timeout_ms} ms time limit; "
+                               f"add filters or a LIMIT, or check the plan with explain=True") from e
+        if "not authorized" in str(e) or "readonly" in str(e):
+            raise ValueError("Only read-only queries are allowed") from e
+        raise
+    finally:
+        conn.set_progress_handler(None, 0)
+        conn.set_authorizer(None)
+
+def run_query(conn: sqlite3.Connection, sql: str, max_rows: int = None,
+              timeout_ms: int = None) -> Dict[str, Any]:
+    """
+    Run a read-only query within the row cap and time budget
+
+    Args:
+        conn: A read-only connection (ConnectionManager.query_reader())
+        sql: One SELECT, WITH or VALUES statement
+        max_rows: Stop after this many rows (default and upper bound QUERY_MAX_ROWS)
+        timeout_ms: Time budget (default QUERY_TIMEOUT_MS)
+
+    Returns:
+        rows, truncated (more rows matched than were fetched) and elapsed_ms
+    """
+    statement = check_statement(sql)
+    max_rows = QUERY_MAX_ROWS if max_rows is None else max(1, min(max_rows, QUERY_MAX_ROWS))
+    timeout_ms = QUERY_TIMEOUT_MS if timeout_ms is None else timeout_ms
+
+    start = time.perf_counter()
+    rows: List[sqlite3.Row] = []
+    with read_only_limits(conn, timeout_ms):
+        cursor = conn.execute(statement)
+        try:
+            # One row past the cap tells whether the result was cut
+            while len(rows) <= max_rows:
+                batch = cursor.fetchmany(min(FETCH_BATCH, max_rows + 1 - len(rows)))
+                if not batch:
+                    break
+                rows.extend(batch)
+        finally:
+            cursor.close()
+
+    truncated = len(rows) > max_rows
+    return {
+        "rows": rows[:max_rows],
+        "truncated": truncated,
+        "elapsed_ms": round((time.perf_counter() - start) * 1000, 1),
+    }
+
+def explain_query(conn: sqlite3.Connection, sql: str, timeout_ms: int = None) -> List[str]:
+    """
+    EXPLAIN QUERY PLAN of a read-only query, without running it
+
+    Returns:
+        Plan steps, indented by depth
+    """
+    statement = check_statement(sql)
+    timeout_ms = QUERY_TIMEOUT_MS if timeout_ms is None else timeout_ms
+
+    with read_only_limits(conn, timeout_ms):
+        steps = conn.execute(f"EXPLAIN QUERY PLAN {statement}").fetchall()
+
+    depth = {0: -1}
+    lines = []
+    for step_id, parent, _, detail in steps:
+        depth[step_id] = depth.get(parent, -1) + 1
+        lines.append("  " * depth[step_id] + detail)
+    return lines
@@ -7,11 +7,13 @@ Designed specifically for LLM agent interactions with comprehensive
 contact management, communication processing, and financial tracking.
 """
 
+import os
+import re
 import sqlite3
 import json
 import logging
 import asyncio
-import requests
+import threading
 from pathlib import Path
 from datetime import datetime, date, timedelta
 from typing import Optional, List, Dict, Any, Union
@@ -19,7 +21,12 @@ from contextlib import asynccontextmanager
 from collections.abc import AsyncIterator
 
 from mcp.server.fastmcp import FastMCP, Context
-from database import CRMDatabase
+from database import CRMDatabase, FTS_TABLES, merge_fts_step, deferred_fts_sync, communication_content_hash, dashboard_counts
+from connections import ConnectionManager
+from identity_cache import IdentityCache
+from pagination import Keyset
+from formatting import format_results
+from query_engine import run_query, explain_query
 from models import (
     Contact, Company, Communication, Task, Transaction, Account, Subscription,
     CreateContactRequest, CreateCommunicationRequest, SearchRequest,
@@ -34,6 +41,9 @@ logger = logging.getLogger(__name__)
 # Database path
 DB_PATH = Path(__file__).parent / "crm.db"
 
+# Seconds between scheduled FTS index merges (0 disables them)
+FTS_OPTIMIZE_INTERVAL_SECONDS = int(os.getenv("CRM_FTS_OPTIMIZE_INTERVAL_SECONDS", "3600"))
+
 # FastMCP server context
 class CRMContext:
     def __init__(self, db_path: Path):
@@ -52,36 +62,223 @@ async def crm_lifespan(server: FastMCP) -> AsyncIterator[CRMContext]:
             db.init_database()
             db.create_sample_data()
         logger.info("Database initialized with sample data")
+    else:
+        db = CRMDatabase(str(DB_PATH))
+        with db:
+            if db.ensure_ingestion_keys():
+                logger.info("Unique keys for communication ingestion added")
+            if db.ensure_fts_indexes():
+                logger.info("Full-text search triggers added and indexes rebuilt")
+            if db.ensure_rollups():
+                logger.info("Dashboard rollups added and filled")
+            changed_indexes = db.ensure_indexes()
+            if changed_indexes:
+                logger.info(f"Indexes updated: {', '.join(changed_indexes)}")
     
     # Create context
     context = CRMContext(DB_PATH)
+    maintenance = None
+    if FTS_OPTIMIZE_INTERVAL_SECONDS > 0:
+        maintenance = asyncio.create_task(fts_maintenance_loop(FTS_OPTIMIZE_INTERVAL_SECONDS))
     
     try:
         yield context
     finally:
         logger.info("Shutting down CRM server")
+        if maintenance is not None:
+            maintenance.cancel()
+        if _connection_manager is not None:
+            _connection_manager.close()
 
 # Create FastMCP server
 mcp = FastMCP("CRM Database", lifespan=crm_lifespan)
 
 # Helper functions
-def get_db_connection() -> sqlite3.Connection:
-    """Get database connection with row factory"""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+_connection_manager: Optional[ConnectionManager] = None
+_connection_manager_lock = threading.Lock()
+
+# Sender -> contact_id cache used by communication ingestion
+identity_cache = IdentityCache()
+
+def get_connection_manager() -> ConnectionManager:
+    """Connection manager for the current DB_PATH (reopened if DB_PATH changes)"""
+    global _connection_manager
+    with _connection_manager_lock:
+        if _connection_manager is None or _connection_manager.db_path != Path(DB_PATH):
+            if _connection_manager is not None:
+                _connection_manager.close()
+            _connection_manager = ConnectionManager(DB_PATH)
+            identity_cache.clear()
+        return _connection_manager
+
+def get_db_connection(readonly: bool = False):
+    """
+    Get a pooled database connection with row factory
+    
+    Use as `with get_db_connection() as conn:`. Writes share a single connection
+    that is held for the whole block and committed (or rolled back) on exit;
+    readonly=True returns the calling thread's read-only connection.
+    """
+    manager = get_connection_manager()
+    return manager.reader() if readonly else manager.writer()
+
+_fts_last_optimized: tuple = (None, 0)
+
+def run_fts_maintenance(force: bool = False) -> bool:
+    """
+    Merge the FTS index segments if anything was written since the last merge
+    
+    All server writes go through the one writer connection, so its total_changes
+    tells whether the indexes can have grown new segments. The merge runs as
+    bounded 'merge' steps, each in its own short writer transaction, so tool
+    calls can write between steps instead of waiting for a full 'optimize'.
+    
+    Returns:
+        True if the indexes were merged
+    """
+    global _fts_last_optimized
+    with get_db_connection() as conn:
+        last_conn, last_changes = _fts_last_optimized
+        if not force and conn is last_conn and conn.total_changes == last_changes:
+            return False
+        start_conn, changes = conn, conn.total_changes
+    
+    # Only the merges' own changes are counted, so tool call writes made between
+    # steps still trigger the next run
+    steps = 0
+    for fts_table in FTS_TABLES:
+        merged = True
+        while merged:
+            with get_db_connection() as conn:
+                before = conn.total_changes
+                merged = merge_fts_step(conn, fts_table)
+                changes += conn.total_changes - before
+            steps += 1
+    
+    _fts_last_optimized = (start_conn, changes)
+    logger.debug(f"Full-text search indexes merged in {steps} steps")
+    return True
+
+async def fts_maintenance_loop(interval: float):
+    """Run scheduled FTS merges in a worker thread until cancelled"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            if await asyncio.to_thread(run_fts_maintenance):
+                logger.info("Full-text search indexes merged")
+        except Exception as e:
+            logger.error(f"Full-text search maintenance failed: {e}")
+
+def build_fts_query(query: str) -> str:
+    """
+    Turn free text into a safe FTS5 MATCH expression
+    
+    Each word becomes a quoted prefix term and all terms must match, so punctuation
+    in emails or invoice numbers cannot produce FTS syntax errors.
+    
+    Returns:
+        MATCH expression, or an empty string if the query has no searchable words
+    """
+    terms = re.findall(r"\w+", query or "")
+    return " ".join(f'"{term}"*' for term in terms)
+
+# Identifiers bound per IN (...) list when resolving senders in bulk
+IDENTITY_LOOKUP_CHUNK = 500
 
-def format_results_for_llm(results: List[sqlite3.Row], description: str) -> str:
-    """Format database results for LLM consumption"""
-    if not results:
-        return f"No results found. {description}"
+def resolve_sender_contacts(conn: sqlite3.Connection, senders) -> Dict[tuple, int]:
+    """
+    Map (platform, sender_identifier) pairs to contact IDs with set-based lookups
     
-    formatted_results = []
-    for row in results:
-        row_dict = dict(row)
-        formatted_results.append(row_dict)
+    Email senders are matched on contacts.email, other platforms through
+    contact_identities. Deleted contacts and identities never match. Senders in
+    identity_cache are not looked up again.
     
-    return f"{description}\n\nResults ({len(results)} found):\n{json.dumps(formatted_results, indent=2, default=str)}"
+    Returns:
+        Dict of (platform, sender_identifier) -> contact_id for the senders that matched
+    """
+    cached, missing = identity_cache.get_many(set(senders))
+    if not missing:
+        return {key: contact_id for key, contact_id in cached.items() if contact_id is not None}
+    
+    by_platform: Dict[str, set] = {}
+    for platform, identifier in missing:
+        by_platform.setdefault(platform, set()).add(identifier)
+    
+    resolved = {}
+    for platform, identifiers in by_platform.items():
+        identifiers = list(identifiers)
+        for start in range(0, len(identifiers), IDENTITY_LOOKUP_CHUNK):
+            chunk = identifiers[start:start + IDENTITY_LOOKUP_CHUNK]
+            placeholders = ", ".join("?" * len(chunk))
+            if platform == "email":
+                rows = conn.execute(f"""
+                    SELECT email, MIN(id) FROM contacts
+                    WHERE email IN ({placeholders}) AND deleted_at IS NULL
+                    GROUP BY email
+                """, chunk)
+            else:
+                rows = conn.execute(f"""
+                    SELECT ci.platform_identifier, MIN(ci.contact_id) FROM contact_identities ci
+                    JOIN contacts c ON ci.contact_id = c.id AND c.deleted_at IS NULL
+                    WHERE ci.platform = ? AND ci.platform_identifier IN ({placeholders})
+                      AND ci.deleted_at IS NULL
+                    GROUP BY ci.platform_identifier
+                """, (platform, *chunk))
+            resolved.update(((platform, identifier), contact_id) for identifier, contact_id in rows)
+    
+    identity_cache.put_many({key: resolved.get(key) for key in missing})
+    resolved.update((key, contact_id) for key, contact_id in cached.items() if contact_id is not None)
+    return resolved
+
+# Sort orders of the search tools: (SQL expression, result column, direction, nullable)
+CONTACT_RANK_KEYSET = Keyset("contacts:rank", [
+    ("bm25(contacts_fts)", "relevance_score", "ASC", False),
+    ("c.id", "id", "ASC", False),
+])
+CONTACT_NAME_KEYSET = Keyset("contacts:name", [
+    ("c.last_name", "last_name", "ASC", False),
+    ("c.first_name", "first_name", "ASC", False),
+    ("c.id", "id", "ASC", False),
+])
+COMMUNICATION_RANK_KEYSET = Keyset("communications:rank", [
+    ("bm25(communications_fts, 1.0, 2.0, 1.0)", "relevance_score", "ASC", False),
+    ("c.id", "id", "ASC", False),
+])
+COMMUNICATION_DATE_KEYSET = Keyset("communications:date", [
+    ("c.communication_timestamp", "communication_timestamp", "DESC", False),
+    ("c.id", "id", "DESC", False),
+])
+COMPANY_NAME_KEYSET = Keyset("companies:name", [
+    ("name", "name", "ASC", False),
+    ("id", "id", "ASC", False),
+])
+TRANSACTION_KEYSET = Keyset("transactions:date", [
+    ("t.transaction_date", "transaction_date", "DESC", False),
+    ("t.created_at", "created_at", "DESC", True),
+    ("t.id", "id", "DESC", False),
+])
+# id ascending last, as stored in the task indexes
+TASK_KEYSET = Keyset("tasks:due", [
+    ("t.due_date", "due_date", "ASC", True),
+    ("t.priority", "priority", "DESC", True),
+    ("t.created_at", "created_at", "DESC", True),
+    ("t.id", "id", "ASC", False),
+])
+
+def format_results_for_llm(results: List[sqlite3.Row], description: str, fields: List[str] = None,
+                           keyset: Keyset = None, limit: int = None) -> str:
+    """
+    Format database results for LLM consumption (projection, truncation, size limit)
+    
+    Paged searches fetch limit + 1 rows and pass their keyset; the extra row only
+    signals that a next_cursor is needed.
+    """
+    rows = [dict(row) for row in results]
+    has_more = keyset is not None and len(rows) > limit
+    if has_more:
+        rows = rows[:limit]
+    return format_results(rows, description, fields=fields, has_more=has_more,
+                          cursor_after=keyset.cursor_after if keyset is not None else None)
 
 def safe_execute(conn: sqlite3.Connection, query: str, params: tuple = ()) -> List[sqlite3.Row]:
     """Safely execute query with error handling"""
@@ -152,6 +349,8 @@ def create_contact(first_name: str, last_name: str, email: str = None,
             ))
             
             contact_id = cursor.lastrowid
+            if email:
+                identity_cache.invalidate([("email", email)])
             conn.commit()
             
             # Get the created contact for response
@@ -181,46 +380,58 @@ def create_contact(first_name: str, last_name: str, email: str = None,
         return json.dumps(error_result.dict(), indent=2)
 
 @mcp.tool()
-def search_contacts(query: str, limit: int = 20) -> str:
+def search_contacts(query: str, limit: int = 20, next_cursor: str = None, fields: List[str] = None) -> str:
     """
     Search contacts by name, email, or notes.
     
     Args:
         query: Search terms (searches name, email, phone, notes)
         limit: Maximum number of results to return (default 20)
+        next_cursor: Cursor from the previous page of the same search (optional)
+        fields: Columns to return, e.g. ["id", "name"] (optional, default all)
     
     Returns:
-        JSON array of matching contacts with company information
+        JSON array of matching contacts with company information, and a
+        next_cursor if more contacts match
     """
     try:
-        with get_db_connection() as conn:
+        with get_db_connection(readonly=True) as conn:
             # Use FTS if available, otherwise fallback to LIKE search
-            try:
-                results = safe_execute(conn, """
-                    SELECT c.*, comp.name as company_name,
-                           bm25(contacts_fts) as relevance_score
-                    FROM contacts_fts
-                    JOIN contacts c ON contacts_fts.rowid = c.id AND c.deleted_at IS NULL
-                    LEFT JOIN companies comp ON c.company_id = comp.id AND comp.deleted_at IS NULL
-                    WHERE contacts_fts MATCH ?
-                    ORDER BY bm25(contacts_fts)
-                    LIMIT ?
-                """, (query, limit))
-            except:
-                # Fallback to LIKE search
+            results = None
+            keyset = CONTACT_RANK_KEYSET
+            fts_query = build_fts_query(query)
+            if fts_query:
+                after, after_params = keyset.condition(next_cursor)
+                try:
+                    results = safe_execute(conn, f"""
+                        SELECT c.*, comp.name as company_name,
+                               bm25(contacts_fts) as relevance_score
+                        FROM contacts_fts
+                        JOIN contacts c ON contacts_fts.rowid = c.id AND c.deleted_at IS NULL
+                        LEFT JOIN companies comp ON c.company_id = comp.id AND comp.deleted_at IS NULL
+                        WHERE contacts_fts MATCH ? AND {after}
+                        ORDER BY {keyset.order_by()}
+                        LIMIT ?
+                    """, (fts_query, *after_params, limit + 1))
+                except sqlite3.OperationalError as e:
+                    logger.warning(f"Contact full-text search unavailable, using LIKE: {e}")
+            
+            if results is None:
+                keyset = CONTACT_NAME_KEYSET
+                after, after_params = keyset.condition(next_cursor)
                 search_term = f"%{query}%"
-                results = safe_execute(conn, """
+                results = safe_execute(conn, f"""
                     SELECT c.*, comp.name as company_name
                     FROM contacts c
                     LEFT JOIN companies comp ON c.company_id = comp.id AND comp.deleted_at IS NULL
                     WHERE (c.first_name LIKE ? OR c.last_name LIKE ? 
                        OR c.email LIKE ? OR c.notes LIKE ?)
-                       AND c.deleted_at IS NULL
-                    ORDER BY c.last_name, c.first_name
+                       AND c.deleted_at IS NULL AND {after}
+                    ORDER BY {keyset.order_by()}
                     LIMIT ?
-                """, (search_term, search_term, search_term, search_term, limit))
+                """, (search_term, search_term, search_term, search_term, *after_params, limit + 1))
             
-            return format_results_for_llm(results, f"Contact search results for: '{query}'")
+            return format_results_for_llm(results, f"Contact search results for: '{query}'", fields, keyset, limit)
             
     except Exception as e:
         return f"Search failed: {str(e)}"
@@ -258,42 +469,39 @@ def create_communication(platform: str, sender_identifier: str, content: str,
                 comm_timestamp = datetime.now()
             
             # Try to match sender to existing contact
-            sender_contact_id = None
-            if platform == "email":
-                cursor.execute("SELECT id FROM contacts WHERE email = ? AND deleted_at IS NULL", (sender_identifier,))
-                contact_row = cursor.fetchone()
-                if contact_row:
-                    sender_contact_id = contact_row[0]
-            else:
-                # Check contact_identities table
-                cursor.execute("""
-                    SELECT ci.contact_id FROM contact_identities ci
-                    JOIN contacts c ON ci.contact_id = c.id AND c.deleted_at IS NULL
-                    WHERE ci.platform = ? AND ci.platform_identifier = ? AND ci.deleted_at IS NULL
-                """, (platform, sender_identifier))
-                identity_row = cursor.fetchone()
-                if identity_row:
-                    sender_contact_id = identity_row[0]
+            sender_contact_id = resolve_sender_contacts(conn, [(platform, sender_identifier)]).get(
+                (platform, sender_identifier))
             
-            # Create communication record
+            # Create communication record (a repeat of the same message is a no-op)
+            comm_timestamp = comm_timestamp.isoformat(" ")
+            content_hash = communication_content_hash(platform, sender_identifier, comm_timestamp, content)
             cursor.execute("""
                 INSERT INTO communications (
                     platform, sender_contact_id, sender_display_name, sender_identifier,
                     subject_line, message_content_text, direction, communication_timestamp,
-                    processing_status, created_at, updated_at
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    content_hash, processing_status, created_at, updated_at
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (content_hash) WHERE platform_message_id IS NULL DO NOTHING
             """, (
                 platform, sender_contact_id, sender_name, sender_identifier,
                 subject, content, direction, comm_timestamp,
-                'processed', datetime.now(), datetime.now()
+                content_hash, 'processed', datetime.now(), datetime.now()
             ))
             
-            comm_id = cursor.lastrowid
+            if cursor.rowcount:
+                comm_id = cursor.lastrowid
+                message = f"Communication from {sender_identifier} created successfully"
+            else:
+                comm_id = conn.execute("""
+                    SELECT id FROM communications INDEXED BY idx_communications_content_hash
+                    WHERE content_hash = ? AND platform_message_id IS NULL
+                """, (content_hash,)).fetchone()[0]
+                message = f"Communication from {sender_identifier} already recorded"
             conn.commit()
             
             result = OperationResult(
                 success=True,
-                message=f"Communication from {sender_identifier} created successfully",
+                message=message,
                 data={"communication_id": comm_id}
             )
             
@@ -307,22 +515,225 @@ def create_communication(platform: str, sender_identifier: str, content: str,
         )
         return json.dumps(error_result.dict(), indent=2)
 
+DIRECTIONS = {d.value for d in Direction}
+# Record fields bound as text columns; other types would fail the whole batch insert
+COMMUNICATION_TEXT_FIELDS = ("platform", "sender_identifier", "content", "subject", "direction",
+                             "sender_name", "platform_message_id")
+
+def normalize_communication_record(record: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Validate one bulk record and fill in defaults
+    
+    Raises:
+        ValueError: If a required field is missing or a value is invalid
+    """
+    if not isinstance(record, dict):
+        raise ValueError("record must be an object")
+    missing = [field for field in ("platform", "sender_identifier", "content") if not record.get(field)]
+    if missing:
+        raise ValueError(f"missing {', '.join(missing)}")
+    not_text = [field for field in COMMUNICATION_TEXT_FIELDS
+                if record.get(field) is not None and not isinstance(record[field], str)]
+    if not_text:
+        raise ValueError(f"{', '.join(not_text)} must be a string")
+    
+    direction = record.get("direction") or Direction.incoming.value
+    if direction not in DIRECTIONS:
+        raise ValueError(f"invalid direction '{direction}'")
+    
+    timestamp = record.get("timestamp")
+    if timestamp:
+        try:
+            comm_timestamp = datetime.fromisoformat(str(timestamp).replace('Z', '+00:00'))
+        except ValueError:
+            raise ValueError(f"invalid timestamp '{timestamp}'")
+    else:
+        comm_timestamp = datetime.now()
+    timestamp = comm_timestamp.isoformat(" ")
+    
+    return {
+        "platform": record["platform"],
+        "sender_identifier": record["sender_identifier"],
+        "content": record["content"],
+        "subject": record.get("subject"),
+        "direction": direction,
+        "sender_name": record.get("sender_name"),
+        "timestamp": timestamp,
+        "platform_message_id": record.get("platform_message_id"),
+        "content_hash": communication_content_hash(record["platform"], record["sender_identifier"],
+                                                   timestamp, record["content"]),
+    }
+
+def communication_key(record: Dict[str, Any]) -> tuple:
+    """Idempotency key: the platform message ID when present, otherwise the content hash"""
+    if record["platform_message_id"]:
+        return ("message", record["platform"], record["platform_message_id"])
+    return ("hash", record["content_hash"])
+
+def lookup_communication_ids(conn: sqlite3.Connection, keys) -> Dict[tuple, int]:
+    """Map communication_key() tuples to the IDs of the stored communications"""
+    by_platform: Dict[str, List[str]] = {}
+    hashes = []
+    for key in keys:
+        if key[0] == "message":
+            by_platform.setdefault(key[1], []).append(key[2])
+        else:
+            hashes.append(key[1])
+    
+    found = {}
+    for platform, message_ids in by_platform.items():
+        for start in range(0, len(message_ids), IDENTITY_LOOKUP_CHUNK):
+            chunk = message_ids[start:start + IDENTITY_LOOKUP_CHUNK]
+            rows = conn.execute(f"""
+                SELECT platform_message_id, id FROM communications
+                WHERE platform = ? AND platform_message_id IN ({", ".join("?" * len(chunk))})
+            """, (platform, *chunk))
+            found.update((("message", platform, message_id), comm_id) for message_id, comm_id in rows)
+    for start in range(0, len(hashes), IDENTITY_LOOKUP_CHUNK):
+        chunk = hashes[start:start + IDENTITY_LOOKUP_CHUNK]
+        rows = conn.execute(f"""
+            SELECT content_hash, id FROM communications INDEXED BY idx_communications_content_hash
+            WHERE content_hash IN ({", ".join("?" * len(chunk))}) AND platform_message_id IS NULL
+        """, chunk)
+        found.update((("hash", content_hash), comm_id) for content_hash, comm_id in rows)
+    return found
+
+def ingest_communications(records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Insert or update many communications in a single transaction
+    
+    Records take the create_communication arguments (platform, sender_identifier,
+    content, subject, direction, sender_name, timestamp) plus an optional
+    platform_message_id. Senders are resolved for the whole batch at once, and
+    invalid records are reported without stopping the rest.
+    
+    Ingestion is idempotent: a record whose platform message ID is already stored
+    updates that communication if its content changed, and a record without one is
+    skipped if a communication with the same sender, timestamp and content exists.
+    Soft-deleted communications are never revived.
+    
+    Returns:
+        Dict with inserted, updated and skipped counts, ids aligned with records
+        (None where the record failed) and errors as {"index", "error"} entries
+    """
+    ids: List[Optional[int]] = [None] * len(records)
+    errors = []
+    keys: List[Optional[tuple]] = [None] * len(records)
+    # Last record per key; earlier repeats within the batch are skipped
+    batch: Dict[tuple, Dict[str, Any]] = {}
+    for index, record in enumerate(records):
+        try:
+            record = normalize_communication_record(record)
+        except ValueError as e:
+            errors.append({"index": index, "error": str(e)})
+            continue
+        keys[index] = communication_key(record)
+        batch.pop(keys[index], None)
+        batch[keys[index]] = record
+    
+    inserted = updated = 0
+    if batch:
+        now = datetime.now().isoformat(" ")
+        with get_db_connection() as conn:
+            contacts = resolve_sender_contacts(
+                conn, {(record["platform"], record["sender_identifier"]) for record in batch.values()})
+            last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM communications").fetchone()[0]
+            with deferred_fts_sync(conn, "communications_fts"):
+                cursor = conn.executemany("""
+                    INSERT INTO communications (
+                        platform, platform_message_id, content_hash, sender_contact_id, sender_display_name,
+                        sender_identifier, subject_line, message_content_text, direction,
+                        communication_timestamp, processing_status, created_at, updated_at
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 'processed', ?, ?)
+                    ON CONFLICT (platform, platform_message_id) WHERE platform_message_id IS NOT NULL DO UPDATE SET
+                        content_hash = excluded.content_hash,
+                        sender_contact_id = COALESCE(excluded.sender_contact_id, sender_contact_id),
+                        sender_display_name = excluded.sender_display_name,
+                        sender_identifier = excluded.sender_identifier,
+                        subject_line = excluded.subject_line,
+                        message_content_text = excluded.message_content_text,
+                        communication_timestamp = excluded.communication_timestamp,
+                        updated_at = excluded.updated_at
+                    WHERE deleted_at IS NULL AND (
+                        content_hash IS NOT excluded.content_hash
+                        OR subject_line IS NOT excluded.subject_line
+                        OR sender_display_name IS NOT excluded.sender_display_name
+                    )
+                    ON CONFLICT (content_hash) WHERE platform_message_id IS NULL DO NOTHING
+                """, [
+                    (record["platform"], record["platform_message_id"], record["content_hash"],
+                     contacts.get((record["platform"], record["sender_identifier"])), record["sender_name"],
+                     record["sender_identifier"], record["subject"], record["content"], record["direction"],
+                     record["timestamp"], now, now)
+                    for record in batch.values()
+                ])
+                changed = cursor.rowcount
+            inserted = conn.execute("SELECT COUNT(*) FROM communications WHERE id > ?", (last_id,)).fetchone()[0]
+            updated = changed - inserted
+            stored = lookup_communication_ids(conn, batch)
+        
+        for index, key in enumerate(keys):
+            if key is not None:
+                ids[index] = stored.get(key)
+    
+    return {
+        "inserted": inserted,
+        "updated": updated,
+        "skipped": len(records) - len(errors) - inserted - updated,
+        "ids": ids,
+        "errors": errors
+    }
+
+@mcp.tool()
+def create_communications_bulk(records: List[Dict[str, Any]]) -> str:
+    """
+    Create many communication records in one call (for imports of message history).
+    
+    Args:
+        records: List of objects with platform, sender_identifier and content
+            (required) and subject, direction, sender_name, timestamp and
+            platform_message_id (optional), as in create_communication
+    
+    Records already stored (same platform message ID, or same sender, timestamp
+    and content) are updated or skipped instead of duplicated, so an import can be
+    retried or re-run safely.
+    
+    Returns:
+        Compact JSON with inserted, updated and skipped counts, the communication ID
+        for each record (null if it failed) and per-record errors
+    """
+    try:
+        result = ingest_communications(records)
+        return json.dumps({"success": True, **result}, separators=(",", ":"))
+    except Exception as e:
+        error_result = OperationResult(
+            success=False,
+            message=f"Failed to create communications: {str(e)}",
+            error_details=str(e)
+        )
+        return json.dumps(error_result.dict(), indent=2)
+
 @mcp.tool()
-def search_communications(query: str, platform: str = None, days_back: int = 30, limit: int = 20) -> str:
+def search_communications(query: str, platform: str = None, days_back: int = 30, limit: int = 20,
+                          next_cursor: str = None, fields: List[str] = None) -> str:
     """
     Search communications by content, sender, or subject.
     
     Args:
-        query: Search terms (searches content, subject, sender name)
+        query: Search terms (searches content, subject, sender name); every word
+            must match, as a word or word prefix
         platform: Filter by specific platform (optional)
         days_back: How many days back to search (default 30)
         limit: Maximum number of results (default 20)
+        next_cursor: Cursor from the previous page of the same search (optional)
+        fields: Columns to return, e.g. ["id", "name"] (optional, default all)
     
     Returns:
-        JSON array of matching communications
+        JSON array of matching communications, best matches first, each with a
+        highlighted snippet, and a next_cursor if more communications match
     """
     try:
-        with get_db_connection() as conn:
+        with get_db_connection(readonly=True) as conn:
             # Build query conditions
             conditions = ["c.communication_timestamp >= ?", "c.deleted_at IS NULL"]
             params = [datetime.now() - timedelta(days=days_back)]
@@ -331,32 +742,55 @@ def search_communications(query: str, platform: str = None, days_back: int = 30,
                 conditions.append("c.platform = ?")
                 params.append(platform)
             
-            # Add search terms
-            search_term = f"%{query}%"
-            conditions.append("""(
-                c.message_content_text LIKE ? OR 
-                c.subject_line LIKE ? OR 
-                c.sender_display_name LIKE ?
-            )""")
-            params.extend([search_term, search_term, search_term])
-            
             where_clause = " AND ".join(conditions)
-            params.append(limit)
             
-            results = safe_execute(conn, f"""
-                SELECT 
-                    c.*,
-                    cont.first_name || ' ' || cont.last_name as contact_name,
-                    comp.name as company_name
-                FROM communications c
-                LEFT JOIN contacts cont ON c.sender_contact_id = cont.id AND cont.deleted_at IS NULL
-                LEFT JOIN companies comp ON c.sender_company_id = comp.id AND comp.deleted_at IS NULL
-                WHERE {where_clause}
-                ORDER BY c.communication_timestamp DESC
-                LIMIT ?
-            """, tuple(params))
+            # Ranked full-text search; LIKE only if the FTS index is missing
+            results = None
+            keyset = COMMUNICATION_RANK_KEYSET
+            fts_query = build_fts_query(query)
+            if fts_query:
+                after, after_params = keyset.condition(next_cursor)
+                try:
+                    results = safe_execute(conn, f"""
+                        SELECT 
+                            c.*,
+                            cont.first_name || ' ' || cont.last_name as contact_name,
+                            comp.name as company_name,
+                            snippet(communications_fts, -1, '**', '**', '...', 16) as snippet,
+                            bm25(communications_fts, 1.0, 2.0, 1.0) as relevance_score
+                        FROM communications_fts
+                        JOIN communications c ON communications_fts.rowid = c.id
+                        LEFT JOIN contacts cont ON c.sender_contact_id = cont.id AND cont.deleted_at IS NULL
+                        LEFT JOIN companies comp ON c.sender_company_id = comp.id AND comp.deleted_at IS NULL
+                        WHERE communications_fts MATCH ? AND {where_clause} AND {after}
+                        ORDER BY {keyset.order_by()}
+                        LIMIT ?
+                    """, (fts_query, *params, *after_params, limit + 1))
+                except sqlite3.OperationalError as e:
+                    logger.warning(f"Communication full-text search unavailable, using LIKE: {e}")
+            
+            if results is None:
+                keyset = COMMUNICATION_DATE_KEYSET
+                after, after_params = keyset.condition(next_cursor)
+                search_term = f"%{query}%"
+                results = safe_execute(conn, f"""
+                    SELECT 
+                        c.*,
+                        cont.first_name || ' ' || cont.last_name as contact_name,
+                        comp.name as company_name
+                    FROM communications c
+                    LEFT JOIN contacts cont ON c.sender_contact_id = cont.id AND cont.deleted_at IS NULL
+                    LEFT JOIN companies comp ON c.sender_company_id = comp.id AND comp.deleted_at IS NULL
+                    WHERE {where_clause} AND (
+                        c.message_content_text LIKE ? OR 
+                        c.subject_line LIKE ? OR 
+                        c.sender_display_name LIKE ?
+                    ) AND {after}
+                    ORDER BY {keyset.order_by()}
+                    LIMIT ?
+                """, (*params, search_term, search_term, search_term, *after_params, limit + 1))
             
-            return format_results_for_llm(results, f"Communication search results for: '{query}'")
+            return format_results_for_llm(results, f"Communication search results for: '{query}'", fields, keyset, limit)
             
     except Exception as e:
         return f"Communication search failed: {str(e)}"
@@ -374,7 +808,7 @@ def get_contact_timeline(contact_id: int, days_back: int = 90) -> str:
         JSON with contact info and chronological communication timeline
     """
     try:
-        with get_db_connection() as conn:
+        with get_db_connection(readonly=True) as conn:
             # Get contact info
             contact_info = safe_execute(conn, """
                 SELECT c.*, comp.name as company_name
@@ -390,14 +824,19 @@ def get_contact_timeline(contact_id: int, days_back: int = 90) -> str:
             
             # Get communications
             cutoff_date = datetime.now() - timedelta(days=days_back)
+            # One index range per side; with an OR the planner walks every recent message
             communications = safe_execute(conn, """
                 SELECT *
                 FROM communications
-                WHERE (sender_contact_id = ? OR recipient_contact_id = ?)
-                  AND communication_timestamp >= ?
-                  AND deleted_at IS NULL
+                WHERE id IN (
+                    SELECT id FROM communications
+                    WHERE sender_contact_id = ? AND communication_timestamp >= ? AND deleted_at IS NULL
+                    UNION
+                    SELECT id FROM communications
+                    WHERE recipient_contact_id = ? AND communication_timestamp >= ? AND deleted_at IS NULL
+                )
                 ORDER BY communication_timestamp DESC
-            """, (contact_id, contact_id, cutoff_date))
+            """, (contact_id, cutoff_date, contact_id, cutoff_date))
             
             # Get tasks
             tasks = safe_execute(conn, """
@@ -478,33 +917,33 @@ def create_task(title: str, description: str = None, contact_id: int = None,
         return json.dumps(error_result.dict(), indent=2)
 
 @mcp.tool()
-def execute_sql_query(sql: str) -> str:
+def execute_sql_query(sql: str, explain: bool = False, max_rows: int = None) -> str:
     """
     Execute a read-only SQL query on the CRM database.
-    SECURITY: Only SELECT statements are allowed.
+    SECURITY: Only SELECT (or WITH / VALUES) statements are allowed. The query runs on a
+    read-only connection with a time limit and a row cap.
     
     Args:
         sql: SQL SELECT statement to execute
+        explain: Return the query plan instead of running the query (optional)
+        max_rows: Maximum rows to return (optional, capped by CRM_QUERY_MAX_ROWS)
     
     Returns:
-        JSON results of the query
+        JSON results of the query, or its plan with explain=True
     """
-    # Security check - only allow SELECT statements
-    sql_upper = sql.strip().upper()
-    if not sql_upper.startswith('SELECT'):
-        return "Error: Only SELECT statements are allowed for security reasons"
-    
-    # Additional security - block certain keywords
-    dangerous_keywords = ['DROP', 'DELETE', 'UPDATE', 'INSERT', 'ALTER', 'CREATE']
-    for keyword in dangerous_keywords:
-        if keyword in sql_upper:
-            return f"Error: '{keyword}' statements are not allowed"
-    
     try:
-        with get_db_connection() as conn:
-            results = safe_execute(conn, sql)
-            return format_results_for_llm(results, f"Query results for: {sql[:100]}...")
-            
+        conn = get_connection_manager().query_reader()
+        if explain:
+            plan = explain_query(conn, sql)
+            return f"Query plan for: {sql[:100]}...\n\n" + "\n".join(plan)
+        
+        result = run_query(conn, sql, max_rows=max_rows)
+        formatted = format_results_for_llm(result["rows"], f"Query results for: {sql[:100]}...")
+        if result["truncated"]:
+            formatted += (f"\n\nStopped after {len(result['rows'])} rows; "
+                          f"add a LIMIT or narrower filters to see the rest.")
+        return formatted
+        
     except Exception as e:
         return f"SQL query failed: {str(e)}"
 
@@ -599,6 +1038,8 @@ def update_contact(contact_id: int, first_name: str = None, last_name: str = Non
             """
             
             cursor.execute(update_query, update_values)
+            if email is not None:
+                identity_cache.invalidate([("email", email)], contact_id=contact_id)
             conn.commit()
             
             # Get updated contact
@@ -639,7 +1080,7 @@ def get_contact_details(contact_id: int) -> str:
         JSON with complete contact information
     """
     try:
-        with get_db_connection() as conn:
+        with get_db_connection(readonly=True) as conn:
             # Get contact with company information
             contact_info = safe_execute(conn, """
                 SELECT c.*, comp.name as company_name, comp.industry as company_industry
@@ -658,8 +1099,11 @@ def get_contact_details(contact_id: int) -> str:
                 SELECT platform, sender_display_name, subject_line, 
                        communication_timestamp, direction
                 FROM communications
-                WHERE (sender_contact_id = ? OR recipient_contact_id = ?)
-                  AND deleted_at IS NULL
+                WHERE id IN (
+                    SELECT id FROM communications WHERE sender_contact_id = ? AND deleted_at IS NULL
+                    UNION
+                    SELECT id FROM communications WHERE recipient_contact_id = ? AND deleted_at IS NULL
+                )
                 ORDER BY communication_timestamp DESC
                 LIMIT 5
             """, (contact_id, contact_id))
@@ -693,6 +1137,63 @@ def get_contact_details(contact_id: int) -> str:
     except Exception as e:
         return json.dumps({"success": False, "message": f"Failed to get contact: {str(e)}"})
 
+@mcp.tool()
+def add_contact_identity(contact_id: int, platform: str, platform_identifier: str,
+                         display_name: str = None) -> str:
+    """
+    Link a platform identity (phone number, username, handle) to a contact.
+    
+    Communications from this identity are attributed to the contact. An identity
+    already linked to another contact is moved to this one.
+    
+    Args:
+        contact_id: ID of the contact
+        platform: Platform name (imessage, whatsapp, sms, slack, etc.)
+        platform_identifier: Platform-specific sender ID
+        display_name: Name shown on the platform (optional)
+    
+    Returns:
+        JSON result with the identity ID
+    """
+    try:
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute("SELECT id FROM contacts WHERE id = ? AND deleted_at IS NULL", (contact_id,))
+            if not cursor.fetchone():
+                return json.dumps({"success": False, "message": "Contact not found or deleted"})
+            
+            cursor.execute("""
+                INSERT INTO contact_identities (contact_id, platform, platform_identifier, platform_display_name)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT (platform, platform_identifier) DO UPDATE SET
+                    contact_id = excluded.contact_id,
+                    platform_display_name = COALESCE(excluded.platform_display_name, platform_display_name),
+                    deleted_at = NULL, deleted_by = NULL, deletion_reason = NULL
+            """, (contact_id, platform, platform_identifier, display_name))
+            identity_id = cursor.execute("""
+                SELECT id FROM contact_identities WHERE platform = ? AND platform_identifier = ?
+            """, (platform, platform_identifier)).fetchone()[0]
+            
+            identity_cache.invalidate([(platform, platform_identifier)])
+            conn.commit()
+            
+            result = OperationResult(
+                success=True,
+                message=f"Identity {platform}:{platform_identifier} linked to contact {contact_id}",
+                data={"identity_id": identity_id, "contact_id": contact_id}
+            )
+            
+            return json.dumps(result.dict(), indent=2, default=str)
+            
+    except Exception as e:
+        error_result = OperationResult(
+            success=False,
+            message=f"Failed to add identity: {str(e)}",
+            error_details=str(e)
+        )
+        return json.dumps(error_result.dict(), indent=2)
+
 @mcp.tool()
 def delete_contact(contact_id: int, reason: str, deleted_by: str = "user") -> str:
     """
@@ -733,6 +1234,7 @@ def delete_contact(contact_id: int, reason: str, deleted_by: str = "user") -> st
                 ) VALUES (?, ?, ?, ?, ?)
             """, ('contacts', contact_id, 'soft', deleted_by, reason))
             
+            identity_cache.invalidate(contact_id=contact_id)
             conn.commit()
             
             result = OperationResult(
@@ -813,30 +1315,33 @@ def create_company(name: str, industry: str = None, website: str = None,
         return json.dumps(error_result.dict(), indent=2)
 
 @mcp.tool()
-def search_companies(query: str, limit: int = 20) -> str:
+def search_companies(query: str, limit: int = 20, next_cursor: str = None, fields: List[str] = None) -> str:
     """
     Search companies by name, industry, or notes.
     
     Args:
         query: Search terms (searches name, industry, website, notes)
         limit: Maximum number of results to return (default 20)
+        next_cursor: Cursor from the previous page of the same search (optional)
+        fields: Columns to return, e.g. ["id", "name"] (optional, default all)
     
     Returns:
-        JSON array of matching companies
+        JSON array of matching companies, and a next_cursor if more companies match
     """
     try:
-        with get_db_connection() as conn:
+        with get_db_connection(readonly=True) as conn:
+            after, after_params = COMPANY_NAME_KEYSET.condition(next_cursor)
             search_term = f"%{query}%"
-            results = safe_execute(conn, """
+            results = safe_execute(conn, f"""
                 SELECT *
                 FROM companies
                 WHERE (name LIKE ? OR industry LIKE ? OR website LIKE ? OR notes LIKE ?)
-                  AND deleted_at IS NULL
-                ORDER BY name
+                  AND deleted_at IS NULL AND {after}
+                ORDER BY {COMPANY_NAME_KEYSET.order_by()}
                 LIMIT ?
-            """, (search_term, search_term, search_term, search_term, limit))
+            """, (search_term, search_term, search_term, search_term, *after_params, limit + 1))
             
-            return format_results_for_llm(results, f"Company search results for: '{query}'")
+            return format_results_for_llm(results, f"Company search results for: '{query}'", fields, COMPANY_NAME_KEYSET, limit)
             
     except Exception as e:
         return f"Company search failed: {str(e)}"
@@ -940,7 +1445,7 @@ def get_company_details(company_id: int) -> str:
         JSON with complete company information including contacts
     """
     try:
-        with get_db_connection() as conn:
+        with get_db_connection(readonly=True) as conn:
             # Get company info
             company_info = safe_execute(conn, """
                 SELECT * FROM companies WHERE id = ? AND deleted_at IS NULL
@@ -1003,7 +1508,7 @@ def get_company_contacts(company_id: int) -> str:
         JSON array of contacts at the company
     """
     try:
-        with get_db_connection() as conn:
+        with get_db_connection(readonly=True) as conn:
             results = safe_execute(conn, """
                 SELECT c.*, comp.name as company_name
                 FROM contacts c
@@ -1102,7 +1607,8 @@ def create_transaction(account_id: int, amount: float, description: str,
 
 @mcp.tool()
 def search_transactions(query: str = None, account_id: int = None, company_id: int = None,
-                       category: str = None, days_back: int = 30, limit: int = 20) -> str:
+                       category: str = None, days_back: int = 30, limit: int = 20,
+                       next_cursor: str = None, fields: List[str] = None) -> str:
     """
     Search financial transactions with various filters.
     
@@ -1113,12 +1619,15 @@ def search_transactions(query: str = None, account_id: int = None, company_id: i
         category: Filter by transaction category (optional)
         days_back: How many days back to search (default 30)
         limit: Maximum number of results (default 20)
+        next_cursor: Cursor from the previous page of the same search (optional)
+        fields: Columns to return, e.g. ["id", "name"] (optional, default all)
     
     Returns:
-        JSON array of matching transactions
+        JSON array of matching transactions, newest first, and a next_cursor if
+        more transactions match
     """
     try:
-        with get_db_connection() as conn:
+        with get_db_connection(readonly=True) as conn:
             # Build WHERE conditions
             conditions = ["t.deleted_at IS NULL"]
             params = []
@@ -1145,7 +1654,12 @@ def search_transactions(query: str = None, account_id: int = None, company_id: i
                 cutoff_date = date.today() - timedelta(days=days_back)
                 params.append(cutoff_date)
             
-            params.append(limit)
+            if next_cursor:
+                after, after_params = TRANSACTION_KEYSET.condition(next_cursor)
+                conditions.append(after)
+                params.extend(after_params)
+            
+            params.append(limit + 1)
             
             where_clause = " AND ".join(conditions)
             
@@ -1155,7 +1669,7 @@ def search_transactions(query: str = None, account_id: int = None, company_id: i
                 JOIN accounts a ON t.account_id = a.id AND a.deleted_at IS NULL
                 LEFT JOIN companies c ON t.company_id = c.id AND c.deleted_at IS NULL
                 WHERE {where_clause}
-                ORDER BY t.transaction_date DESC, t.created_at DESC
+                ORDER BY {TRANSACTION_KEYSET.order_by()}
                 LIMIT ?
             """, tuple(params))
             
@@ -1163,7 +1677,7 @@ def search_transactions(query: str = None, account_id: int = None, company_id: i
             if query:
                 description += f" for: '{query}'"
             
-            return format_results_for_llm(results, description)
+            return format_results_for_llm(results, description, fields, TRANSACTION_KEYSET, limit)
             
     except Exception as e:
         return f"Transaction search failed: {str(e)}"
@@ -1221,7 +1735,8 @@ def create_account(name: str, account_type: str, account_number: str = None,
         return json.dumps(error_result.dict(), indent=2)
 
 @mcp.tool()
-def search_accounts(query: str = None, account_type: str = None, active_only: bool = True) -> str:
+def search_accounts(query: str = None, account_type: str = None, active_only: bool = True,
+                    fields: List[str] = None) -> str:
     """
     Search financial accounts.
     
@@ -1229,12 +1744,13 @@ def search_accounts(query: str = None, account_type: str = None, active_only: bo
         query: Search term for account name or bank name (optional)
         account_type: Filter by account type (optional)
         active_only: Only return active accounts (default True)
+        fields: Columns to return, e.g. ["id", "name"] (optional, default all)
     
     Returns:
         JSON array of matching accounts
     """
     try:
-        with get_db_connection() as conn:
+        with get_db_connection(readonly=True) as conn:
             conditions = ["deleted_at IS NULL"]
             params = []
             
@@ -1258,7 +1774,7 @@ def search_accounts(query: str = None, account_type: str = None, active_only: bo
                 ORDER BY name
             """, tuple(params))
             
-            return format_results_for_llm(results, f"Account search results")
+            return format_results_for_llm(results, f"Account search results", fields)
             
     except Exception as e:
         return f"Account search failed: {str(e)}"
@@ -1418,7 +1934,7 @@ def complete_task(task_id: int) -> str:
 @mcp.tool()
 def search_tasks(query: str = None, contact_id: int = None, company_id: int = None,
                 priority: str = None, completed: bool = None, overdue_only: bool = False,
-                limit: int = 20) -> str:
+                limit: int = 20, next_cursor: str = None, fields: List[str] = None) -> str:
     """
     Search tasks with various filters.
     
@@ -1430,12 +1946,15 @@ def search_tasks(query: str = None, contact_id: int = None, company_id: int = No
         completed: Filter by completion status (optional)
         overdue_only: Only show overdue tasks (optional)
         limit: Maximum number of results (default 20)
+        next_cursor: Cursor from the previous page of the same search (optional)
+        fields: Columns to return, e.g. ["id", "name"] (optional, default all)
     
     Returns:
-        JSON array of matching tasks
+        JSON array of matching tasks, earliest due first, and a next_cursor if
+        more tasks match
     """
     try:
-        with get_db_connection() as conn:
+        with get_db_connection(readonly=True) as conn:
             conditions = ["t.deleted_at IS NULL"]
             params = []
             
@@ -1464,7 +1983,12 @@ def search_tasks(query: str = None, contact_id: int = None, company_id: int = No
                 conditions.append("t.due_date < ? AND t.completed = 0")
                 params.append(date.today())
             
-            params.append(limit)
+            if next_cursor:
+                after, after_params = TASK_KEYSET.condition(next_cursor)
+                conditions.append(after)
+                params.extend(after_params)
+            
+            params.append(limit + 1)
             
             where_clause = " AND ".join(conditions)
             
@@ -1476,7 +2000,7 @@ def search_tasks(query: str = None, contact_id: int = None, company_id: int = No
                 LEFT JOIN contacts c ON t.contact_id = c.id AND c.deleted_at IS NULL
                 LEFT JOIN companies comp ON t.company_id = comp.id AND comp.deleted_at IS NULL
                 WHERE {where_clause}
-                ORDER BY t.due_date ASC, t.priority DESC, t.created_at DESC
+                ORDER BY {TASK_KEYSET.order_by()}
                 LIMIT ?
             """, tuple(params))
             
@@ -1484,7 +2008,7 @@ def search_tasks(query: str = None, contact_id: int = None, company_id: int = No
             if query:
                 description += f" for: '{query}'"
             
-            return format_results_for_llm(results, description)
+            return format_results_for_llm(results, description, fields, TASK_KEYSET, limit)
             
     except Exception as e:
         return f"Task search failed: {str(e)}"
@@ -1550,34 +2074,10 @@ def get_contact_resource(contact_id: str) -> str:
 
 @mcp.resource("dashboard://summary")
 def get_dashboard_summary() -> str:
-    """Get CRM dashboard summary with key metrics"""
+    """Get CRM dashboard summary with key metrics (counts from the trigger-maintained rollups)"""
     try:
-        with get_db_connection() as conn:
-            # Get counts
-            contact_count = safe_execute(conn, "SELECT COUNT(*) as count FROM contacts WHERE status = 'active' AND deleted_at IS NULL")[0][0]
-            company_count = safe_execute(conn, "SELECT COUNT(*) as count FROM companies WHERE deleted_at IS NULL")[0][0]
-            
-            # Communication metrics
-            comm_metrics = safe_execute(conn, """
-                SELECT 
-                    COUNT(*) as total,
-                    SUM(CASE WHEN processing_status = 'needs_processing' THEN 1 ELSE 0 END) as unprocessed,
-                    SUM(CASE WHEN urgency_level = 'urgent' THEN 1 ELSE 0 END) as urgent,
-                    SUM(CASE WHEN requires_follow_up = 1 THEN 1 ELSE 0 END) as needs_followup
-                FROM communications 
-                WHERE communication_timestamp >= date('now', '-30 days')
-                  AND deleted_at IS NULL
-            """)[0]
-            
-            # Task metrics
-            task_metrics = safe_execute(conn, """
-                SELECT 
-                    COUNT(*) as total,
-                    SUM(CASE WHEN completed = 0 THEN 1 ELSE 0 END) as pending,
-                    SUM(CASE WHEN completed = 0 AND due_date <= date('now') THEN 1 ELSE 0 END) as overdue
-                FROM tasks
-                WHERE deleted_at IS NULL
-            """)[0]
+        with get_db_connection(readonly=True) as conn:
+            counts = dashboard_counts(conn)
             
             # Recent activity
             recent_activity = safe_execute(conn, """
@@ -1594,10 +2094,10 @@ def get_dashboard_summary() -> str:
             
             dashboard_data = {
                 "metrics": {
-                    "active_contacts": contact_count,
-                    "total_companies": company_count,
-                    "communications_30_days": dict(comm_metrics),
-                    "task_summary": dict(task_metrics)
+                    "active_contacts": counts["active_contacts"],
+                    "total_companies": counts["companies"],
+                    "communications_30_days": counts["communications_30_days"],
+                    "task_summary": counts["task_summary"]
                 },
                 "recent_activity": [dict(row) for row in recent_activity]
             }
@@ -1607,11 +2107,16 @@ def get_dashboard_summary() -> str:
     except Exception as e:
         return f"Failed to generate dashboard: {str(e)}"
 
+@mcp.resource("metrics://identity_cache")
+def get_identity_cache_metrics() -> str:
+    """Get sender identity cache size and hit-rate metrics"""
+    return json.dumps(identity_cache.stats(), indent=2)
+
 @mcp.resource("reports://upcoming_tasks")
 def get_upcoming_tasks() -> str:
     """Get tasks due in the next 7 days"""
     try:
-        with get_db_connection() as conn:
+        with get_db_connection(readonly=True) as conn:
             upcoming_tasks = safe_execute(conn, """
                 SELECT 
                     t.*,
@@ -1686,7 +2191,7 @@ def create_communication_with_workflow(platform: str, sender_identifier: str, co
                 comm_id = result_data["data"]["communication_id"]
                 
                 # Get the full communication record for workflow trigger
-                with get_db_connection() as conn:
+                with get_db_connection(readonly=True) as conn:
                     comm_record = safe_execute(conn, """
                         SELECT * FROM communications WHERE id = ?
                     """, (comm_id,))
@@ -1803,7 +2308,7 @@ def get_communication_with_workflow_data(communication_id: int) -> str:
         JSON with complete communication information including AI analysis
     """
     try:
-        with get_db_connection() as conn:
+        with get_db_connection(readonly=True) as conn:
             # Get communication with all related data
             comm_record = safe_execute(conn, """
                 SELECT 
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Test bulk communication ingestion
+"""
+
+import sys
+import json
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from database import CRMDatabase
+from fixtures import sample_database, server_database
+
+def test_create_communications_bulk():
+    """Records are inserted in one batch with resolved senders, aligned ids and per-record errors"""
+    print("🧪 Testing bulk communication ingestion")
+
+    import server
+
+    with server_database():
+        with server.get_db_connection() as conn:
+            conn.execute("""
+                INSERT INTO contact_identities (contact_id, platform, platform_identifier)
+                VALUES (2, 'whatsapp', '+15550201')
+            """)
+
+        records = [
+            {"platform": "email", "sender_identifier": "john.smith@acme.com", "content": "Quarterly numbers",
+             "subject": "Q3", "timestamp": "2024-07-01T09:30:00Z", "platform_message_id": "msg-1"},
+            {"platform": "whatsapp", "sender_identifier": "+15550201", "content": "Running late",
+             "sender_name": "Sarah"},
+            {"platform": "email", "sender_identifier": "nobody@example.com"},
+            {"platform": "sms", "sender_identifier": "+15550000", "content": "Hi", "direction": "sideways"},
+            {"platform": "sms", "sender_identifier": "+15550000", "content": "Hi", "timestamp": "yesterday"},
+            {"platform": "email", "sender_identifier": "stranger@example.com", "content": "Cold outreach",
+             "direction": "incoming"},
+            {"platform": "email", "sender_identifier": "bad@example.com", "content": {"x": 1}},
+            {"platform": "sms", "sender_identifier": "+15550000", "content": "Hi", "subject": 7,
+             "platform_message_id": ["m-2"]},
+        ]
+        result = json.loads(server.create_communications_bulk(records))
+        assert result["success"] and result["inserted"] == 3
+        assert result["updated"] == 0 and result["skipped"] == 0
+        assert [error["index"] for error in result["errors"]] == [2, 3, 4, 6, 7]
+        assert "content" in result["errors"][0]["error"]
+        assert result["errors"][3]["error"].endswith("content must be a string")
+        assert "subject, platform_message_id must be a string" in result["errors"][4]["error"]
+        ids = result["ids"]
+        assert ids[2] is None and ids[3] is None and ids[4] is None and ids[6] is None and ids[7] is None
+
+        conn = server.get_db_connection(readonly=True)
+        rows = {row["id"]: row for row in conn.execute("SELECT * FROM communications WHERE id IN (?, ?, ?)",
+                                                       (ids[0], ids[1], ids[5]))}
+        assert rows[ids[0]]["sender_contact_id"] == 1 and rows[ids[0]]["platform_message_id"] == "msg-1"
+        assert rows[ids[0]]["communication_timestamp"].startswith("2024-07-01 09:30:00")
+        assert rows[ids[1]]["sender_contact_id"] == 2 and rows[ids[1]]["message_content_text"] == "Running late"
+        assert rows[ids[5]]["sender_contact_id"] is None and rows[ids[5]]["direction"] == "incoming"
+
+        # Bulk rows are searchable like single inserts
+        assert "Cold outreach" in server.search_communications("outreach")
+
+        # A large batch goes through in one transaction
+        batch = [{"platform": "email", "sender_identifier": f"sender{i % 300}@example.com",
+                  "content": f"Imported message {i}"} for i in range(20000)]
+        start = time.perf_counter()
+        result = json.loads(server.create_communications_bulk(batch))
+        elapsed = time.perf_counter() - start
+        assert result["inserted"] == 20000 and not result["errors"]
+        assert result["ids"] == list(range(result["ids"][0], result["ids"][0] + 20000))
+        assert conn.execute("SELECT message_content_text FROM communications WHERE id = ?",
+                            (result["ids"][-1],)).fetchone()[0] == "Imported message 19999"
+        assert "Imported message 19999" in server.search_communications("19999")
+        with server.get_db_connection() as conn:
+            conn.execute("INSERT INTO communications_fts(communications_fts) VALUES ('integrity-check')")
+            assert not conn.execute("SELECT * FROM fts_deferred_sync").fetchall()
+
+    print(f"✅ Bulk ingestion works ({20000 / elapsed:,.0f} rows/s)")
+
+def test_idempotent_ingestion():
+    """Re-running an import updates changed messages and skips the rest"""
+    print("🧪 Testing idempotent ingestion")
+
+    import server
+
+    with server_database():
+        records = [
+            {"platform": "email", "sender_identifier": "a@example.com", "content": "Draft agenda",
+             "timestamp": "2024-03-01T10:00:00", "platform_message_id": "<1@example.com>"},
+            {"platform": "sms", "sender_identifier": "+15550100", "content": "On my way",
+             "timestamp": "2024-03-01T10:05:00"},
+            {"platform": "sms", "sender_identifier": "+15550100", "content": "On my way",
+             "timestamp": "2024-03-01 10:05:00"},
+        ]
+        first = server.ingest_communications(records)
+        # The third record repeats the second (same sender, timestamp and body)
+        assert (first["inserted"], first["updated"], first["skipped"]) == (2, 0, 1)
+        assert first["ids"][1] != first["ids"][0] and first["ids"][2] is not None
+
+        again = server.ingest_communications(records)
+        assert (again["inserted"], again["updated"], again["skipped"]) == (0, 0, 3)
+        assert again["ids"] == first["ids"]
+
+        # An edited message with a known platform ID is updated in place and re-indexed
+        edited = [{**records[0], "content": "Final agenda"}]
+        result = server.ingest_communications(edited)
+        assert (result["inserted"], result["updated"], result["skipped"]) == (0, 1, 0)
+        assert result["ids"] == first["ids"][:1]
+        assert "Final agenda" in server.search_communications("final", days_back=36500)
+        assert "Draft agenda" not in server.search_communications("draft", days_back=36500)
+
+        # Soft-deleted messages stay deleted
+        with server.get_db_connection() as conn:
+            conn.execute("UPDATE communications SET deleted_at = CURRENT_TIMESTAMP WHERE id = ?",
+                         (first["ids"][0],))
+        result = server.ingest_communications([{**records[0], "content": "Revived"}])
+        assert (result["inserted"], result["updated"], result["skipped"]) == (0, 0, 1)
+
+        # Single creates with the same timestamp are retries, not new messages
+        created = json.loads(server.create_communication("sms", "+15550100", "Retry me",
+                                                         timestamp="2024-03-02T08:00:00"))
+        retried = json.loads(server.create_communication("sms", "+15550100", "Retry me",
+                                                         timestamp="2024-03-02T08:00:00"))
+        assert retried["success"] and "already recorded" in retried["message"]
+        assert retried["data"]["communication_id"] == created["data"]["communication_id"]
+
+        with server.get_db_connection() as conn:
+            conn.execute("INSERT INTO communications_fts(communications_fts) VALUES ('integrity-check')")
+
+    print("✅ Imports are idempotent")
+
+def test_ingestion_keys_migration():
+    """Existing databases get the content hash, lose their duplicates and gain the unique keys"""
+    print("🧪 Testing ingestion key migration")
+
+    with sample_database() as db_path:
+        db = CRMDatabase(str(db_path))
+        with db:
+            conn = db.conn
+            conn.execute("DROP INDEX idx_communications_platform_message")
+            conn.execute("DROP INDEX idx_communications_content_hash")
+            conn.execute("ALTER TABLE communications DROP COLUMN content_hash")
+            for message_id in ("m-1", "m-1", None, None):
+                conn.execute("""
+                    INSERT INTO communications (platform, platform_message_id, sender_identifier,
+                                                message_content_text, direction, communication_timestamp)
+                    VALUES ('email', ?, 'dup@example.com', 'Same body', 'incoming', '2024-01-01 09:00:00')
+                """, (message_id,))
+            conn.commit()
+
+            assert db.ensure_ingestion_keys()
+            rows = conn.execute("""
+                SELECT id, platform_message_id, content_hash, deleted_at, deletion_context_json
+                FROM communications WHERE sender_identifier = 'dup@example.com' ORDER BY id
+            """).fetchall()
+            kept = [row for row in rows if row["deleted_at"] is None]
+            assert [row["platform_message_id"] for row in kept] == ["m-1", None]
+            assert all(row["content_hash"] for row in kept)
+            removed = [row for row in rows if row["deleted_at"] is not None]
+            assert len(removed) == 2 and json.loads(removed[0]["deletion_context_json"])["platform_message_id"] == "m-1"
+            assert conn.execute("SELECT COUNT(*) FROM deletion_audit WHERE table_name = 'communications'").fetchone()[0] == 2
+            assert not db.ensure_ingestion_keys()
+
+    print("✅ Existing databases migrated")
+
+if __name__ == "__main__":
+    test_create_communications_bulk()
+    test_idempotent_ingestion()
+    test_ingestion_keys_migration()
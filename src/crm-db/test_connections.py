@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Test pooled SQLite connections for the CRM server
+"""
+
+import sys
+import sqlite3
+import threading
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from fixtures import sample_database, server_database
+from connections import ConnectionManager, CACHE_SIZE_KB
+
+def test_connection_manager():
+    """WAL and pragmas are applied, readers are per thread and read-only, the writer is shared"""
+    print("🧪 Testing connection manager")
+
+    with sample_database() as db_path:
+        manager = ConnectionManager(db_path)
+        try:
+            reader = manager.reader()
+            assert reader is manager.reader()
+            assert reader.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+            assert reader.execute("PRAGMA foreign_keys").fetchone()[0] == 1
+            assert reader.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+            assert reader.execute("PRAGMA cache_size").fetchone()[0] == -CACHE_SIZE_KB
+            try:
+                reader.execute("DELETE FROM contacts")
+                assert False, "reader connections must be read-only"
+            except sqlite3.OperationalError:
+                pass
+
+            other = []
+            thread = threading.Thread(target=lambda: other.append(manager.reader()))
+            thread.start()
+            thread.join()
+            assert other[0] is not reader
+
+            # Writes are committed on success and rolled back on error
+            with manager.writer() as conn:
+                conn.execute("INSERT INTO tags (name) VALUES ('pooled')")
+            try:
+                with manager.writer() as conn:
+                    conn.execute("INSERT INTO tags (name) VALUES ('rolled back')")
+                    raise ValueError("abort")
+            except ValueError:
+                pass
+            names = {row["name"] for row in reader.execute("SELECT name FROM tags")}
+            assert "pooled" in names and "rolled back" not in names
+
+            # Foreign keys are enforced
+            try:
+                with manager.writer() as conn:
+                    conn.execute("INSERT INTO tasks (title, contact_id) VALUES ('orphan', 99999)")
+                assert False, "dangling contact_id must be rejected"
+            except sqlite3.IntegrityError:
+                pass
+        finally:
+            manager.close()
+
+    print("✅ Connections tuned and reused")
+
+def test_concurrent_tool_calls():
+    """Tool calls from reader and writer threads succeed against the pooled connections"""
+    print("🧪 Testing concurrent tool calls")
+
+    from benchmark_connections import create_sample_database, run_workload
+
+    with server_database(create_sample_database) as db_path:
+        result = run_workload(db_path, readers=3, writers=2, seconds=0.5)
+
+    assert result["read"]["calls"] > 0 and result["write"]["calls"] > 0
+    assert result["read"]["errors"] == 0 and result["write"]["errors"] == 0
+
+    print(f"✅ {result['read']['calls_per_sec']} reads/s, {result['write']['calls_per_sec']} writes/s without errors")
+
+if __name__ == "__main__":
+    test_connection_manager()
+    test_concurrent_tool_calls()
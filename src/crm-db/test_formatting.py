@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Test compact, projected and size-limited result formatting
+"""
+
+import sys
+import json
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import formatting
+from fixtures import server_database
+from formatting import format_results
+
+def parse(result: str):
+    body = result.split("\n\n", 1)[1].split("\n", 1)[1]
+    body, _, note = body.partition("\n\n")
+    return json.loads(body), note
+
+def test_format_results():
+    """Projection, truncation, compact JSON and the token budget"""
+    print("🧪 Testing result formatting")
+
+    rows = [{"id": i, "name": f"Row {i}", "body": "x" * 1000, "meta": None} for i in range(50)]
+
+    result = format_results(rows[:2], "Rows", fields=["id", "body"], max_field_chars=10, token_budget=0)
+    data, note = parse(result)
+    assert data == [{"id": 0, "body": "xxxxxxxxxx... [990 more chars]"}, {"id": 1, "body": "xxxxxxxxxx... [990 more chars]"}]
+    assert "Results (2 found)" in result and not note
+    assert '{"id":0,' in result
+
+    indented = format_results(rows[:2], "Rows", max_field_chars=0, token_budget=0, compact=False)
+    assert '\n  {\n    "id": 0,' in indented and parse(indented)[0] == rows[:2]
+
+    # Rows past the budget are dropped and counted; at least one row is always shown
+    result = format_results(rows, "Rows", max_field_chars=0, token_budget=1000)
+    data, note = parse(result)
+    assert 1 <= len(data) < 50 and len(result) < 4000 + 200
+    assert f"({len(data)} shown, {50 - len(data)} omitted" in result and "fewer fields" in note
+    assert len(parse(format_results(rows, "Rows", max_field_chars=0, token_budget=1))[0]) == 1
+
+    # Paged searches resume after the last row shown
+    result = format_results(rows, "Rows", max_field_chars=0, token_budget=1000,
+                            cursor_after=lambda row: f"after-{row['id']}")
+    data, note = parse(result)
+    assert note == f"More results available. next_cursor: after-{data[-1]['id']}"
+
+    try:
+        format_results(rows, "Rows", fields=["id", "missing"])
+        assert False, "unknown fields must be rejected"
+    except ValueError as e:
+        assert "missing" in str(e) and "Available fields: id, name, body, meta" in str(e)
+
+    assert format_results([], "Rows").startswith("No results found")
+
+    print("✅ Results projected, truncated and limited")
+
+def test_search_tools_stay_within_budget():
+    """Searches with large rows fit the budget and page through the omitted rows"""
+    print("🧪 Testing search result limits")
+
+    import server
+
+    original_budget = formatting.TOKEN_BUDGET
+    with server_database():
+        try:
+            server.ingest_communications([
+                {"platform": "email", "sender_identifier": f"writer{i}@example.com", "subject": f"Essay {i}",
+                 "content": f"Essay {i}: " + "lorem ipsum dolor sit amet " * 200}
+                for i in range(30)
+            ])
+            formatting.TOKEN_BUDGET = 2000
+
+            seen, cursor, pages = [], None, 0
+            while True:
+                result = server.search_communications("essay", limit=10, next_cursor=cursor)
+                data, note = parse(result)
+                assert len(result) < 2000 * 4 + 1000
+                assert all(len(row["message_content_text"]) < 600 for row in data)
+                seen.extend(row["id"] for row in data)
+                pages += 1
+                if not note:
+                    break
+                cursor = note.rsplit("next_cursor: ", 1)[1]
+            assert len(seen) == len(set(seen)) == 30 and pages > 3
+
+            data, _ = parse(server.search_communications("essay", fields=["id", "subject_line"]))
+            assert len(data) == 20 and set(data[0]) == {"id", "subject_line"}
+            assert "Unknown fields: nope" in server.search_communications("essay", fields=["nope"])
+            data, _ = parse(server.search_accounts(fields=["name"]))
+            assert {row["name"] for row in data} >= {"Chase Checking"}
+        finally:
+            formatting.TOKEN_BUDGET = original_budget
+
+    print(f"✅ Searches fit the budget ({pages} pages of large messages)")
+
+if __name__ == "__main__":
+    test_format_results()
+    test_search_tools_stay_within_budget()
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Test full-text search indexes, triggers and ranked communication search
+"""
+
+import sys
+import json
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from database import CRMDatabase, FTS_TABLES
+from fixtures import sample_database, server_database
+
+def fts_ids(conn, fts_table: str, query: str) -> set:
+    return {row[0] for row in conn.execute(f"SELECT rowid FROM {fts_table} WHERE {fts_table} MATCH ?", (query,))}
+
+def test_triggers_keep_index_in_sync():
+    """Inserts, updates and deletes on the content tables reach the FTS indexes"""
+    print("🧪 Testing FTS triggers")
+
+    with sample_database() as db_path:
+        db = CRMDatabase(str(db_path))
+        with db:
+            conn = db.conn
+            # Sample data inserted after the schema is already indexed
+            assert conn.execute("SELECT count(*) FROM communications_fts").fetchone()[0] > 0
+            assert fts_ids(conn, "contacts_fts", "Sarah")
+
+            comm_id = conn.execute("""
+                INSERT INTO communications (platform, direction, communication_timestamp, sender_identifier,
+                                            subject_line, message_content_text)
+                VALUES ('email', 'incoming', CURRENT_TIMESTAMP, 'ops@example.com', 'Quarterly review', 'Agenda for the zeppelin offsite')
+            """).lastrowid
+            assert fts_ids(conn, "communications_fts", "zeppelin") == {comm_id}
+
+            conn.execute("UPDATE communications SET message_content_text = 'Agenda for the lakeside offsite' WHERE id = ?",
+                         (comm_id,))
+            assert not fts_ids(conn, "communications_fts", "zeppelin")
+            assert fts_ids(conn, "communications_fts", "lakeside") == {comm_id}
+
+            # Updates to columns that are not indexed leave the index alone
+            conn.execute("UPDATE communications SET processing_status = 'archived' WHERE id = ?", (comm_id,))
+            assert fts_ids(conn, "communications_fts", "lakeside") == {comm_id}
+
+            conn.execute("DELETE FROM communications WHERE id = ?", (comm_id,))
+            assert not fts_ids(conn, "communications_fts", "lakeside")
+            conn.execute("INSERT INTO communications_fts(communications_fts) VALUES ('integrity-check')")
+
+    print("✅ FTS indexes follow their content tables")
+
+def test_ensure_fts_indexes_backfills():
+    """A database created before the triggers gets them and a full rebuild, once"""
+    print("🧪 Testing FTS backfill")
+
+    with sample_database() as db_path:
+        db = CRMDatabase(str(db_path))
+        with db:
+            conn = db.conn
+            for fts_table in FTS_TABLES:
+                for suffix in ("ai", "ad", "au"):
+                    conn.execute(f"DROP TRIGGER {fts_table}_{suffix}")
+                conn.execute(f"INSERT INTO {fts_table}({fts_table}) VALUES ('delete-all')")
+            conn.commit()
+            assert not fts_ids(conn, "contacts_fts", "Sarah")
+
+            assert db.ensure_fts_indexes()
+            assert fts_ids(conn, "contacts_fts", "Sarah")
+            assert not db.ensure_fts_indexes()
+
+            db.optimize_fts_indexes()
+            assert fts_ids(conn, "contacts_fts", "Sarah")
+
+    print("✅ Existing databases backfilled")
+
+def test_search_communications():
+    """Communication search is ranked, highlighted, filtered and planned through the FTS index"""
+    print("🧪 Testing ranked communication search")
+
+    import server
+
+    with server_database():
+        server.create_communication("email", "a@example.com", "Invoice INV-2041 attached, thanks.",
+                                    subject="Invoice INV-2041")
+        server.create_communication("email", "b@example.com", "Lunch next week? Also the invoice is late.",
+                                    subject="Lunch")
+        server.create_communication("slack", "c", "invoice reminder for INV-2041")
+
+        result = server.search_communications("INV-2041")
+        rows = json.loads(result.split("\n\n", 1)[1].split("\n", 1)[1])
+        # Subject matches rank first; punctuation in the query is not FTS syntax
+        assert [row["subject_line"] for row in rows] == ["Invoice INV-2041", None]
+        assert "**INV**" in rows[0]["snippet"] and "relevance_score" in rows[0]
+
+        # Prefix terms, platform filter and soft deletes still apply
+        assert "Lunch" in server.search_communications("invoi", platform="email")
+        assert "Lunch" not in server.search_communications("invoi", platform="slack")
+        with server.get_db_connection() as conn:
+            conn.execute("UPDATE communications SET deleted_at = CURRENT_TIMESTAMP WHERE subject_line = 'Lunch'")
+        assert "Lunch" not in server.search_communications("invoice")
+        assert "No results found" in server.search_communications("?!")
+
+        conn = server.get_db_connection(readonly=True)
+        plan = " ".join(row[3] for row in conn.execute("""
+            EXPLAIN QUERY PLAN
+            SELECT c.id FROM communications_fts JOIN communications c ON communications_fts.rowid = c.id
+            WHERE communications_fts MATCH ? AND c.communication_timestamp >= ? AND c.deleted_at IS NULL
+            ORDER BY bm25(communications_fts) LIMIT 20
+        """, ('"invoice"*', "2020-01-01")))
+        assert "VIRTUAL TABLE INDEX" in plan and "SEARCH c USING INTEGER PRIMARY KEY" in plan
+
+        assert "sarah.j@globalservices.com" in server.search_contacts("sarah.j@globalservices")
+
+        # Scheduled merges only run after writes
+        assert server.run_fts_maintenance()
+        assert not server.run_fts_maintenance()
+        server.create_communication("email", "a@example.com", "One more")
+        assert server.run_fts_maintenance()
+
+    print("✅ Communications searched through FTS")
+
+def test_maintenance_merges_in_steps():
+    """Scheduled maintenance merges each index to one segment in short, separate transactions"""
+    print("🧪 Testing incremental FTS merges")
+
+    import server
+
+    def segments(conn) -> int:
+        return conn.execute("SELECT count(DISTINCT segid) FROM communications_fts_idx").fetchone()[0]
+
+    with server_database():
+        # Edits write delete markers into new segments
+        for i in range(20):
+            server.create_communication("email", f"merge{i}@example.com", f"Merge message {i}")
+        with server.get_db_connection() as conn:
+            ids = [row[0] for row in conn.execute("SELECT id FROM communications")]
+        for i, comm_id in enumerate(ids * 2):
+            with server.get_db_connection() as conn:
+                conn.execute("UPDATE communications SET message_content_text = ? WHERE id = ?",
+                             (f"Edited message {i}", comm_id))
+        assert segments(server.get_db_connection(readonly=True)) > 1
+
+        statements = []
+        server.get_connection_manager().set_trace_callback(statements.append)
+        try:
+            assert server.run_fts_maintenance(force=True)
+        finally:
+            server.get_connection_manager().set_trace_callback(None)
+
+        merges = [i for i, sql in enumerate(statements) if "VALUES ('merge'" in sql]
+        assert len(merges) > len(FTS_TABLES)
+        # Every step is its own transaction, so writers only wait for one step
+        for position in merges:
+            assert statements[position - 1].startswith("BEGIN")
+            assert next(sql for sql in statements[position + 1:] if not sql.startswith("--")) == "COMMIT"
+        assert not any("'optimize'" in sql for sql in statements)
+
+        conn = server.get_db_connection(readonly=True)
+        assert segments(conn) == 1
+        assert "Edited message 39" in server.search_communications("edited")
+        assert not server.run_fts_maintenance()
+
+    print(f"✅ Indexes merged in {len(merges)} steps")
+
+if __name__ == "__main__":
+    test_triggers_keep_index_in_sync()
+    test_ensure_fts_indexes_backfills()
+    test_search_communications()
+    test_maintenance_merges_in_steps()
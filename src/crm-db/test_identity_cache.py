@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Test the sender identity cache and its invalidation by contact and identity writes
+"""
+
+import sys
+import json
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from fixtures import server_database
+from identity_cache import IdentityCache
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+def test_identity_cache():
+    """LRU eviction, negative TTL, invalidation and hit-rate metrics"""
+    print("🧪 Testing identity cache")
+
+    clock = FakeClock()
+    cache = IdentityCache(max_size=2, ttl=600, negative_ttl=30, clock=clock)
+    cache.put_many({("email", "a@x.com"): 1, ("sms", "+1"): None})
+
+    found, missing = cache.get_many([("email", "a@x.com"), ("sms", "+1"), ("email", "b@x.com")])
+    assert found == {("email", "a@x.com"): 1, ("sms", "+1"): None}
+    assert missing == [("email", "b@x.com")]
+
+    # Negative entries expire first
+    clock.now = 31
+    found, missing = cache.get_many([("email", "a@x.com"), ("sms", "+1")])
+    assert found == {("email", "a@x.com"): 1} and missing == [("sms", "+1")]
+
+    # Least recently used entries are evicted
+    cache.put_many({("sms", "+2"): 2, ("sms", "+3"): 3})
+    found, _ = cache.get_many([("email", "a@x.com"), ("sms", "+2"), ("sms", "+3")])
+    assert set(found) == {("sms", "+2"), ("sms", "+3")}
+
+    cache.invalidate(contact_id=2)
+    cache.invalidate([("sms", "+3")])
+    assert cache.get_many([("sms", "+2"), ("sms", "+3")])[0] == {}
+
+    stats = cache.stats()
+    assert stats["hits"] == 4 and stats["negative_hits"] == 1 and stats["misses"] == 5
+    assert stats["hit_rate"] == 0.5 and stats["evictions"] == 1 and stats["size"] == 0
+
+    print("✅ Cache entries expire, evict and invalidate")
+
+def test_invalidation_by_writes():
+    """Contact and identity writes through the server invalidate cached senders"""
+    print("🧪 Testing identity cache invalidation")
+
+    import server
+
+    with server_database():
+        def sender_of(result: str) -> int:
+            comm_id = json.loads(result)["data"]["communication_id"]
+            row = server.get_db_connection(readonly=True).execute(
+                "SELECT sender_contact_id FROM communications WHERE id = ?", (comm_id,)).fetchone()
+            return row[0]
+
+        server.get_connection_manager()
+        before = server.identity_cache.stats()
+        assert sender_of(server.create_communication("email", "new@example.com", "Hello")) is None
+        assert sender_of(server.create_communication("email", "new@example.com", "Hello again")) is None
+        stats = server.identity_cache.stats()
+        assert stats["negative_hits"] == before["negative_hits"] + 1
+
+        # A new contact replaces the cached "unknown sender"
+        contact_id = json.loads(server.create_contact("New", "Person", email="new@example.com"))["data"]["contact_id"]
+        assert sender_of(server.create_communication("email", "new@example.com", "Now known")) == contact_id
+
+        # Changing the email moves the match
+        server.update_contact(contact_id, email="renamed@example.com")
+        assert sender_of(server.create_communication("email", "new@example.com", "Old address")) is None
+        assert sender_of(server.create_communication("email", "renamed@example.com", "New address")) == contact_id
+
+        # Identities link other platforms; deleting the contact unlinks everything
+        assert sender_of(server.create_communication("telegram", "@newperson", "Hi")) is None
+        assert json.loads(server.add_contact_identity(contact_id, "telegram", "@newperson"))["success"]
+        assert sender_of(server.create_communication("telegram", "@newperson", "Hi again")) == contact_id
+        server.delete_contact(contact_id, reason="test")
+        assert sender_of(server.create_communication("telegram", "@newperson", "Still there?")) is None
+        assert sender_of(server.create_communication("email", "renamed@example.com", "Hello?")) is None
+
+        # Repeated senders in bulk imports are served from the cache
+        batch = [{"platform": "email", "sender_identifier": "john.smith@acme.com", "content": f"Update {i}"}
+                 for i in range(50)]
+        server.ingest_communications(batch)
+        hits = server.identity_cache.stats()["hits"]
+        result = server.ingest_communications([{**record, "content": record["content"] + "!"} for record in batch])
+        assert server.identity_cache.stats()["hits"] == hits + 1
+        senders = server.get_db_connection(readonly=True).execute(
+            f"SELECT DISTINCT sender_contact_id FROM communications WHERE id IN ({', '.join('?' * 50)})",
+            result["ids"]).fetchall()
+        assert [row[0] for row in senders] == [1]
+
+        metrics = json.loads(server.get_identity_cache_metrics())
+        assert metrics["hit_rate"] > 0 and metrics["invalidations"] > 0
+
+    print("✅ Writes invalidate cached senders")
+
+if __name__ == "__main__":
+    test_identity_cache()
+    test_invalidation_by_writes()
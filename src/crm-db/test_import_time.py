@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Startup profile of the CRM server (python -X importtime)
+The database is opened by the lifespan and the first tool call, not at import
+"""
+
+import os
+import re
+import sys
+import subprocess
+from pathlib import Path
+
+IMPORT_BUDGET_MS = float(os.getenv("CRM_IMPORT_BUDGET_MS", "400"))
+
+LINE_PATTERN = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|\s+(\S+)")
+
+def test_server_import_profile():
+    """Importing server.py opens no database connection, skips requests and stays within budget"""
+    print("🧪 Testing CRM server import profile")
+
+    check = "import server; assert server._connection_manager is None"
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", check],
+                            cwd=Path(__file__).parent, capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr[-2000:]
+
+    timings = {}
+    for line in result.stderr.splitlines():
+        match = LINE_PATTERN.match(line)
+        if match:
+            timings[match.group(3)] = int(match.group(2)) / 1000
+
+    assert "requests" not in timings, "requests imported at startup"
+    framework_ms = timings.get("mcp.server.fastmcp", 0.0)
+    own_ms = timings["server"] - framework_ms
+    print(f"   server: {timings['server']:.0f} ms (MCP framework {framework_ms:.0f} ms, own {own_ms:.0f} ms)")
+    assert own_ms < IMPORT_BUDGET_MS, f"CRM server import took {own_ms:.0f} ms (budget {IMPORT_BUDGET_MS:.0f} ms)"
+
+    print("✅ Database opened on first use")
+
+if __name__ == "__main__":
+    test_server_import_profile()
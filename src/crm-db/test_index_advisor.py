@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Test the live-row index set and the index advisor
+"""
+
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from database import CRMDatabase, OBSOLETE_INDEXES
+
+def index_names(conn) -> set:
+    return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+
+def test_every_tool_is_index_driven():
+    """No tool or resource statement scans a large table"""
+    print("🧪 Testing tool query plans")
+
+    import index_advisor
+
+    report = index_advisor.analyze()
+    assert not report["uncovered"], f"add sample calls for {report['uncovered']}"
+    tools = {statement["tool"] for statement in report["statements"]}
+    assert {"search_tasks", "search_transactions", "get_contact_timeline", "get_dashboard_summary"} <= tools
+    full_scans = [(statement["tool"], finding["detail"]) for statement in report["statements"]
+                  for finding in statement["findings"] if finding["severity"] == "error"]
+    assert not full_scans, full_scans
+
+    plans = {" ".join(statement["sql"].split()): statement["plan"] for statement in report["statements"]}
+    overdue = next(plan for sql, plan in plans.items() if "t.due_date < " in sql and "t.completed = 0" in sql)
+    assert overdue[0].startswith("SEARCH t USING INDEX idx_tasks_live_completed_due")
+    assert not any("TEMP B-TREE" in detail for detail in overdue)
+
+    print(f"✅ {len(report['statements'])} statements planned without full scans")
+
+def test_full_scans_are_flagged():
+    """Unindexed filters and deleted_at-only searches are reported as full scans"""
+    print("🧪 Testing full scan detection")
+
+    from index_advisor import check_plan
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db = CRMDatabase(str(Path(temp_dir) / "crm.db"))
+        with db:
+            db.init_database()
+            conn = db.conn
+            findings = check_plan(conn, "SELECT * FROM communications WHERE urgency_level = 'high'")["findings"]
+            assert [finding["issue"] for finding in findings] == ["full scan"]
+
+            conn.execute("CREATE INDEX idx_tasks_deleted ON tasks(deleted_at)")
+            findings = check_plan(conn, "SELECT * FROM tasks WHERE deleted_at IS NULL AND title = 'x'")["findings"]
+            assert findings and findings[0]["severity"] == "error", findings
+
+            assert not check_plan(conn, "SELECT * FROM accounts WHERE bank_name = 'x'")["findings"]
+
+    print("✅ Full scans flagged")
+
+def test_ensure_indexes_migrates():
+    """Existing databases gain the live-row indexes and lose the ones they replace"""
+    print("🧪 Testing index migration")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        db = CRMDatabase(str(Path(temp_dir) / "crm.db"))
+        with db:
+            db.init_database()
+            conn = db.conn
+            assert not index_names(conn) & set(OBSOLETE_INDEXES)
+
+            conn.execute("DROP INDEX idx_tasks_live_due")
+            conn.execute("CREATE INDEX idx_tasks_deleted ON tasks(deleted_at)")
+            conn.execute("CREATE INDEX idx_communications_source_id ON communications(platform_message_id)")
+            conn.commit()
+
+            changed = db.ensure_indexes()
+            assert changed == ["idx_communications_source_id", "idx_tasks_deleted", "idx_tasks_live_due"]
+            names = index_names(conn)
+            assert "idx_tasks_live_due" in names and not names & set(OBSOLETE_INDEXES)
+            assert db.ensure_indexes() == []
+
+    print("✅ Indexes migrated")
+
+if __name__ == "__main__":
+    test_every_tool_is_index_driven()
+    test_full_scans_are_flagged()
+    test_ensure_indexes_migrates()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Test keyset pagination of the search tools
+"""
+
+import sys
+import json
+import sqlite3
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from fixtures import server_database
+from pagination import Keyset
+
+def parse_page(result: str):
+    """Rows and next_cursor of a search tool result"""
+    if result.startswith("No results found"):
+        return [], None
+    body = result.split("\n\n", 1)[1].split("\n", 1)[1]
+    body, _, cursor = body.partition("\n\nMore results available. next_cursor: ")
+    return json.loads(body), cursor or None
+
+def walk(search, **kwargs):
+    """All rows of a search, page by page"""
+    rows, cursor, pages = [], None, 0
+    while True:
+        page, cursor = parse_page(search(next_cursor=cursor, **kwargs))
+        rows.extend(page)
+        pages += 1
+        if not cursor:
+            return rows, pages
+
+def test_keyset_condition():
+    """NULLs sort first ascending and last descending; foreign and damaged cursors are rejected"""
+    print("🧪 Testing keyset conditions")
+
+    keyset = Keyset("test", [("a", "a", "ASC", True), ("b", "b", "DESC", True), ("id", "id", "ASC", False)])
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, a, b)")
+    values = [None, 1, 2]
+    conn.executemany("INSERT INTO t (a, b) VALUES (?, ?)", [(a, b) for a in values for b in values for _ in range(2)])
+    ordered = [row for row in conn.execute(f"SELECT id, a, b FROM t ORDER BY {keyset.order_by()}")]
+
+    for position, (row_id, a, b) in enumerate(ordered):
+        condition, params = keyset.condition(keyset.encode([a, b, row_id]))
+        after = [row for row in conn.execute(f"SELECT id, a, b FROM t WHERE {condition} ORDER BY {keyset.order_by()}",
+                                             params)]
+        assert after == ordered[position + 1:], (a, b, row_id)
+    assert keyset.condition(None) == ("1", [])
+
+    for cursor in ("not-a-cursor!", Keyset("other", keyset.columns).encode([1, 2, 3]), keyset.encode([1])):
+        try:
+            keyset.condition(cursor)
+            assert False, f"{cursor} must be rejected"
+        except ValueError:
+            pass
+
+    print("✅ Keyset conditions resume after every row")
+
+def test_search_tools_paginate():
+    """Walking every page returns each matching row once, in order"""
+    print("🧪 Testing search tool pagination")
+
+    import server
+
+    with server_database():
+        with server.get_db_connection() as conn:
+            # Duplicate sort keys and NULL due dates exercise the tie-breaks
+            conn.executemany("""
+                INSERT INTO tasks (title, contact_id, due_date, priority, created_at)
+                VALUES (?, 1, ?, ?, '2024-01-01 00:00:00')
+            """, [(f"Paged task {i}", None if i % 7 == 0 else f"2024-02-{1 + i % 5:02d}",
+                   ("low", "high", "normal")[i % 3]) for i in range(53)])
+            conn.executemany("""
+                INSERT INTO transactions (account_id, amount, description, transaction_date, created_at)
+                VALUES (1, ?, ?, date('now', ?), '2024-01-01 00:00:00')
+            """, [(i, f"Paged transaction {i}", f"-{i % 4} days") for i in range(41)])
+            for i in range(25):
+                conn.execute("INSERT INTO contacts (first_name, last_name, email) VALUES (?, 'Pager', ?)",
+                             (f"P{i % 4}", f"pager{i}@example.com"))
+                conn.execute("INSERT INTO companies (name, industry) VALUES (?, 'Paging')", (f"Pager Co {i}",))
+        for i in range(33):
+            server.create_communication("email", f"p{i}@example.com", f"Paging update {i}",
+                                        subject="Paging" if i % 2 else None)
+
+        tasks, pages = walk(server.search_tasks, contact_id=1, limit=10)
+        everything, cursor = parse_page(server.search_tasks(contact_id=1, limit=1000))
+        assert cursor is None and pages == 6
+        assert [task["id"] for task in tasks] == [task["id"] for task in everything]
+        assert len({task["id"] for task in tasks}) == 53
+        assert tasks[0]["due_date"] is None
+
+        transactions, _ = walk(server.search_transactions, query="Paged", limit=7)
+        assert len({row["id"] for row in transactions}) == 41
+        dates = [row["transaction_date"] for row in transactions]
+        assert dates == sorted(dates, reverse=True)
+
+        contacts, _ = walk(server.search_contacts, query="pager", limit=4)
+        assert len({row["id"] for row in contacts}) == 25
+        scores = [row["relevance_score"] for row in contacts]
+        assert scores == sorted(scores)
+
+        companies, _ = walk(server.search_companies, query="Pager Co", limit=6)
+        assert [row["name"] for row in companies] == sorted(f"Pager Co {i}" for i in range(25))
+
+        communications, _ = walk(server.search_communications, query="paging", limit=5)
+        assert len({row["id"] for row in communications}) == 33
+        assert all(row["subject_line"] == "Paging" for row in communications[:16])
+
+        # Cursors only fit the search they came from
+        _, task_cursor = parse_page(server.search_tasks(limit=2))
+        assert "does not belong" in server.search_contacts("pager", next_cursor=task_cursor)
+        assert "Invalid cursor" in server.search_tasks(next_cursor="%%%")
+
+        # The next page starts inside the index instead of skipping rows
+        conn = server.get_db_connection(readonly=True)
+        condition, params = server.TASK_KEYSET.condition(
+            server.TASK_KEYSET.encode(["2024-02-03", "high", "2024-01-01 00:00:00", 10]))
+        plan = [row[3] for row in conn.execute(f"""
+            EXPLAIN QUERY PLAN SELECT t.* FROM tasks t WHERE t.deleted_at IS NULL AND {condition}
+            ORDER BY {server.TASK_KEYSET.order_by()} LIMIT 21
+        """, params)]
+        assert plan[0].startswith("SEARCH t USING INDEX idx_tasks_live_due") and len(plan) == 1, plan
+
+    print("✅ Search tools page through every result once")
+
+if __name__ == "__main__":
+    test_keyset_condition()
+    test_search_tools_paginate()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Test the read-only query engine behind execute_sql_query
+"""
+
+import sys
+import time
+import sqlite3
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from fixtures import sample_database, server_database
+from connections import ConnectionManager
+from query_engine import run_query, explain_query, check_statement
+
+RUNAWAY_QUERY = "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n) SELECT COUNT(*) FROM n"
+
+def test_query_limits():
+    """Writes are refused, runaway queries stop at the time limit and results at the row cap"""
+    print("🧪 Testing query engine limits")
+
+    with sample_database() as db_path:
+        manager = ConnectionManager(db_path)
+        try:
+            conn = manager.query_reader()
+            assert conn is manager.query_reader() and conn is not manager.reader()
+
+            # Column names that contain write keywords are fine
+            result = run_query(conn, """
+                -- recent contacts
+                SELECT id, created_at, updated_at, deleted_at FROM contacts WHERE deleted_at IS NULL
+            """)
+            assert len(result["rows"]) == 3 and not result["truncated"]
+            assert run_query(conn, "WITH c AS (SELECT 1 AS created) SELECT * FROM c")["rows"][0][0] == 1
+            matches = run_query(conn, "SELECT rowid FROM communications_fts WHERE communications_fts MATCH 'project'")
+            assert len(matches["rows"]) == 1
+
+            for sql in ("DELETE FROM contacts",
+                        "WITH doomed AS (SELECT 1) DELETE FROM contacts",
+                        "SELECT 1; DROP TABLE contacts",
+                        "ATTACH DATABASE ':memory:' AS other",
+                        f"VACUUM INTO '{db_path.parent / 'copy.db'}'",
+                        "PRAGMA query_only = OFF",
+                        "SELECT * FROM pragma_table_info('contacts')",
+                        "/* hidden */ UPDATE contacts SET status = 'gone'"):
+                try:
+                    run_query(conn, sql)
+                    assert False, f"{sql} must be refused"
+                except (ValueError, sqlite3.Error):
+                    pass
+            assert not (db_path.parent / "copy.db").exists()
+
+            # mode=ro refuses writes even with query_only switched off
+            conn.execute("PRAGMA query_only = OFF")
+            try:
+                conn.execute("DELETE FROM contacts")
+                assert False, "mode=ro must refuse writes"
+            except sqlite3.OperationalError as e:
+                assert "readonly" in str(e)
+            conn.execute("PRAGMA query_only = ON")
+            assert run_query(conn, "SELECT COUNT(*) FROM contacts")["rows"][0][0] == 3
+
+            start = time.perf_counter()
+            try:
+                run_query(conn, RUNAWAY_QUERY, timeout_ms=200)
+                assert False, "runaway query must time out"
+            except TimeoutError as e:
+                assert "200 ms" in str(e)
+            assert time.perf_counter() - start < 1.5
+            # The limits are lifted afterwards
+            assert run_query(conn, "SELECT 1")["rows"][0][0] == 1
+            assert manager.reader().execute("SELECT COUNT(*) FROM companies").fetchone()[0] == 3
+
+            capped = run_query(conn, "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n) "
+                                     "SELECT i FROM n", max_rows=250)
+            assert [row[0] for row in capped["rows"]] == list(range(1, 251)) and capped["truncated"]
+            exact = run_query(conn, "SELECT id FROM companies", max_rows=3)
+            assert len(exact["rows"]) == 3 and not exact["truncated"]
+
+            plan = explain_query(conn, "SELECT * FROM contacts WHERE email = 'john.smith@acme.com'")
+            assert plan and "contacts" in plan[0]
+            nested = explain_query(conn, "SELECT * FROM contacts WHERE id IN (SELECT contact_id FROM tasks)")
+            assert any(line.startswith("  ") for line in nested)
+            assert check_statement("  /* a */ -- b\n values (1)") == "values (1)"
+        finally:
+            manager.close()
+
+    print("✅ Writes refused, time limit and row cap enforced")
+
+def test_execute_sql_query_tool():
+    """The tool reports limits and errors as text"""
+    print("🧪 Testing execute_sql_query")
+
+    import server
+
+    with server_database():
+        result = server.execute_sql_query("SELECT first_name, created_at FROM contacts ORDER BY created_at")
+        assert result.startswith("Query results for") and "Results (3 found)" in result
+
+        result = server.execute_sql_query("SELECT id FROM contacts", max_rows=2)
+        assert "Stopped after 2 rows" in result
+
+        assert "Only read-only queries are allowed" in server.execute_sql_query(
+            "WITH x AS (SELECT 1) DELETE FROM contacts")
+        assert "SQL query failed: Only SELECT" in server.execute_sql_query("DROP TABLE contacts")
+        assert "time limit" in server.execute_sql_query(RUNAWAY_QUERY)
+
+        plan = server.execute_sql_query("SELECT * FROM tasks WHERE deleted_at IS NULL ORDER BY due_date",
+                                        explain=True)
+        assert plan.startswith("Query plan for") and "idx_tasks_live_due" in plan
+
+        with server.get_db_connection(readonly=True) as conn:
+            assert conn.execute("SELECT COUNT(*) FROM contacts").fetchone()[0] == 3
+
+    print("✅ execute_sql_query runs on the read-only engine")
+
+if __name__ == "__main__":
+    test_query_limits()
+    test_execute_sql_query_tool()
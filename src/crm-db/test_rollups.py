@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Test the trigger-maintained dashboard rollups
+"""
+
+import sys
+import json
+import random
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from database import CRMDatabase, dashboard_counts
+from fixtures import sample_database, server_database
+
+def counted_dashboard(conn):
+    """The dashboard figures counted directly from the tables"""
+    communications = conn.execute("""
+        SELECT COUNT(*),
+               SUM(CASE WHEN processing_status = 'needs_processing' THEN 1 ELSE 0 END),
+               SUM(CASE WHEN urgency_level = 'urgent' THEN 1 ELSE 0 END),
+               SUM(CASE WHEN requires_follow_up = 1 THEN 1 ELSE 0 END)
+        FROM communications
+        WHERE communication_timestamp >= date('now', '-30 days') AND deleted_at IS NULL
+    """).fetchone()
+    tasks = conn.execute("""
+        SELECT COUNT(*),
+               SUM(CASE WHEN completed = 0 THEN 1 ELSE 0 END),
+               SUM(CASE WHEN completed = 0 AND due_date <= date('now') THEN 1 ELSE 0 END)
+        FROM tasks WHERE deleted_at IS NULL
+    """).fetchone()
+    return {
+        "contacts": conn.execute("SELECT COUNT(*) FROM contacts WHERE deleted_at IS NULL").fetchone()[0],
+        "active_contacts": conn.execute(
+            "SELECT COUNT(*) FROM contacts WHERE status = 'active' AND deleted_at IS NULL").fetchone()[0],
+        "companies": conn.execute("SELECT COUNT(*) FROM companies WHERE deleted_at IS NULL").fetchone()[0],
+        "communications": conn.execute("SELECT COUNT(*) FROM communications WHERE deleted_at IS NULL").fetchone()[0],
+        "communications_30_days": dict(zip(["total", "unprocessed", "urgent", "needs_followup"],
+                                           [value or 0 for value in communications])),
+        "task_summary": dict(zip(["total", "pending", "overdue"], [value or 0 for value in tasks])),
+    }
+
+def test_rollups_follow_writes():
+    """Inserts, updates, soft deletes, restores and hard deletes keep the rollups exact"""
+    print("🧪 Testing rollup triggers")
+
+    rng = random.Random(49)
+    with sample_database() as db_path:
+        with CRMDatabase(str(db_path)) as db:
+            conn = db.conn
+            statuses = ["active", "inactive", None]
+            for i in range(300):
+                action = rng.randrange(8)
+                if action == 0:
+                    conn.execute("INSERT INTO contacts (first_name, last_name, status) VALUES ('R', ?, ?)",
+                                 (f"Rollup {i}", rng.choice(statuses)))
+                elif action == 1:
+                    conn.execute("INSERT INTO companies (name) VALUES (?)", (f"Rollup Co {i}",))
+                elif action == 2:
+                    conn.execute("""
+                        INSERT INTO communications (platform, sender_identifier, message_content_text, direction,
+                            communication_timestamp, processing_status, urgency_level, requires_follow_up)
+                        VALUES ('sms', ?, ?, 'inbound', datetime('now', ?), ?, ?, ?)
+                    """, (f"+1555{i}", f"Message {i}", f"-{rng.randrange(60)} days",
+                          rng.choice(["needs_processing", "processed"]), rng.choice(["urgent", "normal", None]),
+                          rng.random() < 0.3))
+                elif action == 3:
+                    conn.execute("INSERT INTO tasks (title, due_date, completed) VALUES (?, date('now', ?), ?)",
+                                 (f"Task {i}", f"{rng.randrange(-20, 20)} days", rng.random() < 0.3))
+                elif action == 4:
+                    conn.execute("INSERT INTO tasks (title) VALUES (?)", (f"Undated task {i}",))
+                elif action == 5:
+                    table = rng.choice(["contacts", "companies", "communications", "tasks"])
+                    conn.execute(f"""
+                        UPDATE {table} SET deleted_at = CASE WHEN deleted_at IS NULL THEN CURRENT_TIMESTAMP END
+                        WHERE id = (SELECT id FROM {table} ORDER BY random() LIMIT 1)
+                    """)
+                elif action == 6:
+                    conn.execute("""
+                        UPDATE tasks SET completed = NOT completed, due_date = date('now', ?)
+                        WHERE id = (SELECT id FROM tasks ORDER BY random() LIMIT 1)
+                    """, (f"{rng.randrange(-5, 5)} days",))
+                    conn.execute("""
+                        UPDATE communications SET urgency_level = 'urgent', processing_status = 'processed',
+                            communication_timestamp = datetime('now', '-45 days')
+                        WHERE id = (SELECT id FROM communications ORDER BY random() LIMIT 1)
+                    """)
+                    conn.execute("UPDATE contacts SET status = ? WHERE id = (SELECT id FROM contacts ORDER BY random() LIMIT 1)",
+                                 (rng.choice(statuses),))
+                else:
+                    table = rng.choice(["communications", "tasks"])
+                    conn.execute(f"DELETE FROM {table} WHERE id = (SELECT id FROM {table} ORDER BY random() LIMIT 1)")
+            conn.commit()
+
+            assert db.check_rollups() == []
+            assert dashboard_counts(conn) == counted_dashboard(conn), json.dumps(
+                [dashboard_counts(conn), counted_dashboard(conn)])
+            assert dashboard_counts(conn)["task_summary"]["overdue"] > 0
+
+            # Writes rolled back leave the rollups untouched
+            conn.execute("INSERT INTO companies (name) VALUES ('Rolled back')")
+            conn.rollback()
+            assert db.check_rollups() == []
+
+    print("✅ Rollups match counts recomputed from the tables")
+
+def test_check_and_rebuild():
+    """The consistency check reports drift, and rebuilding or migrating fills the rollups"""
+    print("🧪 Testing rollup check and rebuild")
+
+    with sample_database() as db_path:
+        with CRMDatabase(str(db_path)) as db:
+            db.conn.execute("UPDATE dashboard_rollups SET count = count + 5 WHERE metric = 'companies'")
+            db.conn.execute("DELETE FROM dashboard_rollups WHERE metric = 'contacts_by_status'")
+            db.conn.commit()
+            differences = db.check_rollups()
+            assert {(d["metric"], d["stored"], d["actual"]) for d in differences} == {
+                ("companies", 8, 3), ("contacts_by_status", 0, 3)}
+            db.rebuild_rollups()
+            assert db.check_rollups() == []
+
+            # A database from before the rollups gets them on startup
+            for table in ("contacts", "companies", "communications", "tasks"):
+                for suffix in ("ai", "ad", "au"):
+                    db.conn.execute(f"DROP TRIGGER {table}_rollups_{suffix}")
+            db.conn.execute("DROP TABLE dashboard_rollups")
+            db.conn.commit()
+            assert db.ensure_rollups() is True
+            assert db.ensure_rollups() is False
+            assert db.check_rollups() == []
+            assert dashboard_counts(db.conn) == counted_dashboard(db.conn)
+
+            # Every dashboard read is a primary key search of the rollup table
+            plan = [row[3] for row in db.conn.execute("""
+                EXPLAIN QUERY PLAN SELECT COALESCE(SUM(count), 0) FROM dashboard_rollups
+                WHERE metric = ? AND bucket >= date('now', '-30 days')
+            """, ("communications_by_day",))]
+            assert plan == ["SEARCH dashboard_rollups USING PRIMARY KEY (metric=? AND bucket>?)"], plan
+
+    print("✅ Drift reported, rollups rebuilt and migrated")
+
+def test_dashboard_resource():
+    """dashboard://summary reads the rollups"""
+    print("🧪 Testing dashboard resource")
+
+    import server
+
+    with server_database():
+        server.create_communication("email", "rollup@example.com", "Please call back today")
+        server.create_task("Call back", due_date="2020-01-01")
+        with server.get_db_connection() as conn:
+            conn.execute("UPDATE companies SET deleted_at = CURRENT_TIMESTAMP WHERE id = 1")
+        metrics = json.loads(server.get_dashboard_summary())["metrics"]
+        assert metrics["total_companies"] == 2
+        assert metrics["task_summary"] == {"total": 1, "pending": 1, "overdue": 1}
+        assert metrics["communications_30_days"]["total"] == 2
+
+        # The resource reports whatever the rollups hold
+        with server.get_db_connection() as conn:
+            conn.execute("UPDATE dashboard_rollups SET count = 42 WHERE metric = 'companies'")
+        assert json.loads(server.get_dashboard_summary())["metrics"]["total_companies"] == 42
+
+    print("✅ Dashboard served from the rollups")
+
+if __name__ == "__main__":
+    test_rollups_follow_writes()
+    test_check_and_rebuild()
+    test_dashboard_resource()
@@ -5,7 +5,6 @@ GitHub integration core functionality
 import os
 import json
 import logging
-import requests
 import base64
 from datetime import datetime
 from typing import Dict, List, Optional
@@ -31,11 +30,19 @@ def get_github_token():
         raise ValueError("GITHUB_TOKEN environment variable not set")
     return token
 
-def get_authenticated_session():
-    """Get or create authenticated session"""
+def get_authenticated_session(verify: bool = False):
+    """
+    Get or create authenticated session
+    
+    The token is not checked against /user when the session is created; a bad token
+    fails the first API call with a 401 instead of costing every session an extra
+    round-trip. Pass verify=True (as authenticate_github does) to check it up front.
+    """
     global github_session, authenticated_user
     
     if github_session is None:
+        import requests
+        
         token = get_github_token()
         github_session = requests.Session()
         github_session.headers.update({
@@ -43,8 +50,8 @@ def get_authenticated_session():
             'Accept': 'application/vnd.github.v3+json',
             'User-Agent': 'GitHub-MCP-Server/1.0'
         })
-        
-        # Verify authentication
+    
+    if verify and authenticated_user is None:
         response = github_session.get(f"{GITHUB_API_BASE}/user")
         if response.status_code != 200:
             raise Exception(f"GitHub authentication failed: {response.status_code}")
@@ -74,7 +81,7 @@ def authenticate_github(token: str) -> Dict:
     authenticated_user = None
     
     try:
-        session = get_authenticated_session()
+        get_authenticated_session(verify=True)
         return {
             "success": True,
             "user": authenticated_user,
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Startup profile of the GitHub server (python -X importtime, no GitHub calls)
+requests is imported and the token used only when the first tool call creates the session,
+and creating the session makes no /user request
+"""
+
+import os
+import re
+import sys
+import subprocess
+import importlib.util
+from pathlib import Path
+from types import SimpleNamespace
+
+IMPORT_BUDGET_MS = float(os.getenv("GITHUB_IMPORT_BUDGET_MS", "400"))
+
+LINE_PATTERN = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|\s+(\S+)")
+
+def load_index():
+    """This server's index.py, loaded by path because other servers also have an index module"""
+    spec = importlib.util.spec_from_file_location("github_index", Path(__file__).parent / "index.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def test_server_import_profile():
+    """Importing server.py creates no session, skips requests and stays within budget"""
+    print("🧪 Testing GitHub server import profile")
+
+    check = "import server, index; assert index.github_session is None"
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", check],
+                            cwd=Path(__file__).parent, capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr[-2000:]
+
+    timings = {}
+    for line in result.stderr.splitlines():
+        match = LINE_PATTERN.match(line)
+        if match:
+            timings[match.group(3)] = int(match.group(2)) / 1000
+
+    assert "requests" not in timings, "requests imported at startup"
+    framework_ms = timings.get("mcp.server.fastmcp", 0.0)
+    own_ms = timings["server"] - framework_ms
+    print(f"   server: {timings['server']:.0f} ms (MCP framework {framework_ms:.0f} ms, own {own_ms:.0f} ms)")
+    assert own_ms < IMPORT_BUDGET_MS, f"GitHub server import took {own_ms:.0f} ms (budget {IMPORT_BUDGET_MS:.0f} ms)"
+
+    print("✅ Session created on first use")
+
+def test_session_skips_user_lookup():
+    """Creating the session sends no request; only verify=True calls /user"""
+    print("🧪 Testing GitHub session creation")
+
+    import requests
+    index = load_index()
+
+    calls = []
+    def fake_request(self, method, url, *args, **kwargs):
+        calls.append((method, url))
+        return SimpleNamespace(status_code=200, json=lambda: {"login": "octocat"})
+
+    original_request, original_token = requests.Session.request, os.environ.get("GITHUB_TOKEN")
+    requests.Session.request = fake_request
+    os.environ["GITHUB_TOKEN"] = "test-token"
+    index.github_session, index.authenticated_user = None, None
+    try:
+        session = index.get_authenticated_session()
+        assert session.headers["Authorization"] == "token test-token"
+        assert index.get_authenticated_session() is session
+        assert calls == []
+
+        index.get_authenticated_session(verify=True)
+        assert calls == [("GET", f"{index.GITHUB_API_BASE}/user")]
+        assert index.authenticated_user == {"login": "octocat"}
+    finally:
+        requests.Session.request = original_request
+        if original_token is None:
+            os.environ.pop("GITHUB_TOKEN", None)
+        else:
+            os.environ["GITHUB_TOKEN"] = original_token
+        index.github_session, index.authenticated_user = None, None
+
+    print("✅ /user requested only when verifying the token")
+
+if __name__ == "__main__":
+    test_server_import_profile()
+    test_session_skips_user_lookup()
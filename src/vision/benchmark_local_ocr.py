@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Per-page benchmark of the local OCR tier on test-documents
+
+For every page: quality-model difficulty, local OCR time and confidence, and whether
+the page would be accepted locally or escalated to Vision. With --vision the page is
+also sent to Vision so the local text can be compared with it and the saved cost
+measured.
+
+Usage:
+    LOCAL_OCR_BACKEND=tesseract python benchmark_local_ocr.py [--documents DIR] [--vision]
+"""
+
+import sys
+import json
+import time
+import argparse
+import difflib
+from pathlib import Path
+from datetime import datetime
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from pdf2image import convert_from_path
+
+from local_ocr import (
+    OCR_BACKENDS, LOCAL_OCR_BACKEND, LOCAL_OCR_MAX_DIFFICULTY, LOCAL_OCR_MIN_CONFIDENCE,
+    MIN_LOCAL_TEXT_CHARS, score_page_difficulty
+)
+
+DEFAULT_DOCUMENTS_DIR = Path(__file__).parent.parent.parent / "test-documents"
+BENCHMARK_DIR = Path(__file__).parent.parent.parent / "output" / "benchmarks"
+
+def benchmark_page(image, page_num: int, backend: str, with_vision: bool) -> dict:
+    """Benchmark one rendered page"""
+    start = time.time()
+    difficulty = score_page_difficulty(image)
+    scoring_time = time.time() - start
+
+    start = time.time()
+    local = OCR_BACKENDS[backend](image)
+    local_time = time.time() - start
+
+    accepted = (difficulty <= LOCAL_OCR_MAX_DIFFICULTY and local["confidence"] >= LOCAL_OCR_MIN_CONFIDENCE
+                and len(local["text"].strip()) >= MIN_LOCAL_TEXT_CHARS)
+    row = {
+        "page": page_num,
+        "difficulty": round(difficulty, 3),
+        "scoring_ms": round(scoring_time * 1000, 1),
+        "local_ms": round(local_time * 1000, 1),
+        "local_confidence": round(local["confidence"], 1),
+        "local_chars": len(local["text"]),
+        "accepted_locally": accepted
+    }
+
+    if with_vision:
+        from index import image_to_base64, extract_text_from_image
+
+        start = time.time()
+        vision = extract_text_from_image(image_to_base64(image), page_num)
+        row["vision_ms"] = round((time.time() - start) * 1000, 1)
+        row["vision_cost"] = vision["cost"].get("total_cost", 0.0)
+        row["text_similarity"] = round(difflib.SequenceMatcher(None, local["text"], vision["text"]).ratio(), 3)
+
+    return row
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the local OCR tier per page")
+    parser.add_argument("--documents", default=str(DEFAULT_DOCUMENTS_DIR), help="Directory of PDFs")
+    parser.add_argument("--backend", default=LOCAL_OCR_BACKEND or "tesseract", help="Local OCR backend")
+    parser.add_argument("--vision", action="store_true", help="Also run Vision to compare text and cost")
+    parser.add_argument("--dpi", type=int, default=200, help="Render resolution (matches extract_pdf_text)")
+    args = parser.parse_args()
+
+    documents = sorted(Path(args.documents).glob("*.pdf"))
+    print(f"📊 Benchmarking local OCR ({args.backend}) on {len(documents)} documents")
+
+    results = []
+    for pdf in documents:
+        try:
+            images = convert_from_path(str(pdf), dpi=args.dpi, fmt='PNG')
+        except Exception as e:
+            print(f"⚠️  {pdf.name}: could not render ({e})")
+            continue
+        for page_num, image in enumerate(images, start=1):
+            row = benchmark_page(image, page_num, args.backend, args.vision)
+            row["document"] = pdf.name
+            results.append(row)
+            status = "local" if row["accepted_locally"] else "vision"
+            print(f"   {pdf.name} p{page_num}: difficulty {row['difficulty']:.2f}, "
+                  f"confidence {row['local_confidence']:.1f}, {row['local_ms']:.0f} ms -> {status}")
+
+    accepted = [r for r in results if r["accepted_locally"]]
+    summary = {
+        "backend": args.backend,
+        "pages": len(results),
+        "accepted_locally": len(accepted),
+        "local_rate": round(len(accepted) / len(results), 3) if results else 0.0,
+        "mean_local_ms": round(sum(r["local_ms"] for r in results) / len(results), 1) if results else 0.0,
+        "thresholds": {"max_difficulty": LOCAL_OCR_MAX_DIFFICULTY, "min_confidence": LOCAL_OCR_MIN_CONFIDENCE}
+    }
+    if args.vision and results:
+        summary["vision_cost_saved"] = round(sum(r["vision_cost"] for r in accepted), 6)
+        summary["mean_similarity_accepted"] = (
+            round(sum(r["text_similarity"] for r in accepted) / len(accepted), 3) if accepted else None
+        )
+
+    BENCHMARK_DIR.mkdir(parents=True, exist_ok=True)
+    output_file = BENCHMARK_DIR / f"local_ocr_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump({"summary": summary, "pages": results}, f, indent=2)
+
+    print(f"✅ {summary['accepted_locally']}/{summary['pages']} pages accepted locally "
+          f"({summary['local_rate']:.0%}), report: {output_file}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+"""
+End-to-end benchmark of extractDocumentData over test-documents
+
+Every supported document in the directory goes through the full tool (vendor
+fingerprint, triage, rasterize, preprocess, OCR, classification, structured
+extraction, validation, save) with the OpenAI client replaced by a backend:
+
+- mock: deterministic synthetic responses, no network. Measures the local pipeline.
+- record: real OpenAI calls, each response saved to a cassette (JSONL) by request hash.
+- replay: responses served from a recorded cassette, so real text and token counts
+  are reproduced without network or cost.
+
+The report has pages/sec, per-stage latency percentiles (from tracing), peak RSS,
+request bytes, tokens and cost. It is compared against a stored baseline, and any
+metric that is worse by more than the threshold fails the run (exit code 1). Without
+a baseline the run exits with 2 until one is written with --update-baseline.
+
+Usage:
+    python benchmark_pipeline.py [--documents DIR] [--backend mock|replay|record] [--cassette FILE]
+                                 [--baseline FILE] [--threshold 0.2] [--update-baseline]
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import resource
+import tempfile
+from abc import ABC, abstractmethod
+from pathlib import Path
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+
+os.environ.setdefault("OPENAI_API_KEY", "benchmark-key")
+sys.path.insert(0, str(Path(__file__).parent))
+
+import index
+import tracing
+from index import calculate_cost, load_invoice_template, load_brokerage_template
+from page_source import is_supported_document
+
+DEFAULT_DOCUMENTS_DIR = Path(__file__).parent.parent.parent / "test-documents"
+BENCHMARK_DIR = Path(__file__).parent.parent.parent / "output" / "benchmarks"
+DEFAULT_BASELINE = Path(__file__).parent / "benchmark_baseline.json"
+DEFAULT_CASSETTE = Path(__file__).parent / "benchmark_cassette.jsonl"
+
+# Fractional change that counts as a regression
+DEFAULT_THRESHOLD = 0.2
+# Stages faster than this (p95) are too noisy to compare between runs
+MIN_STAGE_MS = 10.0
+
+# Exit statuses: a regression or failed document, and no baseline to compare against
+EXIT_REGRESSION = 1
+EXIT_NO_BASELINE = 2
+
+# Summary metrics compared with the baseline, and whether higher is better
+COMPARED_METRICS = {
+    "pages_per_sec": True,
+    "peak_rss_mb": False,
+    "request_bytes": False,
+    "total_tokens": False,
+    "total_cost": False
+}
+
+BROKERAGE_HINTS = ("fidelity", "schwab", "vanguard", "brokerage", "statement")
+
+def request_key(kwargs: Dict) -> str:
+    """Stable hash of a chat completion request"""
+    return hashlib.sha256(json.dumps(kwargs, sort_keys=True).encode("utf-8")).hexdigest()
+
+def build_response(recorded: Dict) -> SimpleNamespace:
+    """Chat completion response object from a recorded (or synthetic) dictionary"""
+    return SimpleNamespace(
+        model=recorded["model"],
+        choices=[SimpleNamespace(message=SimpleNamespace(content=recorded["content"]),
+                                 finish_reason=recorded["finish_reason"])],
+        usage=SimpleNamespace(
+            prompt_tokens=recorded["prompt_tokens"],
+            completion_tokens=recorded["completion_tokens"],
+            total_tokens=recorded["prompt_tokens"] + recorded["completion_tokens"],
+            prompt_tokens_details=SimpleNamespace(cached_tokens=recorded.get("cached_tokens", 0))
+        )
+    )
+
+class BenchmarkBackend(ABC):
+    """Stand-in for client.chat.completions that accounts for every request"""
+
+    def __init__(self):
+        self.document = None
+        self.requests = 0
+        self.request_bytes = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cost = 0.0
+
+    @abstractmethod
+    def respond(self, kwargs: Dict) -> Dict:
+        """Recorded response (model, content, finish_reason, prompt_tokens, completion_tokens) for one request"""
+
+    def create(self, **kwargs):
+        self.requests += 1
+        self.request_bytes += len(json.dumps(kwargs).encode("utf-8"))
+        recorded = self.respond(kwargs)
+        self.prompt_tokens += recorded["prompt_tokens"]
+        self.completion_tokens += recorded["completion_tokens"]
+        cost = calculate_cost(recorded["model"], recorded["prompt_tokens"], recorded["completion_tokens"],
+                              recorded.get("cached_tokens", 0))
+        self.cost += cost.get("total_cost", 0.0)
+        return build_response(recorded)
+
+class MockBackend(BenchmarkBackend):
+    """
+    Deterministic synthetic responses
+
+    Documents whose filename looks like a statement are treated as brokerage
+    statements (last page a disclosure), everything else as an invoice. Structured
+    extraction returns the empty template, so validation has nothing to repair.
+    """
+
+    def persona(self) -> str:
+        name = (self.document or "").lower()
+        return "brokerage" if any(hint in name for hint in BROKERAGE_HINTS) else "invoice"
+
+    def page_text(self) -> str:
+        if self.persona() == "brokerage":
+            header = "Brokerage Account Statement\nPortfolio Value: $50,000.00\nHoldings\n"
+            row = "FIDELITY 500 INDEX FUND  10.000  $150.00  $1,500.00\n"
+        else:
+            header = "INVOICE #10001\nBill To: Example Facility\nPayment Due: $1,500.00\n"
+            row = "Shift coverage  8.00  $45.00  $360.00\n"
+        return header + row * 60
+
+    def respond(self, kwargs: Dict) -> Dict:
+        content = kwargs["messages"][-1]["content"]
+        images = [part for part in content if part["type"] == "image_url"] if isinstance(content, list) else []
+        if images and images[0]["image_url"].get("detail") == "low":
+            pages = [{"page": page, "role": "data"} for page in range(1, len(images) + 1)]
+            if self.persona() == "brokerage" and len(pages) > 1:
+                pages[-1]["role"] = "disclosure"
+            text = json.dumps({"document_type": self.persona(), "pages": pages})
+            prompt_tokens = 85 * len(images) + 200
+        elif images:
+            text = self.page_text()
+            prompt_tokens = 765 * len(images) + 100
+        else:
+            template = load_brokerage_template() if self.persona() == "brokerage" else load_invoice_template()
+            text = json.dumps(template)
+            prompt_tokens = sum(len(m["content"]) for m in kwargs["messages"]) // 4
+        return {
+            "model": kwargs["model"],
+            "content": text,
+            "finish_reason": "stop",
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": len(text) // 4
+        }
+
+class ReplayBackend(BenchmarkBackend):
+    """Serves responses recorded by RecordingBackend"""
+
+    def __init__(self, cassette: Path):
+        super().__init__()
+        self.recordings = {}
+        with open(cassette, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    self.recordings[entry["key"]] = entry["response"]
+
+    def respond(self, kwargs: Dict) -> Dict:
+        key = request_key(kwargs)
+        if key not in self.recordings:
+            raise Exception(f"No recorded response for request {key[:12]} ({self.document}) - re-record the cassette")
+        return self.recordings[key]
+
+class RecordingBackend(BenchmarkBackend):
+    """Calls the real OpenAI API and appends each response to a cassette"""
+
+    def __init__(self, cassette: Path, client):
+        super().__init__()
+        self.cassette = cassette
+        self.client = client
+
+    def respond(self, kwargs: Dict) -> Dict:
+        response = self.client.chat.completions.create(**kwargs)
+        details = getattr(response.usage, "prompt_tokens_details", None)
+        recorded = {
+            "model": response.model,
+            "content": response.choices[0].message.content or "",
+            "finish_reason": response.choices[0].finish_reason,
+            "prompt_tokens": response.usage.prompt_tokens,
+            "completion_tokens": response.usage.completion_tokens,
+            "cached_tokens": getattr(details, "cached_tokens", 0) or 0
+        }
+        with open(self.cassette, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({"key": request_key(kwargs), "document": self.document, "response": recorded}) + "\n")
+        return recorded
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process and its children (pdftoppm) in MB"""
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return round(peak / scale, 1)
+
+def run_benchmark(documents: List[Path], backend: BenchmarkBackend, work_dir: Path) -> Dict:
+    """
+    Run extractDocumentData over documents with the given backend
+
+    Args:
+        documents: Documents to process (all must be in one directory)
+        backend: Completions backend standing in for the OpenAI client
+        work_dir: Output directory for extraction artifacts and traces
+
+    Returns:
+        Benchmark report with summary, per-stage percentiles and per-document rows
+    """
+    import server
+
+    original = (index.client, index.OUTPUT_DIR, server.ALLOWED_DOCUMENTS_DIR)
+    index.client = SimpleNamespace(chat=SimpleNamespace(completions=backend))
+    index.OUTPUT_DIR = work_dir
+    server.ALLOWED_DOCUMENTS_DIR = str(documents[0].parent) if documents else ""
+    tracing.reset_metrics()
+
+    rows = []
+    start_time = time.perf_counter()
+    try:
+        for document in documents:
+            backend.document = document.name
+            requests_before, bytes_before = backend.requests, backend.request_bytes
+            document_start = time.perf_counter()
+            row = {"document": document.name}
+            try:
+                result = server.extractDocumentData(str(document))
+                row.update({
+                    "document_type": result["document_type"],
+                    "total_pages": result["total_pages"],
+                    "pages_extracted": len(result["extracted_text"])
+                })
+            except Exception as e:
+                row["error"] = str(e)
+            row.update({
+                "seconds": round(time.perf_counter() - document_start, 3),
+                "requests": backend.requests - requests_before,
+                "request_bytes": backend.request_bytes - bytes_before
+            })
+            rows.append(row)
+            status = f"{row.get('pages_extracted', 0)} pages" if "error" not in row else f"failed: {row['error']}"
+            print(f"   {document.name}: {status}, {row['seconds']:.2f}s, {row['requests']} requests")
+    finally:
+        index.client, index.OUTPUT_DIR, server.ALLOWED_DOCUMENTS_DIR = original
+    elapsed = time.perf_counter() - start_time
+
+    pages = sum(row.get("pages_extracted", 0) for row in rows)
+    summary = {
+        "documents": len(rows),
+        "failed": sum(1 for row in rows if "error" in row),
+        "pages": pages,
+        "seconds": round(elapsed, 3),
+        "pages_per_sec": round(pages / elapsed, 3) if elapsed else 0.0,
+        "peak_rss_mb": peak_rss_mb(),
+        "requests": backend.requests,
+        "request_bytes": backend.request_bytes,
+        "prompt_tokens": backend.prompt_tokens,
+        "completion_tokens": backend.completion_tokens,
+        "total_tokens": backend.prompt_tokens + backend.completion_tokens,
+        "total_cost": round(backend.cost, 6)
+    }
+    return {"summary": summary, "stages": tracing.stage_percentiles(), "documents": rows}
+
+def compare_to_baseline(report: Dict, baseline: Dict, threshold: float = DEFAULT_THRESHOLD) -> List[Dict]:
+    """
+    Metrics that are worse than the baseline by more than threshold
+
+    Compares the summary metrics in COMPARED_METRICS and the p95 of every stage
+    whose baseline p95 is at least MIN_STAGE_MS.
+
+    Returns:
+        List of regressions with metric, baseline, current and relative change
+    """
+    checks = [(name, report["summary"].get(name), baseline["summary"].get(name), higher_is_better)
+              for name, higher_is_better in COMPARED_METRICS.items()]
+    for stage, metrics in baseline.get("stages", {}).items():
+        if metrics["p95_ms"] >= MIN_STAGE_MS and stage in report["stages"]:
+            checks.append((f"stages.{stage}.p95_ms", report["stages"][stage]["p95_ms"], metrics["p95_ms"], False))
+
+    regressions = []
+    for name, current, reference, higher_is_better in checks:
+        if current is None or not reference:
+            continue
+        change = (current - reference) / reference
+        if (-change if higher_is_better else change) > threshold:
+            regressions.append({"metric": name, "baseline": reference, "current": current,
+                                "change": round(change, 3)})
+    return regressions
+
+def create_backend(name: str, cassette: Path) -> BenchmarkBackend:
+    if name == "mock":
+        return MockBackend()
+    if name == "replay":
+        return ReplayBackend(cassette)
+    if name == "record":
+        cassette.unlink(missing_ok=True)
+        return RecordingBackend(cassette, index.client)
+    raise ValueError(f"Unknown backend: {name}")
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark extractDocumentData end to end")
+    parser.add_argument("--documents", default=str(DEFAULT_DOCUMENTS_DIR), help="Directory of documents")
+    parser.add_argument("--backend", choices=["mock", "replay", "record"], default="mock", help="Completions backend")
+    parser.add_argument("--cassette", default=str(DEFAULT_CASSETTE), help="Recorded responses for replay/record")
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE), help="Baseline report to compare against")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Allowed regression (0.2 = 20%%)")
+    parser.add_argument("--update-baseline", action="store_true", help="Write this run as the new baseline")
+    parser.add_argument("--report-dir", default=str(BENCHMARK_DIR), help="Directory for the benchmark report")
+    args = parser.parse_args(argv)
+
+    documents = sorted(p for p in Path(args.documents).resolve().iterdir() if is_supported_document(str(p)))
+    print(f"📊 Benchmarking extractDocumentData ({args.backend}) on {len(documents)} documents")
+
+    backend = create_backend(args.backend, Path(args.cassette))
+    with tempfile.TemporaryDirectory() as work_dir:
+        report = run_benchmark(documents, backend, Path(work_dir))
+    report["backend"] = args.backend
+    report["created_at"] = datetime.now().isoformat()
+
+    summary = report["summary"]
+    print(f"   {summary['pages']} pages in {summary['seconds']:.2f}s ({summary['pages_per_sec']:.2f} pages/sec), "
+          f"peak RSS {summary['peak_rss_mb']:.0f} MB, {summary['request_bytes'] / 1e6:.1f} MB sent, "
+          f"{summary['total_tokens']} tokens, ${summary['total_cost']:.4f}")
+    for stage, metrics in sorted(report["stages"].items()):
+        print(f"   {stage}: p50 {metrics['p50_ms']:.1f} ms, p95 {metrics['p95_ms']:.1f} ms ({metrics['count']})")
+
+    baseline_file = Path(args.baseline)
+    if args.update_baseline:
+        with open(baseline_file, 'w', encoding='utf-8') as f:
+            json.dump({key: report[key] for key in ("backend", "created_at", "summary", "stages")}, f, indent=2)
+        print(f"📌 Baseline updated: {baseline_file}")
+    elif baseline_file.exists():
+        with open(baseline_file, 'r', encoding='utf-8') as f:
+            report["regressions"] = compare_to_baseline(report, json.load(f), args.threshold)
+    else:
+        print(f"❌ No baseline at {baseline_file} - run with --update-baseline to create one")
+
+    report_dir = Path(args.report_dir)
+    report_dir.mkdir(parents=True, exist_ok=True)
+    report_file = report_dir / f"pipeline_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(report_file, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+
+    regressions = report.get("regressions", [])
+    for regression in regressions:
+        print(f"❌ {regression['metric']}: {regression['baseline']} -> {regression['current']} "
+              f"({regression['change']:+.0%})")
+    if summary["failed"]:
+        print(f"❌ {summary['failed']} documents failed")
+    if regressions or summary["failed"]:
+        return EXIT_REGRESSION
+    if not args.update_baseline and "regressions" not in report:
+        return EXIT_NO_BASELINE
+
+    if "regressions" in report:
+        print(f"✅ No regressions beyond {args.threshold:.0%}, report: {report_file}")
+    else:
+        print(f"✅ Report: {report_file}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
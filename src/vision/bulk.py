@@ -0,0 +1,502 @@
+#!/usr/bin/env python3
+"""
+Offline bulk mode for historical imports
+
+Latency does not matter for overnight backfills, so instead of interactive calls the
+corpus is written to JSONL batch files and run through a batch-job backend at batch
+pricing. Two batches run back to back: page OCR for every document, then structured
+extraction from the joined OCR text. Results are joined back into the normal outputs
+(OCR artifacts, output/invoices or output/brokerage JSON with the validation audit).
+
+Requests are split across several batch files and jobs so no file goes over the
+provider's per-batch request count or file size (BULK_BATCH_MAX_REQUESTS,
+BULK_BATCH_MAX_BYTES); the jobs run side by side and their results are merged.
+
+Backends implement BatchBackend. OpenAIBatchBackend uses the provider's Batch API;
+LocalBatchBackend executes the same JSONL file in-process so the path can be run and
+tested offline.
+
+Usage:
+    python bulk.py --document-type invoice [--backend openai|local] PATH [PATH ...]
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import logging
+import argparse
+from abc import ABC, abstractmethod
+from pathlib import Path
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import index
+from index import (
+    STRUCTURED_SYSTEM_PROMPT,
+    build_ocr_messages,
+    build_invoice_prompt,
+    build_brokerage_prompt,
+    calculate_cost,
+    combine_page_text,
+    image_to_base64,
+    png_to_data_url,
+    save_ocr_json,
+    file_content_hash,
+    save_invoice_json,
+    save_brokerage_json
+)
+from preprocess import PREPROCESS_ENABLED, preprocess_page
+from page_source import SUPPORTED_EXTENSIONS, iter_pages
+from json_continuation import strip_code_fences
+from validation import validate_structured_data
+
+logger = logging.getLogger(__name__)
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+BATCH_COMPLETION_WINDOW = "24h"
+DEFAULT_POLL_INTERVAL = 60
+DEFAULT_TIMEOUT = 26 * 60 * 60
+
+# Per-batch caps (the Batch API accepts up to 50,000 requests and 200 MB per file)
+BATCH_MAX_REQUESTS = int(os.getenv("BULK_BATCH_MAX_REQUESTS", "50000"))
+BATCH_MAX_BYTES = int(os.getenv("BULK_BATCH_MAX_BYTES", str(190 * 1024 * 1024)))
+
+# Terminal batch statuses
+BATCH_DONE_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+BULK_EXTRACTORS = {
+    "invoice": {"build_prompt": build_invoice_prompt, "save": save_invoice_json,
+                "max_tokens": 16000, "metadata_key": "invoice_metadata"},
+    "brokerage": {"build_prompt": build_brokerage_prompt, "save": save_brokerage_json,
+                  "max_tokens": 30000, "metadata_key": "statement_metadata"}
+}
+
+# =============================================================================
+# Batch backends
+# =============================================================================
+
+class BatchBackend(ABC):
+    """Interface for batch-job providers"""
+
+    @abstractmethod
+    def submit(self, requests_file: Path) -> str:
+        """Submit a JSONL request file and return a job id"""
+
+    @abstractmethod
+    def status(self, job_id: str) -> str:
+        """Current job status (validating, in_progress, completed, failed, expired, cancelled)"""
+
+    @abstractmethod
+    def download_results(self, job_id: str, results_file: Path) -> Path:
+        """Write the job's JSONL output to results_file"""
+
+class OpenAIBatchBackend(BatchBackend):
+    """OpenAI Batch API"""
+
+    def submit(self, requests_file: Path) -> str:
+        with open(requests_file, 'rb') as f:
+            uploaded = index.client.files.create(file=f, purpose="batch")
+        job = index.client.batches.create(
+            input_file_id=uploaded.id,
+            endpoint=BATCH_ENDPOINT,
+            completion_window=BATCH_COMPLETION_WINDOW
+        )
+        return job.id
+
+    def status(self, job_id: str) -> str:
+        return index.client.batches.retrieve(job_id).status
+
+    def download_results(self, job_id: str, results_file: Path) -> Path:
+        job = index.client.batches.retrieve(job_id)
+        lines = []
+        for file_id in [job.output_file_id, job.error_file_id]:
+            if file_id:
+                lines.append(index.client.files.content(file_id).text.strip())
+        results_file.write_text("\n".join(line for line in lines if line) + "\n", encoding='utf-8')
+        return results_file
+
+def default_local_handler(body: Dict) -> Dict:
+    """Run one batch request body as a normal chat completion"""
+    return index.client.chat.completions.create(**body).model_dump()
+
+class LocalBatchBackend(BatchBackend):
+    """
+    Local stand-in executor
+
+    Runs every request line of a batch file in a background thread pool and writes
+    output lines in the provider's format. The handler turns a request body into a
+    chat completion dictionary (default: a normal API call).
+    """
+
+    def __init__(self, handler: Optional[Callable[[Dict], Dict]] = None, max_workers: int = 4):
+        self.handler = handler or default_local_handler
+        self.max_workers = max_workers
+        self.jobs = {}
+
+    def _execute_line(self, request: Dict) -> Dict:
+        try:
+            body = self.handler(request["body"])
+            return {"id": f"batch_req_{uuid.uuid4().hex[:12]}", "custom_id": request["custom_id"],
+                    "response": {"status_code": 200, "body": body}, "error": None}
+        except Exception as e:
+            return {"id": f"batch_req_{uuid.uuid4().hex[:12]}", "custom_id": request["custom_id"],
+                    "response": None, "error": {"message": str(e)}}
+
+    def _execute(self, requests_file: Path) -> List[Dict]:
+        with open(requests_file, 'r', encoding='utf-8') as f:
+            requests = [json.loads(line) for line in f if line.strip()]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(executor.map(self._execute_line, requests))
+
+    def submit(self, requests_file: Path) -> str:
+        job_id = f"local_batch_{uuid.uuid4().hex[:12]}"
+        executor = ThreadPoolExecutor(max_workers=1)
+        self.jobs[job_id] = executor.submit(self._execute, requests_file)
+        executor.shutdown(wait=False)
+        return job_id
+
+    def status(self, job_id: str) -> str:
+        job = self.jobs[job_id]
+        if not job.done():
+            return "in_progress"
+        return "failed" if job.exception() else "completed"
+
+    def download_results(self, job_id: str, results_file: Path) -> Path:
+        with open(results_file, 'w', encoding='utf-8') as f:
+            for line in self.jobs[job_id].result():
+                f.write(json.dumps(line) + "\n")
+        return results_file
+
+BATCH_BACKENDS = {
+    "openai": OpenAIBatchBackend,
+    "local": LocalBatchBackend
+}
+
+# =============================================================================
+# Batch files
+# =============================================================================
+
+def write_batch_files(requests: Iterable[Dict], work_dir: Path, name: str, max_requests: int = None,
+                      max_bytes: int = None) -> List[Tuple[Path, List[str]]]:
+    """
+    Write (custom_id, body) requests as batch JSONL files, starting a new file at either cap
+
+    Files are named <name>_requests_001.jsonl, <name>_requests_002.jsonl and so on. A single
+    request larger than max_bytes still gets a file of its own.
+
+    Returns:
+        (requests file, custom_ids in it) for each file written
+    """
+    max_requests = max_requests or BATCH_MAX_REQUESTS
+    max_bytes = max_bytes or BATCH_MAX_BYTES
+
+    shards = []
+    f = None
+    size = 0
+    try:
+        for request in requests:
+            line = (json.dumps({
+                "custom_id": request["custom_id"],
+                "method": "POST",
+                "url": BATCH_ENDPOINT,
+                "body": request["body"]
+            }) + "\n").encode('utf-8')
+            if f is None or len(shards[-1][1]) >= max_requests or size + len(line) > max_bytes:
+                if f:
+                    f.close()
+                requests_file = work_dir / f"{name}_requests_{len(shards) + 1:03d}.jsonl"
+                f = open(requests_file, 'wb')
+                shards.append((requests_file, []))
+                size = 0
+            f.write(line)
+            size += len(line)
+            shards[-1][1].append(request["custom_id"])
+    finally:
+        if f:
+            f.close()
+    return shards
+
+def read_batch_results(results_file: Path) -> Dict[str, Dict]:
+    """Batch output lines keyed by custom_id: {"body"} on success or {"error"}"""
+    results = {}
+    with open(results_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            response = row.get("response") or {}
+            if row.get("error") or response.get("status_code", 200) != 200:
+                results[row["custom_id"]] = {"error": row.get("error") or response.get("body")}
+            else:
+                results[row["custom_id"]] = {"body": response["body"]}
+    return results
+
+def run_batch(backend: BatchBackend, requests: Iterable[Dict], work_dir: Path, name: str,
+              poll_interval: float = DEFAULT_POLL_INTERVAL, timeout: float = DEFAULT_TIMEOUT,
+              max_requests: int = None, max_bytes: int = None) -> Dict[str, Dict]:
+    """
+    Write, submit and poll the batch jobs for a set of requests, then merge their results
+
+    Requests of a job that does not complete get an {"error"} result, so one failed
+    job does not discard the others.
+
+    Returns:
+        Results keyed by custom_id
+    """
+    shards = write_batch_files(requests, work_dir, name, max_requests, max_bytes)
+    jobs = []
+    for requests_file, custom_ids in shards:
+        job_id = backend.submit(requests_file)
+        logger.info(f"📤 Submitted {name} batch {job_id} with {len(custom_ids)} requests ({requests_file.name})")
+        jobs.append((job_id, requests_file, custom_ids))
+
+    start_time = time.time()
+    statuses = {job_id: backend.status(job_id) for job_id, _, _ in jobs}
+    while any(status not in BATCH_DONE_STATUSES for status in statuses.values()):
+        if time.time() - start_time > timeout:
+            pending = [job_id for job_id, status in statuses.items() if status not in BATCH_DONE_STATUSES]
+            raise TimeoutError(f"Batches {', '.join(pending)} not finished after {timeout}s")
+        time.sleep(poll_interval)
+        for job_id, status in statuses.items():
+            if status not in BATCH_DONE_STATUSES:
+                statuses[job_id] = backend.status(job_id)
+
+    results = {}
+    for job_id, requests_file, custom_ids in jobs:
+        status = statuses[job_id]
+        logger.info(f"📥 Batch {job_id} finished with status {status}")
+        if status != "completed":
+            results.update({custom_id: {"error": f"Batch {job_id} ended with status {status}"}
+                            for custom_id in custom_ids})
+            continue
+        results_file = requests_file.with_name(requests_file.name.replace("_requests_", "_results_"))
+        results.update(read_batch_results(backend.download_results(job_id, results_file)))
+    return results
+
+# =============================================================================
+# Bulk import
+# =============================================================================
+
+def build_ocr_requests(file_paths: List[str], unreadable: Optional[Dict[int, str]] = None) -> Iterable[Dict]:
+    """
+    Page OCR requests for every document, rendered one document at a time
+
+    A document that cannot be rendered (for example a corrupt PDF) contributes no
+    requests; its error is recorded in unreadable by document index.
+    """
+    for doc_index, file_path in enumerate(file_paths):
+        try:
+            requests = []
+            for page in iter_pages(file_path):
+                if PREPROCESS_ENABLED:
+                    image_urls = [png_to_data_url(png) for png in preprocess_page(page["image"])["tiles_png"]]
+                else:
+                    image_urls = [page["data_url"] or image_to_base64(page["image"])]
+                requests.append({
+                    "custom_id": f"ocr-{doc_index}-p{page['page']}",
+                    "body": {"model": "gpt-4.1-mini", "messages": build_ocr_messages(image_urls), "max_tokens": 10000}
+                })
+        except Exception as e:
+            logger.error(f"❌ Could not read {Path(file_path).name}, skipping it: {e}")
+            if unreadable is not None:
+                unreadable[doc_index] = str(e)
+            continue
+        yield from requests
+
+def _usage_cost(body: Dict) -> Dict:
+    usage = body.get("usage") or {}
+    return calculate_cost(body.get("model", "gpt-4.1-mini"), usage.get("prompt_tokens", 0),
+                          usage.get("completion_tokens", 0), batch=True)
+
+def join_ocr_results(file_paths: List[str], results: Dict[str, Dict],
+                     unreadable: Optional[Dict[int, str]] = None) -> List[Dict]:
+    """Assemble per-document text results in extract_pdf_text format from OCR batch output"""
+    text_results = []
+    for doc_index, file_path in enumerate(file_paths):
+        if unreadable and doc_index in unreadable:
+            continue
+        prefix = f"ocr-{doc_index}-p"
+        page_ids = sorted((key for key in results if key.startswith(prefix)), key=lambda k: int(k[len(prefix):]))
+
+        pages = []
+        costs = {"total_input_tokens": 0, "total_output_tokens": 0, "total_cached_tokens": 0,
+                 "total_cost": 0.0, "pages_processed": 0, "pages_local_ocr": 0, "model_used": None}
+        for custom_id in page_ids:
+            page_num = int(custom_id[len(prefix):])
+            result = results[custom_id]
+            if "error" in result:
+                pages.append({"page": page_num, "text": f"[Error extracting text from page {page_num}: {result['error']}]",
+                              "token_usage": None, "cost": None, "ocr_engine": "vision-batch"})
+                continue
+
+            body = result["body"]
+            usage = body.get("usage") or {}
+            cost = _usage_cost(body)
+            pages.append({
+                "page": page_num,
+                "text": body["choices"][0]["message"]["content"] or "",
+                "token_usage": {"model": body.get("model"), "prompt_tokens": usage.get("prompt_tokens", 0),
+                                "completion_tokens": usage.get("completion_tokens", 0),
+                                "total_tokens": usage.get("total_tokens", 0), "cached_tokens": 0},
+                "cost": cost,
+                "ocr_engine": "vision-batch"
+            })
+            costs["total_input_tokens"] += usage.get("prompt_tokens", 0)
+            costs["total_output_tokens"] += usage.get("completion_tokens", 0)
+            costs["total_cost"] += cost.get("total_cost", 0.0)
+            costs["pages_processed"] += 1
+            costs["model_used"] = body.get("model")
+
+        text_results.append({
+            "filename": Path(file_path).name,
+            "content_hash": file_content_hash(file_path),
+            "total_pages": len(pages),
+            "pages_extracted": [page["page"] for page in pages],
+            "extracted_text": pages,
+            "processing_time": "0s",
+            "total_cost_summary": costs
+        })
+    return text_results
+
+def build_structured_requests(text_results: List[Dict], document_type: str) -> Iterable[Dict]:
+    """Structured extraction requests from joined OCR text"""
+    extractor = BULK_EXTRACTORS[document_type]
+    for doc_index, text_result in enumerate(text_results):
+        if not text_result["extracted_text"]:
+            continue
+        prompt = extractor["build_prompt"](combine_page_text(text_result["extracted_text"]), text_result["filename"])
+        yield {
+            "custom_id": f"structured-{doc_index}",
+            "body": {
+                "model": "gpt-4.1-mini",
+                "messages": [
+                    {"role": "system", "content": STRUCTURED_SYSTEM_PROMPT},
+                    {"role": "user", "content": prompt}
+                ],
+                "max_tokens": extractor["max_tokens"],
+                "temperature": 0
+            }
+        }
+
+def run_bulk_import(file_paths: List[str], document_type: str, backend: Optional[BatchBackend] = None,
+                    work_dir: Optional[Path] = None, poll_interval: float = DEFAULT_POLL_INTERVAL,
+                    timeout: float = DEFAULT_TIMEOUT, max_batch_requests: int = None,
+                    max_batch_bytes: int = None) -> Dict:
+    """
+    Run OCR and structured extraction for a corpus through a batch backend
+
+    Args:
+        file_paths: PDF or image paths to import
+        document_type: invoice or brokerage
+        backend: Batch backend (optional, defaults to OpenAIBatchBackend)
+        work_dir: Where batch files are written (optional, defaults to output/bulk/<run id>)
+        poll_interval: Seconds between status checks
+        timeout: Seconds to wait for each stage's batches
+        max_batch_requests: Requests per batch file (optional, defaults to BATCH_MAX_REQUESTS)
+        max_batch_bytes: Bytes per batch file (optional, defaults to BATCH_MAX_BYTES)
+
+    Returns:
+        Summary with per-document output files, failures and total batch cost
+    """
+    if document_type not in BULK_EXTRACTORS:
+        raise ValueError(f"No structured extractor for document type: {document_type}")
+
+    start_time = time.time()
+    backend = backend or OpenAIBatchBackend()
+    work_dir = work_dir or index.OUTPUT_DIR / "bulk" / datetime.now().strftime("%Y%m%d_%H%M%S")
+    work_dir.mkdir(parents=True, exist_ok=True)
+    extractor = BULK_EXTRACTORS[document_type]
+
+    # Stage 1: page OCR
+    unreadable = {}
+    ocr_results = run_batch(backend, build_ocr_requests(file_paths, unreadable), work_dir, "ocr",
+                            poll_interval, timeout, max_batch_requests, max_batch_bytes)
+    failures = [{"filename": Path(file_paths[doc_index]).name, "ocr_file": None,
+                 "error": f"Could not read document: {error}"} for doc_index, error in unreadable.items()]
+    text_results = join_ocr_results(file_paths, ocr_results, unreadable)
+    ocr_files = [save_ocr_json(text_result, document_type) for text_result in text_results]
+
+    # Stage 2: structured extraction
+    structured_results = run_batch(backend, build_structured_requests(text_results, document_type),
+                                   work_dir, "structured", poll_interval, timeout,
+                                   max_batch_requests, max_batch_bytes)
+
+    documents = []
+    total_cost = sum(t["total_cost_summary"]["total_cost"] for t in text_results)
+    for doc_index, text_result in enumerate(text_results):
+        filename = text_result["filename"]
+        result = structured_results.get(f"structured-{doc_index}")
+        if not result or "error" in result:
+            failures.append({"filename": filename, "ocr_file": ocr_files[doc_index],
+                             "error": str(result["error"]) if result else "No structured extraction result"})
+            continue
+
+        body = result["body"]
+        total_cost += _usage_cost(body).get("total_cost", 0.0)
+        choice = body["choices"][0]
+        try:
+            structured_data = json.loads(strip_code_fences(choice["message"]["content"] or ""))
+        except json.JSONDecodeError as e:
+            reason = "truncated at max_tokens" if choice.get("finish_reason") == "length" else f"invalid JSON: {e}"
+            failures.append({"filename": filename, "ocr_file": ocr_files[doc_index],
+                             "error": f"{reason} - rerun with reprocessDocuments"})
+            continue
+
+        structured_data.setdefault(extractor["metadata_key"], {})["source_file_name"] = filename
+        audit = validate_structured_data(structured_data, document_type)
+        documents.append({
+            "filename": filename,
+            "output_file": extractor["save"](structured_data, filename),
+            "ocr_file": ocr_files[doc_index],
+            "overall_status": audit["overall_status"]
+        })
+
+    summary = {
+        "document_type": document_type,
+        "documents": len(file_paths),
+        "processed": len(documents),
+        "failed": len(failures),
+        "results": documents,
+        "failures": failures,
+        "total_cost": round(total_cost, 6),
+        "work_dir": str(work_dir),
+        "processing_time": f"{round(time.time() - start_time, 2)}s"
+    }
+    with open(work_dir / "summary.json", 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2)
+
+    logger.info(f"✅ Bulk import complete: {summary['processed']} processed, {summary['failed']} failed, "
+                f"${summary['total_cost']} at batch pricing")
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline bulk import through a batch-job backend")
+    parser.add_argument("paths", nargs="+", help="PDF or image files, or directories of them")
+    parser.add_argument("--document-type", required=True, choices=sorted(BULK_EXTRACTORS))
+    parser.add_argument("--backend", default="openai", choices=sorted(BATCH_BACKENDS))
+    parser.add_argument("--poll-interval", type=float, default=DEFAULT_POLL_INTERVAL, help="Seconds between polls")
+    parser.add_argument("--max-batch-requests", type=int, help="Requests per batch file")
+    parser.add_argument("--max-batch-bytes", type=int, help="Bytes per batch file")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    file_paths = []
+    for path in map(Path, args.paths):
+        if path.is_dir():
+            file_paths.extend(str(p) for p in sorted(path.iterdir()) if p.suffix.lower() in SUPPORTED_EXTENSIONS)
+        else:
+            file_paths.append(str(path))
+
+    summary = run_bulk_import(file_paths, args.document_type, BATCH_BACKENDS[args.backend](),
+                              poll_interval=args.poll_interval, max_batch_requests=args.max_batch_requests,
+                              max_batch_bytes=args.max_batch_bytes)
+    print(json.dumps({k: v for k, v in summary.items() if k != "results"}, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -2,20 +2,34 @@
 PDF text extraction using OpenAI Vision API
 """
 
+from __future__ import annotations
+
 import os
 import base64
 import time
 import json
-from typing import Dict, List
+import hashlib
+from datetime import datetime
+from typing import Dict, List, Optional, Union
 from pathlib import Path
 import logging
+import threading
 from dotenv import load_dotenv
 
-from pdf2image import convert_from_path
-from openai import OpenAI
-from PIL import Image
 import io
 
+from lazy_imports import lazy_import
+
+from page_stitching import stitch_page_text
+from json_continuation import CONTINUATION_INSTRUCTION, find_resume_point, join_continuation
+from local_ocr import run_local_ocr_tier
+from preprocess import PREPROCESS_ENABLED, preprocess_pages, summarize_preprocessing, sum_reports
+from page_source import SUPPORTED_EXTENSIONS, is_supported_document, count_pages, iter_pages, chunked
+from tracing import span, traced, current_span, record_stage
+from log_pipeline import debug_artifacts_enabled, write_debug_artifact
+
+Image = lazy_import("PIL.Image")
+
 # Load environment variables from local .env file
 env_path = Path(__file__).parent / '.env'
 load_dotenv(dotenv_path=env_path)
@@ -24,20 +38,39 @@ load_dotenv(dotenv_path=env_path)
 logger = logging.getLogger(__name__)
 
 # Initialize OpenAI client - force use of environment variable from MCP config
-# Debug: Print all environment variables containing "API" to see what's available
-logger.info("Environment variables containing 'API':")
-for key, value in os.environ.items():
-    if 'API' in key.upper():
-        logger.info(f"  {key}: {value[:10]}...{value[-4:] if len(value) > 14 else value}")
-
-# Get the key from environment
 openai_key = os.environ.get('OPENAI_API_KEY')
 if not openai_key:
     raise ValueError("OPENAI_API_KEY environment variable is required")
 
-logger.info(f"Using API key: {openai_key[:20]}...{openai_key[-8:]}")
+class LazyOpenAIClient:
+    """OpenAI client that imports openai and is built on first use"""
+
+    def __init__(self, api_key: str):
+        self._api_key = api_key
+        self._client = None
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    from openai import OpenAI
+                    self._client = OpenAI(api_key=self._api_key)
+        return getattr(self._client, name)
 
-client = OpenAI(api_key=openai_key)
+client = LazyOpenAIClient(openai_key)
+
+# Root directory for all extraction output (structured JSON, cached OCR text)
+OUTPUT_DIR = Path(__file__).parent.parent.parent / "output"
+
+# Bump whenever the structured extraction prompts (or the text fed to them)
+# change so that cached OCR text can be re-run without repeating Vision OCR
+PROMPT_VERSION = "2"
+
+STRUCTURED_SYSTEM_PROMPT = "You are a JSON extraction assistant. You must ONLY return valid, parseable JSON with no additional text, markdown formatting, or code blocks. Your entire response must be valid JSON that can be parsed by json.loads()."
+
+# Follow-up requests allowed when structured extraction output hits max_tokens
+MAX_CONTINUATION_ROUNDS = 3
 
 # Load pricing data
 def load_pricing() -> Dict:
@@ -50,8 +83,9 @@ def load_pricing() -> Dict:
         logger.warning(f"Could not load pricing data: {e}")
         return {"models": {}}
 
-def calculate_cost(model: str, input_tokens: int, output_tokens: int, cached_tokens: int = 0) -> Dict:
-    """Calculate cost for API usage"""
+def calculate_cost(model: str, input_tokens: int, output_tokens: int, cached_tokens: int = 0,
+                   batch: bool = False) -> Dict:
+    """Calculate cost for API usage (batch=True applies the Batch API discount)"""
     pricing = load_pricing()
     
     if model not in pricing["models"]:
@@ -68,6 +102,10 @@ def calculate_cost(model: str, input_tokens: int, output_tokens: int, cached_tok
     if cached_tokens > 0 and model_pricing.get("cached_input"):
         cached_cost = (cached_tokens / 1_000_000) * model_pricing["cached_input"]
     
+    if batch:
+        discount = pricing.get("batch_discount", 1.0)
+        input_cost, output_cost, cached_cost = input_cost * discount, output_cost * discount, cached_cost * discount
+    
     total_cost = input_cost + output_cost + cached_cost
     
     return {
@@ -82,88 +120,141 @@ def calculate_cost(model: str, input_tokens: int, output_tokens: int, cached_tok
         "currency": "USD"
     }
 
-def extract_pdf_text(file_path: str) -> Dict:
+@traced("extract_pdf_text")
+def extract_pdf_text(file_path: str, pages: Optional[List[int]] = None) -> Dict:
     """
-    Extract text from PDF using OpenAI Vision API
+    Extract text from a PDF or image file using OpenAI Vision API
+    
+    PNG, JPEG, HEIC and multi-page TIFF files are read directly. Pages are rendered
+    and processed a chunk at a time (VISION_PAGE_CHUNK_SIZE). When a local OCR backend
+    is configured (LOCAL_OCR_BACKEND), easy pages are OCR'd locally first and only
+    the rest are sent to Vision.
     
     Args:
-        file_path: Path to the PDF file
+        file_path: Path to the PDF or image file
+        pages: 1-based page numbers to extract (optional, defaults to all pages)
         
     Returns:
         Dictionary with extracted text per page
     """
     start_time = time.time()
     
-    # Validate file exists and is PDF
+    # Validate file exists and is a supported type
     if not os.path.exists(file_path):
-        raise FileNotFoundError(f"PDF file not found: {file_path}")
+        raise FileNotFoundError(f"Document file not found: {file_path}")
     
-    if not file_path.lower().endswith('.pdf'):
-        raise ValueError("File must be a PDF")
+    if not is_supported_document(file_path):
+        raise ValueError(f"File must be one of: {', '.join(sorted(SUPPORTED_EXTENSIONS))}")
     
     try:
-        # Convert PDF pages to images
-        logger.info(f"Converting PDF to images: {file_path}")
-        images = convert_from_path(file_path, dpi=200, fmt='PNG')
+        logger.info(f"Reading pages: {file_path}")
+        total_pages = count_pages(file_path)
+        page_numbers = [p for p in sorted(set(pages)) if 1 <= p <= total_pages] if pages else list(range(1, total_pages + 1))
         
         extracted_text = []
-        total_pages = len(images)
         total_cost_data = {
             "total_input_tokens": 0,
             "total_output_tokens": 0,
             "total_cached_tokens": 0,
             "total_cost": 0.0,
             "pages_processed": 0,
+            "pages_local_ocr": 0,
             "model_used": None
         }
+        preprocessing_reports = []
         
-        logger.info(f"Processing {total_pages} pages")
+        logger.info(f"Processing {len(page_numbers)} of {total_pages} pages")
         
-        # Process each page
-        for page_num, image in enumerate(images, 1):
-            logger.info(f"Processing page {page_num}/{total_pages}")
-            
-            # Convert PIL image to base64
-            img_base64 = image_to_base64(image)
+        chunks = chunked(iter_pages(file_path, page_numbers, total_pages=total_pages))
+        while True:
+            with span("rasterize") as rasterize_span:
+                chunk = next(chunks, None)
+                rasterize_span.set_attribute("pages", len(chunk or []))
+            if chunk is None:
+                break
+            chunk_pages = [page["page"] for page in chunk]
+            chunk_images = [page["image"] for page in chunk]
             
-            # Extract text using OpenAI Vision API
-            page_result = extract_text_from_image(img_base64, page_num)
+            # Local OCR tier: confident local results skip Vision entirely
+            with span("local_ocr", pages=len(chunk)):
+                local_results = run_local_ocr_tier(chunk_images, chunk_pages)
             
-            extracted_text.append({
-                "page": page_num,
-                "text": page_result["text"],
-                "token_usage": page_result["token_usage"],
-                "cost": page_result["cost"]
-            })
+            # Deskew, binarize, crop and tile the pages that go to Vision
+            prepared_images = {}
+            if PREPROCESS_ENABLED:
+                vision_pages = [page for page in chunk if page["page"] not in local_results]
+                with span("preprocess", pages=len(vision_pages)):
+                    prepared = preprocess_pages([page["image"] for page in vision_pages])
+                with span("encode", pages=len(vision_pages)):
+                    prepared_images = {
+                        page["page"]: [png_to_data_url(png) for png in result["tiles_png"]]
+                        for page, result in zip(vision_pages, prepared)
+                    }
+                preprocessing_reports.extend(result["report"] for result in prepared)
             
-            # Accumulate totals
-            if page_result["token_usage"]:
-                total_cost_data["total_input_tokens"] += page_result["token_usage"]["prompt_tokens"]
-                total_cost_data["total_output_tokens"] += page_result["token_usage"]["completion_tokens"]
-                total_cost_data["total_cached_tokens"] += page_result["token_usage"].get("cached_tokens", 0)
-                total_cost_data["pages_processed"] += 1
-                total_cost_data["model_used"] = page_result["token_usage"]["model"]
+            # Process each page
+            for page in chunk:
+                page_num = page["page"]
+                if page_num in local_results:
+                    extracted_text.append(local_results[page_num])
+                    total_cost_data["pages_local_ocr"] += 1
+                    continue
+                
+                logger.info(f"Processing page {page_num}/{total_pages}")
+                
+                # Convert PIL image to base64 (already encoded when preprocessed or passed through)
+                img_base64 = prepared_images.get(page_num) or page["data_url"] or image_to_base64(page["image"])
+                
+                # Extract text using OpenAI Vision API
+                page_result = extract_text_from_image(img_base64, page_num)
                 
-            if page_result["cost"] and "total_cost" in page_result["cost"]:
-                total_cost_data["total_cost"] += page_result["cost"]["total_cost"]
+                extracted_text.append({
+                    "page": page_num,
+                    "text": page_result["text"],
+                    "token_usage": page_result["token_usage"],
+                    "cost": page_result["cost"],
+                    "ocr_engine": "vision"
+                })
+                
+                # Accumulate totals
+                if page_result["token_usage"]:
+                    total_cost_data["total_input_tokens"] += page_result["token_usage"]["prompt_tokens"]
+                    total_cost_data["total_output_tokens"] += page_result["token_usage"]["completion_tokens"]
+                    total_cost_data["total_cached_tokens"] += page_result["token_usage"].get("cached_tokens", 0)
+                    total_cost_data["pages_processed"] += 1
+                    total_cost_data["model_used"] = page_result["token_usage"]["model"]
+                    
+                if page_result["cost"] and "total_cost" in page_result["cost"]:
+                    total_cost_data["total_cost"] += page_result["cost"]["total_cost"]
+        
+        preprocessing = None
+        if preprocessing_reports:
+            preprocessing = summarize_preprocessing(preprocessing_reports)
+            bytes_saved = f"{preprocessing['bytes_saved']} bytes and " if preprocessing["bytes_saved"] is not None else ""
+            logger.info(f"🖼️ Preprocessed {preprocessing['pages']} pages: {bytes_saved}"
+                        f"~{preprocessing['tokens_saved']} image tokens saved")
         
         processing_time = round(time.time() - start_time, 2)
         
         result = {
             "filename": Path(file_path).name,
+            "content_hash": file_content_hash(file_path),
             "total_pages": total_pages,
+            "pages_extracted": page_numbers,
             "extracted_text": extracted_text,
             "processing_time": f"{processing_time}s",
-            "total_cost_summary": total_cost_data
+            "total_cost_summary": total_cost_data,
+            "preprocessing": preprocessing
         }
         
         logger.info(f"Text extraction completed in {processing_time}s")
         return result
         
     except Exception as e:
-        logger.error(f"Error processing PDF: {e}")
-        raise Exception(f"Failed to process PDF: {str(e)}")
+        logger.error(f"Error processing document: {e}")
+        raise Exception(f"Failed to process document: {str(e)}")
 
+@traced("encode")
 def image_to_base64(image: Image.Image) -> str:
     """
     Convert PIL Image to base64 string
@@ -176,45 +267,97 @@ def image_to_base64(image: Image.Image) -> str:
     """
     buffer = io.BytesIO()
     image.save(buffer, format='PNG')
-    buffer.seek(0)
-    
-    img_base64 = base64.b64encode(buffer.read()).decode('utf-8')
+    return png_to_data_url(buffer.getvalue())
+
+def png_to_data_url(png: bytes) -> str:
+    """Wrap PNG bytes in a base64 data URL"""
+    img_base64 = base64.b64encode(png).decode('utf-8')
     return f"data:image/png;base64,{img_base64}"
 
-def extract_text_from_image(image_data_url: str, page_num: int) -> Dict:
+def build_ocr_messages(image_urls: List[str]) -> List[Dict]:
+    """
+    Chat messages for OCR of one page
+    
+    Args:
+        image_urls: Image data URLs for the page (several for the tiles of a tall page)
+        
+    Returns:
+        Messages for the chat completions API
+    """
+    prompt = "Extract ALL text from this invoice/document image. Pay special attention to:\n- Header information (invoice number, dates)\n- Billing/customer information (Bill To, Ship To sections)\n- Vendor/company information\n- Line items and charges\n- Totals and payment information\n- Footer terms and conditions\n\nPreserve the exact formatting, spacing, and structure. Include every piece of text visible in the image, even small print or lightly formatted sections."
+    if len(image_urls) > 1:
+        prompt += f"\n\nThe page is split into {len(image_urls)} slightly overlapping tiles, top to bottom. Transcribe them as one continuous page and do not repeat lines that appear in the overlap."
+    
+    return [
+        {
+            "role": "user",
+            "content": [
+                {
+                    "type": "text",
+                    "text": prompt
+                }
+            ] + [
+                {
+                    "type": "image_url",
+                    "image_url": {
+                        "url": url,
+                        "detail": "high"
+                    }
+                }
+                for url in image_urls
+            ]
+        }
+    ]
+
+def timed_chat_completion(**kwargs):
+    """
+    Chat completion that splits the current span's time into model and network time
+    
+    The server's processing time comes from the openai-processing-ms response header;
+    the remainder of the round trip (upload, queueing, download) is recorded as network
+    time under "<stage>.model" and "<stage>.network".
+    """
+    completions = client.chat.completions
+    stage = current_span()
+    if stage is None or not hasattr(completions, "with_raw_response"):
+        return completions.create(**kwargs)
+    
+    start_time = time.perf_counter()
+    raw_response = completions.with_raw_response.create(**kwargs)
+    elapsed_ms = (time.perf_counter() - start_time) * 1000
+    response = raw_response.parse()
+    
+    processing_ms = raw_response.headers.get("openai-processing-ms")
+    if processing_ms:
+        model_ms = min(float(processing_ms), elapsed_ms)
+        stage.set_attribute("openai.processing_ms", model_ms)
+        record_stage(f"{stage.name}.model", model_ms)
+        record_stage(f"{stage.name}.network", elapsed_ms - model_ms)
+    return response
+
+def extract_text_from_image(image_data_url: Union[str, List[str]], page_num: int) -> Dict:
     """
     Extract text from image using OpenAI Vision API
     
     Args:
-        image_data_url: Base64 encoded image data URL
+        image_data_url: Base64 encoded image data URL, or a list of URLs for the
+            overlapping tiles of one tall page (top to bottom)
         page_num: Page number for logging
         
     Returns:
         Dictionary with extracted text, token usage, and cost information
     """
     try:
-        response = client.chat.completions.create(
-            model="gpt-4.1-mini",
-            messages=[
-                {
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": "Extract ALL text from this invoice/document image. Pay special attention to:\n- Header information (invoice number, dates)\n- Billing/customer information (Bill To, Ship To sections)\n- Vendor/company information\n- Line items and charges\n- Totals and payment information\n- Footer terms and conditions\n\nPreserve the exact formatting, spacing, and structure. Include every piece of text visible in the image, even small print or lightly formatted sections."
-                        },
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": image_data_url,
-                                "detail": "high"
-                            }
-                        }
-                    ]
-                }
-            ],
-            max_tokens=10000
-        )
+        image_urls = image_data_url if isinstance(image_data_url, list) else [image_data_url]
+        
+        with span("vision_request", page=page_num, images=len(image_urls)) as request_span:
+            response = timed_chat_completion(
+                model="gpt-4.1-mini",
+                messages=build_ocr_messages(image_urls),
+                max_tokens=10000
+            )
+            request_span.set_attribute("prompt_tokens", response.usage.prompt_tokens)
+            request_span.set_attribute("completion_tokens", response.usage.completion_tokens)
         
         extracted_text = response.choices[0].message.content or ""
         
@@ -240,9 +383,9 @@ def extract_text_from_image(image_data_url: str, page_num: int) -> Dict:
             cached_tokens=token_usage["cached_tokens"]
         )
         
-        logger.info(f"Page {page_num}: Extracted {len(extracted_text)} characters")
-        logger.info(f"Page {page_num}: Token usage - Input: {usage.prompt_tokens}, Output: {usage.completion_tokens}, Total: {usage.total_tokens}")
-        logger.info(f"Page {page_num}: Cost - ${cost_info.get('total_cost', 'N/A')}")
+        logger.info("Page %s: Extracted %s characters, tokens in/out %s/%s, cost $%s", page_num, len(extracted_text),
+                    usage.prompt_tokens, usage.completion_tokens, cost_info.get('total_cost', 'N/A'),
+                    extra={"category": "page_detail"})
         
         return {
             "text": extracted_text,
@@ -258,6 +401,74 @@ def extract_text_from_image(image_data_url: str, page_num: int) -> Dict:
             "cost": None
         }
 
+def create_json_completion(model: str, messages: List[Dict], max_tokens: int,
+                           max_rounds: int = MAX_CONTINUATION_ROUNDS) -> Dict:
+    """
+    Request a JSON completion, continuing it when the output is cut off at max_tokens
+    
+    A truncated response is cut back to the end of its last complete element and a
+    follow-up asks the model to resume from that element's JSON path. The pieces are
+    stitched into one document.
+    
+    Args:
+        model: OpenAI model name
+        messages: Chat messages for the extraction request
+        max_tokens: Output token limit per request
+        max_rounds: Maximum number of continuation requests
+        
+    Returns:
+        Dictionary with content, finish_reason, model, token usage summed over all
+        requests and the number of continuation rounds used
+    """
+    with span("structured_request", model=model, round=0):
+        response = timed_chat_completion(
+            model=model,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=0
+        )
+    content = response.choices[0].message.content or ""
+    finish_reason = response.choices[0].finish_reason
+    prompt_tokens = response.usage.prompt_tokens
+    completion_tokens = response.usage.completion_tokens
+    
+    rounds = 0
+    while finish_reason == "length" and rounds < max_rounds:
+        cut, path = find_resume_point(content)
+        if path is None or path == "$":
+            break
+        
+        rounds += 1
+        content = content[:cut]
+        logger.warning(f"Response truncated at max_tokens - continuation {rounds}/{max_rounds} from {path}")
+        
+        with span("structured_request", model=model, round=rounds):
+            response = timed_chat_completion(
+                model=model,
+                messages=messages + [
+                    {"role": "assistant", "content": content},
+                    {"role": "user", "content": CONTINUATION_INSTRUCTION.format(path=path)}
+                ],
+                max_tokens=max_tokens,
+                temperature=0
+            )
+        content = join_continuation(content, response.choices[0].message.content or "")
+        finish_reason = response.choices[0].finish_reason
+        prompt_tokens += response.usage.prompt_tokens
+        completion_tokens += response.usage.completion_tokens
+    
+    if finish_reason == "length":
+        logger.warning("Response still truncated after continuation - falling back to JSON repair")
+    
+    return {
+        "content": content,
+        "finish_reason": finish_reason,
+        "model": response.model,
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "continuation_rounds": rounds
+    }
+
 def load_invoice_template() -> Dict:
     """Load the invoice template JSON"""
     template_file = Path(__file__).parent / "invoice_template.json"
@@ -268,30 +479,22 @@ def load_invoice_template() -> Dict:
         logger.error(f"Could not load invoice template: {e}")
         raise Exception(f"Failed to load invoice template: {str(e)}")
 
-def extract_structured_invoice_data(extracted_text: str, filename: str) -> Dict:
-    """
-    Extract structured invoice data using OpenAI to parse the text into the template format
+def build_invoice_prompt(extracted_text: str, filename: str, template: Optional[Dict] = None,
+                         prompt_hints: Optional[str] = None) -> str:
+    """Build the structured invoice extraction prompt"""
+    # Load the template
+    if template is None:
+        template = load_invoice_template()
     
-    Args:
-        extracted_text: The raw extracted text from the PDF
-        filename: Name of the source file
+    # Check if the text is too long and needs to be summarized
+    text_length = len(extracted_text)
+    if text_length > 15000:  # For very long documents like utility bills
+        logger.info(f"Text length {text_length} is very long, using simplified extraction approach")
         
-    Returns:
-        Dictionary with structured invoice data
-    """
-    try:
-        # Load the template
-        template = load_invoice_template()
+        # Extract key information from first 8000 characters to stay within token limits
+        summary_text = extracted_text[:8000] + "\n\n[Document continues with additional pages of details, terms, and conditions]"
         
-        # Check if the text is too long and needs to be summarized
-        text_length = len(extracted_text)
-        if text_length > 15000:  # For very long documents like utility bills
-            logger.info(f"Text length {text_length} is very long, using simplified extraction approach")
-            
-            # Extract key information from first 8000 characters to stay within token limits
-            summary_text = extracted_text[:8000] + "\n\n[Document continues with additional pages of details, terms, and conditions]"
-            
-            prompt = f"""
+        prompt = f"""
 Parse this utility bill/invoice text and extract ONLY the key billing information into JSON format.
 
 CRITICAL REQUIREMENTS:
@@ -338,8 +541,8 @@ Bill text to parse:
 {summary_text}
 
 Return ONLY the JSON structure above."""
-        else:
-            prompt = f"""
+    else:
+        prompt = f"""
 Parse the following invoice text and extract information into the exact JSON structure provided.
 
 CRITICAL REQUIREMENTS:
@@ -356,155 +559,176 @@ Invoice text to parse:
 {extracted_text}
 
 Remember: Return ONLY the filled JSON structure with no additional formatting or text."""
+    
+    if prompt_hints:
+        prompt += f"\n\nLayout guidance for this vendor:\n{prompt_hints}"
+    return prompt
+
+@traced("structured_extraction")
+def extract_structured_invoice_data(extracted_text: str, filename: str, template: Optional[Dict] = None,
+                                      model: str = "gpt-4.1-mini", prompt_hints: Optional[str] = None) -> Dict:
+    """
+    Extract structured invoice data using OpenAI to parse the text into the template format
+    
+    Args:
+        extracted_text: The raw extracted text from the PDF
+        filename: Name of the source file
+        template: Invoice template to fill (optional, defaults to invoice_template.json)
+        model: OpenAI model used for the extraction (default gpt-4.1-mini)
+        prompt_hints: Extra layout guidance appended to the prompt, e.g. from a vendor profile (optional)
         
-        logger.info("Extracting structured invoice data...")
+    Returns:
+        Dictionary with structured invoice data
+    """
+    try:
+        prompt = build_invoice_prompt(extracted_text, filename, template, prompt_hints)
         
-        response = client.chat.completions.create(
-            model="gpt-4.1-mini",
+        logger.info(f"Extracting structured invoice data with {model}...")
+        
+        completion = create_json_completion(
+            model=model,
             messages=[
                 {
                     "role": "system",
-                    "content": "You are a JSON extraction assistant. You must ONLY return valid, parseable JSON with no additional text, markdown formatting, or code blocks. Your entire response must be valid JSON that can be parsed by json.loads()."
+                    "content": STRUCTURED_SYSTEM_PROMPT
                 },
                 {
                     "role": "user", 
                     "content": prompt
                 }
             ],
-            max_tokens=16000,
-            temperature=0
+            max_tokens=16000
         )
         
         # Parse the response as JSON with enhanced error handling
-        response_content = response.choices[0].message.content
+        response_content = completion["content"]
         logger.info(f"Raw AI response length: {len(response_content)} characters")
-        logger.info(f"Finish reason: {response.choices[0].finish_reason}")
-        
-        # Check if response was truncated
-        if response.choices[0].finish_reason == "length":
-            logger.warning("Response was truncated due to max_tokens limit!")
-        
-        # DEBUG: Save raw response for inspection
-        try:
-            debug_file = Path(__file__).parent.parent.parent / "output" / f"debug_ai_response_{filename}.txt"
-            debug_file.parent.mkdir(parents=True, exist_ok=True)
-            with open(debug_file, 'w', encoding='utf-8') as f:
-                f.write(f"=== AI Response for {filename} ===\n")
-                f.write(f"Length: {len(response_content)} characters\n")
-                f.write(f"Finish reason: {response.choices[0].finish_reason}\n")
-                f.write(f"=== Response Content ===\n")
-                f.write(response_content)
-                f.write(f"\n=== End Response ===\n")
-            logger.info(f"DEBUG: Saved raw AI response to {debug_file}")
-        except Exception as debug_error:
-            logger.error(f"Failed to save debug file: {debug_error}")
-            
-        # Also log first 500 chars of response
-        logger.info(f"Response preview: {response_content[:500]}...")
-        logger.info(f"Response ends with: {response_content[-100:] if len(response_content) > 100 else response_content}")
-        
-        try:
-            structured_data = json.loads(response_content)
-        except json.JSONDecodeError as e:
-            logger.error(f"JSON parsing failed at position {e.pos}: {e.msg}")
-            logger.error(f"Problematic JSON around error: {response_content[max(0, e.pos-100):e.pos+100]}")
+        logger.info(f"Finish reason: {completion['finish_reason']} ({completion['continuation_rounds']} continuation rounds)")
+        
+        # DEBUG: Save raw response for inspection (VISION_DEBUG_ARTIFACTS=1, written in the background)
+        if debug_artifacts_enabled():
+            write_debug_artifact(
+                OUTPUT_DIR / f"debug_ai_response_{filename}.txt",
+                f"=== AI Response for {filename} ===\nLength: {len(response_content)} characters\n"
+                f"Finish reason: {completion['finish_reason']}\n=== Response Content ===\n"
+                f"{response_content}\n=== End Response ===\n"
+            )
+        
+        # Sampled preview of the response
+        logger.info("Response preview: %.500s...", response_content, extra={"category": "response_preview"})
+        
+        with span("json_parse") as parse_span:
+            try:
+                structured_data = json.loads(response_content)
+            except json.JSONDecodeError as e:
+                parse_span.set_attribute("repair", True)
+                logger.error(f"JSON parsing failed at position {e.pos}: {e.msg}")
+                logger.error(f"Problematic JSON around error: {response_content[max(0, e.pos-100):e.pos+100]}")
             
-            # Enhanced JSON repair logic (same as brokerage)
-            import re
-            fixed_content = response_content.strip()
+                # Enhanced JSON repair logic (same as brokerage)
+                import re
+                fixed_content = response_content.strip()
             
-            # Remove any non-JSON prefix/suffix
-            if '```json' in fixed_content:
-                start = fixed_content.find('```json') + 7
-                end = fixed_content.rfind('```')
-                if end > start:
-                    fixed_content = fixed_content[start:end].strip()
-                    logger.info("Removed ```json``` code block wrapper")
-            elif '```' in fixed_content:
-                start = fixed_content.find('```') + 3
-                end = fixed_content.rfind('```')
-                if end > start:
-                    fixed_content = fixed_content[start:end].strip()
-                    logger.info("Removed ``` code block wrapper")
+                # Remove any non-JSON prefix/suffix
+                if '```json' in fixed_content:
+                    start = fixed_content.find('```json') + 7
+                    end = fixed_content.rfind('```')
+                    if end > start:
+                        fixed_content = fixed_content[start:end].strip()
+                        logger.info("Removed ```json``` code block wrapper")
+                elif '```' in fixed_content:
+                    start = fixed_content.find('```') + 3
+                    end = fixed_content.rfind('```')
+                    if end > start:
+                        fixed_content = fixed_content[start:end].strip()
+                        logger.info("Removed ``` code block wrapper")
             
-            # Ensure proper start
-            if not fixed_content.startswith('{'):
-                start_idx = fixed_content.find('{')
-                if start_idx > 0:
-                    fixed_content = fixed_content[start_idx:]
+                # Ensure proper start
+                if not fixed_content.startswith('{'):
+                    start_idx = fixed_content.find('{')
+                    if start_idx > 0:
+                        fixed_content = fixed_content[start_idx:]
             
-            # Fix formatting issues
-            fixed_content = re.sub(r',(\s*[}\]])', r'\1', fixed_content)
+                # Fix formatting issues
+                fixed_content = re.sub(r',(\s*[}\]])', r'\1', fixed_content)
             
-            # Fix common JSON string formatting issues
-            # 1. Fix double quotes that got turned into escaped quotes incorrectly
-            fixed_content = re.sub(r'""([^"]*)\\"', r'"\1"', fixed_content)
+                # Fix common JSON string formatting issues
+                # 1. Fix double quotes that got turned into escaped quotes incorrectly
+                fixed_content = re.sub(r'""([^"]*)\\"', r'"\1"', fixed_content)
             
-            # 2. Fix malformed escape sequences like \"
-            fixed_content = re.sub(r'\\(")', r'\1', fixed_content)
+                # 2. Fix malformed escape sequences like \"
+                fixed_content = re.sub(r'\\(")', r'\1', fixed_content)
             
-            # 3. Remove any stray backslashes before quotes in values
-            fixed_content = re.sub(r'(:\s*"[^"]*)\\"([^"]*")', r'\1"\2', fixed_content)
+                # 3. Remove any stray backslashes before quotes in values
+                fixed_content = re.sub(r'(:\s*"[^"]*)\\"([^"]*")', r'\1"\2', fixed_content)
             
-            # 4. Fix missing commas - common issue when AI generates complex JSON
-            # Look for patterns like: "field": value\n    "next_field" (missing comma)
-            fixed_content = re.sub(r'([^,\s])\s*\n\s*"', r'\1,\n    "', fixed_content)
+                # 4. Fix missing commas - common issue when AI generates complex JSON
+                # Look for patterns like: "field": value\n    "next_field" (missing comma)
+                fixed_content = re.sub(r'([^,\s])\s*\n\s*"', r'\1,\n    "', fixed_content)
             
-            # 5. Fix mathematical expressions that break JSON (remove them or wrap in strings)
-            # Pattern: "field": 8.15 * 65.00 (should be a number or string)
-            def fix_math_expressions(match):
-                key, expr = match.groups()
-                # If it contains math operators, convert to string
-                if any(op in expr for op in ['*', '/', '+', '-', '(', ')']):
-                    return f'{key}"{expr}"'
-                return match.group(0)
+                # 5. Fix mathematical expressions that break JSON (remove them or wrap in strings)
+                # Pattern: "field": 8.15 * 65.00 (should be a number or string)
+                def fix_math_expressions(match):
+                    key, expr = match.groups()
+                    # If it contains math operators, convert to string
+                    if any(op in expr for op in ['*', '/', '+', '-', '(', ')']):
+                        return f'{key}"{expr}"'
+                    return match.group(0)
             
-            fixed_content = re.sub(r'(:\s*)([0-9\.\*\+\-\(\)\s/]+)(?=\s*[,}\]])', fix_math_expressions, fixed_content)
+                fixed_content = re.sub(r'(:\s*)([0-9\.\*\+\-\(\)\s/]+)(?=\s*[,}\]])', fix_math_expressions, fixed_content)
             
-            # Handle truncation
-            if not fixed_content.endswith('}'):
-                open_braces = fixed_content.count('{')
-                close_braces = fixed_content.count('}')
-                open_brackets = fixed_content.count('[')
-                close_brackets = fixed_content.count(']')
+                # Handle truncation
+                if not fixed_content.endswith('}'):
+                    open_braces = fixed_content.count('{')
+                    close_braces = fixed_content.count('}')
+                    open_brackets = fixed_content.count('[')
+                    close_brackets = fixed_content.count(']')
                 
-                fixed_content = re.sub(r',\s*"[^"]*":\s*[^,}\]]*$', '', fixed_content)
-                fixed_content = re.sub(r',\s*"[^"]*":\s*$', '', fixed_content)
+                    fixed_content = re.sub(r',\s*"[^"]*":\s*[^,}\]]*$', '', fixed_content)
+                    fixed_content = re.sub(r',\s*"[^"]*":\s*$', '', fixed_content)
                 
-                if open_brackets > close_brackets:
-                    fixed_content += ']' * (open_brackets - close_brackets)
-                if open_braces > close_braces:
-                    fixed_content += '}' * (open_braces - close_braces)
+                    if open_brackets > close_brackets:
+                        fixed_content += ']' * (open_brackets - close_brackets)
+                    if open_braces > close_braces:
+                        fixed_content += '}' * (open_braces - close_braces)
             
-            logger.info(f"Attempting to parse fixed content (first 200 chars): {fixed_content[:200]}")
-            try:
-                structured_data = json.loads(fixed_content)
-                logger.info("✅ Successfully repaired and parsed JSON")
-            except json.JSONDecodeError as e2:
-                logger.error(f"Invoice JSON repair attempt failed: {e2}")
-                logger.error(f"Failed content snippet around error: {fixed_content[max(0, e2.pos-100):e2.pos+100]}")
+                logger.info(f"Attempting to parse fixed content (first 200 chars): {fixed_content[:200]}")
+                try:
+                    structured_data = json.loads(fixed_content)
+                    logger.info("✅ Successfully repaired and parsed JSON")
+                except json.JSONDecodeError as e2:
+                    logger.error(f"Invoice JSON repair attempt failed: {e2}")
+                    logger.error(f"Failed content snippet around error: {fixed_content[max(0, e2.pos-100):e2.pos+100]}")
                 
-                # Try chunk extraction for invoices too
-                start_idx = fixed_content.find('{')
-                if start_idx >= 0:
-                    for chunk_size in [len(fixed_content), len(fixed_content)//2, len(fixed_content)//4]:
-                        try:
-                            chunk = fixed_content[start_idx:start_idx + chunk_size]
-                            chunk = re.sub(r',\s*$', '', chunk.rstrip())
+                    # Try chunk extraction for invoices too
+                    start_idx = fixed_content.find('{')
+                    if start_idx >= 0:
+                        for chunk_size in [len(fixed_content), len(fixed_content)//2, len(fixed_content)//4]:
+                            try:
+                                chunk = fixed_content[start_idx:start_idx + chunk_size]
+                                chunk = re.sub(r',\s*$', '', chunk.rstrip())
                             
-                            open_braces = chunk.count('{')
-                            close_braces = chunk.count('}')
-                            open_brackets = chunk.count('[')
-                            close_brackets = chunk.count(']')
+                                open_braces = chunk.count('{')
+                                close_braces = chunk.count('}')
+                                open_brackets = chunk.count('[')
+                                close_brackets = chunk.count(']')
                             
-                            chunk += ']' * max(0, open_brackets - close_brackets)
-                            chunk += '}' * max(0, open_braces - close_braces)
+                                chunk += ']' * max(0, open_brackets - close_brackets)
+                                chunk += '}' * max(0, open_braces - close_braces)
                             
-                            structured_data = json.loads(chunk)
-                            logger.warning(f"✅ Extracted partial invoice JSON with {len(chunk)} characters")
-                            break
-                        except:
-                            continue
+                                structured_data = json.loads(chunk)
+                                logger.warning(f"✅ Extracted partial invoice JSON with {len(chunk)} characters")
+                                break
+                            except:
+                                continue
+                        else:
+                            logger.error("All JSON repair attempts failed - creating minimal response")
+                            structured_data = {
+                                "invoice_metadata": {
+                                    "source_file_name": filename,
+                                    "extraction_error": "Failed to parse AI response as valid JSON"
+                                }
+                            }
                     else:
                         logger.error("All JSON repair attempts failed - creating minimal response")
                         structured_data = {
@@ -513,27 +737,18 @@ Remember: Return ONLY the filled JSON structure with no additional formatting or
                                 "extraction_error": "Failed to parse AI response as valid JSON"
                             }
                         }
-                else:
-                    logger.error("All JSON repair attempts failed - creating minimal response")
-                    structured_data = {
-                        "invoice_metadata": {
-                            "source_file_name": filename,
-                            "extraction_error": "Failed to parse AI response as valid JSON"
-                        }
-                    }
         
         # Add source file name
-        structured_data["invoice_metadata"]["source_file_name"] = filename
+        structured_data.setdefault("invoice_metadata", {})["source_file_name"] = filename
         
         # Calculate cost for this operation
-        usage = response.usage
         cost_info = calculate_cost(
-            model=response.model,
-            input_tokens=usage.prompt_tokens,
-            output_tokens=usage.completion_tokens
+            model=completion["model"],
+            input_tokens=completion["prompt_tokens"],
+            output_tokens=completion["completion_tokens"]
         )
         
-        logger.info(f"Structured extraction - Token usage: Input: {usage.prompt_tokens}, Output: {usage.completion_tokens}")
+        logger.info(f"Structured extraction - Token usage: Input: {completion['prompt_tokens']}, Output: {completion['completion_tokens']}")
         logger.info(f"Structured extraction cost: ${cost_info.get('total_cost', 'N/A')}")
         
         return {
@@ -557,6 +772,7 @@ Remember: Return ONLY the filled JSON structure with no additional formatting or
         logger.error(f"Error extracting structured invoice data: {e}")
         raise Exception(f"Failed to extract structured invoice data: {str(e)}")
 
+@traced("save_json")
 def save_invoice_json(structured_data: Dict, filename: str) -> str:
     """
     Save structured invoice data to JSON file
@@ -571,7 +787,7 @@ def save_invoice_json(structured_data: Dict, filename: str) -> str:
     try:
         # Create output filename
         base_name = Path(filename).stem
-        output_dir = Path(__file__).parent.parent.parent / "output" / "invoices"
+        output_dir = OUTPUT_DIR / "invoices"
         output_file = output_dir / f"{base_name}_structured.json"
         
         # Ensure output directory exists
@@ -598,23 +814,15 @@ def load_brokerage_template() -> Dict:
         logger.error(f"Could not load brokerage template: {e}")
         raise Exception(f"Failed to load brokerage template: {str(e)}")
 
-def extract_structured_brokerage_data(extracted_text: str, filename: str) -> Dict:
-    """
-    Extract structured brokerage statement data using OpenAI to parse the text into the template format
-    
-    Args:
-        extracted_text: The raw extracted text from the PDF
-        filename: Name of the source file
-        
-    Returns:
-        Dictionary with structured brokerage data
-    """
-    try:
-        # Load the template
+def build_brokerage_prompt(extracted_text: str, filename: str, template: Optional[Dict] = None,
+                           prompt_hints: Optional[str] = None) -> str:
+    """Build the structured brokerage extraction prompt"""
+    # Load the template
+    if template is None:
         template = load_brokerage_template()
-        
-        # Create prompt for structured extraction
-        prompt = f"""
+    
+    # Create prompt for structured extraction
+    prompt = f"""
 Parse the following brokerage statement text and extract the information into this JSON structure. 
 Only fill in fields where you can find the information in the text. Leave fields as null if the information is not present.
 For holdings arrays, include all securities/positions found in the statement.
@@ -628,179 +836,204 @@ Template structure:
 Brokerage statement text to parse:
 {extracted_text}
 """
+    
+    if prompt_hints:
+        prompt += f"\nLayout guidance for this statement provider:\n{prompt_hints}\n"
+    return prompt
+
+@traced("structured_extraction")
+def extract_structured_brokerage_data(extracted_text: str, filename: str, template: Optional[Dict] = None,
+                                      model: str = "gpt-4.1-mini", prompt_hints: Optional[str] = None) -> Dict:
+    """
+    Extract structured brokerage statement data using OpenAI to parse the text into the template format
+    
+    Args:
+        extracted_text: The raw extracted text from the PDF
+        filename: Name of the source file
+        template: Brokerage template to fill (optional, defaults to brokerage_template.json)
+        model: OpenAI model used for the extraction (default gpt-4.1-mini)
+        prompt_hints: Extra layout guidance appended to the prompt, e.g. from a vendor profile (optional)
         
-        logger.info("Extracting structured brokerage data...")
+    Returns:
+        Dictionary with structured brokerage data
+    """
+    try:
+        prompt = build_brokerage_prompt(extracted_text, filename, template, prompt_hints)
         
-        response = client.chat.completions.create(
-            model="gpt-4.1-mini",
+        logger.info(f"Extracting structured brokerage data with {model}...")
+        
+        completion = create_json_completion(
+            model=model,
             messages=[
                 {
                     "role": "system",
-                    "content": "You are a JSON extraction assistant. You must ONLY return valid, parseable JSON with no additional text, markdown formatting, or code blocks. Your entire response must be valid JSON that can be parsed by json.loads()."
+                    "content": STRUCTURED_SYSTEM_PROMPT
                 },
                 {
                     "role": "user",
                     "content": prompt
                 }
             ],
-            max_tokens=30000,
-            temperature=0
+            max_tokens=30000
         )
         
         # Parse the response as JSON with enhanced error handling
-        response_content = response.choices[0].message.content
+        response_content = completion["content"]
         logger.info(f"Raw AI response length: {len(response_content)} characters")
+        if completion["continuation_rounds"]:
+            logger.info(f"Brokerage response completed after {completion['continuation_rounds']} continuation rounds")
         
-        # Log a snippet for debugging
-        logger.info(f"Response snippet: {response_content[:200]}...{response_content[-100:]}")
+        # Sampled preview of the response
+        logger.info("Response preview: %.200s...", response_content, extra={"category": "response_preview"})
         
-        try:
-            structured_data = json.loads(response_content)
-        except json.JSONDecodeError as e:
-            logger.error(f"JSON parsing failed at position {e.pos}: {e.msg}")
-            logger.error(f"Problematic JSON around error: {response_content[max(0, e.pos-100):e.pos+100]}")
+        with span("json_parse") as parse_span:
+            try:
+                structured_data = json.loads(response_content)
+            except json.JSONDecodeError as e:
+                parse_span.set_attribute("repair", True)
+                logger.error(f"JSON parsing failed at position {e.pos}: {e.msg}")
+                logger.error(f"Problematic JSON around error: {response_content[max(0, e.pos-100):e.pos+100]}")
             
-            # Enhanced JSON repair logic
-            import re
-            fixed_content = response_content.strip()
+                # Enhanced JSON repair logic
+                import re
+                fixed_content = response_content.strip()
             
-            # Step 1: Remove any non-JSON prefix/suffix (like markdown code blocks)
-            if '```json' in fixed_content:
-                start = fixed_content.find('```json') + 7
-                end = fixed_content.rfind('```')
-                if end > start:
-                    fixed_content = fixed_content[start:end].strip()
-                    logger.info("Removed ```json``` code block wrapper")
-            elif '```' in fixed_content:
-                start = fixed_content.find('```') + 3
-                end = fixed_content.rfind('```')
-                if end > start:
-                    fixed_content = fixed_content[start:end].strip()
-                    logger.info("Removed ``` code block wrapper")
+                # Step 1: Remove any non-JSON prefix/suffix (like markdown code blocks)
+                if '```json' in fixed_content:
+                    start = fixed_content.find('```json') + 7
+                    end = fixed_content.rfind('```')
+                    if end > start:
+                        fixed_content = fixed_content[start:end].strip()
+                        logger.info("Removed ```json``` code block wrapper")
+                elif '```' in fixed_content:
+                    start = fixed_content.find('```') + 3
+                    end = fixed_content.rfind('```')
+                    if end > start:
+                        fixed_content = fixed_content[start:end].strip()
+                        logger.info("Removed ``` code block wrapper")
             
-            # Step 2: Ensure it starts and ends properly
-            if not fixed_content.startswith('{'):
-                start_idx = fixed_content.find('{')
-                if start_idx > 0:
-                    fixed_content = fixed_content[start_idx:]
+                # Step 2: Ensure it starts and ends properly
+                if not fixed_content.startswith('{'):
+                    start_idx = fixed_content.find('{')
+                    if start_idx > 0:
+                        fixed_content = fixed_content[start_idx:]
             
-            # Step 3: Fix common JSON formatting issues
-            # Remove trailing commas before closing brackets/braces
-            fixed_content = re.sub(r',(\s*[}\]])', r'\1', fixed_content)
+                # Step 3: Fix common JSON formatting issues
+                # Remove trailing commas before closing brackets/braces
+                fixed_content = re.sub(r',(\s*[}\]])', r'\1', fixed_content)
             
-            # Fix common JSON string formatting issues (same as invoice)
-            # 1. Fix double quotes that got turned into escaped quotes incorrectly
-            fixed_content = re.sub(r'""([^"]*)\\"', r'"\1"', fixed_content)
+                # Fix common JSON string formatting issues (same as invoice)
+                # 1. Fix double quotes that got turned into escaped quotes incorrectly
+                fixed_content = re.sub(r'""([^"]*)\\"', r'"\1"', fixed_content)
             
-            # 2. Fix malformed escape sequences like \"
-            fixed_content = re.sub(r'\\(")', r'\1', fixed_content)
+                # 2. Fix malformed escape sequences like \"
+                fixed_content = re.sub(r'\\(")', r'\1', fixed_content)
             
-            # 3. Remove any stray backslashes before quotes in values
-            fixed_content = re.sub(r'(:\s*"[^"]*)\\"([^"]*")', r'\1"\2', fixed_content)
+                # 3. Remove any stray backslashes before quotes in values
+                fixed_content = re.sub(r'(:\s*"[^"]*)\\"([^"]*")', r'\1"\2', fixed_content)
             
-            # 4. Fix missing commas and mathematical expressions (same as invoice)
-            fixed_content = re.sub(r'([^,\s])\s*\n\s*"', r'\1,\n    "', fixed_content)
+                # 4. Fix missing commas and mathematical expressions (same as invoice)
+                fixed_content = re.sub(r'([^,\s])\s*\n\s*"', r'\1,\n    "', fixed_content)
             
-            def fix_math_expressions(match):
-                key, expr = match.groups()
-                if any(op in expr for op in ['*', '/', '+', '-', '(', ')']):
-                    return f'{key}"{expr}"'
-                return match.group(0)
+                def fix_math_expressions(match):
+                    key, expr = match.groups()
+                    if any(op in expr for op in ['*', '/', '+', '-', '(', ')']):
+                        return f'{key}"{expr}"'
+                    return match.group(0)
             
-            fixed_content = re.sub(r'(:\s*)([0-9\.\*\+\-\(\)\s/]+)(?=\s*[,}\]])', fix_math_expressions, fixed_content)
+                fixed_content = re.sub(r'(:\s*)([0-9\.\*\+\-\(\)\s/]+)(?=\s*[,}\]])', fix_math_expressions, fixed_content)
             
-            # Step 4: Handle truncated JSON
-            if not fixed_content.endswith('}'):
-                logger.warning("JSON appears truncated - attempting to complete it")
+                # Step 4: Handle truncated JSON
+                if not fixed_content.endswith('}'):
+                    logger.warning("JSON appears truncated - attempting to complete it")
                 
-                # Count open/close braces and brackets
-                open_braces = fixed_content.count('{')
-                close_braces = fixed_content.count('}')
-                open_brackets = fixed_content.count('[')
-                close_brackets = fixed_content.count(']')
+                    # Count open/close braces and brackets
+                    open_braces = fixed_content.count('{')
+                    close_braces = fixed_content.count('}')
+                    open_brackets = fixed_content.count('[')
+                    close_brackets = fixed_content.count(']')
                 
-                # Remove any incomplete field at the end
-                # Look for incomplete patterns like ', "field": partial_value' at the end
-                fixed_content = re.sub(r',\s*"[^"]*":\s*[^,}\]]*$', '', fixed_content)
-                fixed_content = re.sub(r',\s*"[^"]*":\s*$', '', fixed_content)
+                    # Remove any incomplete field at the end
+                    # Look for incomplete patterns like ', "field": partial_value' at the end
+                    fixed_content = re.sub(r',\s*"[^"]*":\s*[^,}\]]*$', '', fixed_content)
+                    fixed_content = re.sub(r',\s*"[^"]*":\s*$', '', fixed_content)
                 
-                # Close missing brackets first, then braces
-                missing_brackets = open_brackets - close_brackets
-                missing_braces = open_braces - close_braces
+                    # Close missing brackets first, then braces
+                    missing_brackets = open_brackets - close_brackets
+                    missing_braces = open_braces - close_braces
                 
-                if missing_brackets > 0:
-                    fixed_content += ']' * missing_brackets
-                if missing_braces > 0:
-                    fixed_content += '}' * missing_braces
+                    if missing_brackets > 0:
+                        fixed_content += ']' * missing_brackets
+                    if missing_braces > 0:
+                        fixed_content += '}' * missing_braces
                     
-                logger.info(f"Added {missing_brackets} closing brackets and {missing_braces} closing braces")
+                    logger.info(f"Added {missing_brackets} closing brackets and {missing_braces} closing braces")
             
-            # Try parsing the repaired JSON
-            logger.info(f"Attempting to parse fixed content (first 200 chars): {fixed_content[:200]}")
-            try:
-                structured_data = json.loads(fixed_content)
-                logger.info("✅ Successfully repaired and parsed JSON")
-            except json.JSONDecodeError as e2:
-                logger.error(f"Repair attempt failed: {e2}")
-                logger.error(f"Failed content snippet around error: {fixed_content[max(0, e2.pos-100):e2.pos+100]}")
+                # Try parsing the repaired JSON
+                logger.info(f"Attempting to parse fixed content (first 200 chars): {fixed_content[:200]}")
+                try:
+                    structured_data = json.loads(fixed_content)
+                    logger.info("✅ Successfully repaired and parsed JSON")
+                except json.JSONDecodeError as e2:
+                    logger.error(f"Repair attempt failed: {e2}")
+                    logger.error(f"Failed content snippet around error: {fixed_content[max(0, e2.pos-100):e2.pos+100]}")
                 
-                # Last resort: extract the largest valid JSON substring
-                start_idx = fixed_content.find('{')
-                if start_idx == -1:
-                    logger.error("No valid JSON object found in response")
-                    structured_data = {
-                        "statement_metadata": {
-                            "source_file_name": filename,
-                            "extraction_error": "No valid JSON object found in response"
+                    # Last resort: extract the largest valid JSON substring
+                    start_idx = fixed_content.find('{')
+                    if start_idx == -1:
+                        logger.error("No valid JSON object found in response")
+                        structured_data = {
+                            "statement_metadata": {
+                                "source_file_name": filename,
+                                "extraction_error": "No valid JSON object found in response"
+                            }
                         }
-                    }
-                else:
-                    # Try progressively smaller chunks from the beginning
-                    for chunk_size in [len(fixed_content), len(fixed_content)//2, len(fixed_content)//4]:
-                        try:
-                            # Take chunk and try to close it properly
-                            chunk = fixed_content[start_idx:start_idx + chunk_size]
+                    else:
+                        # Try progressively smaller chunks from the beginning
+                        for chunk_size in [len(fixed_content), len(fixed_content)//2, len(fixed_content)//4]:
+                            try:
+                                # Take chunk and try to close it properly
+                                chunk = fixed_content[start_idx:start_idx + chunk_size]
                             
-                            # Clean up the chunk end
-                            chunk = re.sub(r',\s*$', '', chunk.rstrip())
+                                # Clean up the chunk end
+                                chunk = re.sub(r',\s*$', '', chunk.rstrip())
                             
-                            # Ensure proper closing
-                            open_braces = chunk.count('{')
-                            close_braces = chunk.count('}')
-                            open_brackets = chunk.count('[')
-                            close_brackets = chunk.count(']')
+                                # Ensure proper closing
+                                open_braces = chunk.count('{')
+                                close_braces = chunk.count('}')
+                                open_brackets = chunk.count('[')
+                                close_brackets = chunk.count(']')
                             
-                            chunk += ']' * max(0, open_brackets - close_brackets)
-                            chunk += '}' * max(0, open_braces - close_braces)
+                                chunk += ']' * max(0, open_brackets - close_brackets)
+                                chunk += '}' * max(0, open_braces - close_braces)
                             
-                            structured_data = json.loads(chunk)
-                            logger.warning(f"✅ Extracted partial JSON with {len(chunk)} characters")
-                            break
-                        except Exception as chunk_error:
-                            logger.debug(f"Chunk size {chunk_size} failed: {chunk_error}")
-                            continue
-                    else:
-                        # If all else fails, create a minimal valid response
-                        logger.error("All JSON repair attempts failed - creating minimal response")
-                        structured_data = {
-                            "statement_metadata": {
-                                "source_file_name": filename,
-                                "extraction_error": "Failed to parse AI response as valid JSON"
+                                structured_data = json.loads(chunk)
+                                logger.warning(f"✅ Extracted partial JSON with {len(chunk)} characters")
+                                break
+                            except Exception as chunk_error:
+                                logger.debug(f"Chunk size {chunk_size} failed: {chunk_error}")
+                                continue
+                        else:
+                            # If all else fails, create a minimal valid response
+                            logger.error("All JSON repair attempts failed - creating minimal response")
+                            structured_data = {
+                                "statement_metadata": {
+                                    "source_file_name": filename,
+                                    "extraction_error": "Failed to parse AI response as valid JSON"
+                                }
                             }
-                        }
         
         # Add source file name
-        structured_data["statement_metadata"]["source_file_name"] = filename
+        structured_data.setdefault("statement_metadata", {})["source_file_name"] = filename
         
         # Calculate cost for this operation
-        usage = response.usage
         cost_info = calculate_cost(
-            model=response.model,
-            input_tokens=usage.prompt_tokens,
-            output_tokens=usage.completion_tokens
+            model=completion["model"],
+            input_tokens=completion["prompt_tokens"],
+            output_tokens=completion["completion_tokens"]
         )
         
-        logger.info(f"Structured brokerage extraction - Token usage: Input: {usage.prompt_tokens}, Output: {usage.completion_tokens}")
+        logger.info(f"Structured brokerage extraction - Token usage: Input: {completion['prompt_tokens']}, Output: {completion['completion_tokens']}")
         logger.info(f"Structured brokerage extraction cost: ${cost_info.get('total_cost', 'N/A')}")
         
         return {
@@ -824,6 +1057,7 @@ Brokerage statement text to parse:
         logger.error(f"Error extracting structured brokerage data: {e}")
         raise Exception(f"Failed to extract structured brokerage data: {str(e)}")
 
+@traced("save_json")
 def save_brokerage_json(structured_data: Dict, filename: str) -> str:
     """
     Save structured brokerage data to JSON file
@@ -838,7 +1072,7 @@ def save_brokerage_json(structured_data: Dict, filename: str) -> str:
     try:
         # Create output filename
         base_name = Path(filename).stem
-        output_dir = Path(__file__).parent.parent.parent / "output" / "brokerage"
+        output_dir = OUTPUT_DIR / "brokerage"
         output_file = output_dir / f"{base_name}_brokerage.json"
         
         # Ensure output directory exists
@@ -853,4 +1087,137 @@ def save_brokerage_json(structured_data: Dict, filename: str) -> str:
         
     except Exception as e:
         logger.error(f"Error saving brokerage JSON: {e}")
-        raise Exception(f"Failed to save brokerage JSON: {str(e)}")
\ No newline at end of file
+        raise Exception(f"Failed to save brokerage JSON: {str(e)}")
+
+def get_template_version(template: Dict) -> str:
+    """
+    Build a version identifier for a template and prompt combination
+    
+    Args:
+        template: The structured extraction template
+        
+    Returns:
+        Version string such as "p1-3f2a9c1b7d", stable across runs
+    """
+    template_json = json.dumps(template, sort_keys=True)
+    digest = hashlib.sha256(f"{PROMPT_VERSION}:{template_json}".encode('utf-8')).hexdigest()
+    return f"p{PROMPT_VERSION}-{digest[:10]}"
+
+def combine_page_text(pages: List[Dict]) -> str:
+    """
+    Combine per-page OCR output into the text passed to structured extraction
+    
+    Repeated table headers, carried-forward subtotals and rows split across a
+    page break are cleaned up by stitch_page_text.
+    
+    Args:
+        pages: List of page dictionaries with "page" and "text" keys
+        
+    Returns:
+        Combined document text
+    """
+    return stitch_page_text(pages)["text"]
+
+def merge_text_results(first: Dict, second: Dict) -> Dict:
+    """
+    Merge two extract_pdf_text results for the same file (e.g. page 1, then the remaining pages)
+    
+    Args:
+        first: Result for the first set of pages
+        second: Result for additional pages
+        
+    Returns:
+        Combined result with pages in order and summed costs
+    """
+    pages = sorted(first["extracted_text"] + second["extracted_text"], key=lambda p: p["page"])
+    
+    first_costs = first["total_cost_summary"]
+    second_costs = second["total_cost_summary"]
+    total_cost_data = {
+        key: first_costs.get(key, 0) + second_costs.get(key, 0)
+        for key in ["total_input_tokens", "total_output_tokens", "total_cached_tokens", "total_cost", "pages_processed", "pages_local_ocr"]
+    }
+    total_cost_data["model_used"] = second_costs.get("model_used") or first_costs.get("model_used")
+    
+    processing_time = float(first["processing_time"].rstrip('s')) + float(second["processing_time"].rstrip('s'))
+    
+    reports = [r["preprocessing"] for r in (first, second) if r.get("preprocessing")]
+    preprocessing = sum_reports(reports, list(reports[0])) if reports else None
+    
+    return {
+        "filename": first["filename"],
+        "content_hash": first.get("content_hash"),
+        "total_pages": first["total_pages"],
+        "pages_extracted": [p["page"] for p in pages],
+        "extracted_text": pages,
+        "processing_time": f"{round(processing_time, 2)}s",
+        "total_cost_summary": total_cost_data,
+        "preprocessing": preprocessing
+    }
+
+def file_content_hash(file_path: str) -> str:
+    """SHA-256 of a document's bytes, identifying it independently of its name or folder"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def ocr_artifact_path(filename: str, content_hash: str) -> Path:
+    """
+    Path of the OCR JSON for a document
+    
+    Keyed by content hash as well as name, so same-named documents from different
+    folders never overwrite each other's OCR text.
+    """
+    return OUTPUT_DIR / "ocr" / f"{Path(filename).stem}_{content_hash[:16]}_ocr.json"
+
+@traced("save_ocr")
+def save_ocr_json(text_result: Dict, document_type: Optional[str] = None) -> str:
+    """
+    Save per-page OCR text so structured extraction can be re-run without Vision
+    
+    Args:
+        text_result: Result dictionary returned by extract_pdf_text
+        document_type: Document type if already known (invoice, brokerage, ...)
+        
+    Returns:
+        Path to the saved OCR JSON file
+    """
+    try:
+        # Results without a content hash (built by hand) fall back to hashing their text
+        content_hash = text_result.get("content_hash") or hashlib.sha256(
+            json.dumps([text_result["filename"], text_result["extracted_text"]], default=str).encode('utf-8')
+        ).hexdigest()
+        output_file = ocr_artifact_path(text_result["filename"], content_hash)
+        
+        output_file.parent.mkdir(parents=True, exist_ok=True)
+        
+        ocr_data = {
+            "filename": text_result["filename"],
+            "content_hash": content_hash,
+            "document_type": document_type,
+            "total_pages": text_result["total_pages"],
+            "extracted_text": text_result["extracted_text"],
+            "total_cost_summary": text_result.get("total_cost_summary", {}),
+            "saved_at": datetime.now().isoformat()
+        }
+        
+        with open(output_file, 'w', encoding='utf-8') as f:
+            json.dump(ocr_data, f, indent=2, ensure_ascii=False)
+        
+        logger.info(f"Saved OCR text to: {output_file}")
+        return str(output_file)
+        
+    except Exception as e:
+        logger.error(f"Error saving OCR JSON: {e}")
+        raise Exception(f"Failed to save OCR JSON: {str(e)}")
+
+def load_ocr_json(ocr_file: str) -> Dict:
+    """Load a cached OCR JSON file written by save_ocr_json"""
+    try:
+        with open(ocr_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        logger.error(f"Could not load OCR file {ocr_file}: {e}")
+        raise Exception(f"Failed to load OCR file: {str(e)}")
@@ -0,0 +1,117 @@
+"""
+Resume truncated JSON completions
+
+When a structured extraction response stops at max_tokens the JSON is cut off in
+the middle of an element. find_resume_point scans the partial output, cuts it back
+to the end of the last complete element and reports that element's JSON path
+(e.g. $.accounts[2].holdings[14]) so a follow-up request can continue from there.
+"""
+
+import json
+import re
+from typing import Dict, List, Optional, Tuple
+
+CONTINUATION_INSTRUCTION = (
+    "Your previous response was cut off by the output length limit. It ends after the complete "
+    "element at JSON path {path}. Continue the same JSON document from exactly that point: start "
+    "with the next character (a comma or a closing bracket/brace), do not repeat anything already "
+    "written, do not restart the document and do not use code blocks."
+)
+
+def _frame_path(stack: List[Dict]) -> str:
+    """JSON path of the element currently being built in the innermost container"""
+    path = "$"
+    for frame in stack:
+        if frame["type"] == "[":
+            path += f"[{frame['count']}]"
+        elif frame["key"] is not None:
+            path += f".{frame['key']}"
+    return path
+
+def find_resume_point(text: str) -> Tuple[int, Optional[str]]:
+    """
+    Find the end of the last complete JSON element in a truncated document
+
+    Args:
+        text: Partial JSON text
+
+    Returns:
+        (cut index, JSON path of the last complete element); the path is None when
+        no element was completed and "$" when the whole document is complete
+    """
+    stack = []
+    in_string = False
+    escape = False
+    string_start = 0
+    primitive_start = None
+    cut, path = 0, None
+
+    def value_complete(end: int):
+        nonlocal cut, path
+        if not stack:
+            cut, path = end, "$"
+            return
+        frame = stack[-1]
+        path = _frame_path(stack)
+        if frame["type"] == "[":
+            frame["count"] += 1
+        frame["expect"] = "comma"
+        cut = end
+
+    for i, ch in enumerate(text):
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+                frame = stack[-1] if stack else None
+                if frame and frame["type"] == "{" and frame["expect"] == "key":
+                    frame["key"] = json.loads(text[string_start:i + 1])
+                    frame["expect"] = "colon"
+                else:
+                    value_complete(i + 1)
+            continue
+
+        # Numbers and literals only count as complete once a delimiter follows them
+        if primitive_start is not None and (ch in ",}]" or ch.isspace()):
+            primitive_start = None
+            value_complete(i)
+
+        if ch == '"':
+            in_string = True
+            string_start = i
+        elif ch in "{[":
+            stack.append({"type": ch, "key": None, "count": 0, "expect": "key" if ch == "{" else "value"})
+        elif ch in "}]":
+            if not stack:
+                break
+            stack.pop()
+            value_complete(i + 1)
+        elif ch == ":":
+            if stack:
+                stack[-1]["expect"] = "value"
+        elif ch == ",":
+            if stack and stack[-1]["type"] == "{":
+                stack[-1]["expect"] = "key"
+        elif not ch.isspace() and primitive_start is None:
+            primitive_start = i
+
+    return cut, path
+
+def strip_code_fences(text: str) -> str:
+    """Remove a markdown code block wrapper a model may add around a continuation"""
+    text = re.sub(r"^\s*```(?:json)?\s*", "", text)
+    return re.sub(r"\s*```\s*$", "", text)
+
+def join_continuation(prefix: str, continuation: str) -> str:
+    """
+    Append a continuation to the cut-back prefix
+
+    A continuation that starts a new element without the separating comma gets one.
+    """
+    continuation = strip_code_fences(continuation).lstrip()
+    if continuation and continuation[0] in '{["' and prefix.rstrip()[-1:] not in ("", "[", "{", ",", ":"):
+        continuation = "," + continuation
+    return prefix + continuation
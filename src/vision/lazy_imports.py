@@ -0,0 +1,43 @@
+"""
+Deferred imports for heavy optional dependencies
+
+MCP clients spawn the Vision server per session, so module import is on the
+handshake path. PIL, numpy and pdf2image are only needed once a document is
+processed; lazy_import returns a module object whose code runs on first
+attribute access, so `Image.open(...)` or `np.array(...)` work unchanged.
+Modules that use these names in annotations add `from __future__ import
+annotations` so that defining a function does not trigger the import.
+"""
+
+import sys
+import importlib.util
+from types import ModuleType
+
+def lazy_import(name: str) -> ModuleType:
+    """
+    Return a module that is executed on first attribute access
+
+    Args:
+        name: Dotted module name (e.g. "PIL.Image")
+
+    Returns:
+        The module (already-imported modules are returned as is)
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named '{name}'", name=name)
+
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+
+    # Bind the submodule on its parent, as a regular import would
+    parent, _, child = name.rpartition(".")
+    if parent:
+        setattr(sys.modules[parent], child, module)
+    return module
@@ -0,0 +1,178 @@
+"""
+Local OCR tier in front of OpenAI Vision
+
+Clean, typed pages (most invoices) do not need a Vision call. Each rendered page is
+rated by a small local quality model; pages rated easy are OCR'd locally (Tesseract
+by default) in a CPU process pool, and the local text is kept only when the engine's
+word confidence clears a threshold. Everything else escalates to Vision as before.
+
+The tier is off unless LOCAL_OCR_BACKEND is set. Backends are pluggable through
+register_ocr_backend; a backend takes a PIL image and returns {"text", "confidence"}
+with confidence on a 0-100 scale.
+"""
+
+from __future__ import annotations
+
+import os
+import math
+import logging
+from typing import Callable, Dict, List, Optional
+from concurrent.futures import ProcessPoolExecutor
+
+from lazy_imports import lazy_import
+
+np = lazy_import("numpy")
+Image = lazy_import("PIL.Image")
+
+logger = logging.getLogger(__name__)
+
+# Configuration (environment overrides)
+LOCAL_OCR_BACKEND = os.getenv("LOCAL_OCR_BACKEND", "")                        # "" disables the tier
+LOCAL_OCR_MAX_DIFFICULTY = float(os.getenv("LOCAL_OCR_MAX_DIFFICULTY", "0.4"))  # pages above go straight to Vision
+LOCAL_OCR_MIN_CONFIDENCE = float(os.getenv("LOCAL_OCR_MIN_CONFIDENCE", "85"))   # mean word confidence to accept
+LOCAL_OCR_WORKERS = int(os.getenv("LOCAL_OCR_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))
+
+# Pages shorter than this after local OCR are treated as failed (blank or unreadable)
+MIN_LOCAL_TEXT_CHARS = 20
+
+# Quality model: logistic regression over cheap image statistics. Shaded scans and
+# photos (many mid-tone pixels), low contrast and very dense pages score as hard.
+QUALITY_SAMPLE_WIDTH = 400
+DIFFICULTY_WEIGHTS = {
+    "bias": -2.0,
+    "ink_ratio": 8.0,
+    "midtone_ratio": 12.0,
+    "contrast": -4.0,
+    "edge_density": 10.0
+}
+
+def tesseract_backend(image: Image.Image) -> Dict:
+    """OCR a page with Tesseract (requires the pytesseract package and tesseract binary)"""
+    import pytesseract
+
+    data = pytesseract.image_to_data(image, output_type=pytesseract.Output.DICT)
+
+    lines = {}
+    confidences = []
+    for i, word in enumerate(data["text"]):
+        if not word.strip():
+            continue
+        key = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+        lines.setdefault(key, []).append(word)
+        confidence = float(data["conf"][i])
+        if confidence >= 0:
+            confidences.append(confidence)
+
+    text = "\n".join(" ".join(words) for _, words in sorted(lines.items()))
+    return {"text": text, "confidence": float(np.mean(confidences)) if confidences else 0.0}
+
+OCR_BACKENDS: Dict[str, Callable[[Image.Image], Dict]] = {
+    "tesseract": tesseract_backend
+}
+
+def register_ocr_backend(name: str, backend: Callable[[Image.Image], Dict]):
+    """
+    Register a local OCR engine
+
+    Args:
+        name: Backend name used in LOCAL_OCR_BACKEND
+        backend: Module-level function taking a PIL image and returning {"text", "confidence"}
+    """
+    OCR_BACKENDS[name] = backend
+
+def page_quality_features(image: Image.Image) -> Dict[str, float]:
+    """Image statistics used by the quality model, computed on a downsampled grayscale copy"""
+    width, height = image.size
+    scale = min(1.0, QUALITY_SAMPLE_WIDTH / width)
+    sample = image.convert('L').resize((max(1, int(width * scale)), max(1, int(height * scale))))
+    gray = np.asarray(sample, dtype=np.float32) / 255.0
+
+    return {
+        "ink_ratio": float((gray < 0.5).mean()),
+        "midtone_ratio": float(((gray > 0.2) & (gray < 0.8)).mean()),
+        "contrast": float(gray.std()),
+        "edge_density": float((np.abs(np.diff(gray, axis=1)) > 0.25).mean())
+    }
+
+def score_page_difficulty(image: Image.Image) -> float:
+    """
+    Rate how hard a page is to OCR locally
+
+    Returns:
+        Difficulty between 0 (clean typed page) and 1 (photo, shaded scan, handwriting)
+    """
+    features = page_quality_features(image)
+    z = DIFFICULTY_WEIGHTS["bias"] + sum(DIFFICULTY_WEIGHTS[name] * value for name, value in features.items())
+    return 1.0 / (1.0 + math.exp(-z))
+
+def _ocr_page(args) -> Dict:
+    """Process pool worker: OCR one page with the given backend function"""
+    backend_fn, page_num, image = args
+    try:
+        result = backend_fn(image)
+        return {"page": page_num, "text": result["text"], "confidence": result["confidence"]}
+    except Exception as e:
+        return {"page": page_num, "text": "", "confidence": 0.0, "error": str(e)}
+
+def run_local_ocr_tier(images: List[Image.Image], page_numbers: List[int], backend: Optional[str] = None,
+                       max_difficulty: float = LOCAL_OCR_MAX_DIFFICULTY,
+                       min_confidence: float = LOCAL_OCR_MIN_CONFIDENCE,
+                       max_workers: int = LOCAL_OCR_WORKERS) -> Dict[int, Dict]:
+    """
+    OCR easy pages locally and return those the local engine is confident about
+
+    Args:
+        images: Rendered page images
+        page_numbers: Page number for each image
+        backend: Registered backend name (optional, defaults to LOCAL_OCR_BACKEND)
+        max_difficulty: Pages rated above this go straight to Vision
+        min_confidence: Minimum mean word confidence to accept local text
+        max_workers: Size of the OCR process pool
+
+    Returns:
+        Page results keyed by page number, in the same shape as Vision page results;
+        pages missing from the result need Vision
+    """
+    backend = backend or LOCAL_OCR_BACKEND
+    if not backend:
+        return {}
+    if backend not in OCR_BACKENDS:
+        logger.warning(f"Unknown local OCR backend '{backend}' - using Vision for all pages")
+        return {}
+
+    difficulties = {page_num: score_page_difficulty(image) for page_num, image in zip(page_numbers, images)}
+    easy_pages = [(OCR_BACKENDS[backend], page_num, image) for page_num, image in zip(page_numbers, images)
+                  if difficulties[page_num] <= max_difficulty]
+    if not easy_pages:
+        logger.info("🔎 No pages rated easy enough for local OCR")
+        return {}
+
+    if max_workers > 1 and len(easy_pages) > 1:
+        with ProcessPoolExecutor(max_workers=min(max_workers, len(easy_pages))) as executor:
+            ocr_results = list(executor.map(_ocr_page, easy_pages))
+    else:
+        ocr_results = [_ocr_page(args) for args in easy_pages]
+
+    accepted = {}
+    for ocr in ocr_results:
+        page_num = ocr["page"]
+        if ocr.get("error"):
+            logger.warning(f"Local OCR failed on page {page_num}: {ocr['error']}")
+            continue
+        if ocr["confidence"] < min_confidence or len(ocr["text"].strip()) < MIN_LOCAL_TEXT_CHARS:
+            logger.info(f"Page {page_num}: local confidence {ocr['confidence']:.1f} - escalating to Vision")
+            continue
+
+        accepted[page_num] = {
+            "page": page_num,
+            "text": ocr["text"],
+            "token_usage": None,
+            "cost": {"total_cost": 0.0},
+            "ocr_engine": backend,
+            "local_confidence": round(ocr["confidence"], 1),
+            "difficulty": round(difficulties[page_num], 3)
+        }
+
+    logger.info(f"🔎 Local OCR ({backend}): {len(accepted)}/{len(page_numbers)} pages accepted, "
+                f"{len(page_numbers) - len(accepted)} sent to Vision")
+    return accepted
@@ -0,0 +1,170 @@
+"""
+Queue-backed logging for the Vision server
+
+Log calls only put the raw record on a bounded queue; a background listener thread
+merges its arguments, caps its size, formats it (exception tracebacks included) and
+writes it. Records are sampled per category (extra={"category": ...}) before
+they are formatted, so a dropped response preview never costs a string copy. Messages
+are capped in size, and when the queue is full new records are counted and dropped
+instead of blocking a request. Debug artifacts (raw model responses) are written by
+a background thread, and only when VISION_DEBUG_ARTIFACTS=1.
+"""
+
+import os
+import queue
+import atexit
+import random
+import logging
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+from concurrent.futures import Future, ThreadPoolExecutor
+from logging.handlers import QueueHandler, QueueListener
+
+logger = logging.getLogger(__name__)
+
+def parse_sample_rates(spec: str) -> Dict[str, float]:
+    """Parse "category=rate,category=rate" into a dictionary"""
+    rates = {}
+    for item in spec.split(","):
+        if "=" in item:
+            category, rate = item.split("=", 1)
+            rates[category.strip()] = max(0.0, min(1.0, float(rate)))
+    return rates
+
+# Configuration (environment overrides)
+LOG_QUEUE_SIZE = int(os.getenv("VISION_LOG_QUEUE_SIZE", "10000"))
+LOG_MAX_MESSAGE_CHARS = int(os.getenv("VISION_LOG_MAX_CHARS", "2000"))
+# Share of records kept per category; categories not listed are always kept
+LOG_SAMPLE_RATES = parse_sample_rates(os.getenv("VISION_LOG_SAMPLE_RATES", "response_preview=0.05,page_detail=0.1"))
+DEBUG_ARTIFACTS_ENABLED = os.getenv("VISION_DEBUG_ARTIFACTS", "0") == "1"
+DEBUG_ARTIFACT_MAX_CHARS = int(os.getenv("VISION_DEBUG_ARTIFACT_MAX_CHARS", "1000000"))
+
+_listener: Optional["TruncatingQueueListener"] = None
+_queue_handler: Optional["BoundedQueueHandler"] = None
+_artifact_executor: Optional[ThreadPoolExecutor] = None
+_artifact_lock = threading.Lock()
+
+class SamplingFilter(logging.Filter):
+    """Keep a random share of records per category"""
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+        self.sampled_out = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        rate = self.rates.get(getattr(record, "category", None), 1.0)
+        if rate >= 1.0 or random.random() < rate:
+            return True
+        self.sampled_out += 1
+        return False
+
+class BoundedQueueHandler(QueueHandler):
+    """Queue handler that enqueues raw records and drops them when the queue is full"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # No formatting in the caller's thread; the listener's handlers format the record
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+class TruncatingQueueListener(QueueListener):
+    """Queue listener that merges a record's arguments and caps the message before its handlers run"""
+
+    def __init__(self, log_queue: queue.Queue, *handlers: logging.Handler, respect_handler_level: bool = False,
+                 max_chars: int = LOG_MAX_MESSAGE_CHARS):
+        super().__init__(log_queue, *handlers, respect_handler_level=respect_handler_level)
+        self.max_chars = max_chars
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        message = record.getMessage()
+        if len(message) > self.max_chars:
+            message = f"{message[:self.max_chars]}... [{len(message) - self.max_chars} chars truncated]"
+        record.msg, record.args = message, None
+        return record
+
+def start_async_logging(sample_rates: Optional[Dict[str, float]] = None) -> QueueListener:
+    """
+    Move the root logger's handlers behind a bounded queue and a background listener
+
+    Call after logging is configured (e.g. logging.basicConfig). Safe to call twice.
+
+    Returns:
+        The running QueueListener
+    """
+    global _listener, _queue_handler
+    if _listener:
+        return _listener
+
+    root = logging.getLogger()
+    handlers = list(root.handlers)
+    for handler in handlers:
+        root.removeHandler(handler)
+
+    log_queue = queue.Queue(LOG_QUEUE_SIZE)
+    _queue_handler = BoundedQueueHandler(log_queue)
+    _queue_handler.addFilter(SamplingFilter(LOG_SAMPLE_RATES if sample_rates is None else sample_rates))
+    root.addHandler(_queue_handler)
+
+    _listener = TruncatingQueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_async_logging)
+    return _listener
+
+def stop_async_logging():
+    """Flush queued records and restore the original handlers"""
+    global _listener, _queue_handler
+    if not _listener:
+        return
+    _listener.stop()
+    root = logging.getLogger()
+    root.removeHandler(_queue_handler)
+    for handler in _listener.handlers:
+        root.addHandler(handler)
+    _listener, _queue_handler = None, None
+
+def logging_stats() -> Dict:
+    """Records dropped because the queue was full or sampled out"""
+    if not _queue_handler:
+        return {"async": False}
+    sampling = next((f for f in _queue_handler.filters if isinstance(f, SamplingFilter)), None)
+    return {
+        "async": True,
+        "queued": _queue_handler.queue.qsize(),
+        "dropped_queue_full": _queue_handler.dropped,
+        "sampled_out": sampling.sampled_out if sampling else 0
+    }
+
+def debug_artifacts_enabled() -> bool:
+    return DEBUG_ARTIFACTS_ENABLED
+
+def _write_artifact(path: Path, content: str):
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content, encoding='utf-8')
+    except Exception as e:
+        logger.error(f"Failed to save debug artifact {path}: {e}")
+
+def write_debug_artifact(path: Path, content: str) -> Optional[Future]:
+    """
+    Write a debug artifact on a background thread when VISION_DEBUG_ARTIFACTS=1
+
+    Returns:
+        Future for the write, or None when artifacts are disabled
+    """
+    global _artifact_executor
+    if not DEBUG_ARTIFACTS_ENABLED:
+        return None
+    with _artifact_lock:
+        if _artifact_executor is None:
+            _artifact_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="debug-artifacts")
+    return _artifact_executor.submit(_write_artifact, path, content[:DEBUG_ARTIFACT_MAX_CHARS])
@@ -0,0 +1,241 @@
+"""
+Pack small single-page documents into one Vision request
+
+Receipts, one-page invoices and notices each pay the fixed cost of a request (prompt,
+round trip, rate-limit slot). Single-page documents are grouped into multi-image
+requests whose estimated image tokens stay within a budget; the model writes each
+document's text after a numbered delimiter, and the response is split back per
+document. Documents whose section is missing are re-run on their own.
+"""
+
+import re
+import time
+import logging
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import index
+from index import calculate_cost, image_to_base64, png_to_data_url, extract_text_from_image
+from preprocess import PREPROCESS_ENABLED, preprocess_page, estimate_image_tokens
+from page_source import count_pages, iter_pages
+from tracing import traced
+
+logger = logging.getLogger(__name__)
+
+# Estimated image input tokens allowed in one packed request
+PACK_TOKEN_BUDGET = 12000
+MAX_DOCUMENTS_PER_REQUEST = 8
+PACK_MAX_OUTPUT_TOKENS = 16000
+
+DOCUMENT_DELIMITER = "=== DOCUMENT {index} ==="
+DELIMITER_PATTERN = re.compile(r"^\s*=== DOCUMENT (\d+) ===\s*$", re.MULTILINE)
+
+PACKED_PROMPT = (
+    "You will receive {count} separate document images, each introduced by its number. "
+    "Extract ALL text from every image. Pay special attention to header information, billing and "
+    "vendor information, line items, totals and payment information, and footer terms.\n\n"
+    "For each image, first write the delimiter line exactly as shown below on its own line, then the "
+    "complete text of that image only, preserving formatting, spacing and structure:\n"
+    + DOCUMENT_DELIMITER.format(index="N") +
+    "\n\nNever mix text from different images and never skip an image."
+)
+
+def prepare_single_page_document(file_path: str) -> Optional[Dict]:
+    """
+    Render a single-page document for packing
+
+    Returns:
+        Dictionary with file_path, image data URLs and estimated tokens, or None for multi-page documents
+    """
+    if count_pages(file_path) != 1:
+        return None
+
+    page = next(iter_pages(file_path, [1], total_pages=1))
+    image = page["image"]
+    if PREPROCESS_ENABLED:
+        prepared = preprocess_page(image)
+        image_urls = [png_to_data_url(png) for png in prepared["tiles_png"]]
+        tokens = prepared["report"]["processed_tokens"]
+    else:
+        image_urls = [page["data_url"] or image_to_base64(image)]
+        tokens = estimate_image_tokens(*image.size)
+
+    return {"file_path": file_path, "filename": Path(file_path).name, "image_urls": image_urls, "tokens": tokens}
+
+def plan_batches(documents: Iterable[Dict], token_budget: int = PACK_TOKEN_BUDGET,
+                 max_documents: int = MAX_DOCUMENTS_PER_REQUEST) -> Iterator[List[Dict]]:
+    """
+    Group documents into requests without exceeding the token budget
+
+    Documents keep their order; one that is over budget by itself gets its own request.
+    Batches are yielded as soon as they are full, so a lazily prepared stream of
+    documents only holds one batch of images at a time.
+    """
+    current, current_tokens = [], 0
+    for document in documents:
+        if current and (current_tokens + document["tokens"] > token_budget or len(current) >= max_documents):
+            yield current
+            current, current_tokens = [], 0
+        current.append(document)
+        current_tokens += document["tokens"]
+    if current:
+        yield current
+
+def split_packed_response(text: str, count: int) -> Dict[int, str]:
+    """
+    Split a packed response on its document delimiters
+
+    Returns:
+        Text keyed by 1-based document number; numbers outside 1..count are ignored
+    """
+    parts = DELIMITER_PATTERN.split(text)
+    sections = {}
+    # parts = [preamble, number, text, number, text, ...]
+    for number, section in zip(parts[1::2], parts[2::2]):
+        number = int(number)
+        if 1 <= number <= count and section.strip():
+            sections[number] = section.strip()
+    return sections
+
+def _single_page_result(document: Dict, text: str, token_usage: Optional[Dict], cost: Dict,
+                        processing_time: float, ocr_engine: str) -> Dict:
+    """Text result for one document in the same shape as extract_pdf_text"""
+    return {
+        "filename": document["filename"],
+        "total_pages": 1,
+        "pages_extracted": [1],
+        "extracted_text": [{
+            "page": 1,
+            "text": text,
+            "token_usage": token_usage,
+            "cost": cost,
+            "ocr_engine": ocr_engine
+        }],
+        "processing_time": f"{round(processing_time, 2)}s",
+        "total_cost_summary": {
+            "total_input_tokens": token_usage["prompt_tokens"] if token_usage else 0,
+            "total_output_tokens": token_usage["completion_tokens"] if token_usage else 0,
+            "total_cached_tokens": token_usage["cached_tokens"] if token_usage else 0,
+            "total_cost": cost.get("total_cost", 0.0) if cost else 0.0,
+            "pages_processed": 1,
+            "pages_local_ocr": 0,
+            "model_used": token_usage["model"] if token_usage else None
+        }
+    }
+
+@traced("packed_request")
+def extract_packed_batch(batch: List[Dict]) -> List[Dict]:
+    """
+    OCR a batch of single-page documents in one request
+
+    Request tokens and cost are shared between documents in proportion to their
+    estimated image tokens.
+
+    Returns:
+        Text results in batch order
+    """
+    start_time = time.time()
+    if len(batch) == 1:
+        document = batch[0]
+        page_result = extract_text_from_image(document["image_urls"], 1)
+        return [_single_page_result(document, page_result["text"], page_result["token_usage"],
+                                    page_result["cost"] or {}, time.time() - start_time, "vision")]
+
+    content = [{"type": "text", "text": PACKED_PROMPT.format(count=len(batch))}]
+    for number, document in enumerate(batch, start=1):
+        content.append({"type": "text", "text": f"Image {number}:"})
+        content.extend({"type": "image_url", "image_url": {"url": url, "detail": "high"}}
+                       for url in document["image_urls"])
+
+    logger.info(f"📦 Packed request with {len(batch)} documents (~{sum(d['tokens'] for d in batch)} image tokens)")
+    response = index.client.chat.completions.create(
+        model="gpt-4.1-mini",
+        messages=[{"role": "user", "content": content}],
+        max_tokens=PACK_MAX_OUTPUT_TOKENS,
+        temperature=0
+    )
+    sections = split_packed_response(response.choices[0].message.content or "", len(batch))
+    elapsed = time.time() - start_time
+
+    usage = response.usage
+    cached_tokens = 0
+    if getattr(usage, 'prompt_tokens_details', None):
+        cached_tokens = getattr(usage.prompt_tokens_details, 'cached_tokens', 0) or 0
+    total_tokens = sum(document["tokens"] for document in batch) or 1
+    results = []
+    for number, document in enumerate(batch, start=1):
+        if number not in sections:
+            logger.warning(f"Packed response missing {document['filename']} - extracting it on its own")
+            results.extend(extract_packed_batch([document]))
+            continue
+
+        share = document["tokens"] / total_tokens
+        token_usage = {
+            "model": response.model,
+            "prompt_tokens": round(usage.prompt_tokens * share),
+            "completion_tokens": round(usage.completion_tokens * share),
+            "total_tokens": round(usage.total_tokens * share),
+            "cached_tokens": round(cached_tokens * share)
+        }
+        cost = calculate_cost(response.model, token_usage["prompt_tokens"], token_usage["completion_tokens"],
+                              token_usage["cached_tokens"])
+        result = _single_page_result(document, sections[number], token_usage, cost, elapsed * share, "vision-packed")
+        result["packed_batch"] = {"documents": len(batch), "position": number}
+        results.append(result)
+
+    return results
+
+def _prepare_documents(file_paths: List[str], multi_page: List[str], errors: Dict[str, str]) -> Iterator[Dict]:
+    """
+    Render single-page documents one at a time for plan_batches
+
+    Multi-page paths are added to multi_page, and unreadable ones to errors with their error.
+    """
+    for file_path in file_paths:
+        try:
+            document = prepare_single_page_document(file_path)
+        except Exception as e:
+            logger.error(f"Could not prepare {file_path} for packing: {e}")
+            errors[file_path] = f"Could not read document: {e}"
+            continue
+        if document:
+            yield document
+        else:
+            multi_page.append(file_path)
+
+def extract_text_packed(file_paths: List[str], token_budget: int = PACK_TOKEN_BUDGET) -> Dict:
+    """
+    OCR many documents, packing single-page ones into shared requests
+
+    Documents are rendered as their batch is assembled. A document that cannot be
+    read, or whose packed request fails, is reported in errors without stopping
+    the others.
+
+    Args:
+        file_paths: PDF or image paths
+        token_budget: Estimated image tokens allowed per packed request
+
+    Returns:
+        Dictionary with text results for packed documents keyed by path, the paths
+        that are multi-page (not packed), errors keyed by path, and the request count
+    """
+    multi_page = []
+    errors = {}
+    results = {}
+    requests = 0
+    for batch in plan_batches(_prepare_documents(file_paths, multi_page, errors), token_budget):
+        requests += 1
+        try:
+            text_results = extract_packed_batch(batch)
+        except Exception as e:
+            logger.error(f"Packed request for {len(batch)} documents failed: {e}")
+            for document in batch:
+                errors[document["file_path"]] = f"Packed OCR request failed: {e}"
+            continue
+        for document, text_result in zip(batch, text_results):
+            results[document["file_path"]] = text_result
+
+    logger.info(f"📦 Packed {len(results)} single-page documents into {requests} requests "
+                f"({len(multi_page)} multi-page documents processed individually, {len(errors)} failed)")
+
+    return {"results": results, "multi_page": multi_page, "errors": errors, "requests": requests}
@@ -0,0 +1,151 @@
+"""
+Page images from PDFs and image files
+
+Scanner output and phone photos (PNG, JPEG, HEIC, multi-page TIFF) are read directly
+instead of being wrapped into a PDF and rasterized again. Pages are yielded lazily:
+PDFs are rendered a few pages per pdftoppm call and TIFF frames are decoded one at a
+time, so a long document never sits in memory as a whole. A single-frame PNG or JPEG
+keeps its original bytes as the upload data URL, so when no preprocessing step needs
+the pixels the file is never decoded or re-encoded.
+"""
+
+from __future__ import annotations
+
+import os
+import base64
+import logging
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from lazy_imports import lazy_import
+
+pdf2image = lazy_import("pdf2image")
+Image = lazy_import("PIL.Image")
+ImageOps = lazy_import("PIL.ImageOps")
+
+logger = logging.getLogger(__name__)
+
+# Full-resolution render; image files are treated as already at this resolution
+RENDER_DPI = 200
+# Pages rendered and processed together
+PAGE_CHUNK_SIZE = int(os.getenv("VISION_PAGE_CHUNK_SIZE", "8"))
+
+PDF_EXTENSIONS = {".pdf"}
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".heic", ".heif", ".tif", ".tiff"}
+SUPPORTED_EXTENSIONS = PDF_EXTENSIONS | IMAGE_EXTENSIONS
+
+PASSTHROUGH_FORMATS = {"PNG": "image/png", "JPEG": "image/jpeg"}
+EXIF_ORIENTATION_TAG = 0x0112
+
+_heif_registered = False
+
+def is_supported_document(file_path: str) -> bool:
+    return Path(file_path).suffix.lower() in SUPPORTED_EXTENSIONS
+
+def is_image_file(file_path: str) -> bool:
+    return Path(file_path).suffix.lower() in IMAGE_EXTENSIONS
+
+def _register_heif():
+    """Enable HEIC/HEIF decoding (optional pillow-heif dependency)"""
+    global _heif_registered
+    if _heif_registered:
+        return
+    try:
+        from pillow_heif import register_heif_opener
+    except ImportError:
+        raise ValueError("HEIC input requires pillow-heif: pip install pillow-heif")
+    register_heif_opener()
+    _heif_registered = True
+
+def _open_image(file_path: str) -> Image.Image:
+    if Path(file_path).suffix.lower() in (".heic", ".heif"):
+        _register_heif()
+    return Image.open(file_path)
+
+def count_pages(file_path: str) -> int:
+    """Number of pages (PDF) or frames (image file)"""
+    if is_image_file(file_path):
+        with _open_image(file_path) as image:
+            return getattr(image, "n_frames", 1)
+    return pdf2image.pdfinfo_from_path(file_path)["Pages"]
+
+def _contiguous_chunks(page_numbers: List[int], size: int) -> Iterator[List[int]]:
+    """Runs of consecutive page numbers, at most size long"""
+    chunk = []
+    for page_num in page_numbers:
+        if chunk and (page_num != chunk[-1] + 1 or len(chunk) >= size):
+            yield chunk
+            chunk = []
+        chunk.append(page_num)
+    if chunk:
+        yield chunk
+
+def _scale_for_dpi(image: Image.Image, dpi: int) -> Image.Image:
+    if dpi >= RENDER_DPI:
+        return image
+    scale = dpi / RENDER_DPI
+    return image.resize((max(1, int(image.width * scale)), max(1, int(image.height * scale))))
+
+def _prepare_frame(frame: Image.Image, dpi: int) -> Image.Image:
+    """Upright RGB copy of the current frame"""
+    frame = ImageOps.exif_transpose(frame) if frame.getexif().get(EXIF_ORIENTATION_TAG, 1) != 1 else frame.copy()
+    if frame.mode != 'RGB':
+        frame = frame.convert('RGB')
+    return _scale_for_dpi(frame, dpi)
+
+def _iter_image_pages(file_path: str, page_numbers: List[int], dpi: int) -> Iterator[Dict]:
+    with _open_image(file_path) as image:
+        frames = getattr(image, "n_frames", 1)
+        mime = PASSTHROUGH_FORMATS.get(image.format)
+        passthrough = (frames == 1 and mime and dpi >= RENDER_DPI
+                       and image.getexif().get(EXIF_ORIENTATION_TAG, 1) == 1)
+
+        if passthrough:
+            with open(file_path, 'rb') as f:
+                data_url = f"data:{mime};base64,{base64.b64encode(f.read()).decode('utf-8')}"
+            # A detached copy, so no file handle outlives the with block
+            yield {"page": 1, "image": image.copy(), "data_url": data_url}
+            return
+
+        for page_num in page_numbers:
+            image.seek(page_num - 1)
+            yield {"page": page_num, "image": _prepare_frame(image, dpi), "data_url": None}
+
+def _iter_pdf_pages(file_path: str, page_numbers: List[int], dpi: int) -> Iterator[Dict]:
+    for chunk in _contiguous_chunks(page_numbers, PAGE_CHUNK_SIZE):
+        images = pdf2image.convert_from_path(file_path, dpi=dpi, fmt='PNG', first_page=chunk[0], last_page=chunk[-1])
+        for page_num, image in zip(chunk, images):
+            yield {"page": page_num, "image": image, "data_url": None}
+
+def iter_pages(file_path: str, pages: Optional[Iterable[int]] = None, dpi: int = RENDER_DPI,
+               total_pages: Optional[int] = None) -> Iterator[Dict]:
+    """
+    Lazily yield page images from a PDF or image file
+
+    Args:
+        file_path: PDF, PNG, JPEG, HEIC or TIFF file
+        pages: 1-based page numbers (optional, defaults to all pages); out-of-range pages are ignored
+        dpi: Render resolution; image files are scaled down for values below RENDER_DPI
+        total_pages: Page count if already known
+
+    Returns:
+        Iterator of {page, image, data_url}; data_url holds the original file bytes
+        when they can be uploaded as they are, otherwise None
+    """
+    total_pages = total_pages or count_pages(file_path)
+    page_numbers = [p for p in sorted(set(pages)) if 1 <= p <= total_pages] if pages else list(range(1, total_pages + 1))
+
+    if is_image_file(file_path):
+        return _iter_image_pages(file_path, page_numbers, dpi)
+    return _iter_pdf_pages(file_path, page_numbers, dpi)
+
+def chunked(items: Iterable, size: int = PAGE_CHUNK_SIZE) -> Iterator[List]:
+    """Group an iterator into lists of at most size items"""
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
@@ -0,0 +1,215 @@
+"""
+Cross-page stitching of OCR text before structured extraction
+
+Vision OCR runs page by page, so a line-item table that spans a page break comes
+back with its column header and page furniture repeated, "continued" or carried
+forward subtotals at the page edges, and the row that straddles the break split in
+two. This module cleans those artifacts locally so the structured extraction prompt
+is shorter and does not see duplicate or broken rows.
+"""
+
+import re
+import logging
+from typing import Dict, List
+
+logger = logging.getLogger(__name__)
+
+# Words that appear in line-item table headers
+TABLE_HEADER_WORDS = {
+    "date", "description", "item", "qty", "quantity", "unit", "units", "rate",
+    "price", "amount", "hours", "total", "service", "shift", "symbol", "cusip",
+    "value", "cost", "ticker", "shares"
+}
+MIN_TABLE_HEADER_WORDS = 3
+
+# Carried-forward subtotals are only dropped within this many non-blank lines of a page edge
+EDGE_LINES = 5
+# Repeated letterhead is only dropped within this many non-blank lines of a page top
+PREAMBLE_LINES = 8
+
+# Running subtotals printed at the bottom of one page and the top of the next
+CARRY_FORWARD_PATTERN = re.compile(
+    r"\b(continued|cont'd|carried forward|brought forward|page total|page subtotal|subtotal this page)\b",
+    re.IGNORECASE
+)
+PAGE_NUMBER_PATTERN = re.compile(r"^\W*page\s+\d+(\s+of\s+\d+)?\W*$", re.IGNORECASE)
+AMOUNT_AT_END_PATTERN = re.compile(r"\(?-?\$?\s?\d{1,3}(,\d{3})*\.\d{2}\)?[\s|]*$")
+ROW_START_PATTERN = re.compile(r"^[\s|]*(\d{1,2}[/-]\d{1,2}([/-]\d{2,4})?|\d{4}-\d{2}-\d{2})\b")
+TABLE_SEPARATOR_PATTERN = re.compile(r"^[\s|:\-+=]+$")
+SUMMARY_LINE_PATTERN = re.compile(r"^[\s|*]*(sub)?total|^[\s|*]*(balance|tax|amount due)", re.IGNORECASE)
+NUMERIC_CELL_PATTERN = re.compile(r"^\(?-?\$?\s?\d[\d,]*(\.\d+)?\)?$")
+MONEY_PATTERN = re.compile(r"\$?\d{1,3}(?:,\d{3})*\.\d{2}\b")
+
+def normalize_line(line: str) -> str:
+    """Lowercase a line and drop table pipes and extra whitespace for comparison"""
+    return re.sub(r"\s+", " ", line.replace("|", " ")).strip().lower()
+
+def is_table_header(line: str) -> bool:
+    """A line made mostly of column names such as Date | Description | Qty | Rate | Amount"""
+    words = re.findall(r"[a-z]+", line.lower())
+    header_words = [word for word in words if word in TABLE_HEADER_WORDS]
+    return len(header_words) >= MIN_TABLE_HEADER_WORDS and len(header_words) >= len(words) / 2
+
+def has_trailing_amount(line: str) -> bool:
+    return bool(AMOUNT_AT_END_PATTERN.search(line))
+
+def is_line_item_row(line: str) -> bool:
+    """A dated row, or one with quantity, rate and amount columns"""
+    if ROW_START_PATTERN.match(line):
+        return True
+    numeric_cells = [cell for cell in line.split("|") if NUMERIC_CELL_PATTERN.match(cell.strip())]
+    return len(numeric_cells) >= 2 or len(MONEY_PATTERN.findall(line)) >= 2
+
+def table_cells(line: str) -> List[str]:
+    """Cells of a pipe-delimited row, or an empty list for a plain line"""
+    if "|" not in line:
+        return []
+    return [cell.strip() for cell in line.strip().strip("|").split("|")]
+
+def is_split_row(previous: List[str], head: str, columns: int) -> bool:
+    """
+    Whether the last line of the previous page starts a row that head finishes
+
+    The cut line must sit directly under the table (a header or row above it) and its
+    columns must complement head's: together the two pipe rows fill the header's
+    columns (one more when a cell is cut in two). A plain-text fragment must start
+    with a date.
+    """
+    tail = previous[-1]
+    if (len(previous) < 2 or has_trailing_amount(tail) or is_table_header(tail)
+            or not has_trailing_amount(head) or ROW_START_PATTERN.match(head)
+            or SUMMARY_LINE_PATTERN.match(head)):
+        return False
+
+    above = previous[-2]
+    if not (is_table_header(above) or TABLE_SEPARATOR_PATTERN.match(above) or is_line_item_row(above)
+            or has_trailing_amount(above)):
+        return False
+
+    tail_cells, head_cells = table_cells(tail), table_cells(head)
+    if tail_cells and head_cells:
+        return not columns or len(tail_cells) + len(head_cells) in (columns, columns + 1)
+    return not tail_cells and not head_cells and bool(ROW_START_PATTERN.match(tail))
+
+def preamble_lines(lines: List[str]) -> set:
+    """Normalized lines at the top of a page, above its table"""
+    preamble = set()
+    for line in lines:
+        normalized = normalize_line(line)
+        if not normalized:
+            continue
+        if len(preamble) >= PREAMBLE_LINES or is_table_header(line) or has_trailing_amount(line):
+            break
+        preamble.add(normalized)
+    return preamble
+
+def _clean_page(lines: List[str], first_page_top: set, seen_headers: set, report: Dict,
+                multi_page: bool) -> List[str]:
+    """Drop repeated headers, page numbers and carried-forward subtotals from one page"""
+    non_blank = [index for index, line in enumerate(lines) if line.strip()]
+    edge = set(non_blank[:EDGE_LINES] + non_blank[-EDGE_LINES:]) if multi_page else set()
+    top = set(non_blank[:PREAMBLE_LINES])
+
+    kept = []
+    in_preamble = True
+    dropped_header = False
+    for index, line in enumerate(lines):
+        normalized = normalize_line(line)
+        if not normalized:
+            kept.append(line)
+            continue
+
+        if PAGE_NUMBER_PATTERN.match(line):
+            report["removed_page_numbers"] += 1
+            continue
+
+        if index in edge and CARRY_FORWARD_PATTERN.search(line) and not is_line_item_row(line):
+            report["removed_carry_forward_lines"] += 1
+            continue
+
+        if is_table_header(line):
+            in_preamble = False
+            if normalized in seen_headers:
+                report["removed_table_headers"] += 1
+                dropped_header = True
+                continue
+            seen_headers.add(normalized)
+
+        elif TABLE_SEPARATOR_PATTERN.match(line) and dropped_header:
+            # Markdown separator row under a dropped header
+            continue
+
+        elif (in_preamble and index in top and normalized in first_page_top
+                and not has_trailing_amount(line)):
+            # Letterhead, invoice number, bill-to block repeated above the table
+            report["removed_repeated_lines"] += 1
+            continue
+
+        if has_trailing_amount(line):
+            in_preamble = False
+        dropped_header = False
+        kept.append(line)
+
+    return kept
+
+def _trim_blank_edges(lines: List[str]) -> List[str]:
+    start, end = 0, len(lines)
+    while start < end and not lines[start].strip():
+        start += 1
+    while end > start and not lines[end - 1].strip():
+        end -= 1
+    return lines[start:end]
+
+def stitch_page_text(pages: List[Dict]) -> Dict:
+    """
+    Clean per-page OCR text into one stream for structured extraction
+
+    Args:
+        pages: List of page dictionaries with "page" and "text" keys
+
+    Returns:
+        Dictionary with the stitched text and a report of what was removed or joined
+    """
+    report = {
+        "pages": len(pages),
+        "removed_table_headers": 0,
+        "removed_repeated_lines": 0,
+        "removed_carry_forward_lines": 0,
+        "removed_page_numbers": 0,
+        "joined_split_rows": 0,
+        "original_chars": sum(len(page["text"]) for page in pages),
+        "stitched_chars": 0
+    }
+
+    first_page_top = preamble_lines(pages[0]["text"].split("\n")) if pages else set()
+    seen_headers = set()
+    # Column count of the most recent pipe table header
+    columns = 0
+    stitched_pages = []
+    for index, page in enumerate(pages):
+        lines = page["text"].split("\n")
+        top = first_page_top if index else set()
+        cleaned = _trim_blank_edges(_clean_page(lines, top, seen_headers, report, len(pages) > 1))
+
+        # A row cut by the page break: its first columns at the bottom, the rest at the next page top
+        if stitched_pages and stitched_pages[-1] and cleaned and is_split_row(stitched_pages[-1], cleaned[0], columns):
+            previous = stitched_pages[-1]
+            previous[-1] = f"{previous[-1].rstrip(' |')} {cleaned[0].lstrip(' |')}"
+            cleaned = cleaned[1:]
+            report["joined_split_rows"] += 1
+
+        for line in cleaned:
+            if is_table_header(line):
+                columns = len(table_cells(line))
+        stitched_pages.append(cleaned)
+
+    text = "\n\n".join("\n".join(lines) for lines in stitched_pages if lines) + "\n\n"
+    report["stitched_chars"] = len(text)
+
+    removed = report["original_chars"] + 2 * len(pages) - report["stitched_chars"]
+    if len(pages) > 1:
+        logger.info(f"🧵 Stitched {len(pages)} pages: {report['removed_table_headers']} headers, "
+                    f"{report['removed_carry_forward_lines']} carried-forward lines, "
+                    f"{report['joined_split_rows']} split rows, {removed} characters removed")
+
+    return {"text": text, "report": report}
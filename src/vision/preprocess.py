@@ -0,0 +1,213 @@
+"""
+Page image preprocessing between rasterization and Vision upload
+
+Scanned pages arrive tilted, grey and surrounded by wide margins, and receipts are
+far taller than the model's image tiles. Each page is deskewed, adaptively binarized,
+cropped to its content box and, when very tall, split into overlapping tiles. All
+steps are vectorized with NumPy and pages are processed in a CPU process pool. The
+per-document report compares upload bytes and estimated image tokens before and after.
+"""
+
+from __future__ import annotations
+
+import io
+import os
+import math
+import logging
+from typing import Dict, List, Tuple
+from concurrent.futures import ProcessPoolExecutor
+
+from lazy_imports import lazy_import
+
+np = lazy_import("numpy")
+Image = lazy_import("PIL.Image")
+
+logger = logging.getLogger(__name__)
+
+# Configuration (environment overrides)
+PREPROCESS_ENABLED = os.getenv("VISION_PREPROCESS", "1") != "0"
+PREPROCESS_BINARIZE = os.getenv("VISION_PREPROCESS_BINARIZE", "1") != "0"
+# Encoding the original page just to report its size costs a full-resolution PNG encode per page
+PREPROCESS_REPORT_BYTES = os.getenv("VISION_PREPROCESS_REPORT_BYTES", "0") == "1"
+PREPROCESS_WORKERS = int(os.getenv("VISION_PREPROCESS_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))
+
+# Deskew search
+DESKEW_SAMPLE_WIDTH = 600
+MAX_SKEW_DEGREES = 5.0
+SKEW_STEP_DEGREES = 0.25
+MIN_SKEW_CORRECTION = 0.3
+
+# Bradley adaptive threshold: pixel is ink when darker than the local mean by this fraction
+BINARIZE_WINDOW_FRACTION = 1 / 16
+BINARIZE_SENSITIVITY = 0.15
+
+# Content box
+CROP_MARGIN = 20
+MIN_INK_PER_LINE = 3
+
+# Tall page split: pages taller than TALL_PAGE_RATIO x width become tiles of TILE_RATIO x width
+TALL_PAGE_RATIO = 2.0
+TILE_RATIO = 1.4
+TILE_OVERLAP = 0.05
+
+# gpt-4.1-mini image tokens: 32px patches, capped at 1536 patches, times 1.62
+PATCH_SIZE = 32
+MAX_PATCHES = 1536
+PATCH_TOKEN_MULTIPLIER = 1.62
+
+def estimate_image_tokens(width: int, height: int) -> int:
+    """Estimate input tokens for one image sent to gpt-4.1-mini"""
+    patches = math.ceil(width / PATCH_SIZE) * math.ceil(height / PATCH_SIZE)
+    if patches > MAX_PATCHES:
+        scale = math.sqrt(PATCH_SIZE * PATCH_SIZE * MAX_PATCHES / (width * height))
+        patches = min(MAX_PATCHES, math.floor(width * scale / PATCH_SIZE) * math.floor(height * scale / PATCH_SIZE))
+    return math.ceil(patches * PATCH_TOKEN_MULTIPLIER)
+
+def png_bytes(image: Image.Image) -> bytes:
+    buffer = io.BytesIO()
+    image.save(buffer, format='PNG', optimize=image.mode == '1')
+    return buffer.getvalue()
+
+def estimate_skew(gray: np.ndarray) -> float:
+    """
+    Estimate page skew in degrees with a projection profile
+
+    Ink pixel rows are sheared for every candidate angle at once; the angle whose row
+    histogram is sharpest (text lines aligned) wins.
+    """
+    height, width = gray.shape
+    scale = min(1.0, DESKEW_SAMPLE_WIDTH / width)
+    if scale < 1.0:
+        sample = np.asarray(Image.fromarray(gray).resize((int(width * scale), max(1, int(height * scale)))))
+    else:
+        sample = gray
+    ys, xs = np.nonzero(sample < 128)
+    if len(ys) < 50:
+        return 0.0
+
+    angles = np.arange(-MAX_SKEW_DEGREES, MAX_SKEW_DEGREES + SKEW_STEP_DEGREES / 2, SKEW_STEP_DEGREES)
+    # Row index of every ink pixel under every candidate shear: (angles, pixels)
+    sheared = np.round(ys[None, :] - xs[None, :] * np.tan(np.radians(angles))[:, None]).astype(np.int64)
+    sheared -= sheared.min()
+    bins = sheared.max() + 1
+    offsets = (np.arange(len(angles)) * bins)[:, None]
+    histograms = np.bincount((sheared + offsets).ravel(), minlength=len(angles) * bins).reshape(len(angles), bins)
+    scores = (histograms.astype(np.float64) ** 2).sum(axis=1)
+    return float(angles[int(np.argmax(scores))])
+
+def adaptive_binarize(gray: np.ndarray) -> np.ndarray:
+    """Bradley-Roth adaptive threshold using an integral image; returns a boolean ink mask"""
+    height, width = gray.shape
+    half = max(1, int(width * BINARIZE_WINDOW_FRACTION) // 2)
+
+    integral = np.zeros((height + 1, width + 1), dtype=np.float64)
+    integral[1:, 1:] = gray.astype(np.float64).cumsum(axis=0).cumsum(axis=1)
+
+    y0 = np.clip(np.arange(height) - half, 0, height)
+    y1 = np.clip(np.arange(height) + half + 1, 0, height)
+    x0 = np.clip(np.arange(width) - half, 0, width)
+    x1 = np.clip(np.arange(width) + half + 1, 0, width)
+
+    window_sum = (integral[y1][:, x1] - integral[y0][:, x1] - integral[y1][:, x0] + integral[y0][:, x0])
+    area = (y1 - y0)[:, None] * (x1 - x0)[None, :]
+    local_mean = window_sum / area
+
+    return gray < local_mean * (1 - BINARIZE_SENSITIVITY)
+
+def content_box(ink: np.ndarray) -> Tuple[int, int, int, int]:
+    """Bounding box (left, top, right, bottom) of the inked area plus a margin"""
+    height, width = ink.shape
+    rows = np.flatnonzero(ink.sum(axis=1) >= MIN_INK_PER_LINE)
+    cols = np.flatnonzero(ink.sum(axis=0) >= MIN_INK_PER_LINE)
+    if len(rows) == 0 or len(cols) == 0:
+        return 0, 0, width, height
+    return (max(0, cols[0] - CROP_MARGIN), max(0, rows[0] - CROP_MARGIN),
+            min(width, cols[-1] + CROP_MARGIN + 1), min(height, rows[-1] + CROP_MARGIN + 1))
+
+def split_tall_page(image: Image.Image) -> List[Image.Image]:
+    """Split a very tall page (receipts) into overlapping tiles"""
+    width, height = image.size
+    if height <= width * TALL_PAGE_RATIO:
+        return [image]
+
+    tile_height = int(width * TILE_RATIO)
+    step = int(tile_height * (1 - TILE_OVERLAP))
+    tops = list(range(0, max(1, height - tile_height), step)) + [height - tile_height]
+    return [image.crop((0, top, width, top + tile_height)) for top in sorted(set(tops))]
+
+def preprocess_page(image: Image.Image, binarize: bool = PREPROCESS_BINARIZE,
+                    report_bytes: bool = PREPROCESS_REPORT_BYTES) -> Dict:
+    """
+    Deskew, binarize, crop and tile one page
+
+    Args:
+        image: Rendered page image
+        binarize: Convert to a 1-bit image with an adaptive threshold
+        report_bytes: Also PNG-encode the original page to report its size (otherwise original_bytes is None)
+
+    Returns:
+        Dictionary with PNG bytes for each tile and a per-page report
+    """
+    gray = np.asarray(image.convert('L'))
+
+    skew = estimate_skew(gray)
+    if abs(skew) >= MIN_SKEW_CORRECTION:
+        gray = np.asarray(Image.fromarray(gray).rotate(skew, resample=Image.BICUBIC, expand=True, fillcolor=255))
+
+    ink = adaptive_binarize(gray)
+    left, top, right, bottom = content_box(ink)
+
+    if binarize:
+        processed = Image.fromarray(np.where(ink, 0, 255).astype(np.uint8)[top:bottom, left:right]).convert('1')
+    else:
+        processed = Image.fromarray(gray[top:bottom, left:right])
+
+    tiles = split_tall_page(processed)
+    tiles_png = [png_bytes(tile) for tile in tiles]
+
+    return {
+        "tiles_png": tiles_png,
+        "report": {
+            "skew_degrees": skew,
+            "crop_box": [int(left), int(top), int(right), int(bottom)],
+            "tiles": len(tiles),
+            "original_bytes": len(png_bytes(image)) if report_bytes else None,
+            "processed_bytes": sum(len(png) for png in tiles_png),
+            "original_tokens": estimate_image_tokens(*image.size),
+            "processed_tokens": sum(estimate_image_tokens(*tile.size) for tile in tiles)
+        }
+    }
+
+def _preprocess_worker(image: Image.Image, report_bytes: bool) -> Dict:
+    return preprocess_page(image, report_bytes=report_bytes)
+
+def preprocess_pages(images: List[Image.Image], max_workers: int = PREPROCESS_WORKERS,
+                     report_bytes: bool = PREPROCESS_REPORT_BYTES) -> List[Dict]:
+    """
+    Preprocess pages in a CPU process pool
+
+    Returns:
+        preprocess_page results in page order
+    """
+    if max_workers > 1 and len(images) > 1:
+        with ProcessPoolExecutor(max_workers=min(max_workers, len(images))) as executor:
+            return list(executor.map(_preprocess_worker, images, [report_bytes] * len(images)))
+    return [preprocess_page(image, report_bytes=report_bytes) for image in images]
+
+def sum_reports(reports: List[Dict], keys: List[str]) -> Dict:
+    """Sum report fields; a field missing (None) from any report is None in the total"""
+    return {
+        key: None if any(report[key] is None for report in reports) else sum(report[key] for report in reports)
+        for key in keys
+    }
+
+def summarize_preprocessing(page_reports: List[Dict]) -> Dict:
+    """Per-document totals of bytes and estimated tokens saved"""
+    totals = sum_reports(page_reports, ["original_bytes", "processed_bytes", "original_tokens",
+                                        "processed_tokens", "tiles"])
+    totals["pages"] = len(page_reports)
+    totals["bytes_saved"] = (totals["original_bytes"] - totals["processed_bytes"]
+                             if totals["original_bytes"] is not None else None)
+    totals["tokens_saved"] = totals["original_tokens"] - totals["processed_tokens"]
+    totals["deskewed_pages"] = sum(1 for report in page_reports if abs(report["skew_degrees"]) >= MIN_SKEW_CORRECTION)
+    return totals
@@ -0,0 +1,214 @@
+"""
+Re-run structured extraction from cached OCR text
+
+When a template or extraction prompt changes, stored documents only need the
+text-to-JSON stage repeated. This module reads the per-page OCR artifacts saved
+by save_ocr_json and writes versioned structured results alongside the originals.
+"""
+
+import json
+import time
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from index import (
+    OUTPUT_DIR,
+    load_ocr_json,
+    combine_page_text,
+    get_template_version,
+    load_invoice_template,
+    load_brokerage_template,
+    extract_structured_invoice_data,
+    extract_structured_brokerage_data
+)
+from tracing import submit_in_context
+
+logger = logging.getLogger(__name__)
+
+# Document types that have a structured extraction stage, with the output
+# sub-directory and file suffix used by save_invoice_json / save_brokerage_json
+STRUCTURED_EXTRACTORS = {
+    "invoice": {
+        "extract": extract_structured_invoice_data,
+        "load_template": load_invoice_template,
+        "output_subdir": "invoices",
+        "suffix": "structured"
+    },
+    "brokerage": {
+        "extract": extract_structured_brokerage_data,
+        "load_template": load_brokerage_template,
+        "output_subdir": "brokerage",
+        "suffix": "brokerage"
+    }
+}
+
+def get_extractor(document_type: str) -> Dict:
+    """Look up the structured extractor configuration for a document type"""
+    if document_type not in STRUCTURED_EXTRACTORS:
+        raise ValueError(f"No structured extractor for document type: {document_type}")
+    return STRUCTURED_EXTRACTORS[document_type]
+
+def list_ocr_artifacts(document_type: Optional[str] = None, output_dir: Optional[Path] = None) -> List[Path]:
+    """
+    List cached OCR artifacts, optionally filtered by document type
+
+    Args:
+        document_type: Only return artifacts recorded with this type (optional)
+        output_dir: Output root to search (optional, defaults to OUTPUT_DIR)
+
+    Returns:
+        Sorted list of OCR JSON file paths
+    """
+    ocr_dir = (output_dir or OUTPUT_DIR) / "ocr"
+    if not ocr_dir.exists():
+        return []
+
+    artifacts = []
+    for ocr_file in sorted(ocr_dir.glob("*_ocr.json")):
+        if document_type:
+            try:
+                with open(ocr_file, 'r', encoding='utf-8') as f:
+                    if json.load(f).get("document_type") != document_type:
+                        continue
+            except Exception as e:
+                logger.warning(f"Skipping unreadable OCR file {ocr_file}: {e}")
+                continue
+        artifacts.append(ocr_file)
+
+    return artifacts
+
+def get_versioned_output_path(ocr_file: str, document_type: str, template_version: str,
+                              output_dir: Optional[Path] = None) -> Path:
+    """
+    Path of the structured result for a document under a given template version
+
+    Named after the OCR artifact (<name>_<hash>) rather than the filename, so
+    same-named documents from different folders get separate results.
+    """
+    extractor = get_extractor(document_type)
+    base_name = Path(ocr_file).stem
+    if base_name.endswith("_ocr"):
+        base_name = base_name[:-len("_ocr")]
+    return ((output_dir or OUTPUT_DIR) / extractor["output_subdir"] / "versions" / template_version /
+            f"{base_name}_{extractor['suffix']}.json")
+
+def reprocess_ocr_file(ocr_file: str, document_type: str, template: Optional[Dict] = None,
+                       output_dir: Optional[Path] = None, force: bool = False) -> Dict:
+    """
+    Re-run structured extraction for one document from its cached OCR text
+
+    Args:
+        ocr_file: Path to OCR JSON written by save_ocr_json
+        document_type: invoice or brokerage
+        template: Template to extract against (optional, defaults to the current template file)
+        output_dir: Output root (optional, defaults to OUTPUT_DIR)
+        force: Re-extract even if a result for this template version already exists
+
+    Returns:
+        Dictionary with the versioned output file and structured extraction cost
+    """
+    extractor = get_extractor(document_type)
+    if template is None:
+        template = extractor["load_template"]()
+    template_version = get_template_version(template)
+
+    ocr_data = load_ocr_json(ocr_file)
+    filename = ocr_data["filename"]
+    output_file = get_versioned_output_path(ocr_file, document_type, template_version, output_dir)
+
+    if output_file.exists() and not force:
+        logger.info(f"Skipping {filename}: already extracted with template {template_version}")
+        return {
+            "filename": filename,
+            "status": "skipped",
+            "template_version": template_version,
+            "output_file": str(output_file),
+            "extraction_cost": {"total_cost": 0.0}
+        }
+
+    combined_text = combine_page_text(ocr_data["extracted_text"])
+    structured_result = extractor["extract"](combined_text, filename, template=template)
+
+    structured_data = structured_result["structured_data"]
+    structured_data["template_version"] = template_version
+
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump(structured_data, f, indent=2, ensure_ascii=False)
+
+    logger.info(f"Reprocessed {filename} with template {template_version}: {output_file}")
+
+    return {
+        "filename": filename,
+        "status": "processed",
+        "template_version": template_version,
+        "output_file": str(output_file),
+        "extraction_cost": structured_result["extraction_cost"]
+    }
+
+def reprocess_archive(document_type: str, ocr_files: Optional[List[str]] = None,
+                      template: Optional[Dict] = None, max_workers: int = 4,
+                      output_dir: Optional[Path] = None, force: bool = False) -> Dict:
+    """
+    Re-run structured extraction for every cached document of a type using a worker pool
+
+    Args:
+        document_type: invoice or brokerage
+        ocr_files: Specific OCR files to reprocess (optional, defaults to all matching artifacts)
+        template: Template to extract against (optional, defaults to the current template file)
+        max_workers: Number of concurrent structured extraction calls
+        output_dir: Output root (optional, defaults to OUTPUT_DIR)
+        force: Re-extract documents that already have a result for this template version
+
+    Returns:
+        Batch summary with per-document results, failures and total cost
+    """
+    start_time = time.time()
+    extractor = get_extractor(document_type)
+    if template is None:
+        template = extractor["load_template"]()
+    template_version = get_template_version(template)
+
+    if ocr_files is None:
+        ocr_files = [str(path) for path in list_ocr_artifacts(document_type, output_dir)]
+
+    logger.info(f"Reprocessing {len(ocr_files)} {document_type} documents with template {template_version}")
+
+    results = []
+    failures = []
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        futures = {
+            submit_in_context(executor, reprocess_ocr_file, ocr_file, document_type, template, output_dir,
+                              force): ocr_file
+            for ocr_file in ocr_files
+        }
+        for future in as_completed(futures):
+            ocr_file = futures[future]
+            try:
+                results.append(future.result())
+            except Exception as e:
+                logger.error(f"Reprocessing failed for {ocr_file}: {e}")
+                failures.append({"ocr_file": ocr_file, "error": str(e)})
+
+    results.sort(key=lambda r: r["filename"])
+    total_cost = sum(r["extraction_cost"].get("total_cost", 0.0) for r in results)
+    processing_time = round(time.time() - start_time, 2)
+
+    summary = {
+        "document_type": document_type,
+        "template_version": template_version,
+        "documents_found": len(ocr_files),
+        "processed": len([r for r in results if r["status"] == "processed"]),
+        "skipped": len([r for r in results if r["status"] == "skipped"]),
+        "failed": len(failures),
+        "results": results,
+        "failures": failures,
+        "total_cost": round(total_cost, 6),
+        "processing_time": f"{processing_time}s"
+    }
+
+    logger.info(f"Reprocessing complete: {summary['processed']} processed, "
+                f"{summary['skipped']} skipped, {summary['failed']} failed in {processing_time}s")
+    return summary
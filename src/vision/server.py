@@ -5,7 +5,6 @@ MCP server for vision functionality - PDF text extraction using OpenAI Vision AP
 
 import asyncio
 import logging
-import requests
 import json
 import os
 from pathlib import Path
@@ -25,7 +24,18 @@ logging.basicConfig(level=logging.INFO)
 logger.info(f"Loading environment from: {env_path}")
 logger.info(f"OpenAI API Key loaded: {'Yes' if os.getenv('OPENAI_API_KEY') else 'No'}")
 
-from index import extract_pdf_text, extract_structured_invoice_data, save_invoice_json, extract_structured_brokerage_data, save_brokerage_json
+from index import extract_pdf_text, extract_structured_invoice_data, save_invoice_json, extract_structured_brokerage_data, save_brokerage_json, save_ocr_json, load_ocr_json, ocr_artifact_path, file_content_hash, merge_text_results, combine_page_text, OUTPUT_DIR
+from reprocess import reprocess_archive, STRUCTURED_EXTRACTORS
+from validation import validate_and_repair
+from packing import extract_text_packed, PACK_TOKEN_BUDGET
+from triage import extract_triaged_text
+from tracing import traced, stage_percentiles
+from log_pipeline import start_async_logging, logging_stats
+from vendor_profiles import (
+    identify_vendor_layout, confirm_vendor_header, get_profile_extraction_options,
+    create_vendor_profile, save_vendor_profile, load_vendor_profiles,
+    compute_layout_hash, render_fingerprint_page
+)
 
 # Vision server context for managing resources
 class VisionContext:
@@ -43,11 +53,15 @@ async def vision_lifespan(server: FastMCP) -> AsyncIterator[VisionContext]:
 # Create FastMCP server with lifespan
 mcp = FastMCP("Vision MCP", lifespan=vision_lifespan)
 
+# Documents may only be read from this directory
+ALLOWED_DOCUMENTS_DIR = os.getenv("VISION_DOCUMENTS_DIR", "/Users/andrew/Projects/claudecode1/test-documents")
+
 # Workflow automation configuration
 WORKFLOW_TRIGGER_ENABLED = True
 CRM_SERVER_URL = "http://localhost:3002"  # CRM MCP server URL
 WORKFLOW_SERVER_URL = "http://localhost:3003"  # Workflow MCP server URL
 
+@traced("workflow_trigger")
 def trigger_workflow_automation(extracted_data: dict, document_type: str = "invoice"):
     """
     Automatically trigger workflows based on extracted document data
@@ -281,7 +295,9 @@ def trigger_specific_workflow(workflow_name: str, communication_data: dict):
             "trigger_data": communication_data
         }
         
-        logger.info(f"📊 Workflow trigger data: {json.dumps(workflow_trigger_data, indent=2)}")
+        trigger_data = workflow_trigger_data["trigger_data"]
+        logger.info(f"📊 Workflow trigger data: {workflow_trigger_data['trigger_event']} for communication "
+                    f"{trigger_data.get('id')} ({len(trigger_data.get('message_content_text') or '')} characters of text)")
         
         # This would normally be:
         # response = requests.post(f"{WORKFLOW_SERVER_URL}/trigger", json=workflow_trigger_data)
@@ -293,12 +309,13 @@ def trigger_specific_workflow(workflow_name: str, communication_data: dict):
         return {"success": False, "error": str(e)}
 
 @mcp.tool()
+@traced("extractInvoiceData")
 def extractInvoiceData(file_path: str) -> dict:
     """
     Extract structured invoice data from PDF and save as JSON
     
     Args:
-        file_path: Path to PDF file in /Users/andrew/Projects/claudecode1/test-documents
+        file_path: Path to PDF or image file (PNG, JPEG, HEIC, TIFF) in /Users/andrew/Projects/claudecode1/test-documents
     
     Returns:
         JSON object with extraction results and path to saved structured data file
@@ -307,39 +324,51 @@ def extractInvoiceData(file_path: str) -> dict:
         logger.info(f"Extracting structured invoice data from: {file_path}")
         
         # Validate file path is in allowed directory
-        allowed_dir = "/Users/andrew/Projects/claudecode1/test-documents"
+        allowed_dir = ALLOWED_DOCUMENTS_DIR
         if not file_path.startswith(allowed_dir):
             raise ValueError(f"File must be in {allowed_dir}")
         
         # First extract text using OpenAI Vision
         text_result = extract_pdf_text(file_path)
         
+        # Keep the per-page OCR text so structured extraction can be re-run later
+        ocr_file = save_ocr_json(text_result, "invoice")
+        
         # Combine all page text
-        combined_text = ""
-        for page_data in text_result["extracted_text"]:
-            combined_text += page_data["text"] + "\n\n"
+        combined_text = combine_page_text(text_result["extracted_text"])
         
         # Extract structured data
         structured_result = extract_structured_invoice_data(combined_text, text_result["filename"])
         
+        # Check the arithmetic and re-extract only failing sections
+        validation = validate_and_repair(structured_result["structured_data"], "invoice",
+                                         text_result["extracted_text"], text_result["filename"])
+        
         # Save structured data to JSON file
-        output_file = save_invoice_json(structured_result["structured_data"], text_result["filename"])
+        output_file = save_invoice_json(validation["structured_data"], text_result["filename"])
         
         # Combine costs
         total_extraction_cost = text_result["total_cost_summary"]["total_cost"]
         structured_cost = structured_result["extraction_cost"]["total_cost"]
-        total_cost = total_extraction_cost + structured_cost
+        total_cost = total_extraction_cost + structured_cost + validation["repair_cost"]
         
         result = {
             "filename": text_result["filename"],
             "total_pages": text_result["total_pages"],
             "processing_time": text_result["processing_time"],
             "extracted_text": text_result["extracted_text"],
-            "structured_data": structured_result["structured_data"],
+            "structured_data": validation["structured_data"],
             "output_file": output_file,
+            "ocr_file": ocr_file,
+            "validation": {
+                "overall_status": validation["audit"]["overall_status"],
+                "requires_human_review": validation["audit"]["requires_human_review"],
+                "reextracted_sections": validation["reextracted_sections"]
+            },
             "cost_breakdown": {
                 "text_extraction_cost": total_extraction_cost,
                 "structured_extraction_cost": structured_cost,
+                "validation_repair_cost": validation["repair_cost"],
                 "total_cost": round(total_cost, 6)
             }
         }
@@ -355,12 +384,13 @@ def extractInvoiceData(file_path: str) -> dict:
         raise Exception(f"Failed to extract structured invoice data: {str(error)}")
 
 @mcp.tool()
+@traced("extractbrokerage")
 def extractbrokerage(file_path: str) -> dict:
     """
     Extract structured brokerage statement data from PDF and save as JSON
     
     Args:
-        file_path: Path to PDF file in /Users/andrew/Projects/claudecode1/test-documents
+        file_path: Path to PDF or image file (PNG, JPEG, HEIC, TIFF) in /Users/andrew/Projects/claudecode1/test-documents
     
     Returns:
         JSON object with extraction results and path to saved structured data file
@@ -369,39 +399,51 @@ def extractbrokerage(file_path: str) -> dict:
         logger.info(f"Extracting structured brokerage data from: {file_path}")
         
         # Validate file path is in allowed directory
-        allowed_dir = "/Users/andrew/Projects/claudecode1/test-documents"
+        allowed_dir = ALLOWED_DOCUMENTS_DIR
         if not file_path.startswith(allowed_dir):
             raise ValueError(f"File must be in {allowed_dir}")
         
         # First extract text using OpenAI Vision
         text_result = extract_pdf_text(file_path)
         
+        # Keep the per-page OCR text so structured extraction can be re-run later
+        ocr_file = save_ocr_json(text_result, "brokerage")
+        
         # Combine all page text
-        combined_text = ""
-        for page_data in text_result["extracted_text"]:
-            combined_text += page_data["text"] + "\n\n"
+        combined_text = combine_page_text(text_result["extracted_text"])
         
         # Extract structured data
         structured_result = extract_structured_brokerage_data(combined_text, text_result["filename"])
         
+        # Check the arithmetic and re-extract only failing sections
+        validation = validate_and_repair(structured_result["structured_data"], "brokerage",
+                                         text_result["extracted_text"], text_result["filename"])
+        
         # Save structured data to JSON file
-        output_file = save_brokerage_json(structured_result["structured_data"], text_result["filename"])
+        output_file = save_brokerage_json(validation["structured_data"], text_result["filename"])
         
         # Combine costs
         total_extraction_cost = text_result["total_cost_summary"]["total_cost"]
         structured_cost = structured_result["extraction_cost"]["total_cost"]
-        total_cost = total_extraction_cost + structured_cost
+        total_cost = total_extraction_cost + structured_cost + validation["repair_cost"]
         
         result = {
             "filename": text_result["filename"],
             "total_pages": text_result["total_pages"],
             "processing_time": text_result["processing_time"],
             "extracted_text": text_result["extracted_text"],
-            "structured_data": structured_result["structured_data"],
+            "structured_data": validation["structured_data"],
             "output_file": output_file,
+            "ocr_file": ocr_file,
+            "validation": {
+                "overall_status": validation["audit"]["overall_status"],
+                "requires_human_review": validation["audit"]["requires_human_review"],
+                "reextracted_sections": validation["reextracted_sections"]
+            },
             "cost_breakdown": {
                 "text_extraction_cost": total_extraction_cost,
                 "structured_extraction_cost": structured_cost,
+                "validation_repair_cost": validation["repair_cost"],
                 "total_cost": round(total_cost, 6)
             }
         }
@@ -417,12 +459,13 @@ def extractbrokerage(file_path: str) -> dict:
         raise Exception(f"Failed to extract structured brokerage data: {str(error)}")
 
 @mcp.tool()
+@traced("extractDocumentData")
 def extractDocumentData(file_path: str) -> dict:
     """
     Universal document processor - extracts data from any PDF and routes to specialized extractors as needed
     
     Args:
-        file_path: Path to PDF file in /Users/andrew/Projects/claudecode1/test-documents
+        file_path: Path to PDF or image file (PNG, JPEG, HEIC, TIFF) in /Users/andrew/Projects/claudecode1/test-documents
     
     Returns:
         JSON object with extraction results, document classification, and workflow automation status
@@ -431,98 +474,315 @@ def extractDocumentData(file_path: str) -> dict:
         logger.info(f"🔍 Processing document with universal extractor: {file_path}")
         
         # Validate file path is in allowed directory
-        allowed_dir = "/Users/andrew/Projects/claudecode1/test-documents"
+        allowed_dir = ALLOWED_DOCUMENTS_DIR
         if not file_path.startswith(allowed_dir):
             raise ValueError(f"File must be in {allowed_dir}")
         
         # Step 1: Extract text using OpenAI Vision (common for all documents)
         logger.info("📄 Step 1: Extracting text from PDF...")
-        text_result = extract_pdf_text(file_path)
+        text_result, vendor_profile = extract_text_with_vendor_profile(file_path)
+        
+        return process_document_text(file_path, text_result, vendor_profile)
         
-        # Combine all page text for classification
-        combined_text = ""
-        for page_data in text_result["extracted_text"]:
-            combined_text += page_data["text"] + "\n\n"
+    except Exception as error:
+        logger.error(f"Error processing document: {error}")
+        raise Exception(f"Failed to process document: {str(error)}")
+
+@mcp.tool()
+@traced("extractDocumentsPacked")
+def extractDocumentsPacked(file_paths: list, token_budget: int = PACK_TOKEN_BUDGET) -> dict:
+    """
+    Process many documents, packing single-page ones into shared Vision requests
+    
+    Single-page PDFs are OCR'd several at a time in one multi-image request (bounded by
+    an image token budget) and split back per document; multi-page PDFs go through the
+    normal extractDocumentData path. Every document is then classified and extracted.
+    
+    Args:
+        file_paths: Paths to PDF files in /Users/andrew/Projects/claudecode1/test-documents
+        token_budget: Estimated image tokens allowed per packed request (default 12000)
+    
+    Returns:
+        Per-document results, failures and the number of packed OCR requests
+    """
+    try:
+        allowed_dir = ALLOWED_DOCUMENTS_DIR
+        for file_path in file_paths:
+            if not file_path.startswith(allowed_dir):
+                raise ValueError(f"File must be in {allowed_dir}")
+        
+        logger.info(f"📦 Processing {len(file_paths)} documents with request packing")
+        packed = extract_text_packed(file_paths, token_budget)
+        
+        results = []
+        failures = []
+        for file_path in file_paths:
+            if file_path in packed["errors"]:
+                failures.append({"file_path": file_path, "error": packed["errors"][file_path]})
+                continue
+            try:
+                if file_path in packed["results"]:
+                    results.append(process_document_text(file_path, packed["results"][file_path]))
+                else:
+                    results.append(extractDocumentData(file_path))
+            except Exception as e:
+                logger.error(f"Packed processing failed for {file_path}: {e}")
+                failures.append({"file_path": file_path, "error": str(e)})
+        
+        return {
+            "documents": len(file_paths),
+            "packed_documents": len(packed["results"]),
+            "packed_requests": packed["requests"],
+            "processed": len(results),
+            "failed": len(failures),
+            "results": results,
+            "failures": failures
+        }
         
-        # Step 2: Classify document type
+    except Exception as error:
+        logger.error(f"Error processing packed documents: {error}")
+        raise Exception(f"Failed to process packed documents: {str(error)}")
+
+def process_document_text(file_path: str, text_result: dict, vendor_profile: Optional[dict] = None) -> dict:
+    """
+    Steps 2-4 of extractDocumentData: classify, extract structured data, trigger workflows
+    
+    Args:
+        file_path: Path of the source PDF
+        text_result: OCR result in extract_pdf_text format
+        vendor_profile: Matched vendor profile (optional)
+    
+    Returns:
+        Unified document result
+    """
+    # Combine all page text for classification
+    combined_text = combine_page_text(text_result["extracted_text"])
+    
+    # Step 2: Classify document type (known vendor layouts carry their own type)
+    extraction_options = {}
+    triage = text_result.get("triage") or {}
+    if vendor_profile:
+        doc_type = vendor_profile["document_type"]
+        template = STRUCTURED_EXTRACTORS[doc_type]["load_template"]()
+        extraction_options = get_profile_extraction_options(vendor_profile, template)
+        logger.info(f"🎯 Step 2: Using vendor profile '{vendor_profile['vendor_id']}' ({doc_type})")
+    elif triage.get("document_type"):
+        doc_type = triage["document_type"]
+        logger.info(f"🎯 Step 2: Using triage classification ({doc_type})")
+    else:
         logger.info("🎯 Step 2: Classifying document type...")
         doc_type = classify_document_simple(combined_text, text_result["filename"])
         logger.info(f"   Document classified as: {doc_type}")
+    ocr_file = save_ocr_json(text_result, doc_type)
+    
+    # Step 3: Route to appropriate extractor
+    logger.info("🔀 Step 3: Routing to specialized extractor if applicable...")
+    structured_data = None
+    specialized_result = None
+    validation = None
+    
+    if doc_type == "invoice":
+        logger.info("   → Using specialized invoice extractor")
+        # Extract structured invoice data
+        structured_result = extract_structured_invoice_data(combined_text, text_result["filename"], **extraction_options)
+        validation = validate_and_repair(structured_result["structured_data"], "invoice",
+                                         text_result["extracted_text"], text_result["filename"])
+        specialized_result = {
+            "extractor_used": "invoice",
+            "structured_data": validation["structured_data"],
+            "output_file": save_invoice_json(validation["structured_data"], text_result["filename"])
+        }
         
-        # Step 3: Route to appropriate extractor
-        logger.info("🔀 Step 3: Routing to specialized extractor if applicable...")
-        structured_data = None
-        specialized_result = None
-        
-        if doc_type == "invoice":
-            logger.info("   → Using specialized invoice extractor")
-            # Extract structured invoice data
-            structured_result = extract_structured_invoice_data(combined_text, text_result["filename"])
-            specialized_result = {
-                "extractor_used": "invoice",
-                "structured_data": structured_result["structured_data"],
-                "output_file": save_invoice_json(structured_result["structured_data"], text_result["filename"])
-            }
-            
-        elif doc_type == "brokerage":
-            logger.info("   → Using specialized brokerage extractor")
-            # Extract structured brokerage data
-            structured_result = extract_structured_brokerage_data(combined_text, text_result["filename"])
-            specialized_result = {
-                "extractor_used": "brokerage",
-                "structured_data": structured_result["structured_data"],
-                "output_file": save_brokerage_json(structured_result["structured_data"], text_result["filename"])
-            }
-            
-        else:
-            logger.info("   → Using general document extraction")
-            # Extract general document data
-            structured_data = extract_general_document_data(combined_text, text_result["filename"])
-            specialized_result = {
-                "extractor_used": "general",
-                "structured_data": structured_data,
-                "output_file": save_general_json(structured_data, text_result["filename"])
-            }
-        
-        # Step 4: Trigger workflow automation
-        logger.info("⚡ Step 4: Triggering workflow automation...")
+    elif doc_type == "brokerage":
+        logger.info("   → Using specialized brokerage extractor")
+        # Extract structured brokerage data
+        structured_result = extract_structured_brokerage_data(combined_text, text_result["filename"], **extraction_options)
+        validation = validate_and_repair(structured_result["structured_data"], "brokerage",
+                                         text_result["extracted_text"], text_result["filename"])
+        specialized_result = {
+            "extractor_used": "brokerage",
+            "structured_data": validation["structured_data"],
+            "output_file": save_brokerage_json(validation["structured_data"], text_result["filename"])
+        }
         
-        # Prepare unified result
-        result = {
-            "filename": text_result["filename"],
-            "document_type": doc_type,
-            "total_pages": text_result["total_pages"],
-            "processing_time": text_result["processing_time"],
-            "extracted_text": text_result["extracted_text"],
-            "classification": {
-                "document_type": doc_type,
-                "extractor_used": specialized_result["extractor_used"],
-                "confidence": 0.95  # Placeholder - can enhance with real confidence scoring
-            },
-            "structured_data": specialized_result["structured_data"],
-            "output_file": specialized_result["output_file"],
-            "cost_breakdown": text_result.get("total_cost_summary", {})
+    else:
+        logger.info("   → Using general document extraction")
+        # Extract general document data
+        structured_data = extract_general_document_data(combined_text, text_result["filename"])
+        specialized_result = {
+            "extractor_used": "general",
+            "structured_data": structured_data,
+            "output_file": save_general_json(structured_data, text_result["filename"])
         }
+    
+    # Step 4: Trigger workflow automation
+    logger.info("⚡ Step 4: Triggering workflow automation...")
+    
+    # Prepare unified result
+    result = {
+        "filename": text_result["filename"],
+        "document_type": doc_type,
+        "total_pages": text_result["total_pages"],
+        "processing_time": text_result["processing_time"],
+        "extracted_text": text_result["extracted_text"],
+        "classification": {
+            "document_type": doc_type,
+            "extractor_used": specialized_result["extractor_used"],
+            "confidence": 0.95  # Placeholder - can enhance with real confidence scoring
+        },
+        "structured_data": specialized_result["structured_data"],
+        "output_file": specialized_result["output_file"],
+        "ocr_file": ocr_file,
+        "vendor_profile": {
+            "vendor_id": vendor_profile["vendor_id"],
+            "vendor_name": vendor_profile["vendor_name"],
+            "pages_extracted": text_result["pages_extracted"],
+            "model": extraction_options.get("model", "gpt-4.1-mini")
+        } if vendor_profile else None,
+        "triage": {
+            "applied": triage["applied"],
+            "reason": triage["reason"],
+            "document_type": triage["document_type"],
+            "pages_extracted": text_result["pages_extracted"],
+            "skipped_pages": triage["skipped_pages"],
+            "cost": (triage["cost"] or {}).get("total_cost", 0.0)
+        } if triage else None,
+        "validation": {
+            "overall_status": validation["audit"]["overall_status"],
+            "requires_human_review": validation["audit"]["requires_human_review"],
+            "reextracted_sections": validation["reextracted_sections"],
+            "repair_cost": validation["repair_cost"]
+        } if validation else None,
+        "cost_breakdown": text_result.get("total_cost_summary", {})
+    }
+    
+    # Trigger workflow automation with document type
+    trigger_workflow_automation(result, doc_type)
+    
+    # Add workflow status to result
+    result["workflow_triggered"] = True
+    result["workflow_type"] = get_workflow_for_document_type(doc_type)
+    
+    logger.info(f"✅ Successfully processed document: {file_path}")
+    logger.info(f"   Document Type: {doc_type}")
+    logger.info(f"   Extractor Used: {specialized_result['extractor_used']}")
+    logger.info(f"   Output File: {specialized_result['output_file']}")
+    logger.info(f"   Workflow Triggered: {result['workflow_type']}")
+    
+    return result
+
+@mcp.tool()
+@traced("reprocessDocuments")
+def reprocessDocuments(document_type: str, max_workers: int = 4, force: bool = False) -> dict:
+    """
+    Re-run structured extraction for stored documents from their cached OCR text
+    
+    Use after changing a template or extraction prompt. Vision OCR is not repeated;
+    only the text-to-JSON stage runs, and results are written under a versioned
+    directory such as output/invoices/versions/<template_version>/.
+    
+    Args:
+        document_type: Document type to reprocess (invoice or brokerage)
+        max_workers: Number of concurrent structured extraction calls (default 4)
+        force: Re-extract documents that already have a result for the current template version
+    
+    Returns:
+        Batch summary with template version, per-document results, failures and total cost
+    """
+    try:
+        if document_type not in STRUCTURED_EXTRACTORS:
+            raise ValueError(f"document_type must be one of: {', '.join(STRUCTURED_EXTRACTORS)}")
         
-        # Trigger workflow automation with document type
-        trigger_workflow_automation(result, doc_type)
+        logger.info(f"♻️ Reprocessing cached {document_type} OCR text...")
+        return reprocess_archive(document_type, max_workers=max_workers, force=force)
         
-        # Add workflow status to result
-        result["workflow_triggered"] = True
-        result["workflow_type"] = get_workflow_for_document_type(doc_type)
+    except Exception as error:
+        logger.error(f"Error reprocessing documents: {error}")
+        raise Exception(f"Failed to reprocess documents: {str(error)}")
+
+@traced("ocr")
+def extract_text_with_vendor_profile(file_path: str) -> tuple:
+    """
+    Extract text, taking the fast path for recognized vendor layouts
+    
+    The first page is fingerprinted locally. On a layout match only page 1 is
+    OCR'd to confirm the header text, then only the profile's pages. Unrecognized
+    layouts go through the low-DPI triage pass, which skips disclosure and
+    boilerplate pages.
+    
+    Returns:
+        Tuple of (text_result, vendor_profile or None)
+    """
+    vendor_profile = identify_vendor_layout(file_path)
+    if not vendor_profile:
+        return extract_triaged_text(file_path), None
+    
+    logger.info(f"🏷️ Layout matches vendor profile '{vendor_profile['vendor_id']}' - confirming header")
+    first_page = extract_pdf_text(file_path, pages=[1])
+    
+    if confirm_vendor_header(vendor_profile, first_page["extracted_text"][0]["text"]):
+        remaining_pages = [p for p in vendor_profile["pages"] if p != 1]
+    else:
+        logger.info("   Header does not match profile - falling back to generic extraction")
+        vendor_profile = None
+        remaining_pages = list(range(2, first_page["total_pages"] + 1))
+    
+    if not remaining_pages:
+        return first_page, vendor_profile
+    
+    return merge_text_results(first_page, extract_pdf_text(file_path, pages=remaining_pages)), vendor_profile
+
+@mcp.tool()
+def registerVendorProfile(file_path: str, vendor_name: str, document_type: str, pages: list = None,
+                          template_fields: list = None, field_positions: dict = None,
+                          extraction_model: str = None, extraction_model_validated: bool = False) -> dict:
+    """
+    Register a recurring vendor layout so matching documents take the fast extraction path
+    
+    Args:
+        file_path: Reference PDF in /Users/andrew/Projects/claudecode1/test-documents
+        vendor_name: Vendor name, e.g. "Clipboard Health"
+        document_type: invoice or brokerage
+        pages: Page numbers that carry the data to extract (default [1])
+        template_fields: Dotted template paths to keep, e.g. ["invoice_metadata", "totals"] (default: full template)
+        field_positions: Where fields appear, e.g. {"invoice_number": "page 1, top right"}
+        extraction_model: Cheaper model to use for this layout, e.g. "gpt-4.1-nano" (optional)
+        extraction_model_validated: Set once extraction_model has been checked against reference output
+    
+    Returns:
+        The stored vendor profile
+    """
+    try:
+        allowed_dir = ALLOWED_DOCUMENTS_DIR
+        if not file_path.startswith(allowed_dir):
+            raise ValueError(f"File must be in {allowed_dir}")
+        if document_type not in STRUCTURED_EXTRACTORS:
+            raise ValueError(f"document_type must be one of: {', '.join(STRUCTURED_EXTRACTORS)}")
         
-        logger.info(f"✅ Successfully processed document: {file_path}")
-        logger.info(f"   Document Type: {doc_type}")
-        logger.info(f"   Extractor Used: {specialized_result['extractor_used']}")
-        logger.info(f"   Output File: {specialized_result['output_file']}")
-        logger.info(f"   Workflow Triggered: {result['workflow_type']}")
+        layout_hash = compute_layout_hash(render_fingerprint_page(file_path))
         
-        return result
+        # Reuse cached OCR text for the header when available
+        ocr_file = ocr_artifact_path(file_path, file_content_hash(file_path))
+        if ocr_file.exists():
+            header_text = load_ocr_json(str(ocr_file))["extracted_text"][0]["text"]
+        else:
+            header_text = extract_pdf_text(file_path, pages=[1])["extracted_text"][0]["text"]
+        
+        profile = create_vendor_profile(
+            vendor_name, document_type, layout_hash, header_text,
+            pages=pages, template_fields=template_fields, field_positions=field_positions,
+            extraction_model=extraction_model, extraction_model_validated=extraction_model_validated
+        )
+        save_vendor_profile(profile)
+        
+        logger.info(f"✅ Registered vendor profile '{profile['vendor_id']}'")
+        return profile
         
     except Exception as error:
-        logger.error(f"Error processing document: {error}")
-        raise Exception(f"Failed to process document: {str(error)}")
+        logger.error(f"Error registering vendor profile: {error}")
+        raise Exception(f"Failed to register vendor profile: {str(error)}")
 
+@traced("classify")
 def classify_document_simple(text_content: str, filename: str) -> str:
     """
     Simple document classification based on keywords
@@ -565,6 +825,7 @@ def classify_document_simple(text_content: str, filename: str) -> str:
     # Default to general document
     return "general"
 
+@traced("structured_extraction")
 def extract_general_document_data(text_content: str, filename: str) -> dict:
     """
     Extract general document data when no specialized extractor applies
@@ -630,6 +891,7 @@ def extract_general_document_data(text_content: str, filename: str) -> dict:
     
     return general_doc
 
+@traced("save_json")
 def save_general_json(data: dict, filename: str) -> str:
     """
     Save general document data to JSON file
@@ -637,9 +899,10 @@ def save_general_json(data: dict, filename: str) -> str:
     import json
     from pathlib import Path
     from datetime import datetime
+    from index import OUTPUT_DIR
     
     # Create output directory if it doesn't exist
-    output_dir = Path("/Users/andrew/Projects/claudecode1/output/general")
+    output_dir = OUTPUT_DIR / "general"
     output_dir.mkdir(parents=True, exist_ok=True)
     
     # Generate output filename
@@ -688,14 +951,31 @@ Available tools:
 - 'extractDocumentData': Universal document processor - automatically routes to specialized extractors
 - 'extractInvoiceData': Extract both raw text AND structured invoice data (specialized)
 - 'extractbrokerage': Extract both raw text AND structured brokerage statement data (specialized)
+- 'reprocessDocuments': Re-run structured extraction from cached OCR text after a template/prompt change
+- 'registerVendorProfile': Register a recurring vendor layout for fast-path extraction
+- 'extractDocumentsPacked': Process many documents, packing single-page ones into shared Vision requests
 
 Output files are saved to: 
 - Invoices: /Users/andrew/Projects/claudecode1/output/invoices/
 - Brokerage: /Users/andrew/Projects/claudecode1/output/brokerage/
 - General: /Users/andrew/Projects/claudecode1/output/general/
+- OCR text: /Users/andrew/Projects/claudecode1/output/ocr/
+- Traces: /Users/andrew/Projects/claudecode1/output/traces/vision_traces.jsonl (per-stage latency in 'vision://metrics')
 """
 
+@mcp.resource("vision://metrics")
+def get_metrics() -> str:
+    """Rolling p50/p95/p99 latency per pipeline stage, plus dropped/sampled log records"""
+    return json.dumps({"stages": stage_percentiles(), "logging": logging_stats()}, indent=2)
+
+@mcp.resource("vision://vendor-profiles")
+def get_vendor_profiles() -> str:
+    """Registered vendor layout profiles used for fast-path extraction"""
+    return json.dumps(load_vendor_profiles(), indent=2)
+
 if __name__ == "__main__":
+    # Log writes happen on a background thread from here on
+    start_async_logging()
     logger.info("Starting Vision MCP server...")
     # Run the server
     mcp.run()
\ No newline at end of file
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Test the end-to-end pipeline benchmark with the mock backend (no OpenAI calls)
+"""
+
+import os
+import sys
+import json
+import tempfile
+import subprocess
+from pathlib import Path
+
+from PIL import Image
+
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+sys.path.insert(0, str(Path(__file__).parent))
+
+from benchmark_pipeline import MockBackend, ReplayBackend, compare_to_baseline, request_key
+
+def test_compare_to_baseline():
+    """Only changes in the bad direction beyond the threshold are regressions"""
+    print("🧪 Testing baseline comparison")
+
+    baseline = {
+        "summary": {"pages_per_sec": 10.0, "peak_rss_mb": 200.0, "request_bytes": 1000, "total_tokens": 500,
+                    "total_cost": 0.01},
+        "stages": {"preprocess": {"p95_ms": 100.0}, "save_json": {"p95_ms": 0.5}}
+    }
+    report = {
+        "summary": {"pages_per_sec": 7.0, "peak_rss_mb": 150.0, "request_bytes": 1100, "total_tokens": 500,
+                    "total_cost": 0.01},
+        "stages": {"preprocess": {"p95_ms": 150.0}, "save_json": {"p95_ms": 5.0}}
+    }
+    regressions = {r["metric"]: r for r in compare_to_baseline(report, baseline, threshold=0.2)}
+
+    # Slower throughput and a slower stage fail; lower RSS and a 10% byte increase do not,
+    # and stages under MIN_STAGE_MS are ignored
+    assert set(regressions) == {"pages_per_sec", "stages.preprocess.p95_ms"}
+    assert regressions["pages_per_sec"]["change"] == -0.3
+
+    print("✅ Regressions detected against the baseline")
+
+def test_replay_backend():
+    """Replayed responses are matched by request hash and accounted like live ones"""
+    print("🧪 Testing replay backend")
+
+    request = {"model": "gpt-4.1-mini", "messages": [{"role": "user", "content": "hello"}], "temperature": 0}
+    with tempfile.TemporaryDirectory() as temp_dir:
+        cassette = Path(temp_dir) / "cassette.jsonl"
+        recorded = MockBackend().respond(request)
+        cassette.write_text(json.dumps({"key": request_key(request), "response": recorded}) + "\n")
+        backend = ReplayBackend(cassette)
+
+        response = backend.create(**request)
+        assert response.choices[0].message.content == recorded["content"]
+        assert backend.requests == 1 and backend.prompt_tokens == recorded["prompt_tokens"]
+        try:
+            backend.create(**{**request, "temperature": 1})
+            assert False, "unrecorded request should fail"
+        except Exception as e:
+            assert "No recorded response" in str(e)
+
+    print("✅ Responses replayed from the cassette")
+
+def test_benchmark_run():
+    """A mock run reports throughput and stages, and a worse run fails against the baseline"""
+    print("🧪 Testing benchmark run")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        documents = Path(temp_dir) / "documents"
+        documents.mkdir()
+        pages = [Image.new('RGB', (850, 1100), 'white') for _ in range(3)]
+        pages[0].save(documents / "fidelity_statement.tif", save_all=True, append_images=pages[1:])
+        Image.new('RGB', (850, 1100), 'white').save(documents / "invoice_1001.png")
+        baseline = Path(temp_dir) / "baseline.json"
+        command = [sys.executable, str(Path(__file__).parent / "benchmark_pipeline.py"),
+                   "--documents", str(documents), "--baseline", str(baseline),
+                   "--report-dir", str(Path(temp_dir) / "reports")]
+
+        # Without a baseline there is nothing to gate on, which is not a pass
+        result = subprocess.run(command, capture_output=True, text=True, timeout=300)
+        assert result.returncode == 2 and "No baseline" in result.stdout, result.stdout[-2000:] + result.stderr[-2000:]
+
+        result = subprocess.run(command + ["--update-baseline"], capture_output=True, text=True, timeout=300)
+        assert result.returncode == 0, result.stdout[-2000:] + result.stderr[-2000:]
+        recorded = json.loads(baseline.read_text())
+        summary = recorded["summary"]
+        # The statement's last page is triaged as a disclosure and skipped
+        assert summary["documents"] == 2 and summary["failed"] == 0 and summary["pages"] == 3
+        assert summary["pages_per_sec"] > 0 and summary["peak_rss_mb"] > 0 and summary["request_bytes"] > 0
+        assert summary["total_tokens"] > 0 and summary["total_cost"] > 0
+        assert {"extractDocumentData", "rasterize", "vision_request", "structured_request"} <= set(recorded["stages"])
+
+        # A baseline that was far cheaper makes this run a regression
+        summary["total_tokens"] //= 2
+        baseline.write_text(json.dumps(recorded))
+        result = subprocess.run(command, capture_output=True, text=True, timeout=300)
+        assert result.returncode == 1 and "total_tokens" in result.stdout
+
+    print("✅ Benchmark reported and compared")
+
+if __name__ == "__main__":
+    test_compare_to_baseline()
+    test_replay_backend()
+    test_benchmark_run()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Test offline bulk mode with the local batch backend (no OpenAI calls)
+"""
+
+import os
+import sys
+import json
+import tempfile
+from pathlib import Path
+
+from PIL import Image
+
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+sys.path.insert(0, str(Path(__file__).parent))
+
+import index
+from bulk import BatchBackend, LocalBatchBackend, run_bulk_import, write_batch_files
+
+INVOICE_JSON = {
+    "invoice_metadata": {"invoice_number": "INV-1"},
+    "line_items": [{"description": "Widget", "quantity": 2, "unit_price": 5.0, "line_total": 10.0}],
+    "totals": {"subtotal": 10.0, "total_amount": 10.0}
+}
+
+class FakeHandler:
+    """Chat completion dictionaries for batch request bodies; the second structured request is truncated"""
+    def __init__(self):
+        self.structured_calls = 0
+
+    def __call__(self, body):
+        finish_reason = "stop"
+        if body["messages"][0]["role"] == "system":
+            self.structured_calls += 1
+            content = "```json\n" + json.dumps(INVOICE_JSON) + "\n```"
+            if self.structured_calls == 2:
+                content, finish_reason = '{"invoice_metadata": {"invoice_number": "INV-', "length"
+        else:
+            content = "INVOICE INV-1\nWidget 2 x 5.00 10.00\nTotal 10.00"
+        return {
+            "model": "gpt-4.1-mini",
+            "choices": [{"message": {"role": "assistant", "content": content}, "finish_reason": finish_reason}],
+            "usage": {"prompt_tokens": 1000, "completion_tokens": 100, "total_tokens": 1100}
+        }
+
+def test_bulk_import_local_backend():
+    """Two batches run end to end and results are joined back per document"""
+    print("🧪 Testing bulk import through the local batch backend")
+
+    original_output_dir = index.OUTPUT_DIR
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        index.OUTPUT_DIR = Path(temp_dir)
+        # Two-page scans as multi-page TIFFs
+        file_paths = []
+        for name in ["good", "broken"]:
+            file_path = Path(temp_dir) / f"{name}.tif"
+            pages = [Image.new('RGB', (400, 500), 'white') for _ in range(2)]
+            pages[0].save(file_path, save_all=True, append_images=pages[1:])
+            file_paths.append(str(file_path))
+        corrupt_path = Path(temp_dir) / "corrupt.pdf"
+        corrupt_path.write_bytes(b"%PDF-1.4 not really a pdf")
+        file_paths.insert(1, str(corrupt_path))
+        try:
+            # Three requests per batch file: the four OCR pages need two jobs
+            summary = run_bulk_import(file_paths, "invoice",
+                                      backend=LocalBatchBackend(handler=FakeHandler(), max_workers=1),
+                                      poll_interval=0.01, max_batch_requests=3)
+
+            work_dir = Path(summary["work_dir"])
+            requests = [json.loads(line) for name in ["ocr_requests_001.jsonl", "ocr_requests_002.jsonl"]
+                        for line in open(work_dir / name)]
+            assert [r["custom_id"] for r in requests] == ["ocr-0-p1", "ocr-0-p2", "ocr-2-p1", "ocr-2-p2"]
+            assert requests[0]["url"] == "/v1/chat/completions"
+            assert (work_dir / "ocr_results_002.jsonl").exists()
+            assert not (work_dir / "ocr_requests_003.jsonl").exists()
+            assert (work_dir / "summary.json").exists()
+
+            assert summary["documents"] == 3
+            assert summary["processed"] == 1 and summary["failed"] == 2
+            failures = {failure["filename"]: failure for failure in summary["failures"]}
+            assert "Could not read document" in failures["corrupt.pdf"]["error"]
+            assert failures["corrupt.pdf"]["ocr_file"] is None
+            assert "truncated" in failures["broken.tif"]["error"]
+            assert Path(failures["broken.tif"]["ocr_file"]).exists()
+
+            saved = json.load(open(summary["results"][0]["output_file"]))
+            assert saved["invoice_metadata"]["source_file_name"] == "good.tif"
+            assert summary["results"][0]["overall_status"] == "PASS"
+
+            # 4 OCR pages + 2 structured requests at half price
+            full_price = index.calculate_cost("gpt-4.1-mini", 1000, 100)["total_cost"]
+            assert abs(summary["total_cost"] - round(6 * full_price * 0.5, 6)) < 1e-6
+        finally:
+            index.OUTPUT_DIR = original_output_dir
+
+    print(f"✅ Bulk import processed {summary['processed']} document, recorded {summary['failed']} failure")
+
+def test_batch_file_caps():
+    """Batch files are split at the request and byte caps, and backends must implement the interface"""
+    requests = [{"custom_id": f"r{i}", "body": {"text": "x" * 100}} for i in range(5)]
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        by_count = write_batch_files(iter(requests), Path(temp_dir), "count", max_requests=2)
+        assert [ids for _, ids in by_count] == [["r0", "r1"], ["r2", "r3"], ["r4"]]
+
+        line_bytes = Path(by_count[2][0]).stat().st_size
+        by_size = write_batch_files(requests, Path(temp_dir), "size", max_bytes=2 * line_bytes + 1)
+        assert [len(ids) for _, ids in by_size] == [2, 2, 1]
+        assert all(path.stat().st_size <= 2 * line_bytes + 1 for path, _ in by_size)
+
+        assert write_batch_files([], Path(temp_dir), "empty") == []
+
+    class Incomplete(BatchBackend):
+        def submit(self, requests_file):
+            return "job"
+    try:
+        Incomplete()
+        assert False, "backends must implement status and download_results"
+    except TypeError:
+        pass
+
+if __name__ == "__main__":
+    test_bulk_import_local_backend()
+    test_batch_file_caps()
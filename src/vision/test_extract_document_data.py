@@ -55,12 +55,21 @@ def test_document_classification_logic():
     import sys
     sys.path.append(str(Path(__file__).parent))
     from server import classify_document_simple
-    
-    for test in test_cases:
-        result = classify_document_simple(test["text"], "test.pdf")
-        status = "✅" if result == test["expected"] else "❌"
-        print(f"{status} {test['name']}: Expected '{test['expected']}', Got '{result}'")
-    
+    import index
+    import tempfile
+
+    # Classification is traced; keep the exported trace out of the real output directory
+    original_output_dir = index.OUTPUT_DIR
+    with tempfile.TemporaryDirectory() as temp_dir:
+        index.OUTPUT_DIR = Path(temp_dir)
+        try:
+            for test in test_cases:
+                result = classify_document_simple(test["text"], "test.pdf")
+                status = "✅" if result == test["expected"] else "❌"
+                print(f"{status} {test['name']}: Expected '{test['expected']}', Got '{result}'")
+        finally:
+            index.OUTPUT_DIR = original_output_dir
+
     print()
 
 def demonstrate_usage():
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Startup profile of the Vision server (python -X importtime, no OpenAI calls)
+
+MCP clients spawn the server per session, so everything imported by server.py is
+on the handshake path. Heavy dependencies must stay deferred until the first tool
+call, and the server's own import cost (excluding the MCP framework) stays within
+VISION_IMPORT_BUDGET_MS.
+"""
+
+import os
+import re
+import sys
+import subprocess
+from pathlib import Path
+from typing import Dict, Tuple
+
+# Loaded on first use, never at import
+DEFERRED_MODULES = ["openai", "numpy", "pdf2image", "PIL.Image", "PIL.ImageOps", "requests"]
+IMPORT_BUDGET_MS = float(os.getenv("VISION_IMPORT_BUDGET_MS", "400"))
+
+LINE_PATTERN = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+def profile_import(module: str, cwd: Path) -> Dict[str, Tuple[float, int]]:
+    """Cumulative import time in ms and nesting depth per module, from python -X importtime"""
+    env = {**os.environ, "OPENAI_API_KEY": os.environ.get("OPENAI_API_KEY", "test-key")}
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=cwd, env=env, capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr[-2000:]
+
+    timings = {}
+    for line in result.stderr.splitlines():
+        match = LINE_PATTERN.match(line)
+        if match:
+            timings[match.group(4)] = (int(match.group(2)) / 1000, (len(match.group(3)) - 1) // 2)
+    return timings
+
+def test_server_import_profile():
+    """Importing server.py loads no heavy dependencies and stays within budget"""
+    print("🧪 Testing Vision server import profile")
+
+    timings = profile_import("server", Path(__file__).parent)
+
+    eager = [name for name in timings
+             if any(name == module or name.startswith(module + ".") for module in DEFERRED_MODULES)]
+    assert not eager, f"Imported at startup: {eager}"
+
+    total_ms = timings["server"][0]
+    framework_ms = timings.get("mcp.server.fastmcp", (0.0, 0))[0]
+    own_ms = total_ms - framework_ms
+    # Direct imports of server.py, slowest first
+    slowest = sorted(((ms, name) for name, (ms, depth) in timings.items()
+                      if depth == 1 and not name.startswith("mcp")), reverse=True)[:5]
+    print(f"   server: {total_ms:.0f} ms (MCP framework {framework_ms:.0f} ms, own {own_ms:.0f} ms)")
+    for ms, name in slowest:
+        print(f"   {name}: {ms:.0f} ms")
+    assert own_ms < IMPORT_BUDGET_MS, f"Vision server import took {own_ms:.0f} ms (budget {IMPORT_BUDGET_MS:.0f} ms)"
+
+    print("✅ Heavy dependencies deferred to first use")
+
+if __name__ == "__main__":
+    test_server_import_profile()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Test continuation of truncated structured extraction output (no OpenAI calls)
+"""
+
+import os
+import sys
+import json
+import tempfile
+from pathlib import Path
+from types import SimpleNamespace
+
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+sys.path.insert(0, str(Path(__file__).parent))
+
+import index
+from json_continuation import find_resume_point, join_continuation
+
+FULL_STATEMENT = {
+    "statement_metadata": {"institution": "Fidelity"},
+    "accounts": [
+        {"account_number": "X12-345", "holdings": [
+            {"ticker": "AAPL", "quantity": 5, "market_value": 500.0},
+            {"ticker": "MSFT", "quantity": 2, "market_value": 1000.0},
+            {"ticker": "VTI", "quantity": 4, "market_value": 800.0}
+        ]}
+    ],
+    "statement_total_value": 2300.0
+}
+
+class TruncatingCompletions:
+    """Returns the statement JSON in pieces, cut off mid-holding like a max_tokens stop"""
+    def __init__(self, text: str, chunk: int):
+        self.text = text
+        self.chunk = chunk
+        self.requests = []
+
+    def create(self, **kwargs):
+        self.requests.append(kwargs["messages"])
+        if len(kwargs["messages"]) == 2:
+            content, finish_reason = self.text[:self.chunk], "length"
+        else:
+            written = kwargs["messages"][-2]["content"]
+            remaining = self.text[len(written):]
+            content = remaining[:self.chunk]
+            finish_reason = "length" if len(remaining) > self.chunk else "stop"
+        return SimpleNamespace(
+            model="gpt-4.1-mini",
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content), finish_reason=finish_reason)],
+            usage=SimpleNamespace(prompt_tokens=1000, completion_tokens=100, total_tokens=1100)
+        )
+
+def test_find_resume_point():
+    """The cut lands after the last complete element and names its path"""
+    print("🧪 Testing resume point detection")
+
+    text = json.dumps(FULL_STATEMENT)
+    partial = text[:text.index('"VTI"') + 8]
+    cut, path = find_resume_point(partial)
+    assert path == "$.accounts[0].holdings[2].ticker"
+    assert partial[:cut].endswith('"VTI"')
+
+    # A number cut mid-way is not complete
+    partial = text[:text.index('1000.0') + 3]
+    cut, path = find_resume_point(partial)
+    assert path == "$.accounts[0].holdings[1].quantity"
+    assert partial[:cut].endswith('"quantity": 2')
+
+    cut, path = find_resume_point('{"statement_metadata": {"institution": "Fid')
+    assert path is None
+
+    assert find_resume_point(text) == (len(text), "$")
+    assert join_continuation('{"a": [1', '```json\n, 2]}\n```') == '{"a": [1, 2]}'
+
+    print("✅ Resume points are found at complete elements")
+
+def test_brokerage_extraction_continues_after_truncation():
+    """Truncated brokerage output is continued and stitched into complete JSON"""
+    print("🧪 Testing continuation of truncated brokerage extraction")
+
+    completions = TruncatingCompletions(json.dumps(FULL_STATEMENT), chunk=120)
+    original_client = index.client
+    original_output_dir = index.OUTPUT_DIR
+    index.client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    with tempfile.TemporaryDirectory() as temp_dir:
+        index.OUTPUT_DIR = Path(temp_dir)
+        try:
+            result = index.extract_structured_brokerage_data("statement text", "Statement.pdf",
+                                                              template={"accounts": []})
+        finally:
+            index.client = original_client
+            index.OUTPUT_DIR = original_output_dir
+
+    data = result["structured_data"]
+    assert [h["ticker"] for h in data["accounts"][0]["holdings"]] == ["AAPL", "MSFT", "VTI"]
+    assert data["statement_total_value"] == 2300.0
+    assert 1 < len(completions.requests) <= 1 + index.MAX_CONTINUATION_ROUNDS
+    assert "JSON path $." in completions.requests[1][-1]["content"]
+
+    # Usage from every round is billed
+    single_call = index.calculate_cost("gpt-4.1-mini", 1000, 100)["total_cost"]
+    assert result["extraction_cost"]["total_cost"] > single_call
+
+    print(f"✅ Completed in {len(completions.requests)} requests")
+
+if __name__ == "__main__":
+    test_find_resume_point()
+    test_brokerage_extraction_continues_after_truncation()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Test the local OCR tier with a stand-in backend (no Tesseract or OpenAI calls)
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from local_ocr import register_ocr_backend, score_page_difficulty, run_local_ocr_tier
+
+def confident_backend(image):
+    """Pretends to read clean pages confidently"""
+    return {"text": "INVOICE 236546\nCNA shift 10 $45.00 $450.00", "confidence": 93.0}
+
+def unsure_backend(image):
+    return {"text": "lNV0ICE 2365 ..", "confidence": 41.0}
+
+register_ocr_backend("confident", confident_backend)
+register_ocr_backend("unsure", unsure_backend)
+
+def make_clean_page() -> Image.Image:
+    image = Image.new('RGB', (850, 1100), 'white')
+    draw = ImageDraw.Draw(image)
+    for row in range(20):
+        draw.text((60, 80 + row * 40), f"Line item {row}   10   $45.00   $450.00", fill='black')
+    return image
+
+def make_photo_page() -> Image.Image:
+    """Shaded, noisy page like a phone photo of a receipt"""
+    rng = np.random.default_rng(0)
+    pixels = np.clip(rng.normal(128, 40, (1100, 850)), 0, 255).astype(np.uint8)
+    return Image.fromarray(pixels).convert('RGB')
+
+def test_quality_model_orders_pages():
+    """Clean typed pages rate easier than noisy photos"""
+    print("🧪 Testing local quality model")
+
+    clean = score_page_difficulty(make_clean_page())
+    photo = score_page_difficulty(make_photo_page())
+    assert clean < 0.4 < photo
+
+    print(f"✅ Difficulty clean={clean:.2f}, photo={photo:.2f}")
+
+def test_local_tier_accepts_and_escalates():
+    """Easy, confident pages stay local; hard or unsure pages go to Vision"""
+    print("🧪 Testing local OCR tier routing")
+
+    images = [make_clean_page(), make_photo_page(), make_clean_page()]
+    pages = [1, 2, 3]
+
+    accepted = run_local_ocr_tier(images, pages, backend="confident", max_workers=2)
+    assert sorted(accepted) == [1, 3]
+    assert accepted[1]["ocr_engine"] == "confident"
+    assert accepted[1]["cost"]["total_cost"] == 0.0
+    assert accepted[1]["token_usage"] is None
+
+    assert run_local_ocr_tier(images, pages, backend="unsure", max_workers=1) == {}
+    assert run_local_ocr_tier(images, pages, backend="") == {}
+
+    print("✅ Local tier routes pages correctly")
+
+if __name__ == "__main__":
+    test_quality_model_orders_pages()
+    test_local_tier_accepts_and_escalates()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Test queue-backed, sampled logging and background debug artifacts
+"""
+
+import sys
+import queue
+import logging
+import tempfile
+import threading
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import log_pipeline
+from log_pipeline import (BoundedQueueHandler, SamplingFilter, TruncatingQueueListener, parse_sample_rates,
+                          write_debug_artifact)
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(self.format(record))
+
+class ThreadRecordingArg:
+    """Log argument that records which thread rendered it"""
+    def __init__(self):
+        self.rendered_in = []
+
+    def __str__(self):
+        self.rendered_in.append(threading.current_thread().name)
+        return "rendered"
+
+def test_sampling_and_size_caps():
+    """Sampled-out categories never reach the writer; long messages are truncated by the listener"""
+    print("🧪 Testing sampled queue logging")
+
+    assert parse_sample_rates("response_preview=0.05, page_detail=2") == {"response_preview": 0.05, "page_detail": 1.0}
+
+    sink = ListHandler()
+    handler = BoundedQueueHandler(queue.Queue(100))
+    sampling = SamplingFilter({"response_preview": 0.0})
+    handler.addFilter(sampling)
+    listener = TruncatingQueueListener(handler.queue, sink, max_chars=50)
+    arg = ThreadRecordingArg()
+
+    test_logger = logging.getLogger("test_log_pipeline")
+    test_logger.propagate = False
+    test_logger.setLevel(logging.INFO)
+    test_logger.addHandler(handler)
+    listener.start()
+    try:
+        test_logger.info("kept %s", "message")
+        test_logger.info("Response preview: %s", "x" * 10000, extra={"category": "response_preview"})
+        test_logger.info("y" * 500)
+        test_logger.info("arg %s", arg)
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            test_logger.exception("failed")
+    finally:
+        listener.stop()
+        test_logger.removeHandler(handler)
+
+    assert sink.messages[0] == "kept message"
+    assert len(sink.messages) == 4 and sampling.sampled_out == 1
+    assert sink.messages[1].startswith("y" * 50 + "...") and "450 chars truncated" in sink.messages[1]
+    # Arguments and tracebacks are rendered on the listener thread, not the caller's
+    assert sink.messages[2] == "arg rendered"
+    assert arg.rendered_in and threading.current_thread().name not in arg.rendered_in
+    assert sink.messages[3].startswith("failed\nTraceback") and "ValueError: boom" in sink.messages[3]
+
+    # A full queue drops records instead of blocking the caller
+    full = BoundedQueueHandler(queue.Queue(1))
+    for _ in range(3):
+        full.handle(logging.LogRecord("t", logging.INFO, __file__, 1, "msg", None, None))
+    assert full.dropped == 2
+
+    print("✅ Records sampled, capped and dropped without blocking")
+
+def test_debug_artifacts():
+    """Debug artifacts are skipped unless enabled, then written in the background"""
+    print("🧪 Testing debug artifacts")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        artifact = Path(temp_dir) / "debug" / "response.txt"
+        original = log_pipeline.DEBUG_ARTIFACTS_ENABLED
+        try:
+            log_pipeline.DEBUG_ARTIFACTS_ENABLED = False
+            assert write_debug_artifact(artifact, "raw") is None
+            assert not artifact.exists()
+
+            log_pipeline.DEBUG_ARTIFACTS_ENABLED = True
+            write_debug_artifact(artifact, "raw response").result(timeout=5)
+            assert artifact.read_text() == "raw response"
+        finally:
+            log_pipeline.DEBUG_ARTIFACTS_ENABLED = original
+
+    print("✅ Debug artifacts written only when enabled")
+
+if __name__ == "__main__":
+    test_sampling_and_size_caps()
+    test_debug_artifacts()
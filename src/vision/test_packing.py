@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Test packing single-page documents into shared Vision requests (no OpenAI calls)
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+from types import SimpleNamespace
+
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+sys.path.insert(0, str(Path(__file__).parent))
+
+import index
+from packing import (
+    plan_batches, split_packed_response, extract_packed_batch, extract_text_packed, prepare_single_page_document
+)
+
+class PackedCompletions:
+    """Answers a packed request with one delimited section per image, optionally dropping one"""
+    def __init__(self, skip=None):
+        self.skip = skip
+        self.requests = []
+        self.kwargs = []
+
+    def create(self, **kwargs):
+        content = kwargs["messages"][0]["content"]
+        self.requests.append(content)
+        self.kwargs.append(kwargs)
+        image_count = sum(1 for part in content if part["type"] == "image_url")
+        if image_count == 1:
+            text = "Receipt text (single)"
+        else:
+            text = "Here you go:\n" + "\n".join(
+                f"=== DOCUMENT {n} ===\nReceipt {n} total $1{n}.00"
+                for n in range(1, image_count + 1) if n != self.skip
+            )
+        return SimpleNamespace(
+            model="gpt-4.1-mini",
+            choices=[SimpleNamespace(message=SimpleNamespace(content=text), finish_reason="stop")],
+            usage=SimpleNamespace(prompt_tokens=3000, completion_tokens=300, total_tokens=3300,
+                                  prompt_tokens_details=SimpleNamespace(cached_tokens=1000))
+        )
+
+def make_documents(tokens):
+    return [
+        {"file_path": f"/docs/receipt{i}.pdf", "filename": f"receipt{i}.pdf",
+         "image_urls": [f"data:image/png;base64,{i}"], "tokens": t}
+        for i, t in enumerate(tokens, start=1)
+    ]
+
+def test_plan_batches_respects_budget():
+    """Batches never exceed the token budget or document cap"""
+    print("🧪 Testing packed batch planning")
+
+    batches = list(plan_batches(make_documents([1000, 1500, 2000, 9000, 500]), token_budget=4000, max_documents=8))
+    assert [[d["filename"] for d in batch] for batch in batches] == [
+        ["receipt1.pdf", "receipt2.pdf"], ["receipt3.pdf"], ["receipt4.pdf"], ["receipt5.pdf"]
+    ]
+    assert len(list(plan_batches(make_documents([100] * 10), token_budget=4000, max_documents=4))) == 3
+
+    sections = split_packed_response("intro\n=== DOCUMENT 1 ===\nA\n=== DOCUMENT 2 ===\nB\n=== DOCUMENT 7 ===\nX", 2)
+    assert sections == {1: "A", 2: "B"}
+
+    print("✅ Batches are planned within budget")
+
+def test_packed_request_splits_per_document():
+    """One request serves several documents; a missing section is re-run alone"""
+    print("🧪 Testing packed extraction")
+
+    completions = PackedCompletions(skip=2)
+    original_client, original_output_dir = index.client, index.OUTPUT_DIR
+    index.client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    with tempfile.TemporaryDirectory() as temp_dir:
+        index.OUTPUT_DIR = Path(temp_dir)
+        try:
+            results = extract_packed_batch(make_documents([1000, 1000, 2000]))
+        finally:
+            index.client, index.OUTPUT_DIR = original_client, original_output_dir
+
+    assert len(completions.requests) == 2
+    assert [r["filename"] for r in results] == ["receipt1.pdf", "receipt2.pdf", "receipt3.pdf"]
+    assert results[0]["extracted_text"][0]["text"] == "Receipt 1 total $11.00"
+    assert results[1]["extracted_text"][0]["text"] == "Receipt text (single)"
+    assert results[2]["packed_batch"] == {"documents": 3, "position": 3}
+
+    # Shared usage is split by image tokens
+    assert results[2]["total_cost_summary"]["total_input_tokens"] == 1500
+    assert results[0]["total_cost_summary"]["total_input_tokens"] == 750
+    assert results[2]["total_cost_summary"]["total_cached_tokens"] == 500
+    assert completions.kwargs[0]["temperature"] == 0
+
+    print("✅ Packed response split back per document")
+
+class FailingFirstCompletions(PackedCompletions):
+    """Fails the first request, then answers like PackedCompletions"""
+    def create(self, **kwargs):
+        if not self.requests:
+            self.requests.append(None)
+            raise RuntimeError("upstream 500")
+        return super().create(**kwargs)
+
+def test_errors_stay_per_document():
+    """An unreadable document or a failed packed request does not lose the other results"""
+    print("🧪 Testing per-document packing errors")
+
+    from PIL import Image, ImageDraw
+
+    completions = FailingFirstCompletions()
+    original_client, original_output_dir = index.client, index.OUTPUT_DIR
+    index.client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    with tempfile.TemporaryDirectory() as temp_dir:
+        index.OUTPUT_DIR = Path(temp_dir) / "output"
+        try:
+            paths = []
+            for i in range(3):
+                image = Image.new('RGB', (400, 600), 'white')
+                ImageDraw.Draw(image).rectangle([50, 50 + 20 * i, 300, 80 + 20 * i], fill='black')
+                path = Path(temp_dir) / f"receipt{i}.png"
+                image.save(path)
+                paths.append(str(path))
+            corrupt = Path(temp_dir) / "corrupt.pdf"
+            corrupt.write_bytes(b"not a pdf")
+            paths.insert(1, str(corrupt))
+
+            # Two receipts fit a request; the first request fails
+            tokens = prepare_single_page_document(paths[0])["tokens"]
+            packed = extract_text_packed(paths, token_budget=2 * tokens)
+        finally:
+            index.client, index.OUTPUT_DIR = original_client, original_output_dir
+
+    assert set(packed["errors"]) == {paths[0], paths[1], paths[2]}
+    assert "Could not read document" in packed["errors"][paths[1]]
+    assert "upstream 500" in packed["errors"][paths[0]]
+    assert list(packed["results"]) == [paths[3]]
+    assert packed["requests"] == 2
+
+    print("✅ Failed documents reported, the rest extracted")
+
+if __name__ == "__main__":
+    test_plan_batches_respects_budget()
+    test_packed_request_splits_per_document()
+    test_errors_stay_per_document()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Test direct image and multi-page TIFF input (no OpenAI calls)
+"""
+
+import os
+import sys
+import base64
+import tempfile
+from pathlib import Path
+from types import SimpleNamespace
+
+from PIL import Image
+
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+sys.path.insert(0, str(Path(__file__).parent))
+
+import index
+from page_source import count_pages, iter_pages, chunked, _contiguous_chunks
+
+class EchoCompletions:
+    """Returns the number of images it was sent"""
+    def __init__(self):
+        self.requests = []
+
+    def create(self, **kwargs):
+        self.requests.append(kwargs)
+        images = [part for part in kwargs["messages"][0]["content"] if part["type"] == "image_url"]
+        return SimpleNamespace(
+            model="gpt-4.1-mini",
+            choices=[SimpleNamespace(message=SimpleNamespace(content=f"{len(images)} image(s)"), finish_reason="stop")],
+            usage=SimpleNamespace(prompt_tokens=1000, completion_tokens=50, total_tokens=1050,
+                                  prompt_tokens_details=None)
+        )
+
+def test_image_frames():
+    """PNG/JPEG pass their bytes through; TIFF frames are streamed and rotated upright"""
+    print("🧪 Testing image page sources")
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        photo = Path(temp_dir) / "photo.jpg"
+        Image.new('RGB', (300, 400), 'white').save(photo, quality=80)
+        page = next(iter_pages(str(photo)))
+        assert page["data_url"] == "data:image/jpeg;base64," + base64.b64encode(photo.read_bytes()).decode()
+        assert page["image"].size == (300, 400)
+        # Decoded and detached, so the file is not held open
+        assert getattr(page["image"], "fp", None) is None
+
+        # Rotated phone photo: decoded and turned upright, original bytes not usable
+        rotated = Path(temp_dir) / "rotated.jpg"
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        Image.new('RGB', (400, 300), 'white').save(rotated, exif=exif)
+        page = next(iter_pages(str(rotated)))
+        assert page["data_url"] is None and page["image"].size == (300, 400)
+
+        scan = Path(temp_dir) / "scan.tif"
+        frames = [Image.new('L', (200, 260), shade) for shade in (10, 20, 30, 40, 50)]
+        frames[0].save(scan, save_all=True, append_images=frames[1:])
+        assert count_pages(str(scan)) == 5
+
+        pages = iter_pages(str(scan), pages=[2, 4, 9])
+        first = next(pages)
+        assert first["page"] == 2 and first["image"].mode == 'RGB' and first["image"].getpixel((0, 0))[0] == 20
+        assert [page["page"] for page in pages] == [4]
+
+        thumbnails = list(iter_pages(str(scan), dpi=50))
+        assert thumbnails[0]["image"].size == (50, 65)
+
+    assert list(_contiguous_chunks([1, 2, 3, 5, 6, 9], 2)) == [[1, 2], [3], [5, 6], [9]]
+    assert [len(chunk) for chunk in chunked(range(7), 3)] == [3, 3, 1]
+
+    print("✅ Image pages read without a PDF round trip")
+
+def test_extract_tiff():
+    """extract_pdf_text takes a multi-page TIFF through the normal page pipeline"""
+    print("🧪 Testing TIFF extraction")
+
+    completions = EchoCompletions()
+    original_client, original_output_dir = index.client, index.OUTPUT_DIR
+    index.client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    with tempfile.TemporaryDirectory() as temp_dir:
+        index.OUTPUT_DIR = Path(temp_dir)
+        scan = Path(temp_dir) / "scan.tiff"
+        frames = [Image.new('RGB', (850, 1100), 'white') for _ in range(3)]
+        frames[0].save(scan, save_all=True, append_images=frames[1:])
+        try:
+            result = index.extract_pdf_text(str(scan), pages=[1, 3])
+        finally:
+            index.client, index.OUTPUT_DIR = original_client, original_output_dir
+
+    assert result["filename"] == "scan.tiff"
+    assert result["total_pages"] == 3 and result["pages_extracted"] == [1, 3]
+    assert [page["page"] for page in result["extracted_text"]] == [1, 3]
+    assert len(completions.requests) == 2
+
+    print("✅ TIFF frames extracted page by page")
+
+if __name__ == "__main__":
+    test_image_frames()
+    test_extract_tiff()
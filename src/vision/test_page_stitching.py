@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Test cross-page stitching of OCR text (no OpenAI calls)
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from page_stitching import stitch_page_text
+
+PAGES = [
+    {"page": 1, "text": """Clipboard Health (Twomagnets Inc.)
+INVOICE 236546
+Page 1 of 2
+
+| Date | Description | Qty | Rate | Amount |
+|---|---|---|---|---|
+| 04/01/2025 | CNA shift - Sunrise Care | 10 | $45.00 | $450.00 |
+| 04/02/2025 | LVN shift - Sunrise Care |
+Continued on next page - Page subtotal $450.00"""},
+    {"page": 2, "text": """Clipboard Health (Twomagnets Inc.)
+INVOICE 236546
+Page 2 of 2
+Subtotal brought forward $450.00
+
+| Date | Description | Qty | Rate | Amount |
+|---|---|---|---|---|
+| night differential | 10 | $70.00 | $700.00 |
+| 04/03/2025 | CNA shift - Sunrise Care | 10 | $45.00 | $450.00 |
+
+Subtotal $1,600.00
+Total $1,600.00"""}
+]
+
+def test_stitch_multi_page_table():
+    """Headers, carried-forward subtotals and split rows are cleaned across the page break"""
+    print("🧪 Testing cross-page line-item stitching")
+
+    result = stitch_page_text(PAGES)
+    text, report = result["text"], result["report"]
+
+    assert text.count("| Date | Description |") == 1
+    assert text.count("INVOICE 236546") == 1
+    assert "Page 2 of 2" not in text
+    assert "brought forward" not in text and "Continued" not in text
+    assert "| 04/02/2025 | LVN shift - Sunrise Care night differential | 10 | $70.00 | $700.00 |" in text
+    assert "| 04/03/2025 | CNA shift - Sunrise Care | 10 | $45.00 | $450.00 |" in text
+    assert "Total $1,600.00" in text
+
+    assert report["removed_table_headers"] == 1
+    assert report["removed_carry_forward_lines"] == 2
+    assert report["joined_split_rows"] == 1
+    assert report["stitched_chars"] < report["original_chars"]
+
+    print(f"✅ Stitched text is {report['original_chars'] - report['stitched_chars']} characters shorter")
+
+def test_single_page_unchanged():
+    """A single page keeps its content"""
+    text = "INVOICE 1\n| Date | Description | Qty | Rate | Amount |\n| 04/01 | Visit | 1 | $10.00 | $10.00 |"
+    assert stitch_page_text([{"page": 1, "text": text}])["text"] == text + "\n\n"
+
+def test_rows_that_mention_continued_are_kept():
+    """Line items that read like carry-forward notes, and repeated wrapped lines, stay in the table"""
+    print("🧪 Testing that line items are never dropped as page furniture")
+
+    wound_row = "| 04/01 | Continued care - wound dressing | 1 | $80.00 | $80.00 |"
+    undated_row = "| Continued care - follow-up | 1 | $60.00 | $60.00 |"
+    pages = [
+        {"page": 1, "text": f"""Home Health Partners
+INVOICE 5512
+
+| Date | Description | Qty | Rate | Amount |
+|---|---|---|---|---|
+| 03/30 | Skilled nursing visit | 1 | $120.00 | $120.00 |
+  includes supplies
+Continued services per care plan
+| 03/31 | Skilled nursing visit | 1 | $120.00 | $120.00 |
+| 03/31 | Home safety review | 1 | $40.00 | $40.00 |
+| 03/31 | Medication review | 1 | $35.00 | $35.00 |
+| 03/31 | Care coordination | 1 | $25.00 | $25.00 |
+| 03/31 | Skilled nursing visit | 1 | $120.00 | $120.00 |
+{wound_row}"""},
+        {"page": 2, "text": f"""Home Health Partners
+INVOICE 5512
+
+| Date | Description | Qty | Rate | Amount |
+|---|---|---|---|---|
+  includes supplies
+{undated_row}
+| 04/02 | Skilled nursing visit | 1 | $120.00 | $120.00 |"""}
+    ]
+
+    result = stitch_page_text(pages)
+    text, report = result["text"], result["report"]
+
+    assert wound_row in text and undated_row in text
+    # Not at a page edge, so kept even without an amount
+    assert "Continued services per care plan" in text
+    # A wrapped description line below the table header is not letterhead
+    assert text.count("includes supplies") == 2
+    assert text.count("INVOICE 5512") == 1
+    assert report["removed_carry_forward_lines"] == 0
+    assert report["removed_repeated_lines"] == 2
+
+    single = "Continued from intake visit\n" + wound_row
+    assert stitch_page_text([{"page": 1, "text": single}])["text"] == single + "\n\n"
+
+    print("✅ Rows and wrapped lines kept, letterhead still removed")
+
+def test_footer_is_not_joined_to_next_row():
+    """A footer or contact line at the bottom of a page is not a split row"""
+    print("🧪 Testing that page footers are not joined to the next page's first row")
+
+    pages = [
+        {"page": 1, "text": """Acme Hardware
+INVOICE 7781
+
+| Item | Qty | Price | Amount |
+|---|---|---|---|
+| Hinge | 2 | 3.50 | 7.00 |
+Questions? Call us at 555-1234"""},
+        {"page": 2, "text": """Acme Hardware
+INVOICE 7781
+
+| Item | Qty | Price | Amount |
+|---|---|---|---|
+| Bolt | 4 | 1.00 | 4.00 |"""}
+    ]
+    result = stitch_page_text(pages)
+    assert "Questions? Call us at 555-1234\n" in result["text"]
+    assert "\n| Bolt | 4 | 1.00 | 4.00 |" in result["text"]
+    assert result["report"]["joined_split_rows"] == 0
+
+    # Plain-text tables: the footer does not start with a date, so it is not a row fragment
+    plain = [
+        {"page": 1, "text": "04/01 Hinge 2 3.50 7.00\nThank you for your business"},
+        {"page": 2, "text": "Bolt 4 1.00 4.00"}
+    ]
+    result = stitch_page_text(plain)
+    assert "Thank you for your business\n" in result["text"]
+    assert result["report"]["joined_split_rows"] == 0
+
+    # A row fragment in the same place is still joined
+    plain[0]["text"] = "04/01 Hinge 2 3.50 7.00\n04/02 Bolt"
+    plain[1]["text"] = "zinc plated 4 1.00 4.00"
+    result = stitch_page_text(plain)
+    assert "04/02 Bolt zinc plated 4 1.00 4.00" in result["text"]
+    assert result["report"]["joined_split_rows"] == 1
+
+    print("✅ Footers stay on their page, row fragments are joined")
+
+if __name__ == "__main__":
+    test_stitch_multi_page_table()
+    test_single_page_unchanged()
+    test_rows_that_mention_continued_are_kept()
+    test_footer_is_not_joined_to_next_row()
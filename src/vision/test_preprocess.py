@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Test page image preprocessing (no OpenAI calls)
+"""
+
+import io
+import sys
+from pathlib import Path
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from preprocess import estimate_skew, preprocess_page, preprocess_pages, summarize_preprocessing
+
+def make_scan(width=1700, height=2200, rows=30) -> Image.Image:
+    """Grey scanner background, wide margins, text-like bars"""
+    image = Image.new('L', (width, height), 215)
+    draw = ImageDraw.Draw(image)
+    for row in range(rows):
+        top = 400 + row * 45
+        draw.rectangle([300, top, 300 + 600 + (row % 5) * 100, top + 12], fill=30)
+    return image.convert('RGB')
+
+def test_deskew_estimate():
+    """A tilted page is detected and straightened"""
+    print("🧪 Testing skew estimation")
+
+    page = make_scan()
+    gray = np.asarray(page.convert('L'))
+    assert abs(estimate_skew(gray)) < 0.3
+
+    tilted = page.rotate(2.5, resample=Image.BICUBIC, expand=True, fillcolor=(215, 215, 215))
+    skew = estimate_skew(np.asarray(tilted.convert('L')))
+    assert abs(abs(skew) - 2.5) <= 0.5
+
+    result = preprocess_page(tilted)
+    straightened = Image.open(io.BytesIO(result["tiles_png"][0])).convert('L')
+    assert abs(estimate_skew(np.asarray(straightened))) < 0.3
+
+    print(f"✅ Estimated skew {skew:.2f} degrees")
+
+def test_crop_binarize_and_tiles():
+    """Margins are cropped, pages binarized and tall receipts tiled"""
+    print("🧪 Testing crop, binarization and tiling")
+
+    result = preprocess_page(make_scan(), report_bytes=True)
+    report = result["report"]
+    left, top, right, bottom = report["crop_box"]
+    assert left > 200 and top > 300 and right < 1400
+    assert report["tiles"] == 1
+    assert report["processed_bytes"] < report["original_bytes"]
+    assert report["processed_tokens"] <= report["original_tokens"]
+
+    receipt = make_scan(width=600, height=3000, rows=60)
+    tiles = preprocess_page(receipt)["report"]["tiles"]
+    assert tiles > 1
+
+    summary = summarize_preprocessing([report, preprocess_page(receipt, report_bytes=True)["report"]])
+    assert summary["pages"] == 2
+    assert summary["bytes_saved"] == summary["original_bytes"] - summary["processed_bytes"]
+
+    pooled = preprocess_pages([make_scan(), make_scan()], max_workers=2)
+    assert [page["report"]["crop_box"] for page in pooled] == [report["crop_box"]] * 2
+
+    # The original page is only encoded when its size is asked for
+    assert [page["report"]["original_bytes"] for page in pooled] == [None, None]
+    unmeasured = summarize_preprocessing([report] + [page["report"] for page in pooled])
+    assert unmeasured["original_bytes"] is None and unmeasured["bytes_saved"] is None
+    assert unmeasured["processed_bytes"] == report["processed_bytes"] * 3
+    assert unmeasured["tokens_saved"] > 0
+
+    print(f"✅ Saved {report['original_bytes'] - report['processed_bytes']} bytes on a letter page, "
+          f"receipt split into {tiles} tiles")
+
+if __name__ == "__main__":
+    test_deskew_estimate()
+    test_crop_binarize_and_tiles()
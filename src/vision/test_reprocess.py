@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Test re-running structured extraction from cached OCR text (no OpenAI calls)
+"""
+
+import os
+import sys
+import json
+import tempfile
+from pathlib import Path
+from types import SimpleNamespace
+
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+sys.path.insert(0, str(Path(__file__).parent))
+
+import index
+import reprocess
+
+class FakeCompletions:
+    """Returns a fixed invoice JSON and counts structured extraction calls"""
+    def __init__(self):
+        self.calls = 0
+
+    def create(self, **kwargs):
+        self.calls += 1
+        content = json.dumps({"invoice_metadata": {"invoice_number": "236546"}, "totals": {"total": 120.5}})
+        return SimpleNamespace(
+            model="gpt-4.1-mini",
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content), finish_reason="stop")],
+            usage=SimpleNamespace(prompt_tokens=1000, completion_tokens=50, total_tokens=1050)
+        )
+
+def test_reprocess_archive_from_cached_ocr():
+    """Cached OCR text is reprocessed into a versioned directory, and re-runs are skipped"""
+    print("🧪 Testing reprocessing from cached OCR text")
+
+    completions = FakeCompletions()
+    original_client = index.client
+    original_output_dir = index.OUTPUT_DIR
+    index.client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        output_dir = Path(temp_dir)
+        index.OUTPUT_DIR = output_dir
+        try:
+            for name in ["Invoice A.pdf", "Invoice B.pdf"]:
+                index.save_ocr_json({
+                    "filename": name,
+                    "total_pages": 1,
+                    "extracted_text": [{"page": 1, "text": "INVOICE #236546 Total $120.50"}],
+                    "total_cost_summary": {"total_cost": 0.01}
+                }, "invoice")
+            index.save_ocr_json({
+                "filename": "Statement.pdf",
+                "total_pages": 1,
+                "extracted_text": [{"page": 1, "text": "Fidelity brokerage statement"}]
+            }, "brokerage")
+
+            assert len(reprocess.list_ocr_artifacts("invoice", output_dir)) == 2
+
+            template = {"invoice_metadata": {"invoice_number": None}, "totals": {"total": None}}
+            summary = reprocess.reprocess_archive("invoice", template=template, max_workers=2, output_dir=output_dir)
+
+            assert summary["processed"] == 2
+            assert summary["failed"] == 0
+            assert completions.calls == 2
+
+            version = index.get_template_version(template)
+            [output_file] = (output_dir / "invoices" / "versions" / version).glob("Invoice A_*_structured.json")
+            saved = json.loads(output_file.read_text())
+            assert saved["template_version"] == version
+            assert saved["invoice_metadata"]["source_file_name"] == "Invoice A.pdf"
+
+            # Same template version again: nothing to do
+            summary = reprocess.reprocess_archive("invoice", template=template, output_dir=output_dir)
+            assert summary["skipped"] == 2
+            assert completions.calls == 2
+
+            # A template change produces a new version
+            template["totals"]["tax"] = None
+            assert index.get_template_version(template) != version
+        finally:
+            index.client = original_client
+            index.OUTPUT_DIR = original_output_dir
+
+    print("✅ Reprocessing wrote versioned results without Vision OCR")
+
+def test_same_named_documents_keep_separate_ocr():
+    """a/invoice.pdf and b/invoice.pdf get their own OCR artifacts"""
+    print("🧪 Testing OCR artifacts of same-named documents")
+
+    original_output_dir = index.OUTPUT_DIR
+    with tempfile.TemporaryDirectory() as temp_dir:
+        index.OUTPUT_DIR = Path(temp_dir) / "output"
+        try:
+            ocr_files = {}
+            for folder, text in [("a", "INVOICE A-1 Total $10.00"), ("b", "INVOICE B-7 Total $99.00")]:
+                document = Path(temp_dir) / folder / "invoice.pdf"
+                document.parent.mkdir()
+                document.write_bytes(text.encode("utf-8"))
+                ocr_files[folder] = index.save_ocr_json({
+                    "filename": document.name,
+                    "content_hash": index.file_content_hash(str(document)),
+                    "total_pages": 1,
+                    "extracted_text": [{"page": 1, "text": text}]
+                }, "invoice")
+                assert Path(ocr_files[folder]) == index.ocr_artifact_path(
+                    str(document), index.file_content_hash(str(document)))
+
+            assert ocr_files["a"] != ocr_files["b"]
+            assert "A-1" in index.load_ocr_json(ocr_files["a"])["extracted_text"][0]["text"]
+            assert "B-7" in index.load_ocr_json(ocr_files["b"])["extracted_text"][0]["text"]
+            assert len(reprocess.list_ocr_artifacts("invoice", index.OUTPUT_DIR)) == 2
+        finally:
+            index.OUTPUT_DIR = original_output_dir
+
+    print("✅ Same-named documents keep separate OCR text")
+
+def test_same_named_documents_keep_separate_results():
+    """Reprocessing a/invoice.pdf and b/invoice.pdf writes one result for each"""
+    print("🧪 Testing reprocessed results of same-named documents")
+
+    completions = FakeCompletions()
+    original_client = index.client
+    original_output_dir = index.OUTPUT_DIR
+    index.client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        output_dir = Path(temp_dir) / "output"
+        index.OUTPUT_DIR = output_dir
+        try:
+            ocr_files = []
+            for folder, text in [("a", "INVOICE A-1 Total $10.00"), ("b", "INVOICE B-7 Total $99.00")]:
+                document = Path(temp_dir) / folder / "invoice.pdf"
+                document.parent.mkdir()
+                document.write_bytes(text.encode("utf-8"))
+                ocr_files.append(index.save_ocr_json({
+                    "filename": document.name,
+                    "content_hash": index.file_content_hash(str(document)),
+                    "total_pages": 1,
+                    "extracted_text": [{"page": 1, "text": text}]
+                }, "invoice"))
+
+            template = {"invoice_metadata": {"invoice_number": None}, "totals": {"total": None}}
+            summary = reprocess.reprocess_archive("invoice", template=template, output_dir=output_dir)
+            assert summary["processed"] == 2 and summary["skipped"] == 0
+            assert completions.calls == 2
+
+            output_files = {result["output_file"] for result in summary["results"]}
+            assert len(output_files) == 2
+            for ocr_file in ocr_files:
+                assert str(reprocess.get_versioned_output_path(
+                    ocr_file, "invoice", summary["template_version"], output_dir)) in output_files
+        finally:
+            index.client = original_client
+            index.OUTPUT_DIR = original_output_dir
+
+    print("✅ Same-named documents get separate reprocessed results")
+
+if __name__ == "__main__":
+    test_reprocess_archive_from_cached_ocr()
+    test_same_named_documents_keep_separate_ocr()
+    test_same_named_documents_keep_separate_results()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Test per-stage tracing and latency percentiles (no OpenAI calls)
+"""
+
+import os
+import sys
+import json
+import time
+import tempfile
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+sys.path.insert(0, str(Path(__file__).parent))
+
+import index
+import tracing
+from tracing import span, traced, record_stage, stage_percentiles, reset_metrics, submit_in_context
+
+class RawCompletions:
+    """Completions exposing with_raw_response and the server processing-time header"""
+    def __init__(self):
+        self.with_raw_response = self
+
+    def create(self, **kwargs):
+        response = SimpleNamespace(model="gpt-4.1-mini")
+        return SimpleNamespace(headers={"openai-processing-ms": "0.5"}, parse=lambda: response)
+
+def test_trace_export():
+    """Nested spans are written as one OTLP/JSON trace when the root ends"""
+    print("🧪 Testing trace export")
+
+    @traced("save_json")
+    def save():
+        return "saved"
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        original_output_dir = index.OUTPUT_DIR
+        index.OUTPUT_DIR = Path(temp_dir)
+        try:
+            with span("extractDocumentData", file="a.pdf"):
+                with span("rasterize", pages=2):
+                    pass
+                assert save() == "saved"
+                try:
+                    with span("json_parse"):
+                        raise ValueError("bad json")
+                except ValueError:
+                    pass
+            trace_file = Path(temp_dir) / "traces" / "vision_traces.jsonl"
+            lines = trace_file.read_text().splitlines()
+        finally:
+            index.OUTPUT_DIR = original_output_dir
+
+    assert len(lines) == 1
+    resource_spans = json.loads(lines[0])["resourceSpans"][0]
+    assert resource_spans["resource"]["attributes"][0]["value"]["stringValue"] == "vision-mcp"
+    spans = {s["name"]: s for s in resource_spans["scopeSpans"][0]["spans"]}
+    root = spans["extractDocumentData"]
+    assert "parentSpanId" not in root
+    assert all(spans[name]["parentSpanId"] == root["spanId"] for name in ["rasterize", "save_json", "json_parse"])
+    assert len({s["traceId"] for s in spans.values()}) == 1
+    assert spans["json_parse"]["status"] == {"code": 2, "message": "ValueError: bad json"}
+    assert spans["rasterize"]["attributes"] == [{"key": "pages", "value": {"intValue": "2"}}]
+    assert int(root["endTimeUnixNano"]) >= int(spans["save_json"]["endTimeUnixNano"])
+
+    print("✅ Trace exported with parent links")
+
+def test_thread_pool_spans():
+    """Spans in pool workers join the submitting trace, and abandoned traces are evicted"""
+    print("🧪 Testing spans across worker threads")
+
+    def page_worker(page):
+        with span("vision_request", page=page):
+            time.sleep(0.01)
+        return page
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        trace_file = Path(temp_dir) / "traces.jsonl"
+        original_file = tracing.TRACE_FILE
+        tracing.TRACE_FILE = trace_file
+        try:
+            with span("reprocessDocuments") as root:
+                with ThreadPoolExecutor(max_workers=2) as executor:
+                    futures = [submit_in_context(executor, page_worker, page) for page in range(4)]
+                    assert sorted(future.result() for future in futures) == [0, 1, 2, 3]
+                    # Plain submit starts a new trace per task
+                    executor.submit(page_worker, 9).result()
+
+            traces = [json.loads(line)["resourceSpans"][0]["scopeSpans"][0]["spans"]
+                      for line in trace_file.read_text().splitlines()]
+
+            # A trace whose root never finished is dropped once it is older than the limit
+            tracing._open_traces["stale"] = (time.monotonic() - tracing.TRACE_MAX_AGE_SECONDS - 1, [{}])
+            with span("root"):
+                pass
+            assert "stale" not in tracing._open_traces
+        finally:
+            tracing.TRACE_FILE = original_file
+
+    joined = [trace for trace in traces if any(s["name"] == "reprocessDocuments" for s in trace)][0]
+    workers = [s for s in joined if s["name"] == "vision_request"]
+    assert len(workers) == 4 and all(s["parentSpanId"] == root.span_id for s in workers)
+    assert {s["traceId"] for s in joined} == {root.trace_id}
+    assert len(traces) == 2
+    reset_metrics()
+
+    print("✅ Worker spans share the parent trace")
+
+def test_stage_percentiles():
+    """Rolling windows report nearest-rank p50/p95/p99 per stage"""
+    print("🧪 Testing stage percentiles")
+
+    reset_metrics()
+    for duration in range(1, 101):
+        record_stage("vision_request", float(duration))
+    metrics = stage_percentiles()["vision_request"]
+    assert metrics["count"] == 100
+    assert (metrics["p50_ms"], metrics["p95_ms"], metrics["p99_ms"], metrics["max_ms"]) == (50.0, 95.0, 99.0, 100.0)
+
+    # Server processing time splits a request span into model and network time
+    original_client, original_enabled = index.client, tracing.TRACING_ENABLED
+    index.client = SimpleNamespace(chat=SimpleNamespace(completions=RawCompletions()))
+    tracing.TRACING_ENABLED = False
+    try:
+        with span("structured_request") as request_span:
+            response = index.timed_chat_completion(model="gpt-4.1-mini", messages=[])
+    finally:
+        index.client, tracing.TRACING_ENABLED = original_client, original_enabled
+
+    assert response.model == "gpt-4.1-mini"
+    assert request_span.attributes["openai.processing_ms"] <= 0.5
+    metrics = stage_percentiles()
+    assert {"structured_request", "structured_request.model", "structured_request.network"} <= set(metrics)
+    reset_metrics()
+
+    print("✅ Percentiles computed per stage")
+
+if __name__ == "__main__":
+    test_trace_export()
+    test_thread_pool_spans()
+    test_stage_percentiles()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Test the low-DPI triage pass (no OpenAI calls)
+"""
+
+import io
+import os
+import base64
+import sys
+import json
+import tempfile
+from pathlib import Path
+from types import SimpleNamespace
+
+from PIL import Image
+
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+sys.path.insert(0, str(Path(__file__).parent))
+
+import index
+from triage import decide_pages, parse_triage_response, triage_document
+
+class TriageCompletions:
+    """Labels pages 4-6 of a brokerage statement as disclosures"""
+    def __init__(self):
+        self.requests = []
+
+    def create(self, **kwargs):
+        self.requests.append(kwargs)
+        content = json.dumps({
+            "document_type": "brokerage",
+            "pages": [{"page": p, "role": "disclosure" if p >= 4 else "data"} for p in range(1, 7)]
+        })
+        return SimpleNamespace(
+            model="gpt-4.1-mini",
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content), finish_reason="stop")],
+            usage=SimpleNamespace(prompt_tokens=2400, completion_tokens=120, total_tokens=2520)
+        )
+
+def test_decide_pages():
+    """Skippable roles are dropped, page 1 and unlabelled pages are kept"""
+    print("🧪 Testing triage page decisions")
+
+    decision = decide_pages({1: "blank", 2: "data", 3: "boilerplate", 4: "summary"}, total_pages=5)
+    assert decision["extract_pages"] == [1, 2, 4, 5]
+    assert decision["skipped_pages"] == [{"page": 3, "role": "boilerplate"}]
+
+    parsed = parse_triage_response('```json\n{"document_type": "Receipt", "pages": [{"page": 2, "role": "blank"}, '
+                                   '{"page": 3, "role": "mystery"}]}\n```')
+    assert parsed == {"document_type": None, "page_roles": {2: "blank"}}
+
+    print("✅ Page decisions are conservative")
+
+def test_triage_document():
+    """Thumbnails go out in one low-detail request and disclosures are skipped"""
+    print("🧪 Testing document triage")
+
+    completions = TriageCompletions()
+    original_client, original_output_dir = index.client, index.OUTPUT_DIR
+    index.client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    with tempfile.TemporaryDirectory() as temp_dir:
+        index.OUTPUT_DIR = Path(temp_dir)
+        statement = Path(temp_dir) / "statement.tif"
+        pages = [Image.new('RGB', (1700, 2200), 'white') for _ in range(7)]
+        pages[0].save(statement, save_all=True, append_images=pages[1:])
+        receipt = Path(temp_dir) / "receipt.png"
+        Image.new('RGB', (600, 1800), 'white').save(receipt)
+        try:
+            decision = triage_document(str(statement))
+            short = triage_document(str(receipt))
+        finally:
+            index.client, index.OUTPUT_DIR = original_client, original_output_dir
+
+    assert len(completions.requests) == 1
+    images = [part for part in completions.requests[0]["messages"][1]["content"] if part["type"] == "image_url"]
+    assert len(images) == 7 and images[0]["image_url"]["detail"] == "low"
+    # 200 DPI-equivalent frames are scaled to the triage DPI
+    thumbnail = Image.open(io.BytesIO(base64.b64decode(images[0]["image_url"]["url"].split(",", 1)[1])))
+    assert thumbnail.size == (425, 550)
+
+    assert decision["applied"] and decision["document_type"] == "brokerage"
+    assert decision["extract_pages"] == [1, 2, 3, 7]
+    assert [p["page"] for p in decision["skipped_pages"]] == [4, 5, 6]
+    assert decision["cost"]["total_cost"] > 0
+
+    assert not short["applied"] and short["extract_pages"] is None
+
+    print(f"✅ Triage skipped {len(decision['skipped_pages'])} of {decision['total_pages']} pages")
+
+if __name__ == "__main__":
+    test_decide_pages()
+    test_triage_document()
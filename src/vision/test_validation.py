@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Test arithmetic validation and targeted re-extraction (no OpenAI calls)
+"""
+
+import os
+import sys
+import json
+import tempfile
+from pathlib import Path
+from types import SimpleNamespace
+
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+sys.path.insert(0, str(Path(__file__).parent))
+
+import index
+from validation import (
+    validate_invoice, validate_brokerage, validate_structured_data, validate_and_repair, to_number
+)
+
+class FakeCompletions:
+    """Returns corrected line items and records the prompt it was sent"""
+    def __init__(self, content: dict):
+        self.content = content
+        self.prompts = []
+
+    def create(self, **kwargs):
+        self.prompts.append(kwargs["messages"][-1]["content"])
+        return SimpleNamespace(
+            model="gpt-4.1-mini",
+            choices=[SimpleNamespace(message=SimpleNamespace(content=json.dumps(self.content)), finish_reason="stop")],
+            usage=SimpleNamespace(prompt_tokens=500, completion_tokens=100, total_tokens=600)
+        )
+
+def make_invoice(second_amount):
+    return {
+        "invoice_metadata": {"invoice_number": "236546", "balance_due": "$1,150.00"},
+        "line_items": [
+            {"description": "CNA shift 04/01", "quantity": 10, "rate": "$45.00", "amount": "$450.00"},
+            {"description": "LVN shift 04/02", "quantity": 10, "rate": 70, "amount": second_amount}
+        ],
+        "totals": {"subtotal": "1,150.00", "tax": None, "total": "$1,150.00"}
+    }
+
+PAGES = [
+    {"page": 1, "text": "Clipboard Health\nCNA shift 04/01  10  $45.00  $450.00"},
+    {"page": 2, "text": "LVN shift 04/02  10  $70.00  $700.00"},
+    {"page": 3, "text": "Subtotal $1,150.00\nTotal $1,150.00"}
+]
+
+def test_invoice_checks():
+    """Line math, line sum and subtotal formula"""
+    print("🧪 Testing invoice arithmetic checks")
+
+    assert to_number("(12.50)") == -12.5
+    assert to_number("n/a") != to_number("n/a")  # NaN
+
+    audit = validate_invoice(make_invoice("$700.00"))
+    assert audit["overall_status"] == "PASS"
+    assert not audit["requires_human_review"]
+
+    audit = validate_invoice(make_invoice("$770.00"))
+    assert audit["line_math"][1]["status"] == "FAIL"
+    assert audit["line_math"][1]["difference"] == 70.0
+    assert audit["line_sum_to_subtotal"]["status"] == "FAIL"
+    assert audit["subtotal_formula"]["status"] == "PASS"
+    assert audit["requires_human_review"]
+
+    print("✅ Invoice checks work")
+
+def test_brokerage_checks():
+    """Holdings sum to account totals and accounts to the statement total"""
+    print("🧪 Testing brokerage arithmetic checks")
+
+    statement = {
+        "accounts": [
+            {"account_number": "X12-345", "account_total_value": 1500.0, "holdings": [
+                {"ticker": "AAPL", "quantity": 5, "price": 100, "market_value": 500.0},
+                {"ticker": "MSFT", "quantity": 2, "price": 500, "market_value": 1000.0}
+            ]},
+            {"account_number": "Z98-765", "account_total_value": 900.0, "holdings": [
+                {"ticker": "VTI", "quantity": 4, "price": 200, "market_value": 800.0}
+            ]}
+        ],
+        "statement_total_value": 2400.0
+    }
+
+    audit = validate_brokerage(statement)
+    assert audit["holdings_to_account"][0]["status"] == "PASS"
+    assert audit["holdings_to_account"][1]["status"] == "FAIL"
+    assert audit["accounts_to_statement"]["status"] == "PASS"
+    assert audit["quantity_value_logic"] == []
+    assert audit["requires_human_review"]
+
+    print("✅ Brokerage checks work")
+
+def test_reextracts_only_failing_pages():
+    """A failing row is re-extracted from its own page and the audit passes"""
+    print("🧪 Testing targeted re-extraction")
+
+    completions = FakeCompletions({"line_items": [
+        {"description": "LVN shift 04/02", "quantity": 10, "rate": 70, "amount": 700.0}
+    ]})
+    original_client = index.client
+    original_output_dir = index.OUTPUT_DIR
+    index.client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    with tempfile.TemporaryDirectory() as temp_dir:
+        index.OUTPUT_DIR = Path(temp_dir)
+        try:
+            structured_data = make_invoice("$770.00")
+            result = validate_and_repair(structured_data, "invoice", PAGES, "Invoice.pdf")
+        finally:
+            index.client = original_client
+            index.OUTPUT_DIR = original_output_dir
+
+    assert len(completions.prompts) == 1
+    assert "LVN shift" in completions.prompts[0]
+    assert "CNA shift" not in completions.prompts[0]
+    assert result["reextracted_sections"] == [{"section": "line_items", "pages": [2]}]
+    assert len(result["structured_data"]["line_items"]) == 2
+    assert result["structured_data"]["line_items"][0]["description"] == "CNA shift 04/01"
+    assert result["audit"]["overall_status"] == "PASS"
+    assert result["structured_data"]["audit"]["requires_human_review"] is False
+    assert result["repair_cost"] > 0
+
+    print("✅ Only the failing page was re-extracted")
+
+def test_model_reported_failures_are_kept():
+    """Passing arithmetic does not clear checks the model already failed"""
+    print("🧪 Testing audit merge with model-reported checks")
+
+    structured_data = make_invoice("$700.00")
+    structured_data["audit"] = {
+        "duplicate_line_item": {"status": "FAIL", "duplicates_found": [1]},
+        "section_presence": {"status": "PASS", "missing_sections": []},
+        "overall_status": "DISCREPANCIES FOUND",
+        "requires_human_review": True
+    }
+    audit = validate_structured_data(structured_data, "invoice")
+    assert audit is structured_data["audit"]
+    assert audit["subtotal_formula"]["status"] == "PASS"
+    assert audit["duplicate_line_item"]["status"] == "FAIL"
+    assert audit["overall_status"] == "DISCREPANCIES FOUND"
+    assert audit["requires_human_review"] is True
+
+    # The model asked for review without failing a check of its own
+    structured_data["audit"] = {"overall_status": "PASS", "requires_human_review": True}
+    assert validate_structured_data(structured_data, "invoice")["overall_status"] == "PASS"
+    assert structured_data["audit"]["requires_human_review"] is True
+
+    # A repaired document keeps the model's verdict, not the failure it was repaired from
+    completions = FakeCompletions({"line_items": [
+        {"description": "LVN shift 04/02", "quantity": 10, "rate": 70, "amount": 700.0}
+    ]})
+    original_client = index.client
+    original_output_dir = index.OUTPUT_DIR
+    index.client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    with tempfile.TemporaryDirectory() as temp_dir:
+        index.OUTPUT_DIR = Path(temp_dir)
+        try:
+            for reported_review in (False, True):
+                structured_data = make_invoice("$770.00")
+                structured_data["audit"] = {"requires_human_review": reported_review}
+                result = validate_and_repair(structured_data, "invoice", PAGES, "Invoice.pdf")
+                assert result["reextracted_sections"]
+                assert result["audit"]["overall_status"] == "PASS"
+                assert result["audit"]["requires_human_review"] is reported_review
+        finally:
+            index.client = original_client
+            index.OUTPUT_DIR = original_output_dir
+
+    print("✅ Model-reported failures survive the arithmetic checks")
+
+if __name__ == "__main__":
+    test_invoice_checks()
+    test_brokerage_checks()
+    test_reextracts_only_failing_pages()
+    test_model_reported_failures_are_kept()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Test vendor layout fingerprinting and profile matching (no OpenAI calls)
+"""
+
+import sys
+from pathlib import Path
+
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from vendor_profiles import (
+    compute_layout_hash, hash_distance, create_vendor_profile, match_layout_hash,
+    confirm_vendor_header, trim_template, get_profile_extraction_options
+)
+
+def make_page(header_height: int, table_top: int) -> Image.Image:
+    """Draw a simple invoice-like page layout"""
+    image = Image.new('RGB', (612, 792), 'white')
+    draw = ImageDraw.Draw(image)
+    draw.rectangle([40, 30, 300, 30 + header_height], fill='black')
+    draw.rectangle([40, table_top, 572, table_top + 300], outline='black', width=6)
+    draw.rectangle([400, 700, 572, 740], fill='gray')
+    return image
+
+CLIPBOARD_HEADER = """Clipboard Health (Twomagnets Inc.)
+P.O. Box 103125 Pasadena, CA 91189
+INVOICE 236546
+Bill To: Sunrise Care Facility
+"""
+
+def test_fingerprint_matches_same_layout():
+    """Same layout matches, a different layout does not"""
+    print("🧪 Testing vendor layout fingerprints")
+
+    reference_hash = compute_layout_hash(make_page(80, 200))
+    same_layout_hash = compute_layout_hash(make_page(82, 204))
+    other_layout_hash = compute_layout_hash(make_page(300, 450))
+
+    assert hash_distance(reference_hash, same_layout_hash) <= 4
+    assert hash_distance(reference_hash, other_layout_hash) > 10
+
+    profile = create_vendor_profile(
+        "Clipboard Health", "invoice", reference_hash, CLIPBOARD_HEADER,
+        pages=[1, 2], template_fields=["invoice_metadata", "totals.total"],
+        field_positions={"invoice_number": "page 1, top right"},
+        extraction_model="gpt-4.1-nano", extraction_model_validated=True
+    )
+    profiles = {profile["vendor_id"]: profile}
+
+    assert match_layout_hash(same_layout_hash, profiles)["vendor_id"] == "clipboard_health"
+    assert match_layout_hash(other_layout_hash, profiles) is None
+
+    # Next month's invoice: different numbers, same header words
+    next_month = CLIPBOARD_HEADER.replace("236546", "237495")
+    assert confirm_vendor_header(profile, next_month)
+    assert not confirm_vendor_header(profile, "Fidelity Investments\nBrokerage Statement\n")
+
+    print("✅ Fingerprint matching works")
+
+def test_profile_extraction_options():
+    """Profiles trim the template and only use a validated cheaper model"""
+    template = {
+        "invoice_metadata": {"invoice_number": None, "due_date": None},
+        "vendor": {"name": None},
+        "totals": {"subtotal": None, "total": None}
+    }
+    profile = create_vendor_profile(
+        "Clipboard Health", "invoice", "0" * 16, CLIPBOARD_HEADER,
+        template_fields=["invoice_metadata", "totals.total"],
+        field_positions={"invoice_number": "page 1, top right"},
+        extraction_model="gpt-4.1-nano"
+    )
+
+    assert trim_template(template, profile["template_fields"]) == {
+        "invoice_metadata": {"invoice_number": None, "due_date": None},
+        "totals": {"total": None}
+    }
+
+    options = get_profile_extraction_options(profile, template)
+    assert "model" not in options
+    assert "invoice_number" in options["prompt_hints"]
+
+    profile["extraction_model_validated"] = True
+    assert get_profile_extraction_options(profile, template)["model"] == "gpt-4.1-nano"
+
+    print("✅ Profile extraction options are correct")
+
+if __name__ == "__main__":
+    test_fingerprint_matches_same_layout()
+    test_profile_extraction_options()
@@ -0,0 +1,210 @@
+"""
+Per-stage latency tracing for the Vision pipeline
+
+Stages (rasterize, preprocess, encode, Vision request, structured completion, JSON
+parse/repair, validation, file writes, ...) run inside spans. Nested spans share a
+trace through a context variable; work handed to a thread pool joins the trace when
+it is submitted with submit_in_context(). When a root span ends, its whole trace is appended
+to a local trace file as one OpenTelemetry (OTLP/JSON) line, so it can be loaded by
+any OTLP-compatible viewer. Every span duration also feeds a rolling window per stage
+from which p50/p95/p99 are reported (the vision://metrics resource).
+"""
+
+import os
+import json
+import math
+import time
+import uuid
+import logging
+import functools
+import threading
+import contextvars
+from pathlib import Path
+from collections import deque
+from contextvars import ContextVar
+from concurrent.futures import Executor, Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Configuration (environment overrides)
+TRACING_ENABLED = os.getenv("VISION_TRACING", "1") != "0"
+# Defaults to <OUTPUT_DIR>/traces/vision_traces.jsonl
+TRACE_FILE = Path(os.environ["VISION_TRACE_FILE"]) if os.getenv("VISION_TRACE_FILE") else None
+METRICS_WINDOW = int(os.getenv("VISION_METRICS_WINDOW", "1000"))
+# Unfinished traces older than this are dropped (spans that outlived their root)
+TRACE_MAX_AGE_SECONDS = float(os.getenv("VISION_TRACE_MAX_AGE_SECONDS", "3600"))
+
+SERVICE_NAME = "vision-mcp"
+SCOPE_NAME = "vision.tracing"
+
+# OTLP enums
+SPAN_KIND_INTERNAL = 1
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("vision_current_span", default=None)
+_lock = threading.Lock()
+# trace id -> (monotonic time the first span finished, finished spans), oldest first
+_open_traces: Dict[str, Tuple[float, List[Dict]]] = {}
+_stage_durations: Dict[str, deque] = {}
+
+def _otlp_value(value: Any) -> Dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+def record_stage(name: str, duration_ms: float):
+    """Add one duration to a stage's rolling window"""
+    with _lock:
+        window = _stage_durations.get(name)
+        if window is None:
+            window = _stage_durations[name] = deque(maxlen=METRICS_WINDOW)
+        window.append(duration_ms)
+
+class Span:
+    """One timed stage; use through span() or @traced"""
+
+    def __init__(self, name: str, attributes: Optional[Dict] = None):
+        self.name = name
+        self.attributes = dict(attributes or {})
+        self.parent = _current_span.get()
+        self.trace_id = self.parent.trace_id if self.parent else uuid.uuid4().hex
+        self.span_id = uuid.uuid4().hex[:16]
+        self.status = STATUS_OK
+        self.status_message = None
+        self.start_ns = None
+        self.end_ns = None
+        self._token = None
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def __enter__(self) -> "Span":
+        self.start_ns = time.time_ns()
+        self._start_perf = time.perf_counter()
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration_ms = (time.perf_counter() - self._start_perf) * 1000
+        self.end_ns = self.start_ns + int(duration_ms * 1_000_000)
+        _current_span.reset(self._token)
+        if exc is not None:
+            self.status = STATUS_ERROR
+            self.status_message = f"{exc_type.__name__}: {exc}"
+
+        record_stage(self.name, duration_ms)
+        if TRACING_ENABLED:
+            self._finish()
+        return False
+
+    def to_otlp(self) -> Dict:
+        otlp = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": SPAN_KIND_INTERNAL,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in self.attributes.items()],
+            "status": {"code": self.status}
+        }
+        if self.parent:
+            otlp["parentSpanId"] = self.parent.span_id
+        if self.status_message:
+            otlp["status"]["message"] = self.status_message
+        return otlp
+
+    def _finish(self):
+        with _lock:
+            now = time.monotonic()
+            _evict_stale_traces(now)
+            _, spans = _open_traces.setdefault(self.trace_id, (now, []))
+            spans.append(self.to_otlp())
+            if self.parent:
+                return
+            del _open_traces[self.trace_id]
+        export_trace(spans)
+
+def _evict_stale_traces(now: float):
+    """Drop unfinished traces older than TRACE_MAX_AGE_SECONDS; call with _lock held"""
+    while _open_traces:
+        trace_id, (opened, spans) = next(iter(_open_traces.items()))
+        if now - opened <= TRACE_MAX_AGE_SECONDS:
+            return
+        del _open_traces[trace_id]
+        logger.debug(f"Dropped {len(spans)} spans of unfinished trace {trace_id}")
+
+def span(name: str, **attributes) -> Span:
+    """Context manager timing one stage: `with span("rasterize", pages=3):`"""
+    return Span(name, attributes)
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+def submit_in_context(executor: Executor, func: Callable, *args, **kwargs) -> Future:
+    """executor.submit that runs func in a copy of the caller's context, so its spans join the current trace"""
+    return executor.submit(contextvars.copy_context().run, func, *args, **kwargs)
+
+def traced(name: str) -> Callable:
+    """Decorator running the function inside a span of the given stage name"""
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with Span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def export_trace(spans: List[Dict], trace_file: Optional[Path] = None):
+    """Append one finished trace to the trace file as an OTLP/JSON line"""
+    if trace_file is None:
+        import index
+        trace_file = TRACE_FILE or index.OUTPUT_DIR / "traces" / "vision_traces.jsonl"
+    payload = {
+        "resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+            "scopeSpans": [{"scope": {"name": SCOPE_NAME}, "spans": spans}]
+        }]
+    }
+    try:
+        trace_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(trace_file, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(payload) + "\n")
+    except Exception as e:
+        logger.warning(f"Failed to export trace: {e}")
+
+def _percentile(ordered: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of a sorted list"""
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+def stage_percentiles() -> Dict[str, Dict]:
+    """
+    Rolling latency statistics per stage
+
+    Returns:
+        {stage: {count, mean_ms, p50_ms, p95_ms, p99_ms, max_ms}} over the last
+        METRICS_WINDOW spans of each stage
+    """
+    with _lock:
+        windows = {name: sorted(durations) for name, durations in _stage_durations.items()}
+    return {
+        name: {
+            "count": len(ordered),
+            "mean_ms": round(sum(ordered) / len(ordered), 3),
+            "p50_ms": round(_percentile(ordered, 0.50), 3),
+            "p95_ms": round(_percentile(ordered, 0.95), 3),
+            "p99_ms": round(_percentile(ordered, 0.99), 3),
+            "max_ms": round(ordered[-1], 3)
+        }
+        for name, ordered in sorted(windows.items()) if ordered
+    }
+
+def reset_metrics():
+    with _lock:
+        _stage_durations.clear()
@@ -0,0 +1,182 @@
+"""
+Low-DPI triage pass before full-resolution OCR
+
+Multi-page documents often carry pages that never contribute structured data:
+brokerage disclosures, legal boilerplate, terms and conditions, blank backs. The
+first pages are rendered as small thumbnails and sent in one cheap Vision request
+that classifies the document and labels each page's role. Only pages that can hold
+data are then rendered at full resolution and OCR'd. The triage decision travels
+with the text result so callers can report it.
+"""
+
+import os
+import json
+import logging
+from typing import Dict
+
+import index
+from index import STRUCTURED_SYSTEM_PROMPT, calculate_cost, extract_pdf_text, image_to_base64
+from json_continuation import strip_code_fences
+from page_source import count_pages, iter_pages
+from tracing import traced
+
+logger = logging.getLogger(__name__)
+
+# Configuration (environment overrides)
+TRIAGE_ENABLED = os.getenv("VISION_TRIAGE", "1") != "0"
+TRIAGE_MODEL = os.getenv("VISION_TRIAGE_MODEL", "gpt-4.1-mini")
+TRIAGE_DPI = int(os.getenv("VISION_TRIAGE_DPI", "50"))
+# Shorter documents are extracted in full; triage would cost more than it saves
+TRIAGE_MIN_PAGES = int(os.getenv("VISION_TRIAGE_MIN_PAGES", "3"))
+# Pages after this are always extracted
+TRIAGE_MAX_PAGES = int(os.getenv("VISION_TRIAGE_MAX_PAGES", "24"))
+
+TRIAGE_DOCUMENT_TYPES = ["invoice", "brokerage", "dmv", "legal", "medical", "tax", "general"]
+PAGE_ROLES = ["data", "summary", "cover", "disclosure", "boilerplate", "blank"]
+SKIP_ROLES = {"disclosure", "boilerplate", "blank"}
+
+TRIAGE_PROMPT = (
+    "These are low-resolution thumbnails of the first {count} pages of one document, in order. "
+    "Classify the document as one of: " + ", ".join(TRIAGE_DOCUMENT_TYPES) + ". "
+    "Then label every page with its role:\n"
+    "- data: tables, line items, holdings, transactions, amounts or form fields\n"
+    "- summary: account or billing summary, totals, balances\n"
+    "- cover: letter or cover page with names, addresses, dates or reference numbers\n"
+    "- disclosure: regulatory disclosures, important information, definitions\n"
+    "- boilerplate: terms and conditions, legal notices, instructions, advertising\n"
+    "- blank: empty or nearly empty page\n"
+    "When unsure, use data. Return JSON only: "
+    '{{"document_type": "...", "pages": [{{"page": 1, "role": "..."}}]}}'
+)
+
+def decide_pages(page_roles: Dict[int, str], total_pages: int) -> Dict:
+    """
+    Choose the pages that need full extraction
+
+    Page 1 is always kept; pages without a role (unlabelled or past the triage window)
+    are kept.
+
+    Returns:
+        Dictionary with extract_pages and skipped_pages ([{page, role}])
+    """
+    extract_pages = []
+    skipped_pages = []
+    for page_num in range(1, total_pages + 1):
+        role = page_roles.get(page_num)
+        if page_num > 1 and role in SKIP_ROLES:
+            skipped_pages.append({"page": page_num, "role": role})
+        else:
+            extract_pages.append(page_num)
+    return {"extract_pages": extract_pages, "skipped_pages": skipped_pages}
+
+def parse_triage_response(content: str) -> Dict:
+    """
+    Parse the triage JSON into a document type and page roles
+
+    Unknown document types become None (callers fall back to keyword classification);
+    unknown roles are dropped so those pages are kept.
+    """
+    data = json.loads(strip_code_fences(content or ""))
+    document_type = str(data.get("document_type") or "").lower()
+    page_roles = {}
+    for entry in data.get("pages") or []:
+        role = str(entry.get("role") or "").lower()
+        if role in PAGE_ROLES:
+            page_roles[int(entry["page"])] = role
+    return {
+        "document_type": document_type if document_type in TRIAGE_DOCUMENT_TYPES else None,
+        "page_roles": page_roles
+    }
+
+@traced("triage")
+def triage_document(file_path: str) -> Dict:
+    """
+    Classify a document and decide which pages need full extraction from low-DPI thumbnails
+
+    Args:
+        file_path: Path to the PDF or image file
+
+    Returns:
+        Triage decision: applied, reason, document_type, total_pages, extract_pages
+        (None means all pages), skipped_pages, page_roles, token_usage and cost
+    """
+    total_pages = count_pages(file_path)
+    decision = {
+        "applied": False,
+        "reason": None,
+        "document_type": None,
+        "total_pages": total_pages,
+        "extract_pages": None,
+        "skipped_pages": [],
+        "page_roles": {},
+        "token_usage": None,
+        "cost": None
+    }
+    if total_pages < TRIAGE_MIN_PAGES:
+        decision["reason"] = f"fewer than {TRIAGE_MIN_PAGES} pages"
+        return decision
+
+    try:
+        window = range(1, min(total_pages, TRIAGE_MAX_PAGES) + 1)
+        thumbnails = [page["image"] for page in iter_pages(file_path, window, dpi=TRIAGE_DPI, total_pages=total_pages)]
+        content = [{"type": "text", "text": TRIAGE_PROMPT.format(count=len(thumbnails))}]
+        for page_num, thumbnail in enumerate(thumbnails, start=1):
+            content.append({"type": "text", "text": f"Page {page_num}:"})
+            content.append({"type": "image_url", "image_url": {"url": image_to_base64(thumbnail), "detail": "low"}})
+
+        logger.info(f"🔎 Triage of {len(thumbnails)} pages at {TRIAGE_DPI} DPI")
+        response = index.client.chat.completions.create(
+            model=TRIAGE_MODEL,
+            messages=[
+                {"role": "system", "content": STRUCTURED_SYSTEM_PROMPT},
+                {"role": "user", "content": content}
+            ],
+            max_tokens=2000,
+            temperature=0
+        )
+        usage = response.usage
+        decision["token_usage"] = {
+            "model": response.model,
+            "prompt_tokens": usage.prompt_tokens,
+            "completion_tokens": usage.completion_tokens,
+            "total_tokens": usage.total_tokens
+        }
+        decision["cost"] = calculate_cost(response.model, usage.prompt_tokens, usage.completion_tokens)
+
+        parsed = parse_triage_response(response.choices[0].message.content)
+    except Exception as e:
+        logger.warning(f"Triage failed for {file_path} - extracting all pages: {e}")
+        decision["reason"] = f"triage failed: {e}"
+        return decision
+
+    decision.update(decide_pages(parsed["page_roles"], total_pages))
+    decision.update({
+        "applied": True,
+        "document_type": parsed["document_type"],
+        "page_roles": {str(page): role for page, role in sorted(parsed["page_roles"].items())}
+    })
+    logger.info(f"   Triage: {parsed['document_type']}, extracting {len(decision['extract_pages'])} of "
+                f"{total_pages} pages ({len(decision['skipped_pages'])} skipped)")
+    return decision
+
+def extract_triaged_text(file_path: str) -> Dict:
+    """
+    Extract text from the pages triage keeps
+
+    Returns:
+        extract_pdf_text result with a "triage" key; triage cost is included in the
+        cost summary
+    """
+    if not TRIAGE_ENABLED:
+        return extract_pdf_text(file_path)
+
+    triage = triage_document(file_path)
+    # Nothing skipped: render the whole document in one pass
+    text_result = extract_pdf_text(file_path, pages=triage["extract_pages"] if triage["skipped_pages"] else None)
+    text_result["triage"] = triage
+
+    triage_cost = (triage["cost"] or {}).get("total_cost", 0.0)
+    if triage_cost:
+        text_result["total_cost_summary"]["triage_cost"] = triage_cost
+        text_result["total_cost_summary"]["total_cost"] += triage_cost
+    return text_result
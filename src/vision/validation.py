@@ -0,0 +1,461 @@
+"""
+Arithmetic validation of structured extraction results
+
+Checks line-item math, line sums against the subtotal, subtotal + tax = total and
+brokerage holdings against account and statement totals. Results are written into
+the template's "audit" section. Failing checks are localized to the OCR pages that
+contain the affected rows or accounts, and only those sections are re-extracted.
+"""
+
+from __future__ import annotations
+
+import re
+import copy
+import logging
+from typing import Dict, List, Optional
+
+from index import (
+    load_invoice_template,
+    load_brokerage_template,
+    extract_structured_invoice_data,
+    extract_structured_brokerage_data
+)
+from tracing import traced
+from lazy_imports import lazy_import
+
+np = lazy_import("numpy")
+
+logger = logging.getLogger(__name__)
+
+# Money tolerances: line amounts are rounded to cents, sums can drift by a few cents
+LINE_ABS_TOLERANCE = 0.02
+LINE_REL_TOLERANCE = 0.001
+SUM_ABS_TOLERANCE = 0.05
+# Brokerage prices are often rounded to fewer decimals than quantity * price needs
+HOLDING_REL_TOLERANCE = 0.01
+
+def to_number(value) -> float:
+    """Convert an extracted amount such as "$1,234.50" or "(12.00)" to float, NaN if not numeric"""
+    if value is None or isinstance(value, bool):
+        return np.nan
+    if isinstance(value, (int, float)):
+        return float(value)
+
+    text = str(value).strip()
+    negative = text.startswith('(') and text.endswith(')')
+    text = re.sub(r"[,$\s()]", "", text)
+    try:
+        number = float(text)
+    except ValueError:
+        return np.nan
+    return -number if negative else number
+
+def to_array(rows: List[Dict], field: str) -> np.ndarray:
+    """Column of numeric values from a list of row dictionaries"""
+    return np.array([to_number(row.get(field)) for row in rows], dtype=float)
+
+def _round(value: float) -> Optional[float]:
+    """JSON friendly rounding that maps NaN to None"""
+    return None if value is None or np.isnan(value) else round(float(value), 2)
+
+def _compare(computed: float, reported: float, tolerance: float) -> Dict:
+    """Compare a computed total with a reported one"""
+    if np.isnan(computed) or np.isnan(reported):
+        return {"difference": None, "status": "SKIPPED"}
+    difference = reported - computed
+    return {"difference": _round(difference), "status": "PASS" if abs(difference) <= tolerance else "FAIL"}
+
+def validate_invoice(structured_data: Dict) -> Dict:
+    """
+    Check invoice arithmetic
+
+    Args:
+        structured_data: Structured invoice data in invoice_template.json format
+
+    Returns:
+        Audit dictionary with line_math, line_sum_to_subtotal, subtotal_formula,
+        total_to_balance_due, overall_status and requires_human_review
+    """
+    line_items = [item for item in (structured_data.get("line_items") or []) if isinstance(item, dict)]
+    totals = structured_data.get("totals") or {}
+    metadata = structured_data.get("invoice_metadata") or {}
+
+    quantity = to_array(line_items, "quantity")
+    rate = to_array(line_items, "rate")
+    amount = to_array(line_items, "amount")
+
+    # Quantity x rate for every row at once
+    expected = quantity * rate
+    difference = amount - expected
+    checkable = ~np.isnan(difference)
+    tolerance = np.maximum(LINE_ABS_TOLERANCE, LINE_REL_TOLERANCE * np.abs(amount))
+    line_failed = checkable & (np.abs(difference) > tolerance)
+
+    line_math = [
+        {
+            "row_index": i,
+            "expected_amount": _round(expected[i]),
+            "reported_amount": _round(amount[i]),
+            "difference": _round(difference[i]),
+            "status": "FAIL" if line_failed[i] else ("PASS" if checkable[i] else "SKIPPED")
+        }
+        for i in range(len(line_items))
+    ]
+
+    subtotal = to_number(totals.get("subtotal"))
+    tax = to_number(totals.get("tax"))
+    shipping = to_number(totals.get("shipping"))
+    discount = to_number(totals.get("discount"))
+    total = to_number(totals.get("total"))
+    balance_due = to_number(metadata.get("balance_due"))
+
+    # Without a subtotal, lines sum straight to the total when there are no adjustments
+    line_sum = np.nansum(amount) if len(line_items) and not np.all(np.isnan(amount)) else np.nan
+    has_adjustments = not (np.isnan(tax) and np.isnan(shipping) and np.isnan(discount))
+    sum_reference = subtotal if not np.isnan(subtotal) else (total if not has_adjustments else np.nan)
+    line_sum_check = {"line_sum": _round(line_sum), "subtotal": _round(sum_reference)}
+    line_sum_check.update(_compare(line_sum, sum_reference, SUM_ABS_TOLERANCE))
+
+    computed_total = subtotal + np.nan_to_num(tax) + np.nan_to_num(shipping) - abs(np.nan_to_num(discount))
+    subtotal_check = {"computed_total": _round(computed_total), "reported_total": _round(total)}
+    subtotal_check.update(_compare(computed_total, total, SUM_ABS_TOLERANCE))
+
+    # Balance due can legitimately include prior balances, so a mismatch is only a warning
+    balance_check = {"total": _round(total), "balance_due": _round(balance_due)}
+    balance_check.update(_compare(total, balance_due, SUM_ABS_TOLERANCE))
+    if balance_check["status"] == "FAIL":
+        balance_check["status"] = "WARN"
+
+    audit = {
+        "line_math": line_math,
+        "line_sum_to_subtotal": line_sum_check,
+        "subtotal_formula": subtotal_check,
+        "total_to_balance_due": balance_check
+    }
+    return _finish_audit(audit, failed=bool(line_failed.any()) or
+                         "FAIL" in (line_sum_check["status"], subtotal_check["status"]))
+
+def validate_brokerage(structured_data: Dict) -> Dict:
+    """
+    Check brokerage statement arithmetic
+
+    Args:
+        structured_data: Structured brokerage data in brokerage_template.json format
+
+    Returns:
+        Audit dictionary with holdings_to_account, accounts_to_statement,
+        quantity_value_logic, overall_status and requires_human_review
+    """
+    accounts = [account for account in (structured_data.get("accounts") or []) if isinstance(account, dict)]
+
+    # Flatten holdings with the index of their account so sums can be grouped in one pass
+    holdings = []
+    account_index = []
+    for i, account in enumerate(accounts):
+        for holding in account.get("holdings") or []:
+            if isinstance(holding, dict):
+                holdings.append(holding)
+                account_index.append(i)
+    account_index = np.array(account_index, dtype=int)
+
+    quantity = to_array(holdings, "quantity")
+    price = to_array(holdings, "price")
+    market_value = to_array(holdings, "market_value")
+
+    computed_value = quantity * price
+    value_checkable = ~np.isnan(computed_value) & ~np.isnan(market_value) & (market_value != 0)
+    difference_pct = np.full(len(holdings), np.nan)
+    difference_pct[value_checkable] = (
+        (market_value[value_checkable] - computed_value[value_checkable]) / np.abs(market_value[value_checkable])
+    )
+    value_failed = value_checkable & (np.abs(difference_pct) > HOLDING_REL_TOLERANCE)
+
+    quantity_value_logic = [
+        {
+            "account_number": accounts[account_index[i]].get("account_number"),
+            "cusip_or_ticker": holdings[i].get("cusip") or holdings[i].get("ticker"),
+            "computed_value": _round(computed_value[i]),
+            "reported_market_value": _round(market_value[i]),
+            "difference_pct": _round(difference_pct[i] * 100) if value_checkable[i] else None,
+            "status": "FAIL"
+        }
+        for i in np.flatnonzero(value_failed)
+    ]
+
+    holdings_sum = np.bincount(account_index, weights=np.nan_to_num(market_value), minlength=len(accounts)) \
+        if len(holdings) else np.zeros(len(accounts))
+    has_holdings = np.bincount(account_index, weights=~np.isnan(market_value), minlength=len(accounts)) > 0 \
+        if len(holdings) else np.zeros(len(accounts), dtype=bool)
+    account_total = to_array(accounts, "account_total_value")
+
+    holdings_to_account = []
+    for i, account in enumerate(accounts):
+        check = {
+            "account_number": account.get("account_number"),
+            "holdings_sum": _round(holdings_sum[i]) if has_holdings[i] else None,
+            "account_total_value": _round(account_total[i])
+        }
+        check.update(_compare(holdings_sum[i] if has_holdings[i] else np.nan, account_total[i],
+                              max(SUM_ABS_TOLERANCE, LINE_REL_TOLERANCE * abs(np.nan_to_num(account_total[i])))))
+        holdings_to_account.append(check)
+
+    statement_total = to_number(structured_data.get("statement_total_value"))
+    total_of_accounts = np.nansum(account_total) if len(accounts) and not np.all(np.isnan(account_total)) else np.nan
+    accounts_check = {
+        "total_of_account_values": _round(total_of_accounts),
+        "statement_total_value": _round(statement_total)
+    }
+    accounts_check.update(_compare(total_of_accounts, statement_total, SUM_ABS_TOLERANCE))
+
+    audit = {
+        "holdings_to_account": holdings_to_account,
+        "accounts_to_statement": accounts_check,
+        "quantity_value_logic": quantity_value_logic
+    }
+    return _finish_audit(audit, failed=bool(value_failed.any()) or accounts_check["status"] == "FAIL" or
+                         any(check["status"] == "FAIL" for check in holdings_to_account))
+
+def count_failures(audit: Dict) -> int:
+    """Number of failing checks in an audit"""
+    failures = 0
+    for value in audit.values():
+        checks = value if isinstance(value, list) else [value]
+        failures += sum(1 for check in checks if isinstance(check, dict) and check.get("status") == "FAIL")
+    return failures
+
+def _finish_audit(audit: Dict, failed: bool) -> Dict:
+    """Set the overall audit status fields"""
+    audit["overall_status"] = "DISCREPANCIES FOUND" if failed else "PASS"
+    audit["requires_human_review"] = failed
+    return audit
+
+VALIDATORS = {
+    "invoice": validate_invoice,
+    "brokerage": validate_brokerage
+}
+
+def validate_structured_data(structured_data: Dict, document_type: str,
+                             reported_review: Optional[bool] = None) -> Dict:
+    """
+    Run the arithmetic checks for a document type and add them to structured_data["audit"]
+
+    Checks the model already reported (duplicate_line_item, section_presence, ...)
+    are kept: the document fails if any check in the merged audit fails, and still
+    requires human review if the model asked for it.
+
+    Args:
+        structured_data: Structured data from the invoice or brokerage extractor
+        document_type: invoice or brokerage
+        reported_review: The model's own requires_human_review (optional, defaults to
+            the value in structured_data["audit"])
+
+    Returns:
+        The merged audit dictionary
+    """
+    audit = structured_data.get("audit")
+    if not isinstance(audit, dict):
+        audit = structured_data["audit"] = {}
+    if reported_review is None:
+        reported_review = audit.get("requires_human_review") is True
+
+    audit.update(VALIDATORS[document_type](structured_data))
+    _finish_audit(audit, failed=count_failures(audit) > 0)
+    audit["requires_human_review"] = reported_review or audit["requires_human_review"]
+    return audit
+
+# =============================================================================
+# Localizing discrepancies to OCR pages
+# =============================================================================
+
+def _normalize(text: str) -> str:
+    return re.sub(r"\s+", " ", str(text).lower()).strip()
+
+def _amount_needles(value) -> List[str]:
+    """Ways an amount may be printed on the page"""
+    number = to_number(value)
+    if np.isnan(number):
+        return []
+    return [f"{abs(number):,.2f}", f"{abs(number):.2f}"]
+
+def find_pages(needles: List[str], pages: List[Dict]) -> List[int]:
+    """
+    Page numbers whose OCR text contains any of the needles
+
+    Args:
+        needles: Strings to look for (compared case and whitespace insensitively)
+        pages: Per-page OCR output with "page" and "text" keys
+
+    Returns:
+        Sorted page numbers
+    """
+    needles = [_normalize(n) for n in needles if n and len(str(n).strip()) >= 3]
+    found = set()
+    for page in pages:
+        text = _normalize(page.get("text", ""))
+        if any(needle in text for needle in needles):
+            found.add(page["page"])
+    return sorted(found)
+
+def locate_line_item(item: Dict, pages: List[Dict]) -> List[int]:
+    """Pages that contain a line item, by description first and amount second"""
+    description = str(item.get("description") or "")[:30]
+    located = find_pages([description], pages) if description else []
+    return located or find_pages(_amount_needles(item.get("amount")), pages)
+
+def locate_discrepancies(structured_data: Dict, audit: Dict, document_type: str, pages: List[Dict]) -> List[Dict]:
+    """
+    Map failing checks to the sections and pages that need re-extraction
+
+    Returns:
+        List of {"section", "pages", and row_indexes or account_index} entries
+    """
+    all_pages = [page["page"] for page in pages]
+    last_page = all_pages[-1:] if all_pages else []
+    discrepancies = []
+
+    if document_type == "invoice":
+        line_items = structured_data.get("line_items") or []
+        failing_rows = [row["row_index"] for row in audit["line_math"] if row["status"] == "FAIL"]
+        if failing_rows:
+            failing_pages = sorted({p for i in failing_rows for p in locate_line_item(line_items[i], pages)})
+            discrepancies.append({"section": "line_items", "row_indexes": failing_rows,
+                                  "pages": failing_pages or all_pages})
+        elif "FAIL" in (audit["line_sum_to_subtotal"]["status"], audit["subtotal_formula"]["status"]):
+            totals = structured_data.get("totals") or {}
+            totals_pages = find_pages(_amount_needles(totals.get("total")) + _amount_needles(totals.get("subtotal")), pages)
+            discrepancies.append({"section": "totals", "pages": totals_pages or last_page})
+
+    elif document_type == "brokerage":
+        accounts = structured_data.get("accounts") or []
+        failing_accounts = {i for i, check in enumerate(audit["holdings_to_account"]) if check["status"] == "FAIL"}
+        failing_accounts |= {
+            i for i, account in enumerate(accounts)
+            for row in audit["quantity_value_logic"] if row["account_number"] == account.get("account_number")
+        }
+        for i in sorted(failing_accounts):
+            account = accounts[i]
+            account_pages = find_pages([account.get("account_number"), account.get("account_name")], pages)
+            discrepancies.append({"section": "accounts", "account_index": i, "pages": account_pages or all_pages})
+        if audit["accounts_to_statement"]["status"] == "FAIL" and not failing_accounts:
+            summary_pages = find_pages(_amount_needles(structured_data.get("statement_total_value")), pages)
+            discrepancies.append({"section": "statement_total_value", "pages": summary_pages or all_pages[:1]})
+
+    return discrepancies
+
+# =============================================================================
+# Targeted re-extraction
+# =============================================================================
+
+def _pages_text(pages: List[Dict], page_numbers: List[int]) -> str:
+    return "\n\n".join(page["text"] for page in pages if page["page"] in page_numbers)
+
+def reextract_section(structured_data: Dict, discrepancy: Dict, document_type: str,
+                      pages: List[Dict], filename: str) -> float:
+    """
+    Re-extract one failing section from its pages and splice it into structured_data
+
+    Returns:
+        Cost of the re-extraction call
+    """
+    section = discrepancy["section"]
+    section_text = _pages_text(pages, discrepancy["pages"])
+    logger.info(f"🔁 Re-extracting {section} from pages {discrepancy['pages']}")
+
+    if document_type == "invoice":
+        template = load_invoice_template()
+        result = extract_structured_invoice_data(section_text, filename, template={section: template[section]})
+    else:
+        template = load_brokerage_template()
+        result = extract_structured_brokerage_data(section_text, filename, template={section: template[section]})
+
+    extracted = result["structured_data"].get(section)
+    cost = result["extraction_cost"].get("total_cost", 0.0)
+    if extracted in (None, [], {}):
+        logger.warning(f"Re-extraction returned no {section} - keeping original")
+        return cost
+
+    if section == "line_items":
+        # Replace the rows that came from the re-extracted pages
+        line_items = structured_data.get("line_items") or []
+        row_pages = [locate_line_item(item, pages) for item in line_items]
+        replaced = [i for i, located in enumerate(row_pages)
+                    if i in discrepancy["row_indexes"] or (located and set(located) <= set(discrepancy["pages"]))]
+        insert_at = replaced[0] if replaced else len(line_items)
+        kept = [item for i, item in enumerate(line_items) if i not in replaced]
+        structured_data["line_items"] = kept[:insert_at] + list(extracted) + kept[insert_at:]
+    elif section == "accounts":
+        accounts = structured_data["accounts"]
+        original = accounts[discrepancy["account_index"]]
+        replacement = next((a for a in extracted if a.get("account_number") == original.get("account_number")),
+                           extracted[0] if len(extracted) == 1 else None)
+        if replacement:
+            accounts[discrepancy["account_index"]] = replacement
+    else:
+        structured_data[section] = extracted
+
+    return cost
+
+@traced("validation")
+def validate_and_repair(structured_data: Dict, document_type: str, pages: List[Dict],
+                        filename: str, max_rounds: int = 1) -> Dict:
+    """
+    Validate structured data and re-extract only the sections that fail
+
+    Args:
+        structured_data: Structured data from the invoice or brokerage extractor
+        document_type: invoice or brokerage
+        pages: Per-page OCR output ("extracted_text" from extract_pdf_text)
+        filename: Source filename
+        max_rounds: Maximum number of re-extraction rounds
+
+    Returns:
+        Dictionary with structured_data (audited), audit, sections re-extracted and repair cost
+    """
+    if document_type not in VALIDATORS:
+        return {"structured_data": structured_data, "audit": None, "reextracted_sections": [], "repair_cost": 0.0}
+
+    # The model's verdict, before the arithmetic checks are merged into the audit
+    reported_audit = structured_data.get("audit")
+    reported_review = isinstance(reported_audit, dict) and reported_audit.get("requires_human_review") is True
+    audit = validate_structured_data(structured_data, document_type, reported_review)
+    reextracted = []
+    repair_cost = 0.0
+
+    for round_num in range(max_rounds):
+        if not audit["requires_human_review"]:
+            break
+
+        discrepancies = locate_discrepancies(structured_data, audit, document_type, pages)
+        if not discrepancies:
+            break
+
+        logger.info(f"Validation round {round_num + 1}: {len(discrepancies)} section(s) to re-extract")
+        candidate = copy.deepcopy(structured_data)
+        round_sections = []
+        for discrepancy in discrepancies:
+            try:
+                repair_cost += reextract_section(candidate, discrepancy, document_type, pages, filename)
+                round_sections.append({"section": discrepancy["section"], "pages": discrepancy["pages"]})
+            except Exception as e:
+                logger.error(f"Re-extraction of {discrepancy['section']} failed: {e}")
+
+        # Keep the repair only if it reduces the number of failing checks
+        candidate_audit = validate_structured_data(candidate, document_type, reported_review)
+        if count_failures(candidate_audit) >= count_failures(audit):
+            logger.warning("Re-extraction did not improve the audit - keeping original values")
+            break
+
+        structured_data.clear()
+        structured_data.update(candidate)
+        audit = candidate_audit
+        reextracted.extend(round_sections)
+
+    logger.info(f"Validation result: {audit['overall_status']} "
+                f"({len(reextracted)} section(s) re-extracted, ${round(repair_cost, 6)})")
+
+    return {
+        "structured_data": structured_data,
+        "audit": audit,
+        "reextracted_sections": reextracted,
+        "repair_cost": round(repair_cost, 6)
+    }
@@ -0,0 +1,262 @@
+"""
+Vendor layout fingerprinting and per-vendor extraction profiles
+
+Recurring documents (monthly Clipboard Health invoices, Fidelity statements) share
+a layout. A fingerprint made of a perceptual hash of the first page and the stable
+words in its header identifies a known layout, and the stored profile says which
+pages matter, which template fields to ask for, where fields sit on the page and
+which (validated) cheaper model can be used.
+"""
+
+from __future__ import annotations
+
+import re
+import json
+import logging
+from pathlib import Path
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from lazy_imports import lazy_import
+from page_source import iter_pages
+from tracing import traced
+
+Image = lazy_import("PIL.Image")
+
+logger = logging.getLogger(__name__)
+
+PROFILES_FILE = Path(__file__).parent / "vendor_profiles.json"
+
+# First page is rendered small for fingerprinting - layout, not legibility, matters
+FINGERPRINT_DPI = 40
+HASH_SIZE = 8
+
+# Matching thresholds
+MAX_HASH_DISTANCE = 10          # out of HASH_SIZE * HASH_SIZE bits
+MIN_HEADER_SIMILARITY = 0.5     # Jaccard similarity of header tokens
+HEADER_LINES = 10
+
+def compute_layout_hash(image: Image.Image) -> str:
+    """
+    Compute a difference hash (dHash) of a page image
+
+    Args:
+        image: PIL Image of the page
+
+    Returns:
+        Hex string of HASH_SIZE * HASH_SIZE bits
+    """
+    small = image.convert('L').resize((HASH_SIZE + 1, HASH_SIZE), Image.BILINEAR)
+    pixels = list(small.getdata())
+
+    bits = 0
+    for row in range(HASH_SIZE):
+        for col in range(HASH_SIZE):
+            left = pixels[row * (HASH_SIZE + 1) + col]
+            right = pixels[row * (HASH_SIZE + 1) + col + 1]
+            bits = (bits << 1) | (1 if left > right else 0)
+
+    return f"{bits:0{HASH_SIZE * HASH_SIZE // 4}x}"
+
+def hash_distance(hash_a: str, hash_b: str) -> int:
+    """Hamming distance between two layout hashes"""
+    return bin(int(hash_a, 16) ^ int(hash_b, 16)).count("1")
+
+def header_tokens(text: str, lines: int = HEADER_LINES) -> List[str]:
+    """
+    Extract the stable words from the top of a page
+
+    Numbers, dates and amounts change every month, so only alphabetic words of
+    three or more letters from the first non-empty lines are kept.
+    """
+    header_lines = [line for line in text.split('\n') if line.strip()][:lines]
+    tokens = set()
+    for line in header_lines:
+        for word in re.findall(r"[A-Za-z]{3,}", line):
+            tokens.add(word.lower())
+    return sorted(tokens)
+
+def header_similarity(tokens_a: List[str], tokens_b: List[str]) -> float:
+    """Jaccard similarity between two header token lists"""
+    set_a, set_b = set(tokens_a), set(tokens_b)
+    if not set_a or not set_b:
+        return 0.0
+    return len(set_a & set_b) / len(set_a | set_b)
+
+def render_fingerprint_page(file_path: str) -> Image.Image:
+    """Render the first page of a PDF or image file at fingerprint resolution"""
+    return next(iter_pages(file_path, [1], dpi=FINGERPRINT_DPI))["image"]
+
+def load_vendor_profiles() -> Dict[str, Dict]:
+    """Load stored vendor profiles keyed by vendor_id"""
+    if not PROFILES_FILE.exists():
+        return {}
+    try:
+        with open(PROFILES_FILE, 'r', encoding='utf-8') as f:
+            return json.load(f).get("profiles", {})
+    except Exception as e:
+        logger.warning(f"Could not load vendor profiles: {e}")
+        return {}
+
+def save_vendor_profile(profile: Dict) -> str:
+    """
+    Add or replace a vendor profile
+
+    Args:
+        profile: Profile dictionary as returned by create_vendor_profile
+
+    Returns:
+        Path to the profiles file
+    """
+    try:
+        profiles = load_vendor_profiles()
+        profiles[profile["vendor_id"]] = profile
+
+        with open(PROFILES_FILE, 'w', encoding='utf-8') as f:
+            json.dump({"profiles": profiles}, f, indent=2, ensure_ascii=False)
+
+        logger.info(f"Saved vendor profile '{profile['vendor_id']}' to {PROFILES_FILE}")
+        return str(PROFILES_FILE)
+
+    except Exception as e:
+        logger.error(f"Error saving vendor profile: {e}")
+        raise Exception(f"Failed to save vendor profile: {str(e)}")
+
+def create_vendor_profile(vendor_name: str, document_type: str, layout_hash: str, header_text: str,
+                          pages: Optional[List[int]] = None, template_fields: Optional[List[str]] = None,
+                          field_positions: Optional[Dict[str, str]] = None, extraction_model: Optional[str] = None,
+                          extraction_model_validated: bool = False) -> Dict:
+    """
+    Build a vendor profile from a reference document's fingerprint
+
+    Args:
+        vendor_name: Human readable vendor name
+        document_type: invoice or brokerage
+        layout_hash: compute_layout_hash of the reference first page
+        header_text: OCR text of the reference first page
+        pages: Pages that carry the data to extract (default [1])
+        template_fields: Dotted template paths to keep, e.g. ["invoice_metadata", "totals.total"] (default: whole template)
+        field_positions: Where fields appear, e.g. {"invoice_number": "page 1, top right"}
+        extraction_model: Cheaper model for structured extraction of this layout (optional)
+        extraction_model_validated: Whether extraction_model has been checked against reference outputs
+
+    Returns:
+        Profile dictionary
+    """
+    vendor_id = re.sub(r"[^a-z0-9]+", "_", vendor_name.lower()).strip("_")
+    return {
+        "vendor_id": vendor_id,
+        "vendor_name": vendor_name,
+        "document_type": document_type,
+        "layout_hash": layout_hash,
+        "header_tokens": header_tokens(header_text),
+        "pages": sorted(set(pages)) if pages else [1],
+        "template_fields": template_fields or [],
+        "field_positions": field_positions or {},
+        "extraction_model": extraction_model,
+        "extraction_model_validated": extraction_model_validated,
+        "created_at": datetime.now().isoformat()
+    }
+
+def match_layout_hash(layout_hash: str, profiles: Optional[Dict[str, Dict]] = None) -> Optional[Dict]:
+    """
+    Find the stored profile whose layout hash is closest to the given one
+
+    Returns:
+        The closest profile within MAX_HASH_DISTANCE, or None
+    """
+    if profiles is None:
+        profiles = load_vendor_profiles()
+
+    best_profile = None
+    best_distance = MAX_HASH_DISTANCE + 1
+    for profile in profiles.values():
+        distance = hash_distance(layout_hash, profile["layout_hash"])
+        if distance < best_distance:
+            best_profile, best_distance = profile, distance
+
+    if best_profile:
+        logger.info(f"Layout hash matched '{best_profile['vendor_id']}' at distance {best_distance}")
+    return best_profile
+
+@traced("vendor_fingerprint")
+def identify_vendor_layout(file_path: str) -> Optional[Dict]:
+    """
+    Cheap local check for a known vendor layout before any Vision calls
+
+    Args:
+        file_path: Path to the PDF file
+
+    Returns:
+        Candidate vendor profile, or None when the layout is not recognized
+    """
+    profiles = load_vendor_profiles()
+    if not profiles:
+        return None
+
+    try:
+        layout_hash = compute_layout_hash(render_fingerprint_page(file_path))
+    except Exception as e:
+        logger.warning(f"Could not fingerprint {file_path}: {e}")
+        return None
+
+    return match_layout_hash(layout_hash, profiles)
+
+def confirm_vendor_header(profile: Dict, first_page_text: str) -> bool:
+    """Confirm a layout-hash match against the header text of the first page"""
+    similarity = header_similarity(profile["header_tokens"], header_tokens(first_page_text))
+    logger.info(f"Header similarity with '{profile['vendor_id']}': {similarity:.2f}")
+    return similarity >= MIN_HEADER_SIMILARITY
+
+def trim_template(template: Dict, fields: List[str]) -> Dict:
+    """
+    Keep only the listed dotted paths of a template
+
+    Args:
+        template: Full extraction template
+        fields: Dotted paths such as "invoice_metadata" or "vendor.name"
+
+    Returns:
+        Trimmed copy of the template (the full template if no fields are given)
+    """
+    if not fields:
+        return template
+
+    trimmed = {}
+    for field in fields:
+        source, target = template, trimmed
+        parts = field.split('.')
+        for i, part in enumerate(parts):
+            if not isinstance(source, dict) or part not in source:
+                logger.warning(f"Template field '{field}' not found - skipping")
+                break
+            if i == len(parts) - 1:
+                target[part] = source[part]
+            else:
+                target = target.setdefault(part, {})
+                source = source[part]
+
+    return trimmed
+
+def get_profile_extraction_options(profile: Dict, template: Dict) -> Dict:
+    """
+    Structured extraction keyword arguments for a matched vendor profile
+
+    Args:
+        profile: Matched vendor profile
+        template: Full template for the profile's document type
+
+    Returns:
+        Dictionary with template, model (only if validated) and prompt_hints
+    """
+    options = {"template": trim_template(template, profile.get("template_fields", []))}
+
+    if profile.get("extraction_model") and profile.get("extraction_model_validated"):
+        options["model"] = profile["extraction_model"]
+
+    if profile.get("field_positions"):
+        options["prompt_hints"] = "\n".join(
+            f"- {field}: {position}" for field, position in profile["field_positions"].items()
+        )
+
+    return options
@@ -5,7 +5,6 @@ Manages automated workflows that chain operations across multiple MCP servers
 """
 
 import json
-import yaml
 import asyncio
 import re
 from datetime import datetime, timedelta
@@ -15,7 +14,7 @@ from dataclasses import dataclass, asdict
 import sqlite3
 import tempfile
 
-from fastmcp import FastMCP
+from mcp.server.fastmcp import FastMCP
 from pydantic import BaseModel
 
 # Initialize MCP server
@@ -75,6 +74,8 @@ class WorkflowEngine:
     
     def load_workflows(self):
         """Load workflow definitions from YAML files"""
+        import yaml
+        
         WORKFLOWS_DIR.mkdir(exist_ok=True)
         
         for workflow_file in WORKFLOWS_DIR.glob("*.yml"):
@@ -359,8 +360,16 @@ class WorkflowEngine:
                 json.dumps([asdict(step) for step in execution.steps_completed])
             ))
 
-# Global workflow engine instance
-workflow_engine = WorkflowEngine()
+# Global workflow engine instance, created on first tool use so that server
+# startup (the MCP handshake) does not wait on YAML parsing and SQLite setup
+workflow_engine: Optional[WorkflowEngine] = None
+
+def get_workflow_engine() -> WorkflowEngine:
+    """Return the workflow engine, loading workflows and the history DB on first use"""
+    global workflow_engine
+    if workflow_engine is None:
+        workflow_engine = WorkflowEngine()
+    return workflow_engine
 
 # MCP Tools for Workflow Management
 
@@ -379,7 +388,7 @@ def trigger_workflow(workflow_name: str, trigger_event: str, trigger_data: dict)
     """
     try:
         # Run workflow asynchronously
-        execution = asyncio.run(workflow_engine.execute_workflow(
+        execution = asyncio.run(get_workflow_engine().execute_workflow(
             workflow_name, trigger_event, trigger_data
         ))
         
@@ -411,7 +420,7 @@ def list_workflows() -> str:
     """
     try:
         workflows_info = []
-        for name, definition in workflow_engine.workflows.items():
+        for name, definition in get_workflow_engine().workflows.items():
             workflows_info.append({
                 "name": name,
                 "description": definition.get("description", ""),
@@ -436,8 +445,9 @@ def get_workflow_execution(execution_id: str) -> str:
         JSON with execution details
     """
     try:
-        if execution_id in workflow_engine.executions:
-            execution = workflow_engine.executions[execution_id]
+        engine = get_workflow_engine()
+        if execution_id in engine.executions:
+            execution = engine.executions[execution_id]
             result = {
                 "execution_id": execution.execution_id,
                 "workflow_name": execution.workflow_name,
@@ -478,6 +488,8 @@ def create_workflow_definition(name: str, definition: dict) -> str:
     Returns:
         JSON result with creation status
     """
+    import yaml
+    
     try:
         # Save to YAML file
         workflow_file = WORKFLOWS_DIR / f"{name}.yml"
@@ -485,7 +497,7 @@ def create_workflow_definition(name: str, definition: dict) -> str:
             yaml.dump(definition, f, default_flow_style=False)
         
         # Reload workflows
-        workflow_engine.load_workflows()
+        get_workflow_engine().load_workflows()
         
         result = {
             "success": True,
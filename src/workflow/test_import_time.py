@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+"""
+Startup profile of the Workflow server (python -X importtime)
+Workflow YAML files and the execution history DB are loaded on first tool use, not at import
+"""
+
+import os
+import re
+import sys
+import subprocess
+from pathlib import Path
+
+IMPORT_BUDGET_MS = float(os.getenv("WORKFLOW_IMPORT_BUDGET_MS", "400"))
+
+LINE_PATTERN = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|\s+(\S+)")
+
+def test_server_import_profile():
+    """Importing server.py parses no YAML, opens no database and stays within budget"""
+    print("🧪 Testing Workflow server import profile")
+
+    check = "import server; assert server.workflow_engine is None"
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", check],
+                            cwd=Path(__file__).parent, capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr[-2000:]
+    assert "Loaded workflow" not in result.stdout
+
+    timings = {}
+    for line in result.stderr.splitlines():
+        match = LINE_PATTERN.match(line)
+        if match:
+            timings[match.group(3)] = int(match.group(2)) / 1000
+
+    assert "yaml" not in timings, "yaml imported at startup"
+    framework_ms = timings.get("mcp.server.fastmcp", 0.0)
+    own_ms = timings["server"] - framework_ms
+    print(f"   server: {timings['server']:.0f} ms (MCP framework {framework_ms:.0f} ms, own {own_ms:.0f} ms)")
+    assert own_ms < IMPORT_BUDGET_MS, f"Workflow server import took {own_ms:.0f} ms (budget {IMPORT_BUDGET_MS:.0f} ms)"
+
+    print("✅ Workflow engine deferred to first use")
+
+if __name__ == "__main__":
+    test_server_import_profile()
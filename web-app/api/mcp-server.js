@@ -668,34 +668,26 @@ app.get('/api/crm/dashboard', async (req, res) => {
     // Direct database query for dashboard stats
     const result = await new Promise((resolve, reject) => {
       const python = spawn('python3', ['-c', `
+import sys
 import json
-import sqlite3
 from pathlib import Path
 
+sys.path.append('${path.resolve(__dirname, '../../src/crm-db')}')
 db_path = Path("${path.resolve(__dirname, '../../src/crm-db/crm.db')}")
 
 try:
-    conn = sqlite3.connect(str(db_path))
-    cursor = conn.cursor()
-    
-    # Get counts for dashboard
-    cursor.execute("SELECT COUNT(*) FROM contacts WHERE deleted_at IS NULL")
-    contacts = cursor.fetchone()[0]
-    
-    cursor.execute("SELECT COUNT(*) FROM companies WHERE deleted_at IS NULL")
-    companies = cursor.fetchone()[0]
-    
-    cursor.execute("SELECT COUNT(*) FROM communications WHERE deleted_at IS NULL")
-    communications = cursor.fetchone()[0]
+    from database import CRMDatabase, dashboard_counts
     
-    cursor.execute("SELECT COUNT(*) FROM tasks WHERE completed = 0 AND deleted_at IS NULL")
-    urgentTasks = cursor.fetchone()[0]
+    # Counts come from the trigger-maintained rollups instead of COUNT(*) scans
+    with CRMDatabase(str(db_path)) as db:
+        db.ensure_rollups()
+        counts = dashboard_counts(db.conn)
     
     result = {
-        "contacts": contacts,
-        "companies": companies, 
-        "communications": communications,
-        "urgentTasks": urgentTasks
+        "contacts": counts["contacts"],
+        "companies": counts["companies"],
+        "communications": counts["communications"],
+        "urgentTasks": counts["task_summary"]["pending"]
     }
     
     print(json.dumps(result))